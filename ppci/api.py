@@ -22,12 +22,16 @@ from .utils.reporting import DummyReportGenerator, HtmlReportGenerator
 from .opt.transform import DeleteUnusedInstructionsPass
 from .opt.transform import RemoveAddZeroPass
 from .opt import CommonSubexpressionEliminationPass
+from .opt import GlobalValueNumberingPass
 from .opt import ConstantFolder
 from .opt import LoadAfterStorePass
 from .opt import CleanPass
 from .opt.mem2reg import Mem2RegPromotor
-from .opt.cjmp import CJumpPass
+from .opt.pass_manager import PassManager
 from .opt.tailcall import TailCallOptimization
+from .opt.inline import InlinePass
+from .opt.sccp import SparseConditionalConstantPropagationPass
+from .opt.licm import LoopInvariantCodeMotionPass
 from .codegen import CodeGenerator
 from .binutils.linker import link
 from .binutils.archive import archive
@@ -184,7 +188,44 @@ def disasm(data, march):
 OPT_LEVELS = ("0", "1", "2", "s")
 
 
-def optimize(ir_module, level=0, reporter=None):
+def get_optimization_passes(level):
+    """ Create the list of optimization passes for the given level.
+
+    Args:
+        level: The optimization level, one of 1, 2 or s.
+    """
+    level = str(level)
+    if level not in OPT_LEVELS:
+        raise ValueError("Invalid optimization level {}".format(level))
+
+    opt_passes = [
+        Mem2RegPromotor(),
+        RemoveAddZeroPass(),
+        ConstantFolder(),
+    ]
+
+    if level == "1":
+        opt_passes.append(CommonSubexpressionEliminationPass())
+    else:
+        opt_passes.append(GlobalValueNumberingPass())
+    opt_passes.extend([TailCallOptimization(), LoadAfterStorePass()])
+    if level in ("2", "s"):
+        opt_passes.append(SparseConditionalConstantPropagationPass())
+
+    opt_passes.extend([DeleteUnusedInstructionsPass(), CleanPass()])
+
+    # Inline after cleaning, the next round optimizes the callers:
+    if level == "2":
+        # Loop optimizations increase code size:
+        opt_passes.append(LoopInvariantCodeMotionPass())
+        opt_passes.append(InlinePass(max_size=30))
+    elif level == "s":
+        # Only inline when the code does not grow:
+        opt_passes.append(InlinePass(optimize_size=True))
+    return opt_passes
+
+
+def optimize(ir_module, level=0, reporter=None, verify_level=None):
     """ Run a bag of tricks against the :doc:`ir-code<ir/index>`.
 
     This is an in-place operation!
@@ -197,6 +238,9 @@ def optimize(ir_module, level=0, reporter=None):
             2: more optimization
             s: optimize for size
         reporter: Report detailed log to this reporter
+        verify_level: The :class:`ppci.irutils.VerifyLevel` to check the
+            module before and after optimization. None selects the
+            default level.
     """
     logger = logging.getLogger("optimize")
     level = str(level)
@@ -212,41 +256,34 @@ def optimize(ir_module, level=0, reporter=None):
     if level == "0":
         return
 
-    # TODO: differentiate between optimization levels!
-
-    # Optimization passes (bag of tricks) run them three times:
-    opt_passes = [
-        Mem2RegPromotor(),
-        RemoveAddZeroPass(),
-        ConstantFolder(),
-        CommonSubexpressionEliminationPass(),
-        TailCallOptimization(),
-        LoadAfterStorePass(),
-        DeleteUnusedInstructionsPass(),
-        CleanPass(),
-    ] * 3
-
-    if level == "3":
-        opt_passes.append(CJumpPass())
+    # Optimization passes (bag of tricks), run until nothing changes:
+    pass_manager = PassManager(get_optimization_passes(level))
 
     # Run the passes over the module:
-    verify_module(ir_module)
-    for opt_pass in opt_passes:
-        opt_pass.run(ir_module)
-        # reporter.message('{} after {}:'.format(ir_module, opt_pass))
-        # reporter.dump_ir(ir_module)
+    verify_module(ir_module, level=verify_level)
+    pass_manager.run(ir_module)
 
     if reporter:
         # Dump report:
         reporter.message("{} after optimization:".format(ir_module))
         reporter.message("{} {}".format(ir_module, ir_module.stats()))
+        pass_manager.report(reporter)
         reporter.dump_ir(ir_module)
 
-    verify_module(ir_module)
+    # Verify against freshly computed control flow info, so that stale
+    # analysis results cannot hide a broken pass:
+    pass_manager.analyses.clear()
+    verify_module(ir_module, level=verify_level)
 
 
 def ir_to_stream(
-    ir_module, march, output_stream, reporter=None, debug=False, opt="speed"
+    ir_module,
+    march,
+    output_stream,
+    reporter=None,
+    debug=False,
+    opt="speed",
+    verify_level=None,
 ):
     """ Translate IR module to output stream.
     """
@@ -256,7 +293,7 @@ def ir_to_stream(
         reporter = DummyReportGenerator()
 
     code_generator = CodeGenerator(march, optimize_for=opt)
-    verify_module(ir_module)
+    verify_module(ir_module, level=verify_level)
 
     # Code generation:
     code_generator.generate(
@@ -275,7 +312,13 @@ def ir_to_assembly(ir_modules, march, add_binary=False):
 
 
 def ir_to_object(
-    ir_modules, march, reporter=None, debug=False, opt="speed", outstream=None
+    ir_modules,
+    march,
+    reporter=None,
+    debug=False,
+    opt="speed",
+    outstream=None,
+    verify_level=None,
 ):
     """ Translate IR-modules into code for the given architecture.
 
@@ -287,6 +330,8 @@ def ir_to_object(
         debug (bool): include debugging information
         opt (str): optimization goal. Can be 'speed', 'size' or 'co2'.
         outstream: instruction stream to write instructions to
+        verify_level: The :class:`ppci.irutils.VerifyLevel` to check the
+            modules with before code generation.
 
     Returns:
         ObjectFile: An object file
@@ -321,6 +366,7 @@ def ir_to_object(
             reporter=reporter,
             debug=debug,
             opt=opt,
+            verify_level=verify_level,
         )
 
     reporter.message("All modules generated!")
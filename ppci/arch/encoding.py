@@ -3,7 +3,7 @@
 
 import abc
 from .registers import Register
-from .token import TokenSequence
+from .token import Token, TokenSequence, _p2
 
 
 class Operand(property):
@@ -390,17 +390,38 @@ class Instruction(Constructor, metaclass=InsMeta):
                     p.__set__(o, new)
 
     def get_tokens(self):
-        precodes = []
-        tokens = []
-        for nl in self.non_leaves:
-            if hasattr(nl, "tokens"):
-                for tc in nl.tokens:
-                    t = tc()
-                    if t.Info.precode:
-                        precodes.append(t)
-                    else:
-                        tokens.append(t)
-        return TokenSequence(precodes + tokens)
+        """ Create the tokens for this instruction, precodes first """
+        _, layout = self.get_layout()
+        tokens = [token_type() for token_type in layout.token_types]
+        return TokenSequence(tokens)
+
+    @classmethod
+    def has_constructor_operands(cls):
+        """ Check if the parts of this instruction depend on its operands """
+        if cls not in _constructor_operands:
+            _constructor_operands[cls] = bool(cls.syntax) and any(
+                p.is_constructor for p in cls.syntax.formal_arguments
+            )
+        return _constructor_operands[cls]
+
+    def get_layout(self):
+        """ Get the parts of this instruction and their compiled layout.
+
+        The layout is created once for each class of instruction, or for
+        each combination of part classes when the instruction has
+        constructor operands.
+        """
+        if self.has_constructor_operands():
+            parts = tuple(self.non_leaves)
+            key = tuple(type(part) for part in parts)
+        else:
+            parts = (self,)
+            key = type(self)
+        layout = _layouts.get(key)
+        if layout is None:
+            layout = InstructionLayout(parts)
+            _layouts[key] = layout
+        return parts, layout
 
     def get_positions(self):
         """ Calculate the positions in the byte stream of all parts """
@@ -424,6 +445,10 @@ class Instruction(Constructor, metaclass=InsMeta):
         returns bytes for this instruction.
         """
 
+        parts, layout = self.get_layout()
+        if layout.encoder:
+            return layout.encoder(parts)
+
         tokens = self.get_tokens()
         self.set_all_patterns(tokens)
         return tokens.encode()
@@ -447,7 +472,8 @@ class Instruction(Constructor, metaclass=InsMeta):
     def relocations(self):
         """ Determine the total set of relocations for this instruction """
         relocs = []
-        positions = self.get_positions()
+        parts, layout = self.get_layout()
+        positions = dict(zip(parts, layout.offsets))
         for nl, offset in positions.items():
             for reloc in nl.gen_relocations():
                 relocs.append(reloc.shifted(offset))
@@ -588,6 +614,179 @@ class VariablePattern(BitPattern):
         return self.prop.get_value(objref)
 
 
+# Layouts of instructions, by instruction class, or by the classes of
+# the parts of an instruction with constructor operands:
+_layouts = {}
+_constructor_operands = {}
+
+
+class InstructionLayout:
+    """ The tokens and patterns of an instruction made of the given parts.
+
+    When possible, an encoder function is compiled for the instruction.
+    The bits of fixed patterns are combined into a constant for each token,
+    and only the variable fields are shifted in when encoding.
+    """
+
+    def __init__(self, parts):
+        self.offsets = []
+        self.token_types = []
+        precode_types = []
+        offset = 0
+        for part in parts:
+            self.offsets.append(offset)
+            tokens = getattr(part, "tokens", ())
+            for token_type in tokens:
+                if token_type.Info.precode:
+                    precode_types.append(token_type)
+                else:
+                    self.token_types.append(token_type)
+            offset += sum(t.Info.size for t in tokens) // 8
+        self.token_types = precode_types + self.token_types
+        self.encoder = self.compile_encoder(parts)
+
+    def compile_encoder(self, parts):
+        """ Create an encoder function, or return None when the parts have
+        custom patterns or tokens, which only the generic encoding supports.
+        """
+        if not self.is_standard(parts):
+            return
+
+        # Gather all field assignments, in the order they are done:
+        writes = []
+        for part_index, part in enumerate(parts):
+            for pattern in part.dict_to_patterns(part.patterns):
+                field = self.find_field(pattern.field)
+                if field is None:
+                    return
+                if type(pattern) is FixedPattern:
+                    value = pattern.value
+                    if not isinstance(value, int):
+                        return
+                    if field[1]._checked:
+                        value = self.wrap_value(value, field[1]._bitsize)
+                        if value is None:
+                            return
+                    writes.append((field, None, value))
+                elif type(pattern) is VariablePattern:
+                    get_value = pattern.prop.get_value
+                    writes.append((field, part_index, get_value))
+                else:
+                    return
+
+        # Later assignments overwrite earlier ones, so determine the bits
+        # which remain of each assignment, starting at the last one:
+        written = [0] * len(self.token_types)
+        constants = [0] * len(self.token_types)
+        variables = []
+        for (token_index, prop), part_index, value in reversed(writes):
+            token_mask = (1 << self.token_types[token_index].Info.size) - 1
+            placements = []
+            shift = prop._bitsize
+            for start, size in prop._ranges:
+                shift -= size
+                mask = (1 << size) - 1
+                keep = (mask << start) & ~written[token_index] & token_mask
+                written[token_index] |= mask << start
+                if keep:
+                    placements.append((shift, mask, start, keep))
+
+            if part_index is None:
+                for shift, mask, start, keep in placements:
+                    constants[token_index] |= (
+                        ((value >> shift) & mask) << start
+                    ) & keep
+            elif placements:
+                limit = (1 << prop._bitsize) if prop._checked else 0
+                variables.append(
+                    (part_index, value, token_index, limit, placements)
+                )
+
+        sizes = [t.Info.size // 8 for t in self.token_types]
+        byteorders = [t.byteorder() for t in self.token_types]
+        token_range = range(len(self.token_types))
+
+        def encoder(parts):
+            values = constants.copy()
+            for variable in variables:
+                part_index, get_value, index, limit, placements = variable
+                value = get_value(parts[part_index])
+                assert isinstance(value, int)
+                if limit:
+                    if value >= limit:
+                        raise ValueError(
+                            "value {} cannot be fit into {} bits".format(
+                                value, limit.bit_length() - 1
+                            )
+                        )
+                    if value < 0:
+                        value += limit
+                        assert value >= 0
+                for shift, mask, start, keep in placements:
+                    value_bits = ((value >> shift) & mask) << start
+                    values[index] |= value_bits & keep
+            return b"".join(
+                values[i].to_bytes(sizes[i], byteorders[i])
+                for i in token_range
+            )
+
+        return encoder
+
+    def is_standard(self, parts):
+        """ Check that parts and tokens use the default encoding methods """
+        instruction_type = type(parts[0])
+        if (
+            instruction_type.get_tokens is not Instruction.get_tokens
+            or instruction_type.set_all_patterns
+            is not Instruction.set_all_patterns
+        ):
+            return False
+        for part in parts:
+            part_type = type(part)
+            if (
+                part_type.set_patterns is not Constructor.set_patterns
+                or part_type.set_user_patterns
+                is not Constructor.set_user_patterns
+                or part_type.dict_to_patterns
+                is not Constructor.dict_to_patterns
+            ):
+                return False
+        for token_type in self.token_types:
+            if (
+                token_type.__init__ is not Token.__init__
+                or token_type.__setitem__ is not Token.__setitem__
+                or token_type.encode is not Token.encode
+                or token_type.pack.__func__ is not Token.pack.__func__
+                or token_type.Info.size % 8 != 0
+            ):
+                return False
+        return True
+
+    def find_field(self, name):
+        """ Find the token with the named field, like set_field does """
+        if name in ("bit_value", "mask"):
+            return
+        for token_index, token_type in enumerate(self.token_types):
+            prop = getattr(token_type, name, None)
+            if prop is None:
+                continue
+            if isinstance(prop, _p2):
+                return token_index, prop
+            return
+
+    @staticmethod
+    def wrap_value(value, bits):
+        """ Wrap a value into a field, like Token.__setitem__ does """
+        limit = 1 << bits
+        if value >= limit:
+            return
+        if value < 0:
+            value += limit
+        if value < 0:
+            return
+        return value
+
+
 class Relocation:
     """ Baseclass for all relocation types.
 
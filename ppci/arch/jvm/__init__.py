@@ -10,6 +10,7 @@ https://en.wikipedia.org/wiki/Java_bytecode_instruction_listings
 from .io import read_jar, read_class_file
 from .class2ir import class_to_ir
 from .class_loader import ClassLoader
+from .jarfile import JarFile
 from .dynload import load_class
 from .printer import print_class_file
 
@@ -21,4 +22,5 @@ __all__ = [
     "load_class",
     "print_class_file",
     "ClassLoader",
+    "JarFile",
 ]
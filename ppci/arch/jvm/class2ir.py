@@ -2,6 +2,7 @@
 """
 
 import logging
+import re
 from .io import load_code, parse_method_descriptor
 from .nodes import BaseType
 from .enums import AccessFlag, ConstantTag
@@ -14,9 +15,14 @@ from ... import ir
 logger = logging.getLogger("jvm2ir")
 
 
-def class_to_ir(class_file):
-    """ Translate java class file into IR-code. """
-    generator = Generator()
+def class_to_ir(class_file, class_loader=None):
+    """ Translate java class file into IR-code.
+
+    When a class loader is given, static methods of other classes can be
+    called. These classes are loaded when they are first referenced, and
+    the generated functions are named after their class.
+    """
+    generator = Generator(class_loader=class_loader)
     generator.initialize()
     generator.gen_class(class_file)
     return generator.get_result()
@@ -33,12 +39,38 @@ def jar_to_ir(jar_file):
     return generator.get_result()
 
 
+def mangle_name(class_name, method_name, descriptor=None):
+    """ Create the symbol name for a method of a class
+
+    As in JNI, the parameter types of an overloaded method are added,
+    to give each overload its own name.
+    """
+    name = re.sub(r"\W", "_", "{}_{}".format(class_name, method_name))
+    if descriptor is not None:
+        name = "{}__{}".format(name, mangle_parameters(descriptor))
+    return name
+
+
+def mangle_parameters(descriptor):
+    """ Escape the parameter types of a method descriptor like JNI does """
+    parameters = descriptor[1 : descriptor.index(")")]
+    escapes = {"_": "_1", ";": "_2", "[": "_3", "/": "_"}
+    return "".join(escapes.get(c, c) for c in parameters)
+
+
+def is_overloaded(class_file, method_name):
+    """ Test if a class has several methods with the given name """
+    return sum(m.name == method_name for m in class_file.methods) > 1
+
+
 class Generator:
-    def __init__(self):
+    def __init__(self, class_loader=None):
         self._builder = Builder()
         self.stack = None
         self.local_variables = None
         self.class_file = None
+        self.class_loader = class_loader
+        self.referenced_classes = []  # Other classes which are called
 
     def initialize(self):
         """ Prepare translation. """
@@ -86,7 +118,9 @@ class Generator:
     def gen_class(self, class_file):
         logger.warning("java class file code generate is work in progress")
         self._functions = {}
+        self._external_functions = {}
         self.class_file = class_file
+        self.class_name = self.get_class_name(class_file.this_class)
         for method in class_file.methods:
             if AccessFlag.ACC_STATIC in method.access_flags:
                 self.gen_method(method)
@@ -104,21 +138,32 @@ class Generator:
 
         # Construct valid function:
         binding = ir.Binding.GLOBAL
+        if is_overloaded(self.class_file, method.name):
+            descriptor = signature.text
+        else:
+            descriptor = None
+        if self.class_loader is not None:
+            name = mangle_name(self.class_name, method.name, descriptor)
+        elif descriptor is not None:
+            name = "{}__{}".format(method.name, mangle_parameters(descriptor))
+        else:
+            name = method.name
         if signature.return_type:
             ir_typ = self.get_ir_type(signature.return_type)
-            ir_func = self._builder.new_function(method.name, binding, ir_typ)
+            ir_func = self._builder.new_function(name, binding, ir_typ)
             dbg_return_type = self.get_debug_type(signature.return_type)
         else:
-            ir_func = self._builder.new_procedure(method.name, binding)
+            ir_func = self._builder.new_procedure(name, binding)
             dbg_return_type = debuginfo.DebugBaseType("void", 0, 1)
         self._builder.set_function(ir_func)
 
         # Register function:
-        if method.name in self._functions:
+        key = (method.name, signature.text)
+        if key in self._functions:
             # Maybe we had an external function at first?
             raise NotImplementedError("TODO: update existing / replace?")
         else:
-            self._functions[method.name] = ir_func
+            self._functions[key] = ir_func
 
         # Start in entry block:
         first_block = self._builder.new_block()
@@ -417,8 +462,7 @@ class Generator:
         elif mnemonic == "invokestatic":
             method_index = args[0]
             method_ref = self.class_file.constant_pool[method_index]
-            # print(method_ref)
-            # TODO: use --> class_index = method_ref.value[0]
+            class_name = self.get_class_name(method_ref.value[0])
             name_and_type_index = method_ref.value[1]
             name_and_type = self.class_file.constant_pool[name_and_type_index]
             # print(class_index, name_and_type)
@@ -427,25 +471,37 @@ class Generator:
             logger.debug("calling %s with %s", name.value, signature.value)
             name = name.value
             signature = parse_method_descriptor(signature.value)
-            self.call_sub(name, signature)
+            self.call_sub(class_name, name, signature)
         else:  # pragma: no cover
             # logger.error('todo: 0x%X', instruction)
             raise NotImplementedError(mnemonic)
 
-    def call_sub(self, name, signature):
+    def get_class_name(self, class_index):
+        """ Get the name of a class given by an index. """
+        class_constant = self.class_file.get_constant(class_index)
+        assert class_constant.tag == ConstantTag.Class
+        return self.class_file.get_name(class_constant.value)
+
+    def call_sub(self, class_name, name, signature):
         """ Call a function / method """
-        ir_method = self.get_method_ref(name, signature)
+        if class_name == self.class_name:
+            ir_method = self.get_method_ref(name, signature)
+        else:
+            ir_method = self.get_external_method_ref(
+                class_name, name, signature
+            )
 
-        # Gather arguments from stack:
+        # Gather arguments from stack, the last argument is on top:
         args = []
-        for parameter_type in signature.parameter_types:
+        for parameter_type in reversed(signature.parameter_types):
             ir_typ = self.get_ir_type(parameter_type)
             arg = self.stack.pop()
             assert arg.ty is ir_typ
             args.append(arg)
+        args.reverse()
 
         # Invoke tha method:
-        is_void = isinstance(ir_method, ir.Procedure)
+        is_void = signature.return_type is None
         if is_void:
             self.emit(ir.ProcedureCall(ir_method, args))
         else:
@@ -457,14 +513,67 @@ class Generator:
 
     def get_method_ref(self, name, signature):
         """ Retrieve a method with the given name and signature. """
-        if name in self._functions:
-            func = self._functions[name]
-            # Check types?
+        key = (name, signature.text)
+        if key in self._functions:
+            func = self._functions[key]
         else:
             # Create new external method.
             raise NotImplementedError("TODO")
         return func
 
+    def get_external_method_ref(self, class_name, name, signature):
+        """ Refer to a static method of another class.
+
+        The class is loaded on its first reference, to check that the
+        method exists.
+        """
+        if self.class_loader is None:
+            raise NotImplementedError(
+                "Calling {}.{} requires a class loader".format(
+                    class_name, name
+                )
+            )
+
+        key = (class_name, name, signature.text)
+        if key not in self._external_functions:
+            class_file = self.class_loader.load(class_name)
+            methods = [
+                m
+                for m in class_file.methods
+                if m.name == name and m.descriptor.text == signature.text
+            ]
+            if not methods:
+                raise ValueError(
+                    "Class {} has no method {}{}".format(
+                        class_name, name, signature.text
+                    )
+                )
+            if AccessFlag.ACC_STATIC not in methods[0].access_flags:
+                raise NotImplementedError(
+                    "Calling non-static method {}.{}".format(class_name, name)
+                )
+            if class_name not in self.referenced_classes:
+                self.referenced_classes.append(class_name)
+
+            if is_overloaded(class_file, name):
+                descriptor = signature.text
+            else:
+                descriptor = None
+            mangled_name = mangle_name(class_name, name, descriptor)
+            argument_types = [
+                self.get_ir_type(t) for t in signature.parameter_types
+            ]
+            if signature.return_type is None:
+                func = ir.ExternalProcedure(mangled_name, argument_types)
+            else:
+                return_ty = self.get_ir_type(signature.return_type)
+                func = ir.ExternalFunction(
+                    mangled_name, argument_types, return_ty
+                )
+            self._builder.module.add_external(func)
+            self._external_functions[key] = func
+        return self._external_functions[key]
+
     def gen_load_const(self, value, typ):
         """ Generate code for loading a constant value. """
         value = self.emit(ir.Const(value, "const", typ))
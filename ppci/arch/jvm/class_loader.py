@@ -1,25 +1,156 @@
 """ Methods to load classes easily.
 """
 
+import hashlib
+import io
+import logging
 import os
+from ...utils.cache import read_cache_entry, write_cache_entry
+from .class2ir import Generator
+from .io import read_class_file
 from .jarfile import JarFile
 
 
+logger = logging.getLogger("jvm.loader")
+
+
 class ClassLoader:
-    def __init__(self):
+    """ Load classes from a class path of jar files and directories.
+
+    Jar files are indexed once, when the first class is searched for.
+    Classes are read and translated on demand: compiling a class also
+    compiles the classes whose static methods it calls, but no others.
+
+    Args:
+        cache_dir: when given, the compiled code of each class is cached
+            in this directory, and reused when the class file and the
+            target architecture are the same.
+    """
+
+    def __init__(self, cache_dir=None):
         self.class_paths = []
+        self.cache_dir = cache_dir
+        self._jar_files = {}
+        self._class_data = {}
+        self._class_files = {}
         self.add_class_path("/usr/lib/jvm/default/jre/lib/rt.jar")
 
     def add_class_path(self, path):
         """ Add a jar or directory to the class path. """
         self.class_paths.append(path)
 
-    def load(self, name):
-        # Start search!
+    def close(self):
+        """ Close all opened jar files """
+        for jar_file in self._jar_files.values():
+            jar_file.close()
+        self._jar_files.clear()
+
+    def find_class_data(self, name):
+        """ Get the contents of the class file of a class.
+
+        Args:
+            name: the class name, for example java/lang/Object
+        """
+        if name not in self._class_data:
+            self._class_data[name] = self._search_class_data(name)
+        return self._class_data[name]
+
+    def _search_class_data(self, name):
         for class_path in self.class_paths:
             if os.path.isdir(class_path):
-                pass
+                filename = os.path.join(class_path, name + ".class")
+                if os.path.isfile(filename):
+                    logger.debug("Loading %s from %s", name, filename)
+                    with open(filename, "rb") as f:
+                        return f.read()
             elif os.path.isfile(class_path):
-                pass
-            else:
-                pass
+                jar_file = self._get_jar_file(class_path)
+                if name in jar_file:
+                    logger.debug("Loading %s from %s", name, class_path)
+                    return jar_file.read_class_data(name)
+        raise ValueError("Class {} not found".format(name))
+
+    def _get_jar_file(self, filename):
+        if filename not in self._jar_files:
+            self._jar_files[filename] = JarFile(filename)
+        return self._jar_files[filename]
+
+    def load(self, name):
+        """ Load the class file of a class. """
+        if name not in self._class_files:
+            data = self.find_class_data(name)
+            self._class_files[name] = read_class_file(io.BytesIO(data))
+        return self._class_files[name]
+
+    def compile(self, name, march, debug=False):
+        """ Compile a class and the classes it refers to.
+
+        Returns a single object file with the code of all these classes.
+        The method m of class a/B is named a_B_m in this object, or
+        a_B_m__II for the overload of m with two int parameters.
+        """
+        from ...api import get_arch, link
+
+        march = get_arch(march)
+        objs = []
+        pending = [name]
+        compiled = set()
+        while pending:
+            class_name = pending.pop(0)
+            if class_name in compiled:
+                continue
+            compiled.add(class_name)
+            obj, referenced_classes = self.compile_class(
+                class_name, march, debug=debug
+            )
+            objs.append(obj)
+            pending.extend(referenced_classes)
+        return link(objs, partial_link=True, debug=debug)
+
+    def compile_class(self, name, march, debug=False):
+        """ Compile a single class.
+
+        Returns the object file of the class, and the names of the classes
+        which it refers to.
+        """
+        from ... import __version__
+        from ...api import get_arch, ir_to_object
+
+        march = get_arch(march)
+        data = self.find_class_data(name)
+        key_parts = [__version__, march.make_id_str(), str(debug), name]
+        key = hashlib.sha256(
+            "\0".join(key_parts).encode("utf8") + b"\0" + data
+        ).hexdigest()
+        entry = self._load_cache_entry(key)
+        if entry:
+            logger.debug("Using cached code for %s", name)
+            return entry
+
+        logger.info("Compiling class %s", name)
+        generator = Generator(class_loader=self)
+        generator.initialize()
+        generator.gen_class(self.load(name))
+        ir_module = generator.get_result()
+        obj = ir_to_object([ir_module], march, debug=debug)
+        self._save_cache_entry(key, obj, generator.referenced_classes)
+        return obj, generator.referenced_classes
+
+    def _load_cache_entry(self, key):
+        from ...binutils.objectfile import deserialize
+
+        if not self.cache_dir:
+            return
+        entry = read_cache_entry(self.cache_dir, key)
+        if entry is None:
+            return
+        try:
+            return deserialize(entry["object"]), entry["references"]
+        except (ValueError, KeyError, AttributeError) as ex:
+            logger.warning("Ignoring broken cache entry %s: %s", key, ex)
+
+    def _save_cache_entry(self, key, obj, referenced_classes):
+        if not self.cache_dir:
+            return
+        entry = {"object": obj.serialize(), "references": referenced_classes}
+        write_cache_entry(self.cache_dir, key, entry)
@@ -401,7 +401,7 @@ class DescriptorParser:
         else:
             return_type = self.parse_field_type()
 
-        return MethodType(parameter_types, return_type)
+        return MethodType(parameter_types, return_type, text=self.text)
 
     def take(self):
         c = self.text[self.pos]
@@ -1,2 +1,64 @@
+""" Java archive (jar) files.
+"""
+
+import io
+import logging
+import zipfile
+from .io import read_class_file, read_manifest
+
+
+logger = logging.getLogger("jvm.jar")
+
+
 class JarFile:
-    pass
+    """ A jar file, with an index of the classes in it.
+
+    The index is created once when the jar is opened. Class files are only
+    read when they are requested.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._zip_file = zipfile.ZipFile(filename)
+        self._class_entries = {}
+        for entry in self._zip_file.namelist():
+            if entry.endswith(".class"):
+                self._class_entries[entry[: -len(".class")]] = entry
+        logger.debug(
+            "Indexed %s classes in %s", len(self._class_entries), filename
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._zip_file.close()
+
+    def __contains__(self, name):
+        return name in self._class_entries
+
+    def __iter__(self):
+        """ Iterate over all class files in this jar """
+        for name in self.class_names:
+            yield self.read_class(name)
+
+    @property
+    def class_names(self):
+        """ The names of the classes in this jar, like java/lang/Object """
+        return sorted(self._class_entries)
+
+    def read_manifest(self):
+        """ Read the properties from the manifest of this jar """
+        with self._zip_file.open("META-INF/MANIFEST.MF") as manifest_file:
+            return read_manifest(io.TextIOWrapper(manifest_file))
+
+    def read_class_data(self, name):
+        """ Read the contents of the class file of the given class """
+        return self._zip_file.read(self._class_entries[name])
+
+    def read_class(self, name):
+        """ Read the class file of the given class """
+        return read_class_file(io.BytesIO(self.read_class_data(name)))
@@ -5,9 +5,10 @@ from .opcodes import op_to_name
 
 
 class MethodType:
-    def __init__(self, parameter_types, return_type):
+    def __init__(self, parameter_types, return_type, text=None):
         self.parameter_types = parameter_types
         self.return_type = return_type
+        self.text = text  # The descriptor, for example (II)I
 
 
 class BaseType:
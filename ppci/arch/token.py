@@ -31,12 +31,16 @@ def u8(x):
 
 
 class _p2(property):
-    def __init__(self, getter, setter, bitsize, signed):
+    def __init__(self, getter, setter, bitsize, signed, ranges, checked):
         if bitsize < 1:
             raise TypeError("Cannot create field with less than 1 bit")
         self._bitsize = bitsize
         self._signed = signed
         self._mask = (1 << bitsize) - 1
+        # The (start, size) bit ranges of this field, most significant first:
+        self._ranges = ranges
+        # Whether setting a value which does not fit raises an error:
+        self._checked = checked
         super().__init__(getter, setter)
 
     def __add__(self, other):
@@ -52,7 +56,7 @@ def bit_range(b, e, signed=False):
     def setter(s, v):
         s[b:e] = v
 
-    return _p2(getter, setter, e - b, signed)
+    return _p2(getter, setter, e - b, signed, [(b, e - b)], True)
 
 
 def bit(b):
@@ -77,7 +81,8 @@ def bit_concat(*partials):
 
     bitsize = sum(at._bitsize for at in partials)
     signed = partials[0]._signed
-    return _p2(getter, setter, bitsize, signed)
+    ranges = [r for at in partials for r in at._ranges]
+    return _p2(getter, setter, bitsize, signed, ranges, False)
 
 
 class TokenMeta(type):
@@ -181,12 +186,8 @@ class Token(metaclass=TokenMeta):
     def pack(cls, value):
         """ Pack integer value into bytes """
         assert cls.Info.size is not None
-        size = cls.Info.size // 8
-        if cls.Info.endianness == Endianness.LITTLE:
-            byte_numbers = range(size)
-        else:
-            byte_numbers = reversed(range(size))
-        return bytes((value >> (x * 8)) & 0xFF for x in byte_numbers)
+        mask = (1 << cls.Info.size) - 1
+        return (value & mask).to_bytes(cls.Info.size // 8, cls.byteorder())
 
     @classmethod
     def unpack(cls, data):
@@ -194,13 +195,15 @@ class Token(metaclass=TokenMeta):
         byte_size = cls.Info.size // 8
         if len(data) != byte_size:
             raise TypeError("Incorrect amount of data provided")
-        value = 0
+        return int.from_bytes(data, cls.byteorder())
+
+    @classmethod
+    def byteorder(cls):
+        """ Get the byte order of this token, for int.to_bytes """
         if cls.Info.endianness == Endianness.LITTLE:
-            data = reversed(data)
-        for byte in data:
-            value <<= 8
-            value += byte
-        return value
+            return "little"
+        else:
+            return "big"
 
 
 class TokenSequence:
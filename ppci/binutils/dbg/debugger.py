@@ -6,6 +6,7 @@ Start the debug server for your target and connect to it using the
 debugger interface.
 """
 
+import bisect
 import logging
 import struct
 import operator
@@ -60,6 +61,7 @@ class Debugger:
         self.events = driver.events
         self.variable_map = {}
         self.addr_map = {}
+        self._clear_indices()
 
     def __repr__(self):
         return "Debugger for {} using {}".format(self.arch, self.driver)
@@ -85,12 +87,7 @@ class Debugger:
 
     def get_possible_breakpoints(self, filename):
         """ Return the rows in the file for which breakpoints can be set """
-        options = set()
-        if self.debug_info:
-            for loc in self.debug_info.locations:
-                if loc.loc.filename == filename:
-                    options.add(loc.loc.row)
-        return options
+        return set(self._file_rows.get(filename, ()))
 
     def set_breakpoint(self, filename, row):
         """ Set a breakpoint """
@@ -155,11 +152,45 @@ class Debugger:
         self.obj = obj
         self.variable_map = {v.name: v for v in self.debug_info.variables}
         self.addr_map = {}
+        self._clear_indices()
         for loc in self.debug_info.locations:
             addr = self.calc_address(loc.address)
             self.addr_map[addr] = loc
             self.logger.debug("%s at 0x%x", loc, addr)
 
+            # The first location of a row is where a breakpoint goes:
+            key = (loc.loc.filename, loc.loc.row)
+            if key not in self._row_addresses:
+                self._row_addresses[key] = addr
+                self._file_rows.setdefault(loc.loc.filename, set()).add(
+                    loc.loc.row
+                )
+
+        # Sort addresses, such that the code at an address can be found
+        # by bisection:
+        self._location_addresses = sorted(self.addr_map)
+        function_ranges = sorted(
+            (
+                self.calc_address(function.begin),
+                self.calc_address(function.end),
+                index,
+            )
+            for index, function in enumerate(self.debug_info.functions)
+        )
+        self._function_begins = [r[0] for r in function_ranges]
+        self._function_ranges = [
+            (begin, end, self.debug_info.functions[index])
+            for begin, end, index in function_ranges
+        ]
+
+    def _clear_indices(self):
+        """ Forget the lookup tables of the debug information """
+        self._location_addresses = []
+        self._function_begins = []
+        self._function_ranges = []
+        self._row_addresses = {}
+        self._file_rows = {}
+
     def validate_memory(self, obj):
         """ Validate memory given an object file """
         for image in obj.images:
@@ -188,25 +219,36 @@ class Debugger:
     def find_pc(self):
         """ Given the current program counter (pc) determine the source """
         pc = self.get_pc()
-        # if pc in self.addr_map:
-        minkey = min(self.addr_map.keys(), key=lambda k: abs(k - pc))
+        minkey = self.find_nearest_location_address(pc)
         debug = self.addr_map[minkey]
         self.logger.info(
-            "Found program counter at %s with delta %i" % (debug, minkey - pc)
+            "Found program counter at %s with delta %i", debug, minkey - pc
         )
-        # debug = self.addr_map[pc]
         loc = debug.loc
         return loc.filename, loc.row
 
+    def find_nearest_location_address(self, address):
+        """ Find the address of the location which is closest by """
+        addresses = self._location_addresses
+        if not addresses:
+            raise ValueError("No source locations known")
+        index = bisect.bisect_left(addresses, address)
+        if index == len(addresses):
+            return addresses[-1]
+        if index > 0 and address - addresses[index - 1] <= (
+            addresses[index] - address
+        ):
+            return addresses[index - 1]
+        return addresses[index]
+
     def current_function(self):
         """ Determine the PC and then determine which function we are in """
         pc = self.get_pc()
-        if self.debug_info:
-            for function in self.debug_info.functions:
-                begin = self.calc_address(function.begin)
-                end = self.calc_address(function.end)
-                if pc in range(begin, end):
-                    return function
+        index = bisect.bisect_right(self._function_begins, pc) - 1
+        if index >= 0:
+            _, end, function = self._function_ranges[index]
+            if pc < end:
+                return function
 
     def local_vars(self):
         """ Return map of local variable names """
@@ -217,12 +259,12 @@ class Debugger:
 
     def find_address(self, filename, row):
         """ Given a filename and a row, determine the address """
-        if self.debug_info:
-            for debug in self.debug_info.locations:
-                loc = debug.loc
-                if loc.filename == filename and loc.row == row:
-                    return self.calc_address(debug.address)
-        self.logger.warning("Could not find address for %s:%i", filename, row)
+        address = self._row_addresses.get((filename, row))
+        if address is None:
+            self.logger.warning(
+                "Could not find address for %s:%i", filename, row
+            )
+        return address
 
     # Registers:
     def get_register_values(self, registers):
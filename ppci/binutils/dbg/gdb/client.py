@@ -69,19 +69,42 @@ class GdbDebugDriver(DebugDriver):
     sending and receiving of bytes. The protocol must be able to
     work using sockets and threads, serial port and threads and asyncio
     sockets.
+
+    Every packet is a round trip to the target, so while the target is
+    stopped, registers and memory are cached. Memory is read in pages of
+    `memory_page_size` bytes, and adjacent pages are read with a single
+    packet. The caches are cleared when the target is resumed. Pass
+    `cache_memory=False` when reading memory has side effects, for
+    example for memory mapped peripherals.
     """
 
     logger = logging.getLogger("gdbclient")
 
-    def __init__(self, arch, transport, pcresval=0, swbrkpt=False):
+    #: The amount of bytes which are read and cached at once.
+    memory_page_size = 64
+
+    def __init__(
+        self,
+        arch,
+        transport,
+        pcresval=0,
+        swbrkpt=False,
+        cache_memory=True,
+        no_ack=True,
+    ):
         super().__init__()
         self.arch = arch
         self.transport = transport
         self.status = DebugState.RUNNING
         self.pcresval = pcresval
         self._register_value_cache = {}  # Cached map of register values
+        self._memory_cache = {}  # Map of page number to page data
+        self.cache_memory = cache_memory
+        self.no_ack = no_ack
         self.swbrkpt = swbrkpt
         self.stopreason = INTERRUPT
+        self.max_packet_size = 0x400
+        self._binary_writes = True
 
         self._message_handler = None
         self._stop_msg_queue = queue.Queue()
@@ -97,8 +120,27 @@ class GdbDebugDriver(DebugDriver):
         self._message_handler = Thread(target=self._handle_stop_queue)
         self._message_handler.start()
         self.transport.connect()
+        self._negotiate_features()
         # self.send('?')
 
+    def _negotiate_features(self):
+        """ Query the features of the gdb server, and use them """
+        try:
+            res = self._send_command("qSupported")
+        except queue.Empty:
+            self.logger.warning("Server does not respond to qSupported")
+            return
+
+        features = res.split(";") if res else []
+        for feature in features:
+            if feature.startswith("PacketSize="):
+                self.max_packet_size = int(feature[11:], 16)
+
+        if self.no_ack and "QStartNoAckMode+" in features:
+            if self._send_command("QStartNoAckMode") == "OK":
+                self.logger.debug("Packets are no longer acknowledged")
+                self._rsp.ack_mode = False
+
     def disconnect(self):
         """ Disconnect the client """
         self.transport.disconnect()
@@ -172,6 +214,7 @@ class GdbDebugDriver(DebugDriver):
         """ Update state to started """
         self.status = DebugState.RUNNING
         self._register_value_cache.clear()
+        self._memory_cache.clear()
         self.events.on_start()
 
     def _stop(self):
@@ -198,13 +241,12 @@ class GdbDebugDriver(DebugDriver):
                 if is_hex(name):
                     # We are dealing with a register value here!
                     reg_num = int(name, 16)
-                    # self.logger.error('%s', reg_num)
-                    if reg_num == self.arch.gdb_registers.index(
-                        self.arch.gdb_pc
-                    ):
-                        # TODO: fill a cache of registers
-                        data = bytes.fromhex(rest[3:-1])
-                        (self.pcstopval,) = struct.unpack("<I", data)
+                    if reg_num < len(self.arch.gdb_registers):
+                        register = self.arch.gdb_registers[reg_num]
+                        data = bytes.fromhex(value)
+                        self._register_value_cache[
+                            register
+                        ] = self._unpack_register(register, data)
 
         if code & (BRKPOINT | INTERRUPT) != 0:
             self.logger.debug("Target stopped..")
@@ -274,34 +316,35 @@ class GdbDebugDriver(DebugDriver):
         return res
 
     def set_registers(self, regvalues):
+        """ Set registers using the gdb `G` command.
+
+        Registers which are not given keep their value.
+        """
         if self.status == DebugState.STOPPED:
+            values = {}
+            if any(r not in regvalues for r in self.arch.gdb_registers):
+                values.update(self._get_general_registers())
+            values.update(regvalues)
             data = bytearray()
-            res = {}
-            offset = 0
             for register in self.arch.gdb_registers:
-                reg_data = self._pack_register(register, regvalues[register])
-                size = register.bitsize // 8
-                data[offset : offset + size] = reg_data
-                offset += size
+                data.extend(self._pack_register(register, values[register]))
             data = binascii.b2a_hex(data).decode("ascii")
-            res = self._send_command("G %s" % data)
+            res = self._send_command("G%s" % data)
             if res == "OK":
                 self.logger.debug("Register written")
+                self._register_value_cache.update(values)
             else:
                 self.logger.warning("Registers writing failed: %s", res)
+                self._register_value_cache.clear()
 
     def _get_register(self, register):
         """ Get a single register """
         if self.status == DebugState.STOPPED:
-            if register in self._register_value_cache:
-                value = self._register_value_cache[register]
-            else:
-                idx = self.arch.gdb_registers.index(register)
-                data = self._send_command("p %x" % idx)
-                data = binascii.a2b_hex(data.encode("ascii"))
-                value = self._unpack_register(register, data)
-                self._register_value_cache[register] = value
-            return value
+            if register not in self._register_value_cache:
+                # Fetch all registers at once, since other registers are
+                # likely needed as well:
+                self._get_general_registers()
+            return self._register_value_cache.get(register, 0)
         else:
             self.logger.warning(
                 "Cannot read register %s while not stopped", register
@@ -312,13 +355,15 @@ class GdbDebugDriver(DebugDriver):
         """ Set a single register """
         if self.status == DebugState.STOPPED:
             idx = self.arch.gdb_registers.index(register)
-            value = self._pack_register(register, value)
-            value = binascii.b2a_hex(value).decode("ascii")
-            res = self._send_command("P %x=%s" % (idx, value))
+            data = self._pack_register(register, value)
+            data = binascii.b2a_hex(data).decode("ascii")
+            res = self._send_command("P %x=%s" % (idx, data))
             if res == "OK":
                 self.logger.debug("Register written")
+                self._register_value_cache[register] = value
             else:
                 self.logger.warning("Register write failed: %s", res)
+                self._register_value_cache.pop(register, None)
 
     def _unpack_register(self, register, data):
         """ Fetch a register from some data """
@@ -381,26 +426,119 @@ class GdbDebugDriver(DebugDriver):
     def read_mem(self, address: int, size: int):
         """ Read memory from address """
         if self.status == DebugState.STOPPED:
-            res = self._send_command("m %x,%x" % (address, size))
-            ret = binascii.a2b_hex(res.encode("ascii"))
-            return ret
+            data = None
+            if self.cache_memory and size > 0:
+                data = self._read_cached_memory(address, size)
+            if data is None:
+                data = self._read_memory(address, size)
+            if data is None:
+                self.logger.warning(
+                    "Cannot read memory at 0x%x, size %i", address, size
+                )
+                data = bytes()
+            return data
         else:
             self.logger.warning("Cannot read memory, target not stopped!")
             return bytes()
 
+    def _read_cached_memory(self, address, size):
+        """ Read memory via the cache, filling the pages not in it """
+        page_size = self.memory_page_size
+        first = address // page_size
+        last = (address + size - 1) // page_size
+        pages = range(first, last + 1)
+
+        # Read adjacent missing pages at once:
+        missing = [p for p in pages if p not in self._memory_cache]
+        while missing:
+            count = 1
+            while count < len(missing) and (
+                missing[count] == missing[0] + count
+            ):
+                count += 1
+            data = self._read_memory(missing[0] * page_size, count * page_size)
+            if data is None or len(data) != count * page_size:
+                # Maybe the pages are only partially readable
+                return
+            for nr, page in enumerate(missing[:count]):
+                self._memory_cache[page] = data[
+                    nr * page_size : (nr + 1) * page_size
+                ]
+            missing = missing[count:]
+
+        data = b"".join(self._memory_cache[page] for page in pages)
+        offset = address - first * page_size
+        return data[offset : offset + size]
+
+    def _read_memory(self, address, size):
+        """ Read memory using as few `m` commands as possible """
+        max_size = self.max_packet_size // 2
+        data = bytearray()
+        while len(data) < size:
+            chunk_address = address + len(data)
+            chunk_size = min(size - len(data), max_size)
+            res = self._send_command("m %x,%x" % (chunk_address, chunk_size))
+            if not res or (len(res) == 3 and res.startswith("E")):
+                return
+            data.extend(binascii.a2b_hex(res.encode("ascii")))
+        return bytes(data)
+
     def write_mem(self, address: int, data):
         """ Write memory """
         if self.status == DebugState.STOPPED:
-            length = len(data)
-            data = binascii.b2a_hex(data).decode("ascii")
-            res = self._send_command("M %x,%x:%s" % (address, length, data))
-            if res == "OK":
-                self.logger.debug("Memory written")
-            else:
-                self.logger.warning("Memory write failed: %s", res)
+            # Escaping can double the size of binary data:
+            max_size = (self.max_packet_size - 32) // 2
+            for offset in range(0, len(data), max_size):
+                chunk = data[offset : offset + max_size]
+                res = self._write_memory(address + offset, chunk)
+                if res == "OK":
+                    self.logger.debug("Memory written")
+                    self._update_memory_cache(address + offset, chunk)
+                else:
+                    self.logger.warning("Memory write failed: %s", res)
+                    # The memory may be partially written:
+                    self._drop_memory_cache(address + offset, len(chunk))
         else:
             self.logger.warning("Cannot write memory, target not stopped!")
 
+    def _write_memory(self, address, data):
+        """ Write memory with the binary `X` command, or else with `M` """
+        length = len(data)
+        if self._binary_writes:
+            res = self._send_command(
+                "X%x,%x:%s" % (address, length, bytes(data).decode("latin-1"))
+            )
+            if res:
+                return res
+            self.logger.debug("Binary writes not supported")
+            self._binary_writes = False
+        data = binascii.b2a_hex(data).decode("ascii")
+        return self._send_command("M %x,%x:%s" % (address, length, data))
+
+    def _update_memory_cache(self, address, data):
+        """ Put written data into the cached pages """
+        page_size = self.memory_page_size
+        first = address // page_size
+        last = (address + len(data) - 1) // page_size
+        for page in range(first, last + 1):
+            if page in self._memory_cache:
+                page_address = page * page_size
+                contents = bytearray(self._memory_cache[page])
+                begin = max(address, page_address)
+                end = min(address + len(data), page_address + page_size)
+                contents[begin - page_address : end - page_address] = data[
+                    begin - address : end - address
+                ]
+                self._memory_cache[page] = bytes(contents)
+
+    def _drop_memory_cache(self, address, size):
+        """ Remove the pages with the given memory range from the cache """
+        page_size = self.memory_page_size
+        first = address // page_size
+        last = (address + size - 1) // page_size
+        for page in range(first, last + 1):
+            self._memory_cache.pop(page, None)
+
     def _handle_message(self, message):
         # Filter stop packets:
         if message.startswith(("T", "S")):
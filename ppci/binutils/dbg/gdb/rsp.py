@@ -1,7 +1,11 @@
 """ Implement the RSP protocol which is used in gdb.
 
-A packet is send, and then it is acknowledged by a '+'.
+A packet is send, and then it is acknowledged by a '+'. When the server
+supports it, acknowledgements can be turned off, by setting ack_mode
+to False after a successful QStartNoAckMode command.
 
+Packets can contain binary data, so characters are mapped one to one
+onto bytes by using the latin-1 encoding.
 """
 
 import logging
@@ -26,6 +30,7 @@ class RspHandler:
         self._ack_queue = Queue(maxsize=1)
         self._lock = Lock()
         self.on_message = None
+        self.ack_mode = True
 
     def sendpkt(self, data, retries=10):
         """ sends data via the RSP protocol to the device """
@@ -33,6 +38,8 @@ class RspHandler:
             wire_data = self.rsp_pack(data)
             self.logger.debug("--> %s", wire_data)
             self.send(wire_data)
+            if not self.ack_mode:
+                return
             res = self._ack_queue.get(timeout=0.5)
             while res != "+":
                 self.logger.warning("discards %s", res)
@@ -47,7 +54,7 @@ class RspHandler:
         """ Send ascii data to target """
         if self.verbose:
             self.logger.debug("--> %s", msg)
-        self.transport.send(msg.encode("ascii"))
+        self.transport.send(msg.encode("latin-1"))
 
     def _process_byte(self, byte):
         msg = self._packet_decoder.send(byte)
@@ -68,9 +75,11 @@ class RspHandler:
                 res = self.rsp_unpack(pkt)
             except ValueError as ex:
                 self.logger.warning("Bad packet %s", ex)
-                self.send("-")
+                if self.ack_mode:
+                    self.send("-")
             else:
-                self.send("+")
+                if self.ack_mode:
+                    self.send("+")
                 self.on_message(res)
         else:
             self.logger.warning("discards %s", pkt)
@@ -120,7 +129,7 @@ def decoder():
                     res.extend(byte)
                     byte = yield
                     res.extend(byte)
-                    byte = yield res.decode("ascii")
+                    byte = yield res.decode("latin-1")
                     break
         elif byte == b"+":
             byte = yield byte.decode("ascii")
@@ -9,7 +9,7 @@ import binascii
 from ..arch.encoding import Instruction
 from ..arch.asm_printer import AsmPrinter
 from ..arch.generic_instructions import Alignment, DebugData, Label
-from ..arch.generic_instructions import SectionInstruction
+from ..arch.generic_instructions import SectionInstruction, PseudoInstruction
 from ..arch.generic_instructions import Global, SetSymbolType
 from ..arch.generic_instructions import ArtificialInstruction
 from ..arch.generic_instructions import RelocationHolder
@@ -94,25 +94,43 @@ class BinaryOutputStream(OutputStream):
         """
         assert isinstance(item, Instruction), str(item) + str(type(item))
 
+        if isinstance(item, PseudoInstruction):
+            # Labels and directives, which have no binary code:
+            self.emit_pseudo(item)
+            return
+
+        # Emit binary code into the current section:
+        section = self.current_section
+        assert section
+        address = len(section.data)
+        section.add_data(item.encode())
+
+        for reloc in item.relocations():
+            symbol_id = self._get_symbol(reloc.symbol_name).id
+            reloc_entry = RelocationEntry(
+                reloc.name,
+                symbol_id,
+                section.name,
+                address + reloc.offset,
+                reloc.addend,
+            )
+            self.obj_file.add_relocation(reloc_entry)
+
+    def emit_pseudo(self, item):
+        """ Process a label or a directive """
         if isinstance(item, SectionInstruction):
             self.current_section = self.obj_file.get_section(
                 item.name, create=True
             )
-
-        if isinstance(item, Global):
+        elif isinstance(item, Global):
             self._mark_global(item.name)
         elif isinstance(item, SetSymbolType):
             self._symbol_types[item.name] = item.typ
 
         assert self.current_section
-        # Current section and location into this section:
         section = self.current_section
         address = section.size
 
-        # Emit binary code into section:
-        bin_data = item.encode()
-        section.add_data(bin_data)
-
         for symbol_name in item.symbols():
             if symbol_name in self._symbols:
                 symbol = self._symbols[symbol_name]
@@ -123,23 +141,12 @@ class BinaryOutputStream(OutputStream):
                 # Create new symbol:
                 self._new_symbol(symbol_name, section.name, address)
 
-        for reloc in item.relocations():
-            symbol_id = self._get_symbol(reloc.symbol_name).id
-            reloc_entry = RelocationEntry(
-                reloc.name,
-                symbol_id,
-                section.name,
-                address + reloc.offset,
-                reloc.addend,
-            )
-            self.obj_file.add_relocation(reloc_entry)
-
         # Special case for align, TODO do this different?
         if isinstance(item, Alignment):
-            while section.size % item.align != 0:
-                section.add_data(bytes([0]))
-            if item.align > self.current_section.alignment:
-                self.current_section.alignment = item.align
+            padding = -section.size % item.align
+            section.add_data(bytes(padding))
+            if item.align > section.alignment:
+                section.alignment = item.align
         elif isinstance(item, DebugData):
             # We have debug data here!
             self.emit_debug(item.data)
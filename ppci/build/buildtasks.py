@@ -6,11 +6,14 @@ These task are wrappers around the functions provided in the buildfunctions
 module
 """
 
+import os
+from .depfile import format_rule, parse_rules
 from .tasks import Task, TaskError, register_task
 from ..utils.reporting import HtmlReportGenerator, DummyReportGenerator
 from .. import api
 from ..lang.tools.common import ParserException
 from ..common import CompilerError
+from ..lang.c import CBuilder
 
 
 @register_task
@@ -114,7 +117,13 @@ class C3CompileTask(OutputtingTask):
 
 @register_task
 class CCompileTask(OutputtingTask):
-    """ Task that compiles C code for some target into an object file """
+    """ Task that compiles C code for some target into an object file
+
+    The files included by the sources are written as a makefile rule into
+    a file next to the output, with the .d extension. When the output is
+    newer than the sources and all included files, and the task arguments
+    are the same, the compilation is skipped.
+    """
     def run(self):
         arch = self.get_argument('arch')
         sources = self.open_file_set(self.arguments['sources'])
@@ -123,6 +132,17 @@ class CCompileTask(OutputtingTask):
         else:
             includes = []
 
+        debug = bool(self.get_argument('debug', default=False))
+        opt = int(self.get_argument('optimize', default='0'))
+
+        output_filename = self.relpath(self.get_argument('output'))
+        dep_filename = os.path.splitext(output_filename)[0] + '.d'
+        signature = '# ccompile arch={} optimize={} debug={} {} {}'.format(
+            arch, opt, debug, ';'.join(sources), ';'.join(includes))
+        if self.is_up_to_date(output_filename, dep_filename, signature):
+            self.logger.info('%s is up to date', output_filename)
+            return
+
         if 'report' in self.arguments:
             report_file = self.relpath(self.arguments['report'])
             reporter = HtmlReportGenerator(
@@ -131,24 +151,56 @@ class CCompileTask(OutputtingTask):
         else:
             reporter = DummyReportGenerator()
 
-        debug = bool(self.get_argument('debug', default=False))
-        opt = int(self.get_argument('optimize', default='0'))
-
+        march = api.get_arch(arch)
         coptions = api.COptions()
         coptions.add_include_paths(includes)
 
         with reporter:
             objs = []
+            dependencies = list(sources)
             for source in sources:
+                cbuilder = CBuilder(march.info, coptions)
                 with open(source, 'r') as f:
-                    obj = api.cc(
-                        f, arch, coptions=coptions, opt_level=opt,
-                        reporter=reporter, debug=debug)
+                    ir_module = cbuilder.build(f, source, reporter=reporter)
+                api.optimize(ir_module, level=opt, reporter=reporter)
+                obj = api.ir_to_object(
+                    [ir_module], march, debug=debug, reporter=reporter)
                 objs.append(obj)
+                for filename in cbuilder.dependencies:
+                    if filename not in dependencies:
+                        dependencies.append(filename)
             obj = api.link(
                 objs, partial_link=True, reporter=reporter, debug=debug)
 
         self.store_object(obj)
+        with open(dep_filename, 'w') as f:
+            f.write(signature + '\n')
+            f.write(format_rule(output_filename, dependencies))
+
+    @staticmethod
+    def is_up_to_date(output_filename, dep_filename, signature):
+        """ Check if the output is newer than all files in the rule of the
+        dependency file, which was created with the same signature """
+        if not os.path.exists(output_filename):
+            return False
+        try:
+            with open(dep_filename, 'r') as f:
+                text = f.read()
+            rules = parse_rules(text)
+        except (OSError, ValueError):
+            return False
+        if not text.startswith(signature + '\n') or len(rules) != 1:
+            return False
+        targets, prerequisites = rules[0]
+        if targets != [output_filename]:
+            return False
+        output_time = os.path.getmtime(output_filename)
+        for filename in prerequisites:
+            if not os.path.exists(filename):
+                return False
+            if os.path.getmtime(filename) > output_time:
+                return False
+        return True
 
 
 @register_task
@@ -0,0 +1,62 @@
+"""
+    Module to format and parse makefile rules which list the files that
+    a target depends upon. These are the rules as generated by
+    ``ppci-cc -M`` and by most other C compilers.
+"""
+
+
+def format_rule(target, prerequisites):
+    """ Create a makefile rule for target with the given prerequisites """
+    words = [_escape(target) + ':']
+    words.extend(_escape(p) for p in prerequisites)
+    return ' \\\n  '.join(words) + '\n'
+
+
+def parse_rules(text):
+    """ Parse makefile rules into a list of (targets, prerequisites) """
+    rules = []
+    text = text.replace('\\\r\n', ' ').replace('\\\n', ' ')
+    for line in text.splitlines():
+        if not line.strip() or line.startswith('#'):
+            continue
+        words = _split(line)
+        if ':' not in words:
+            raise ValueError('Invalid rule: {}'.format(line))
+        index = words.index(':')
+        rules.append((words[:index], words[index + 1:]))
+    return rules
+
+
+def _escape(filename):
+    return filename.replace('$', '$$').replace(' ', '\\ ')
+
+
+def _split(line):
+    """ Split a line into filenames, and a separate ':' word """
+    words = []
+    word = ''
+    pos = 0
+    while pos < len(line):
+        char = line[pos]
+        if char == '\\' and line[pos + 1:pos + 2] == ' ':
+            word += ' '
+            pos += 1
+        elif char == '$' and line[pos + 1:pos + 2] == '$':
+            word += '$'
+            pos += 1
+        elif char.isspace():
+            if word:
+                words.append(word)
+            word = ''
+        elif char == ':' and line[pos + 1:pos + 2] in ('', ' ', '\t'):
+            # A colon not followed by space is part of a name, like C:\a.h
+            if word:
+                words.append(word)
+            words.append(':')
+            word = ''
+        else:
+            word += char
+        pos += 1
+    if word:
+        words.append(word)
+    return words
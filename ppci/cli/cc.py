@@ -6,11 +6,18 @@ computer architectures.
 
 
 import argparse
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from .base import base_parser, march_parser
 from .compile_base import compile_parser, do_compile
 from .base import LogSetup, get_arch_from_args
 from .. import api
-from ..lang.c import create_ast, CAstPrinter
+from ..binutils.objectfile import serialize, deserialize
+from ..build.depfile import format_rule
+from ..irutils.instrument import add_tracer
+from ..lang.c import create_ast, get_dependencies, CAstPrinter, CBuilder
 from ..lang.c.options import COptions, coptions_parser
 
 
@@ -28,6 +35,22 @@ parser.add_argument(
     default=False,
     help="Instead of preprocessing, emit a makefile rule with dependencies",
 )
+parser.add_argument(
+    "-MD",
+    action="store_true",
+    default=False,
+    help="Compile and write a makefile rule with dependencies to a file",
+)
+parser.add_argument(
+    "-MF",
+    metavar="file",
+    help="Write the makefile rule to this file instead of the default",
+)
+parser.add_argument(
+    "-MT",
+    metavar="target",
+    help="Use this as the target of the makefile rule instead of the output",
+)
 parser.add_argument(
     "--ast",
     action="store_true",
@@ -37,6 +60,14 @@ parser.add_argument(
 parser.add_argument(
     "-c", action="store_true", default=False, help="Compile, but do not link"
 )
+parser.add_argument(
+    "--jobs",
+    "-j",
+    metavar="N",
+    type=int,
+    default=1,
+    help="Compile the sources into object code in at most N processes",
+)
 parser.add_argument(
     "sources",
     metavar="source",
@@ -61,8 +92,9 @@ def cc(args=None):
                     api.preprocess(src, output, coptions)
         elif args.M:  # Emit a makefile dep line.
             dependencies = []
-            for filename in dependencies:
-                print(filename)
+            for src in args.sources:
+                dependencies.extend(get_dependencies(src, coptions))
+            write_dependencies(args, dependencies)
         elif args.ast:
             with open(args.output, "w") as output:
                 printer = CAstPrinter(file=output)
@@ -73,17 +105,133 @@ def cc(args=None):
                         src, march.info, filename=filename, coptions=coptions
                     )
                     printer.print(ast)
+        elif can_compile_in_parallel(args):
+            objs, dependencies = compile_in_parallel(march, coptions, args)
+            obj = api.link(
+                objs,
+                partial_link=True,
+                reporter=log_setup.reporter,
+                debug=args.g,
+            )
+            with open(args.output, "w") as output:
+                obj.save(output)
+
+            if args.MD:
+                write_dependencies(args, dependencies)
         else:
             ir_modules = []
+            dependencies = []
             for src in args.sources:
                 # Compile and optimize in any case:
-                ir_module = api.c_to_ir(
-                    src, march, coptions=coptions, reporter=log_setup.reporter
+                cbuilder = CBuilder(march.info, coptions)
+                ir_module = cbuilder.build(
+                    src, src.name, reporter=log_setup.reporter
                 )
                 ir_modules.append(ir_module)
+                dependencies.extend(cbuilder.dependencies)
 
             do_compile(ir_modules, march, log_setup.reporter, log_setup.args)
 
+            if args.MD:
+                write_dependencies(args, dependencies)
+
+
+def can_compile_in_parallel(args):
+    """ Check if the sources can be compiled into object code in a pool
+    of processes. Other outputs are created serially. """
+    if get_worker_count(args) < 2:
+        return False
+    if args.ir or args.S or args.wasm or args.pycode:
+        return False
+    if "fork" not in multiprocessing.get_all_start_methods():
+        logging.getLogger("cc").warning(
+            "Cannot fork, compiling sources serially"
+        )
+        return False
+    # Sources must be files, which each process opens again:
+    return all(os.path.isfile(src.name) for src in args.sources)
+
+
+def get_worker_count(args):
+    """ Get the amount of processes to compile the sources in """
+    return min(args.jobs, len(args.sources), os.cpu_count() or 1)
+
+
+def compile_in_parallel(march, coptions, args):
+    """ Compile each source into an object in a pool of processes.
+
+    The worker processes are forked from this process, and are
+    initialized with the architecture and the options. The objects are
+    returned in the order of the sources, so the output does not depend
+    on timing.
+    """
+    filenames = [src.name for src in args.sources]
+    workers = get_worker_count(args)
+    logging.getLogger("cc").info(
+        "Compiling %s sources in %s processes", len(filenames), workers
+    )
+    # The options are passed to the forked workers without pickling:
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker,
+        initargs=(march, coptions, args),
+    ) as executor:
+        results = list(executor.map(_compile_source, filenames))
+
+    objs = [deserialize(data) for data, _ in results]
+    dependencies = [d for _, deps in results for d in deps]
+    return objs, dependencies
+
+
+# The architecture and options of a worker process, set when it starts:
+_worker_options = None
+
+
+def _init_worker(march, coptions, args):
+    """ Initialize a worker process with the options to compile with """
+    global _worker_options
+    _worker_options = (march, coptions, args)
+
+
+def _compile_source(filename):
+    """ Compile a single source into object code, in a worker process """
+    march, coptions, args = _worker_options
+    cbuilder = CBuilder(march.info, coptions)
+    with open(filename, "r") as f:
+        ir_module = cbuilder.build(f, filename)
+    api.optimize(ir_module, level=args.O, verify_level=args.verify)
+    if args.instrument_functions:
+        add_tracer(ir_module)
+    obj = api.ir_to_object(
+        [ir_module], march, debug=args.g, verify_level=args.verify
+    )
+    return serialize(obj), cbuilder.dependencies
+
+
+def write_dependencies(args, dependencies):
+    """ Write a makefile rule stating that the output depends on the
+    sources and on all files included by the sources.
+
+    The rule is written to the -MF file. If not given, -M writes to stdout
+    and -MD writes to the output filename with a .d extension.
+    """
+    target = args.MT or args.output
+    prerequisites = []
+    for filename in [src.name for src in args.sources] + dependencies:
+        if filename not in prerequisites:
+            prerequisites.append(filename)
+    rule = format_rule(target, prerequisites)
+    if args.MF:
+        filename = args.MF
+    elif args.MD:
+        filename = os.path.splitext(args.output)[0] + ".d"
+    else:
+        print(rule, end="")
+        return
+    with open(filename, "w") as f:
+        f.write(rule)
+
 
 if __name__ == "__main__":
     cc()
@@ -39,6 +39,12 @@ compile_parser.add_argument(
 compile_parser.add_argument(
     "-O", help="optimize code", default="0", choices=api.OPT_LEVELS
 )
+compile_parser.add_argument(
+    "--verify",
+    help="IR verification level",
+    default=irutils.VerifyLevel.FULL,
+    choices=irutils.VerifyLevel.ALL,
+)
 compile_parser.add_argument(
     "--instrument-functions",
     help="Instrument given functions",
@@ -52,7 +58,12 @@ def do_compile(ir_modules, march, reporter, args):
 
     # Optimize:
     for ir_module in ir_modules:
-        api.optimize(ir_module, level=args.O, reporter=reporter)
+        api.optimize(
+            ir_module,
+            level=args.O,
+            reporter=reporter,
+            verify_level=args.verify,
+        )
 
     # Instrument:
     if args.instrument_functions:
@@ -70,7 +81,13 @@ def do_compile(ir_modules, march, reporter, args):
         with open(args.output, "w") as output:
             stream = TextOutputStream(printer=march.asm_printer, f=output)
             for ir_module in ir_modules:
-                api.ir_to_stream(ir_module, march, stream, reporter=reporter)
+                api.ir_to_stream(
+                    ir_module,
+                    march,
+                    stream,
+                    reporter=reporter,
+                    verify_level=args.verify,
+                )
     elif args.wasm:  # Output web-assembly code
         assert len(ir_modules) == 1
         ir_module = ir_modules[0]
@@ -82,7 +99,11 @@ def do_compile(ir_modules, march, reporter, args):
             api.ir_to_python(ir_modules, output, reporter=reporter)
     else:  # Full object output
         obj = api.ir_to_object(
-            ir_modules, march, reporter=reporter, debug=args.g
+            ir_modules,
+            march,
+            reporter=reporter,
+            debug=args.g,
+            verify_level=args.verify,
         )
         with open(args.output, "w") as output:
             obj.save(output)
@@ -71,29 +71,34 @@ def readelf(args=None):
     """ Read ELF file and display contents """
     args = parser.parse_args(args)
     with LogSetup(args):
-        # Read in elf file:
-        elf = read_elf(args.elf)
+        # Map the elf file, so that only the displayed parts are read:
+        elf = read_elf(args.elf, use_mmap=True)
         args.elf.close()
 
-        # Dump information:
-        if args.file_header or args.all or args.headers:
-            print_elf_header(elf)
+        with elf:
+            print_elf(elf, args)
 
-        if args.program_headers or args.all or args.headers:
-            print_program_headers(elf.program_headers)
 
-        if args.section_headers or args.all or args.headers:
-            print_section_headers(elf)
+def print_elf(elf, args):
+    """ Print the parts of the elf file selected by args """
+    if args.file_header or args.all or args.headers:
+        print_elf_header(elf)
 
-        if args.syms or args.all:
-            print_symbol_table(elf)
+    if args.program_headers or args.all or args.headers:
+        print_program_headers(elf.program_headers)
 
-        if args.hex_dump:
-            section_number = int(args.hex_dump)
-            print_hex_dump(elf, section_number)
+    if args.section_headers or args.all or args.headers:
+        print_section_headers(elf)
 
-        if args.debug_dump:
-            print_debug_info(elf, args.debug_dump)
+    if args.syms or args.all:
+        print_symbol_table(elf)
+
+    if args.hex_dump:
+        section_number = int(args.hex_dump)
+        print_hex_dump(elf, section_number)
+
+    if args.debug_dump:
+        print_debug_info(elf, args.debug_dump)
 
 
 def print_elf_header(elf):
@@ -0,0 +1,76 @@
+""" Run a command line tool in a ppci compile server.
+
+This saves the startup time of the tool, since the server has already
+loaded ppci. Start a server with ppci-server, then run tools like this:
+
+    $ ppci-remote cc -m arm -c hello.c -o hello.oj
+
+The tool runs in the current directory, and its output and exit status
+are those of the tool.
+"""
+
+import argparse
+import getpass
+import json
+import os
+import socket
+import sys
+import tempfile
+
+
+def default_socket_path():
+    """ Get the socket path from PPCI_SERVER, or a per user default """
+    if "PPCI_SERVER" in os.environ:
+        return os.environ["PPCI_SERVER"]
+    name = "ppci-server-{}.sock".format(getpass.getuser())
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+parser = argparse.ArgumentParser(
+    description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+)
+parser.add_argument(
+    "--socket",
+    metavar="path",
+    default=default_socket_path(),
+    help="Unix socket of the server, default is $PPCI_SERVER or %(default)s",
+)
+parser.add_argument("command", help="The tool to run, for example cc")
+parser.add_argument(
+    "arguments", nargs=argparse.REMAINDER, help="Arguments for the tool"
+)
+
+
+def request(socket_path, command, arguments, cwd=None):
+    """ Run a command in the server listening at socket_path.
+
+    Returns a tuple with the exit status, stdout and stderr of the command.
+    """
+    message = {
+        "command": command,
+        "arguments": list(arguments),
+        "cwd": os.path.abspath(cwd or os.getcwd()),
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(message).encode("utf8") + b"\n")
+        with connection.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("The server closed the connection")
+    response = json.loads(line.decode("utf8"))
+    return response["status"], response["stdout"], response["stderr"]
+
+
+def remote(args=None):
+    """ Run a tool in the compile server """
+    args = parser.parse_args(args)
+    status, stdout, stderr = request(args.socket, args.command, args.arguments)
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    if status:
+        sys.exit(status)
+
+
+if __name__ == "__main__":
+    remote()
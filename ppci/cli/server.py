@@ -0,0 +1,178 @@
+""" Compile server.
+
+Runs a pool of worker processes which keep ppci loaded, and runs command
+line tools on request of ppci-remote. This avoids the startup time of the
+tools, which is large compared to compiling a small source file.
+
+The workers keep the created architectures and the lexed C headers, so
+these are reused by the next compilations.
+
+    $ ppci-server --preload arm &
+    $ ppci-remote cc -m arm -c hello.c -o hello.oj
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import socketserver
+import traceback
+from .base import base_parser, LogSetup
+from .remote import default_socket_path
+from ..arch.target_list import create_arch
+from ..lang.c.preprocessor import CPreProcessor, HeaderCache
+
+
+# Tools which can be run, mapping to the module with the tool function:
+COMMANDS = {
+    "archive": "archive",
+    "asm": "asm",
+    "build": "build",
+    "c3c": "c3c",
+    "cc": "cc",
+    "ld": "link",
+    "llc": "llc",
+    "objcopy": "objcopy",
+    "opt": "opt",
+    "pascal": "pascal",
+    "wasmcompile": "wasmcompile",
+}
+
+
+parser = argparse.ArgumentParser(
+    description=__doc__,
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    parents=[base_parser],
+)
+parser.add_argument(
+    "--socket",
+    metavar="path",
+    default=default_socket_path(),
+    help="Unix socket to listen on, default is $PPCI_SERVER or %(default)s",
+)
+parser.add_argument(
+    "--jobs",
+    "-j",
+    type=int,
+    help="Number of worker processes, default is the number of cpus",
+)
+parser.add_argument(
+    "--preload",
+    metavar="arch",
+    default=[],
+    action="append",
+    help="Create this architecture when starting a worker",
+)
+
+
+def server(args=None):
+    """ Run a compile server until interrupted """
+    args = parser.parse_args(args)
+    with LogSetup(args) as log_setup:
+        with CompileServer(args.socket, args.jobs, args.preload) as srv:
+            log_setup.logger.info("Listening on %s", args.socket)
+            try:
+                srv.serve_forever()
+            except KeyboardInterrupt:
+                log_setup.logger.info("Stopping server")
+
+
+class CompileServer(
+    socketserver.ThreadingMixIn, socketserver.UnixStreamServer
+):
+    """ Server which runs the tools requested by clients in a pool of
+    worker processes.
+
+    Each client sends a line with a json encoded request, containing the
+    command, its arguments and the working directory. The server replies
+    with a line with the exit status and the output of the command.
+    """
+
+    logger = logging.getLogger("server")
+    daemon_threads = True
+
+    def __init__(self, socket_path, jobs=None, preload=()):
+        self.socket_path = socket_path
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.pool = multiprocessing.Pool(
+            jobs, initializer=init_worker, initargs=(tuple(preload),)
+        )
+        super().__init__(socket_path, CompileRequestHandler)
+
+    def run_command(self, command, arguments, cwd):
+        """ Run a command in one of the workers """
+        if command not in COMMANDS:
+            message = "Unknown command {}, use one of {}\n".format(
+                command, ", ".join(sorted(COMMANDS))
+            )
+            return 2, "", message
+        self.logger.debug("Running %s %s", command, " ".join(arguments))
+        return self.pool.apply(run_command, (command, arguments, cwd))
+
+    def server_close(self):
+        super().server_close()
+        self.pool.terminate()
+        self.pool.join()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class CompileRequestHandler(socketserver.StreamRequestHandler):
+    """ Handle the requests of a single client connection """
+
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line.decode("utf8"))
+            status, stdout, stderr = self.server.run_command(
+                request["command"], request["arguments"], request["cwd"]
+            )
+            response = {"status": status, "stdout": stdout, "stderr": stderr}
+            self.wfile.write(json.dumps(response).encode("utf8") + b"\n")
+
+
+def init_worker(preload):
+    """ Prepare a worker process, by loading all tools in advance """
+    # Log output of the tools is only sent to the client:
+    logging.getLogger().handlers.clear()
+    CPreProcessor.header_cache = HeaderCache()
+    for module_name in COMMANDS.values():
+        importlib.import_module(".{}".format(module_name), __package__)
+    for arch in preload:
+        parts = arch.split(":")
+        create_arch(parts[0], options=tuple(parts[1:]))
+
+
+def run_command(command, arguments, cwd):
+    """ Run a tool in this worker and capture its output """
+    module_name = COMMANDS[command]
+    module = importlib.import_module(".{}".format(module_name), __package__)
+    function = getattr(module, module_name)
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    status = 0
+    with contextlib.redirect_stdout(stdout):
+        with contextlib.redirect_stderr(stderr):
+            try:
+                os.chdir(cwd)
+                function(arguments)
+            except SystemExit as ex:
+                if ex.code is None:
+                    status = 0
+                elif isinstance(ex.code, int):
+                    status = ex.code
+                else:
+                    print(ex.code, file=stderr)
+                    status = 1
+            except Exception:
+                traceback.print_exc()
+                status = 1
+    return status, stdout.getvalue(), stderr.getvalue()
+
+
+if __name__ == "__main__":
+    server()
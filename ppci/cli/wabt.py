@@ -79,7 +79,7 @@ run_parser.add_argument(
     dest="wasm_target",
     metavar="target",
     help="Which target to generate code for",
-    choices=("native", "python"),
+    choices=("native", "python", "interp", "tiered"),
     default="python",
 )
 run_parser.add_argument(
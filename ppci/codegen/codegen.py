@@ -5,7 +5,7 @@ The architecture is provided when the generator is created.
 
 import logging
 from .. import ir
-from ..irutils import Verifier, split_block
+from ..irutils import split_block
 from ..arch.arch import Architecture
 from ..arch.generic_instructions import Label, Comment, Global, DebugData
 from ..arch.generic_instructions import RegisterUseDef, VirtualInstruction
@@ -32,7 +32,6 @@ class CodeGenerator:
     def __init__(self, arch, optimize_for="size"):
         assert isinstance(arch, Architecture), arch
         self.arch = arch
-        self.verifier = Verifier()
         self.sgraph_builder = SelectionGraphBuilder(arch)
         weights_map = {
             "size": (10, 1, 1),
@@ -187,10 +186,12 @@ class CodeGenerator:
         reporter.dump_frame(frame)
 
         # Add label and return and stack adjustment:
-        instruction_list = []
-        output_stream = MasterOutputStream(
-            [FunctionOutputStream(instruction_list.append), output_stream]
-        )
+        if reporter.dumps_instructions:
+            # Keep the emitted instructions for the report:
+            instruction_list = []
+            output_stream = MasterOutputStream(
+                [FunctionOutputStream(instruction_list.append), output_stream]
+            )
         peep_hole_stream = PeepHoleStream(output_stream)
         self.emit_frame_to_stream(frame, peep_hole_stream, debug=debug)
         peep_hole_stream.flush()
@@ -205,7 +206,8 @@ class CodeGenerator:
             dd = DebugData(d)
             output_stream.emit(dd)
 
-        reporter.dump_instructions(instruction_list, self.arch)
+        if reporter.dumps_instructions:
+            reporter.dump_instructions(instruction_list, self.arch)
 
     def select_and_schedule(self, ir_function, frame, reporter):
         """ Perform instruction selection and scheduling """
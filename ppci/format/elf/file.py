@@ -6,6 +6,7 @@ https://en.wikipedia.org/wiki/Executable_and_Linkable_Format
 
 import io
 import logging
+import mmap
 
 from ...arch.arch_info import Endianness
 from .headers import ElfMachine, HeaderTypes
@@ -17,6 +18,7 @@ logger = logging.getLogger("elf")
 class ElfSection:
     def __init__(self, header):
         self.header = header
+        self._buffer = None
 
     def read_data(self, f):
         """ Read this elf section's data from file """
@@ -24,15 +26,63 @@ class ElfSection:
         self.data = f.read(self.header.sh_size)
         return self.data
 
+    def map_data(self, buffer):
+        """ Refer to this elf section's data in a buffer with the file.
+
+        The data becomes a memoryview into the buffer, so it is not copied.
+        """
+        self._buffer = buffer
+        start = self.header.sh_offset
+        self.data = memoryview(buffer)[start : start + self.header.sh_size]
+        return self.data
+
     def get_str(self, offset):
         """ Get a string indicated by numeric value """
-        end = self.data.find(0, offset)
-        return self.data[offset:end].decode("utf8")
+        if self._buffer is None:
+            end = self.data.find(0, offset)
+            return self.data[offset:end].decode("utf8")
+        else:
+            # Search in the buffer, since a memoryview has no find:
+            start = self.header.sh_offset + offset
+            limit = self.header.sh_offset + self.header.sh_size
+            end = self._buffer.find(b"\0", start, limit)
+            if end < 0:
+                end = limit
+            return bytes(self._buffer[start:end]).decode("utf8")
 
 
 SHN_UNDEF = 0
 
 
+class SymbolTableView:
+    """ The entries of a symbol table section.
+
+    Entries are only decoded when they are accessed.
+    """
+
+    def __init__(self, entry_type, data):
+        self.entry_type = entry_type
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // self.entry_type.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        size = self.entry_type.size
+        offset = index * size
+        return self.entry_type.deserialize(self.data[offset : offset + size])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
 class StringTable:
     def __init__(self):
         self.strtab = bytes([0])
@@ -56,10 +106,62 @@ class ElfFile:
         self.e_machine = ElfMachine.X86_64.value  # x86-64 machine
         self.header_types = HeaderTypes(bits=bits, endianness=endianness)
         self.sections = []
+        self._mapped_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     @staticmethod
-    def load(f):
+    def load(f, use_mmap=False):
+        """ Load an elf file.
+
+        When use_mmap is True, the file is memory mapped, and the section
+        data are memoryviews into the mapped file. The file is then only
+        read from disk when the data is used. Call close to unmap it.
+        """
+        if use_mmap:
+            return ElfFile._load_mapped(f)
+
         logger.debug("Loading ELF file")
+        elf_file = ElfFile._load_headers(f)
+        elf_file.read_strtab(f)
+        for section in elf_file.sections:
+            section.read_data(f)
+            section.name = elf_file.get_str(section.header["sh_name"])
+        return elf_file
+
+    @staticmethod
+    def _load_mapped(f):
+        logger.debug("Mapping ELF file")
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, io.UnsupportedOperation):
+            # For example an io.BytesIO, which has no file descriptor:
+            f.seek(0)
+            buffer = f.read()
+            elf_file = ElfFile._load_headers(io.BytesIO(buffer))
+        else:
+            # Headers are read eagerly, a mmap can be read like a file:
+            try:
+                elf_file = ElfFile._load_headers(buffer)
+            except Exception:
+                buffer.close()
+                raise
+            elf_file._mapped_file = buffer
+
+        for section in elf_file.sections:
+            section.map_data(buffer)
+        elf_file.strtab = elf_file.sections[elf_file.elf_header.e_shstrndx]
+        for section in elf_file.sections:
+            section.name = elf_file.get_str(section.header["sh_name"])
+        return elf_file
+
+    @staticmethod
+    def _load_headers(f):
+        """ Read the elf header, program headers and section headers """
         # Read header
         e_ident = f.read(16)
         if e_ident[0:4] != b"\x7FELF":
@@ -88,30 +190,45 @@ class ElfFile:
         for _ in range(elf_file.elf_header["e_shnum"]):
             sh = elf_file.header_types.SectionHeader.read(f)
             elf_file.sections.append(ElfSection(sh))
-
-        elf_file.read_strtab(f)
-        for section in elf_file.sections:
-            section.read_data(f)
-            section.name = elf_file.get_str(section.header["sh_name"])
         return elf_file
 
+    def close(self):
+        """ Unmap the file, if it was loaded with use_mmap
+
+        This raises a BufferError while other objects still refer to the
+        mapped data, such as slices of the section data. The file then
+        remains mapped and usable, and can be closed once these objects
+        are released.
+        """
+        if self._mapped_file is not None:
+            for section in self.sections:
+                section.data.release()
+            try:
+                self._mapped_file.close()
+            except BufferError:
+                # Map the sections again, so that nothing is half closed:
+                for section in self.sections:
+                    section.map_data(self._mapped_file)
+                raise
+            self._mapped_file = None
+
     def read_strtab(self, f):
-        self.strtab = self.sections[self.elf_header.e_shstrndx].read_data(f)
+        self.strtab = self.sections[self.elf_header.e_shstrndx]
+        return self.strtab.read_data(f)
 
     def read_symbol_table(self, sym_section):
-        f = io.BytesIO(sym_section.data)
-        count = (
-            len(sym_section.data) // self.header_types.SymbolTableEntry.size
+        """ Get the entries of a symbol table section.
+
+        The entries are decoded when they are accessed, so this is cheap
+        for large symbol tables.
+        """
+        return SymbolTableView(
+            self.header_types.SymbolTableEntry, sym_section.data
         )
-        table = [
-            self.header_types.SymbolTableEntry.read(f) for _ in range(count)
-        ]
-        return table
 
     def get_str(self, offset):
         """ Get a string indicated by numeric value """
-        end = self.strtab.find(0, offset)
-        return self.strtab[offset:end].decode("utf8")
+        return self.strtab.get_str(offset)
 
     def has_section(self, name):
         for section in self.sections:
@@ -6,6 +6,11 @@ from .file import ElfFile
 # TODO: move some parts from ElfFile to this file.
 
 
-def read_elf(f):
-    """ Read an ELF file """
-    return ElfFile.load(f)
+def read_elf(f, use_mmap=False):
+    """ Read an ELF file.
+
+    With use_mmap, the file is memory mapped instead of read completely,
+    which is much cheaper for large files. Close the returned ElfFile when
+    done with it.
+    """
+    return ElfFile.load(f, use_mmap=use_mmap)
@@ -7,7 +7,27 @@ from .. import ir
 
 
 class CallGraph(DiGraph):
-    pass
+    """ Graph with a node for each subroutine and an edge for each call """
+
+    def __init__(self):
+        super().__init__()
+        self.node_map = {}
+
+    def get_node(self, routine):
+        """ Get the call graph node of the given routine """
+        return self.node_map[routine]
+
+
+class CallGraphNode(DiNode):
+    """ Call graph node of a single subroutine """
+
+    def __init__(self, graph, routine):
+        super().__init__(graph)
+        self.routine = routine
+        graph.node_map[routine] = self
+
+    def __repr__(self):
+        return "CG-node({})".format(self.routine.name)
 
 
 def mod_to_call_graph(ir_module) -> CallGraph:
@@ -15,20 +35,21 @@ def mod_to_call_graph(ir_module) -> CallGraph:
     cg = CallGraph()
 
     # Create call graph nodes:
-    node_map = {}
     for routine in ir_module.functions:
-        node_map[routine] = DiNode(cg)
+        CallGraphNode(cg, routine)
     for routine in ir_module.externals:
         if isinstance(routine, ir.ExternalSubRoutine):
-            node_map[routine] = DiNode(cg)
+            CallGraphNode(cg, routine)
 
     # Add call graph edges:
     for routine in ir_module.functions:
-        n1 = node_map[routine]
+        n1 = cg.get_node(routine)
         for instruction in routine.get_instructions():
             if isinstance(instruction, (ir.FunctionCall, ir.ProcedureCall)):
                 routine2 = instruction.callee
-                n2 = node_map[routine2]
-                cg.add_edge(n1, n2)
+                # Calls via function pointers have no known callee:
+                if routine2 in cg.node_map:
+                    n2 = cg.get_node(routine2)
+                    cg.add_edge(n1, n2)
 
     return cg
@@ -13,14 +13,9 @@ Functions present:
 import logging
 
 # TODO: this is possibly the third edition of flow graph code.. Merge at will!
-from .digraph import DiGraph, DiNode
+from .digraph import DiGraph, DiNode, strongly_connected_components
 from . import lt
-from .algorithm.fixed_point_dominator import calculate_dominators
-from .algorithm.fixed_point_dominator import calculate_post_dominators
-from .algorithm.fixed_point_dominator import (
-    calculate_immediate_post_dominators,
-)
-from collections import namedtuple
+from collections import namedtuple, deque
 
 
 class DomTreeNode:
@@ -61,19 +56,19 @@ def ir_function_to_graph(ir_function):
     cfg = ControlFlowGraph()
     cfg.exit_node = ControlFlowNode(cfg, name=None)
 
-    # Create nodes:
+    # Create nodes in breadth first order:
     block_list = []
-    worklist = [ir_function.entry]
+    discovered = {ir_function.entry}
+    worklist = deque([ir_function.entry])
     while worklist:
-        block = worklist.pop(0)
+        block = worklist.popleft()
         block_list.append(block)
         node = ControlFlowNode(cfg, name=block.name)
-        assert block not in block_map
         block_map[block] = node
         for successor_block in block.successors:
-            if successor_block not in block_map:
-                if successor_block not in worklist:
-                    worklist.append(successor_block)
+            if successor_block not in discovered:
+                discovered.add(successor_block)
+                worklist.append(successor_block)
 
     cfg.entry_node = block_map[ir_function.entry]
 
@@ -127,10 +122,12 @@ class ControlFlowGraph(DiGraph):
         self._idom = None  # immediate_dominators
 
         # Post dominator info:
-        self._pdom = None  # post dominators
-        self._spdom = None  # Strict post dominators
-        self._ipdom = None  # post dominators
-        self._reach = None  # Reach map
+        self._ipdom = None  # immediate post dominators
+        self.post_tree_map = None
+
+        # Reach info:
+        self._component = None  # Strongly connected component numbers
+        self._reach = None  # Reached components per component
         self.root_tree = None
 
     def validate(self):
@@ -156,10 +153,21 @@ class ControlFlowGraph(DiGraph):
         return self.tree_map[other].below(self.tree_map[one])
 
     def post_dominates(self, one, other):
-        """ Test whether a node post dominates another node """
-        if self._pdom is None:
+        """ Test whether a node post dominates another node.
+
+        Like dominance, this is checked with the intervals of the
+        post dominator tree.
+        """
+        if self._ipdom is None:
             self._calculate_post_dominator_info()
-        return one in self._pdom[other]
+        if other not in self.post_tree_map:
+            # No path from other to the exit, so trivially true:
+            return True
+        elif one not in self.post_tree_map:
+            return False
+        return self.post_tree_map[other].below_or_same(
+            self.post_tree_map[one]
+        )
 
     def get_immediate_dominator(self, node):
         """ Retrieve a nodes immediate dominator """
@@ -171,12 +179,21 @@ class ControlFlowGraph(DiGraph):
         """ Retrieve a nodes immediate post dominator """
         if self._ipdom is None:
             self._calculate_post_dominator_info()
-        return self._ipdom[node]
+        return self._ipdom.get(node, None)
 
     def can_reach(self, one, other):
+        """ Test if there is a non-empty path from one node to another """
+        if self._reach is None:
+            self.calculate_reach()
+        mask = self._reach[self._component[one]]
+        return bool((mask >> self._component[other]) & 1)
+
+    def reached_nodes(self, node):
+        """ Get the set of nodes which can be reached from node """
         if self._reach is None:
             self.calculate_reach()
-        return other in self._reach[one]
+        mask = self._reach[self._component[node]]
+        return {n for n in self.nodes if (mask >> self._component[n]) & 1}
 
     def _calculate_dominator_info(self):
         """ Calculate dominator information """
@@ -233,105 +250,93 @@ class ControlFlowGraph(DiGraph):
         self._number_dominator_tree()
 
     def _number_dominator_tree(self):
-        """ Assign intervals to the dominator tree.
-
-        Very cool idea to check if one node dominates
-        another node.
-
-        First, assign an interval to each node in the dominator
-        tree, which marks its entrance and exit of depth
-        first search of the tree.
-
-        To test dominance, determine the interval of both
-        nodes. If the interval of node a falls within the
-        interval of node b, b dominates a. This allows for
-        constant time dominance checking!
-        """
-
-        t = 0
-
-        worklist = [self.root_tree]
-        discovered = {}  # when the node was discovered
-        while worklist:
-            node = worklist[-1]
-            if node.node in discovered:
-                # finished event
-                node.interval = (discovered[node.node], t)
-                worklist.pop()
-            else:
-                # discovery event
-                discovered[node.node] = t
-                for child in node.children:
-                    worklist.append(child)
-            t += 1
+        """ Assign intervals to the dominator tree. """
+        number_tree(self.root_tree)
 
     def _calculate_post_dominator_info(self):
-        """ Calculate the post dominator sets iteratively.
+        """ Calculate the post dominator tree.
 
         Post domination is the same as domination, but then starting at
-        the exit node.
+        the exit node and following the edges backwards. Nodes which
+        cannot reach the exit, such as nodes in an endless loop, have no
+        immediate post dominator.
         """
         self.validate()
 
-        self._pdom = calculate_post_dominators(self.nodes, self.exit_node)
+        self._ipdom = lt.calculate_idom(self, self.exit_node, reverse=True)
+        self._ipdom[self.exit_node] = None
 
-        # Determine strict post dominators:
-        self._spdom = {}
-        for node in self.nodes:
-            self._spdom[node] = self._pdom[node] - {node}
+        self.post_tree_map = {}
+        for node in self._ipdom:
+            self.post_tree_map[node] = DomTreeNode(node, list(), None)
 
-        self._ipdom = calculate_immediate_post_dominators(
-            self.nodes, self._pdom, self._spdom
-        )
+        for node, ipdom_node in self._ipdom.items():
+            if ipdom_node:
+                parent = self.post_tree_map[ipdom_node]
+                parent.children.append(self.post_tree_map[node])
 
-    def calculate_reach(self):
-        """ Calculate which nodes can reach what other nodes """
-        self.validate()
+        number_tree(self.post_tree_map[self.exit_node])
 
-        # Initialize reach map:
-        self._reach = {}
-        for node in self.nodes:
-            self._reach[node] = self.successors(node)
-
-        # Run fixed point iteration:
-        change = True
-        while change:
-            change = False
-            for node in self.nodes:
+    def calculate_reach(self):
+        """ Calculate which nodes can reach what other nodes.
 
-                # Fill reachable condition:
-                new_reach = set(self._reach[node])  # Take the old reach
-                for m in node.successors:
-                    new_reach |= self._reach[m]
+        All nodes in a strongly connected component reach the same
+        nodes, so the reach is determined per component, and stored as
+        a bitmask of component numbers. The components are in reverse
+        topological order, so the reach of the successors of a
+        component is known before the component itself is handled.
+        """
+        self.validate()
 
-                if new_reach != self._reach[node]:
-                    change = True
-                    self._reach[node] = new_reach
+        components = strongly_connected_components(self)
+        self._component = {}
+        for number, component in enumerate(components):
+            for node in component:
+                self._component[node] = number
+
+        self._reach = []
+        for number, component in enumerate(components):
+            mask = 0
+            for node in component:
+                for successor in node.successors:
+                    other = self._component[successor]
+                    mask |= 1 << other
+                    if other != number:
+                        mask |= self._reach[other]
+            self._reach.append(mask)
 
     def calculate_loops(self):
-        """ Calculate loops by use of the dominator info """
-        if self._reach is None:
-            self.calculate_reach()
+        """ Calculate loops by use of the dominator info.
 
+        A loop is formed by a back edge to a header, which dominates the
+        source of the edge. The loop body consists of the nodes dominated
+        by the header, from which the header can be reached. These are
+        found by walking the edges backwards from the header.
+        """
+        loop_nodes = {}
         loops = []
         for node in self.nodes:
             for header in self.successors(node):
                 if header.dominates(node):
                     # Back edge!
-                    # Determine the other nodes in the loop:
-                    loop_nodes = [
-                        ln
-                        for ln in self._reach[header]
-                        if (
-                            header.dominates(ln)
-                            and ln.can_reach(header)
-                            and ln is not header
-                        )
-                    ]
-                    loop = Loop(header=header, rest=loop_nodes)
+                    if header not in loop_nodes:
+                        loop_nodes[header] = self._find_loop_nodes(header)
+                    loop = Loop(header=header, rest=list(loop_nodes[header]))
                     loops.append(loop)
         return loops
 
+    def _find_loop_nodes(self, header):
+        """ Find the nodes dominated by header which can reach header """
+        found = set()
+        worklist = list(header.predecessors)
+        while worklist:
+            node = worklist.pop()
+            if node in found or node is header:
+                continue
+            found.add(node)
+            worklist.extend(node.predecessors)
+        return [node for node in found if header.dominates(node)]
+
     def calculate_dominance_frontier(self):
         """ Calculate the dominance frontier.
 
@@ -371,6 +376,40 @@ class ControlFlowGraph(DiGraph):
             yield c.node
 
 
+def number_tree(tree):
+    """ Assign intervals to the nodes of a dominator tree.
+
+    Very cool idea to check if one node dominates
+    another node.
+
+    First, assign an interval to each node in the dominator
+    tree, which marks its entrance and exit of depth
+    first search of the tree.
+
+    To test dominance, determine the interval of both
+    nodes. If the interval of node a falls within the
+    interval of node b, b dominates a. This allows for
+    constant time dominance checking!
+    """
+
+    t = 0
+
+    worklist = [tree]
+    discovered = {}  # when the node was discovered
+    while worklist:
+        node = worklist[-1]
+        if node.node in discovered:
+            # finished event
+            node.interval = (discovered[node.node], t)
+            worklist.pop()
+        else:
+            # discovery event
+            discovered[node.node] = t
+            for child in node.children:
+                worklist.append(child)
+        t += 1
+
+
 def bottom_up_recursive(tree):
     """ Generator that yields all nodes in bottom up way """
     for c in tree.children:
@@ -396,9 +435,9 @@ def bottom_up(tree):
 
 def pre_order(tree):
     """ Traverse tree in pre-order """
-    worklist = [(None, tree)]
+    worklist = deque([(None, tree)])
     while worklist:
-        parent, node = worklist.pop(0)
+        parent, node = worklist.popleft()
         yield parent, node
         for child in node.children:
             worklist.append((node, child))
@@ -422,8 +461,8 @@ class ControlFlowNode(DiNode):
         return self.graph.can_reach(self, other)
 
     def reached(self):
-        """ Test if this node is reached """
-        return self.graph._reach[self]
+        """ Get the nodes which can be reached from this node """
+        return self.graph.reached_nodes(self)
 
     def __repr__(self):
         value = self.name if self.name else id(self)
@@ -101,3 +101,59 @@ def dfs(start_node, reverse=False):
             else:
                 for successor in node.successors:
                     worklist.append((node, successor))
+
+
+def strongly_connected_components(graph):
+    """ Find the strongly connected components of a directed graph.
+
+    This is the algorithm of Tarjan, rewritten without recursion to
+    prevent hitting the recursion limit on large graphs.
+
+    Returns:
+        A list of sets of nodes. The list is in reverse topological order,
+        so a component comes after all components reachable from it.
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    for root in graph.nodes:
+        if root in index:
+            continue
+
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        worklist = [(root, iter(graph.successors(root)))]
+        while worklist:
+            node, successors = worklist[-1]
+            for successor in successors:
+                if successor not in index:
+                    index[successor] = lowlink[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    worklist.append(
+                        (successor, iter(graph.successors(successor)))
+                    )
+                    break
+                elif successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            else:
+                # All successors visited:
+                worklist.pop()
+                if worklist:
+                    parent = worklist[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+                if lowlink[node] == index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.add(member)
+                        if member is node:
+                            break
+                    components.append(component)
+    return components
@@ -15,6 +15,12 @@ logger = logging.getLogger("lt")
 
 
 def calculate_idom(graph, entry, reverse=False):
+    """ Calculate the immediate dominators of the nodes in graph.
+
+    When reverse is True, the edges are followed backwards, which
+    gives the immediate post dominators when entry is the exit node.
+    Nodes which cannot be reached from entry are not in the result.
+    """
     x = LengauerTarjan(reverse)
     return x.compute(graph, entry)
 
@@ -55,8 +61,11 @@ class LengauerTarjan:
 
             # Determine semi dominator for n:
             s = p
-            for v in n.predecessors:
-                if self.dfnum[v] <= self.dfnum[n]:
+            for v in self.predecessors(n):
+                if v not in self.dfnum:
+                    # Not reachable from the entry
+                    continue
+                elif self.dfnum[v] <= self.dfnum[n]:
                     s2 = v
                 else:
                     s2 = self.semi[self.ancestor_with_lowest_semi(v)]
@@ -87,10 +96,17 @@ class LengauerTarjan:
                 assert n in idom
         return idom
 
+    def predecessors(self, node):
+        """ Get the predecessors of a node in the traversal direction """
+        if self._reverse:
+            return node.successors
+        else:
+            return node.predecessors
+
     def dfs(self, start_node):
         """ Depth first search nodes """
-        for dfnum, pair in enumerate(dfs(start_node)):
-            parent, node = pair
+        nodes = dfs(start_node, reverse=self._reverse)
+        for dfnum, (parent, node) in enumerate(nodes):
             assert node not in self.dfnum
             self.dfnum[node] = dfnum
             assert node not in self.parent
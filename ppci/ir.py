@@ -10,6 +10,7 @@ The only types available are basic integer types and a pointer type.
 # pylint: disable=R0903
 
 from binascii import hexlify
+from collections.abc import MutableSequence
 from itertools import chain
 import logging
 from .utils.collections import OrderedSet
@@ -192,6 +193,11 @@ class Module:
         self._functions.append(function)
         function.module = self
 
+    def remove_function(self, function):
+        """ Remove a function from this module """
+        self._functions.remove(function)
+        function.module = None
+
     def add_variable(self, variable):
         """ Add a variable to this module """
         assert isinstance(variable, Variable)
@@ -232,7 +238,9 @@ class Module:
 class Value:
     """ Base of all values """
 
-    __slots__ = ('name', 'ty', 'used_by')
+    # The attributes name, ty and used_by are slots of the subclasses,
+    # since instructions also derive from Instruction:
+    __slots__ = ()
 
     def __init__(self, name: str, ty: Typ):
         # Has a name and a type?
@@ -286,7 +294,7 @@ class Binding:
 class GlobalValue(Value):
     """ A global value (with a name and an address) """
 
-    __slots__ = ('binding',)
+    __slots__ = ('name', 'ty', 'used_by', 'binding')
 
     def __init__(self, name, binding):
         super().__init__(name, ptr)
@@ -533,19 +541,124 @@ class Function(SubRoutine):
         return "{} function {} {}({})".format(self.binding, ret_typ, self.name, args)
 
 
+class BlockInstructions(MutableSequence):
+    """ A list like view on the instructions of a block.
+
+    Modifying this view modifies the block.
+    """
+
+    __slots__ = ("_block",)
+
+    def __init__(self, block):
+        self._block = block
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def __eq__(self, other):
+        if isinstance(other, (list, tuple, BlockInstructions)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __len__(self):
+        return len(self._block)
+
+    def __iter__(self):
+        return iter(self._block)
+
+    def __reversed__(self):
+        return reversed(self._block)
+
+    def __contains__(self, instruction):
+        return instruction in self._block
+
+    def __getitem__(self, key):
+        return self._block[key]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            instructions = list(self._block)
+            instructions[key] = value
+            self._block.instructions = instructions
+        else:
+            old_instruction = self._block[key]
+            self._block._link(value, old_instruction)
+            self._block._unlink(old_instruction)
+            self._make_unique_name(value)
+
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            for instruction in self._block[key]:
+                self._block._unlink(instruction)
+        else:
+            self._block._unlink(self._block[key])
+
+    def insert(self, index, instruction):
+        if index < 0:
+            index = max(index + len(self._block), 0)
+        if index < len(self._block):
+            self._block._link(instruction, self._block[index])
+        else:
+            self._block._link(instruction, None)
+        self._make_unique_name(instruction)
+
+    def _make_unique_name(self, instruction):
+        function = self._block.function
+        if isinstance(instruction, Value) and function is not None:
+            function.make_unique_name(instruction)
+
+
 class Block:
     """ Uninterrupted sequence of instructions.
 
     A block is properly terminated if its last instruction is a
     :class:`FinalInstruction`.
+
+    The instructions are kept in a doubly linked list, so that inserting
+    and removing instructions takes constant time. Positions of the
+    instructions are numbered on demand, and cached until the
+    block is modified. Once instructions are looked up by index, a list
+    of the instructions is created and kept up to date on modification.
     """
 
     def __init__(self, name):
         self.name = name
         self.function = None
-        self.instructions = list()
+        self._first = None
+        self._last = None
+        self._count = 0
+        # Whether the instructions are numbered with their position:
+        self._numbered = True
+        self._items = None
         self.references = OrderedSet()
 
+    @property
+    def instructions(self):
+        """ A list like view on the instructions of this block.
+
+        Modifying the view modifies this block, and assigning a list of
+        instructions replaces all instructions.
+        """
+        return BlockInstructions(self)
+
+    @instructions.setter
+    def instructions(self, instructions):
+        instructions = list(instructions)
+        # Detach the current instructions:
+        for instruction in self:
+            instruction._prev = instruction._next = None
+            instruction.block = None
+        for instruction in instructions:
+            # Take instructions out of other blocks:
+            if instruction.block is not None:
+                instruction.block._unlink(instruction)
+        self._first = self._last = None
+        self._items = None
+        self._count = 0
+        self._numbered = True
+        for instruction in instructions:
+            self._link(instruction, None)
+
     def dump(self):
         print("  ", self)
         for instruction in self:
@@ -558,25 +671,117 @@ class Block:
         return str(self)
 
     def __iter__(self):
-        for instruction in self.instructions:
+        instruction = self._first
+        while instruction is not None:
+            # Fetch the next one first, the instruction may be removed:
+            next_instruction = instruction._next
+            yield instruction
+            instruction = next_instruction
+
+    def __reversed__(self):
+        instruction = self._last
+        while instruction is not None:
+            previous_instruction = instruction._prev
             yield instruction
+            instruction = previous_instruction
 
     def __len__(self):
-        return len(self.instructions)
+        return self._count
+
+    def __contains__(self, instruction):
+        return (
+            isinstance(instruction, Instruction) and instruction.block is self
+        )
 
     def __getitem__(self, key):
-        return self.instructions.__getitem__(key)
+        items = self._items
+        if items is None:
+            items = self._items = list(self)
+        if isinstance(key, slice):
+            return list(items[key])
+        try:
+            instruction = items[key]
+        except IndexError:
+            raise IndexError("Block index out of range") from None
+        if not self._numbered:
+            # Remember the position, for splicing at this instruction:
+            instruction._order = key % len(items)
+        return instruction
 
-    def insert_instruction(self, instruction, before_instruction=None):
-        """ Insert an instruction at the front of the block """
-        if before_instruction is not None:
-            assert self == before_instruction.block
-            pos = before_instruction.position
-        else:
-            pos = 0
+    def _link(self, instruction, before_instruction):
+        """ Link an instruction into the list before the given one """
         assert isinstance(instruction, Instruction)
+        if instruction.block is not None:
+            # Take the instruction out of its current block:
+            instruction.block._unlink(instruction)
+        if before_instruction is None:
+            previous_instruction = self._last
+            self._last = instruction
+            # Appending keeps the numbering valid:
+            instruction._order = self._count
+            if self._items is not None:
+                self._items.append(instruction)
+        else:
+            assert before_instruction.block is self
+            if self._items is not None:
+                position = self._index(before_instruction)
+                self._items.insert(position, instruction)
+                instruction._order = position
+            previous_instruction = before_instruction._prev
+            before_instruction._prev = instruction
+            self._numbered = False
+
+        instruction._prev = previous_instruction
+        instruction._next = before_instruction
+        if previous_instruction is None:
+            self._first = instruction
+        else:
+            previous_instruction._next = instruction
         instruction.block = self
-        self.instructions.insert(pos, instruction)
+        self._count += 1
+
+    def _unlink(self, instruction):
+        """ Remove an instruction from the linked list """
+        assert instruction.block is self
+        if self._items is not None:
+            del self._items[self._index(instruction)]
+        previous_instruction = instruction._prev
+        next_instruction = instruction._next
+        if previous_instruction is None:
+            self._first = next_instruction
+        else:
+            previous_instruction._next = next_instruction
+        if next_instruction is None:
+            self._last = previous_instruction
+        else:
+            next_instruction._prev = previous_instruction
+            self._numbered = False
+        instruction._prev = instruction._next = None
+        instruction.block = None
+        self._count -= 1
+
+    def _index(self, instruction):
+        """ Get the position of an instruction in the list of items """
+        position = instruction._order
+        if self._numbered:
+            return position
+        # The position of the last lookup is a good guess:
+        items = self._items
+        if position < len(items) and items[position] is instruction:
+            return position
+        return items.index(instruction)
+
+    def _renumber(self):
+        """ Number all instructions with their position in this block """
+        for position, instruction in enumerate(self):
+            instruction._order = position
+        self._numbered = True
+
+    def insert_instruction(self, instruction, before_instruction=None):
+        """ Insert an instruction at the front of the block """
+        if before_instruction is None:
+            before_instruction = self._first
+        self._link(instruction, before_instruction)
         if isinstance(instruction, Value):
             self.function.make_unique_name(instruction)
 
@@ -584,27 +789,33 @@ class Block:
         """ Add an instruction to the end of this block """
         assert isinstance(instruction, Instruction)
         assert not self.is_closed
-        instruction.block = self
-        self.instructions.append(instruction)
+        self._link(instruction, None)
         if isinstance(instruction, Value):
             self.function.make_unique_name(instruction)
 
+    def move_instruction(self, instruction, before_instruction=None):
+        """ Move an instruction from a block of the same function.
+
+        The instruction is placed before the given instruction, or at
+        the end of this block. The instruction keeps its name.
+        """
+        assert instruction.function is self.function
+        self._link(instruction, before_instruction)
+
     def remove_instruction(self, instruction):
         """ Remove instruction from block """
-        instruction.block = None
-        self.instructions.remove(instruction)
+        self._unlink(instruction)
         return instruction
 
     @property
     def last_instruction(self):
         """ Gets the last instruction from the block """
-        if not self.is_empty:
-            return self.instructions[-1]
+        return self._last
 
     @property
     def is_empty(self):
         """ Determines whether the block is empty or not """
-        return len(self) == 0
+        return self._count == 0
 
     @property
     def is_closed(self):
@@ -619,12 +830,12 @@ class Block:
     @property
     def first_instruction(self):
         """ Return this blocks first instruction """
-        return self.instructions[0]
+        return self._first
 
     @property
     def phis(self):
         """ Return all :class:`Phi` instructions of this block """
-        return [i for i in self.instructions if i.is_phi]
+        return [i for i in self if i.is_phi]
 
     @property
     def successors(self):
@@ -670,65 +881,117 @@ class Block:
                 phi.set_incoming(b2, value)
 
 
-def value_use(name):
-    """ Creates a property that also keeps track of usage """
+class ValueUse:
+    """ Descriptor for an operand of an instruction.
 
-    def getter(self):
-        """ Gets the value """
-        if name in self._var_map:
-            return self._var_map[name]
-        else:  # pragma: no cover
-            raise KeyError(name)
+    The value is stored in a slot with the name prefixed with an
+    underscore, which the instruction class must define. Setting the
+    operand keeps track of the usage of the value.
+    """
 
-    def setter(self, value):
+    __slots__ = ("name", "slot")
+
+    def __init__(self, name):
+        self.name = name
+        self.slot = "_" + name
+
+    def __get__(self, instance, owner):
+        """ Gets the value """
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self.slot)
+        except AttributeError:  # pragma: no cover
+            raise KeyError(self.name)
+
+    def __set__(self, instance, value):
         """ Sets the value """
         if not isinstance(value, Value):
             raise TypeError(
                 "Expecting a Value instance, but got {}".format(value)
             )
         # If value was already set, remove usage
-        if name in self._var_map:
-            self.del_use(self._var_map[name])
+        old_value = getattr(instance, self.slot, None)
+        if old_value is not None:
+            instance.del_use(old_value)
 
-        # Place the value in the var map:
-        self._var_map[name] = value
+        setattr(instance, self.slot, value)
 
         # Add usage:
-        self.add_use(value)
+        instance.add_use(value)
 
-    return property(getter, setter)
+
+def value_use(name):
+    """ Creates a property that also keeps track of usage """
+    return ValueUse(name)
+
+
+# Cache with the operand names per instruction class:
+_operand_names = {}
+
+
+def get_operand_names(cls):
+    """ Get the names of the value operands of an instruction class """
+    if cls not in _operand_names:
+        _operand_names[cls] = tuple(
+            name
+            for klass in reversed(cls.__mro__)
+            for name, attribute in vars(klass).items()
+            if isinstance(attribute, ValueUse)
+        )
+    return _operand_names[cls]
 
 
 class Instruction:
     """ Base class for all instructions that go into a basic block """
 
+    __slots__ = ('_uses', 'block', '_prev', '_next', '_order')
+
     def __init__(self):
-        # Create a collection to store the values this value uses.
-        # TODO: think of better naming..
-        self._var_map = {}
         self.block = None
-        self.uses = OrderedSet()
+
+        # Links to the neighbours in the block, and the cached position:
+        self._prev = None
+        self._next = None
+        self._order = 0
+
+        # Map of used values to the number of times they are used, since
+        # an instruction can use the same value more than once:
+        self._uses = {}
 
     @property
     def function(self):
         """ Return the function this instruction is part of """
         return self.block.function
 
+    @property
+    def uses(self):
+        """ The values used by this instruction """
+        return self._uses.keys()
+
     def add_use(self, value):
         """ Add v to the list of values used by this instruction """
         if not isinstance(value, Value):
             raise TypeError("Expected Value, but got {}".format(value))
-        self.uses.add(value)
-        value.add_user(self)
+        if value in self._uses:
+            self._uses[value] += 1
+        else:
+            self._uses[value] = 1
+            value.add_user(self)
 
     def del_use(self, v):
         assert isinstance(v, Value)
-        self.uses.remove(v)
-        v.del_user(self)
+        count = self._uses[v] - 1
+        if count:
+            self._uses[v] = count
+        else:
+            del self._uses[v]
+            v.del_user(self)
 
     def delete(self):
         for use in list(self.uses):
-            self.del_use(use)
+            while use in self.uses:
+                self.del_use(use)
         if self.uses:
             uses = ", ".join(map(str, self.uses))
             raise ValueError(
@@ -741,23 +1004,33 @@ class Instruction:
         """ replace value usage 'old' with new value, updating the def-use
             information.
         """
-        # TODO: update reference
-        # assert old in self._var_map.values()
-        for name in self._var_map:
-            if self._var_map[name] is old:
-                self.del_use(old)
-                self._var_map[name] = new
-                self.add_use(new)
+        for name in get_operand_names(type(self)):
+            if getattr(self, name) is old:
+                setattr(self, name, new)
 
     def remove_from_block(self):
         for use in list(self.uses):
-            self.del_use(use)
+            while use in self.uses:
+                self.del_use(use)
         self.block.remove_instruction(self)
 
     @property
     def position(self):
         """ Return numerical position in block """
-        return self.block.instructions.index(self)
+        block = self.block
+        if not block._numbered:
+            block._renumber()
+        return self._order
+
+    @property
+    def previous_instruction(self):
+        """ The instruction before this one in the block, or None """
+        return self._prev
+
+    @property
+    def next_instruction(self):
+        """ The instruction after this one in the block, or None """
+        return self._next
 
     @property
     def is_terminator(self):
@@ -774,6 +1047,8 @@ class Instruction:
 class LocalValue(Value, Instruction):
     """ An instruction that results in a value has a type and a name """
 
+    __slots__ = ('name', 'ty', 'used_by')
+
     def __init__(self, name: str, ty: Typ):
         super().__init__(name, ty)
 
@@ -808,6 +1083,8 @@ class LocalValue(Value, Instruction):
 class AddressOf(LocalValue):
     """ This instruction takes the address of a block of data """
 
+    __slots__ = ('_src',)
+
     src = value_use("src")
 
     def __init__(self, src, name: str):
@@ -825,6 +1102,8 @@ class AddressOf(LocalValue):
 class Cast(LocalValue):
     """ Base type conversion instruction """
 
+    __slots__ = ('_src',)
+
     src = value_use("src")
 
     def __init__(self, value, name, ty):
@@ -838,6 +1117,8 @@ class Cast(LocalValue):
 class Undefined(LocalValue):
     """ Undefined value, this value must never be used. """
 
+    __slots__ = ()
+
     def __str__(self):
         return "{} = undefined".format(self.name)
 
@@ -845,6 +1126,8 @@ class Undefined(LocalValue):
 class Const(LocalValue):
     """ Represents a constant value """
 
+    __slots__ = ('value',)
+
     def __init__(self, value, name, ty):
         super().__init__(name, ty)
         self.value = value
@@ -859,6 +1142,8 @@ class LiteralData(LocalValue):
         instruction, a label and its data is emitted in the literal area
     """
 
+    __slots__ = ('data',)
+
     def __init__(self, data, name):
         super().__init__(name, BlobDataTyp(len(data), 1))
         self.data = data
@@ -872,6 +1157,8 @@ class LiteralData(LocalValue):
 class FunctionCall(LocalValue):
     """ Call a function with some arguments and a return value """
 
+    __slots__ = ('arguments', '_callee')
+
     callee = value_use("callee")
 
     def __init__(self, callee, arguments, name, ty):
@@ -893,11 +1180,11 @@ class FunctionCall(LocalValue):
 
     def replace_use(self, old, new):
         super().replace_use(old, new)
-        if old in self.arguments:
-            idx = self.arguments.index(old)
-            self.del_use(old)
-            self.arguments[idx] = new
-            self.add_use(new)
+        for idx, argument in enumerate(self.arguments):
+            if argument is old:
+                self.del_use(old)
+                self.arguments[idx] = new
+                self.add_use(new)
 
     def __str__(self):
         args = ", ".join(arg.name for arg in self.arguments)
@@ -909,6 +1196,8 @@ class FunctionCall(LocalValue):
 class ProcedureCall(Instruction):
     """ Call a procedure with some arguments """
 
+    __slots__ = ('arguments', '_callee')
+
     callee = value_use("callee")
 
     def __init__(self, callee, arguments):
@@ -928,11 +1217,11 @@ class ProcedureCall(Instruction):
 
     def replace_use(self, old, new):
         super().replace_use(old, new)
-        if old in self.arguments:
-            idx = self.arguments.index(old)
-            self.del_use(old)
-            self.arguments[idx] = new
-            self.add_use(new)
+        for idx, argument in enumerate(self.arguments):
+            if argument is old:
+                self.del_use(old)
+                self.arguments[idx] = new
+                self.add_use(new)
 
     def __str__(self):
         args = ", ".join(arg.name for arg in self.arguments)
@@ -942,6 +1231,8 @@ class ProcedureCall(Instruction):
 class Unop(LocalValue):
     """ Generic unary operation """
 
+    __slots__ = ('operation', '_a')
+
     ops = ["-", "~"]  # someday perhaps: 'floor', 'sqrt'
     a = value_use("a")
 
@@ -965,6 +1256,8 @@ class Unop(LocalValue):
 class Binop(LocalValue):
     """ Generic binary operation """
 
+    __slots__ = ('operation', '_a', '_b')
+
     ops = ["+", "-", "*", "/", "%", "|", "&", "^", "<<", ">>", "rol", "ror"]
     a = value_use("a")
     b = value_use("b")
@@ -1016,6 +1309,8 @@ class Phi(LocalValue):
     the IR-code to be in SSA form.
     """
 
+    __slots__ = ('inputs',)
+
     def __init__(self, name, ty):
         super().__init__(name, ty)
         self.inputs = {}
@@ -1067,6 +1362,8 @@ class Phi(LocalValue):
 class Alloc(LocalValue):
     """ Allocates space on the stack. The type of this value is a ptr """
 
+    __slots__ = ('amount', 'alignment')
+
     def __init__(self, name: str, amount: int, alignment: int):
         super().__init__(name, BlobDataTyp(amount, alignment))
 
@@ -1096,6 +1393,8 @@ class Alloc(LocalValue):
 class CopyBlob(Instruction):
     """ Sort of memcpy operation. """
 
+    __slots__ = ('amount', '_dst', '_src')
+
     dst = value_use("dst")
     src = value_use("src")
 
@@ -1150,6 +1449,8 @@ class Variable(GlobalValue):
 class Parameter(LocalValue):
     """ Parameter of a :class:`SubRoutine`. """
 
+    __slots__ = ('num',)
+
     def __init__(self, name, ty):
         super().__init__(name, ty)
 
@@ -1167,6 +1468,8 @@ class Load(LocalValue):
         volatile: whether or not this memory access is volatile.
     """
 
+    __slots__ = ('volatile', '_address')
+
     address = value_use("address")
 
     def __init__(self, address, name, ty, volatile=False):
@@ -1184,6 +1487,8 @@ class Load(LocalValue):
 class Store(Instruction):
     """ Store a value into memory """
 
+    __slots__ = ('volatile', '_address', '_value')
+
     address = value_use("address")
     value = value_use("value")
 
@@ -1213,6 +1518,8 @@ class Store(Instruction):
 
 class InlineAsm(Instruction):
     """ Inline assembly code. """
+
+    __slots__ = ('template', 'clobbers', 'input_values')
     def __init__(self, template, clobbers):
         super().__init__()
         self.template = template
@@ -1226,11 +1533,11 @@ class InlineAsm(Instruction):
 
     def replace_use(self, old, new):
         super().replace_use(old, new)
-        if old in self.input_values:
-            idx = self.input_values.index(old)
-            self.del_use(old)
-            self.input_values[idx] = new
-            self.add_use(new)
+        for idx, value in enumerate(self.input_values):
+            if value is old:
+                self.del_use(old)
+                self.input_values[idx] = new
+                self.add_use(new)
 
     def __str__(self):
         return 'asm ({})'.format(self.template)
@@ -1244,7 +1551,7 @@ class FinalInstruction(Instruction):
     instruction.
     """
 
-    pass
+    __slots__ = ()
 
 
 class Exit(FinalInstruction):
@@ -1254,6 +1561,8 @@ class Exit(FinalInstruction):
     in a :class:`Procedure`.
     """
 
+    __slots__ = ('targets',)
+
     def __init__(self):
         super().__init__()
         self.targets = []
@@ -1268,6 +1577,8 @@ class Return(FinalInstruction):
     This instruction is only legal in a :class:`Function`.
     """
 
+    __slots__ = ('targets', '_result')
+
     result = value_use("result")
 
     def __init__(self, result):
@@ -1300,6 +1611,8 @@ def block_use(name):
 class JumpBase(FinalInstruction):
     """ Base of all jumping instructions """
 
+    __slots__ = ('_block_map',)
+
     def __init__(self):
         super().__init__()
         self._block_map = {}
@@ -1321,6 +1634,7 @@ class JumpBase(FinalInstruction):
 
     def delete(self):
         """ Clear references """
+        super().delete()
         while self._block_map:
             _, block = self._block_map.popitem()
             block.references.remove(self)
@@ -1340,6 +1654,8 @@ class JumpBase(FinalInstruction):
 class Jump(JumpBase):
     """ Jump statement to another :class:`Block` within the same function """
 
+    __slots__ = ()
+
     target = block_use("target")
 
     def __init__(self, target):
@@ -1353,6 +1669,8 @@ class Jump(JumpBase):
 class CJump(JumpBase):
     """ Conditional jump to true or false labels. """
 
+    __slots__ = ('cond', '_a', '_b')
+
     conditions = ["==", "<", ">", ">=", "<=", "!="]
     a = value_use("a")
     b = value_use("b")
@@ -1385,6 +1703,8 @@ class JumpTable(JumpBase):
     In the worst case, this is expanded to a whole bunch of CJump statements.
     """
 
+    __slots__ = ('table', '_v')
+
     v = value_use("v")
     lab_default = block_use("lab_default")
 
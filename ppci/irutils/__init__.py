@@ -1,7 +1,8 @@
 """ Various utilities to operate on IR-code.
 """
 
-from .verify import verify_module, Verifier
+from .verify import verify_module, Verifier, VerifyLevel
+from .verify import set_verify_level, get_verify_level
 from .writer import Writer, print_module
 from .reader import Reader, read_module
 from .builder import Builder, split_block
@@ -18,6 +19,9 @@ __all__ = [
     "split_block",
     "Verifier",
     "verify_module",
+    "VerifyLevel",
+    "set_verify_level",
+    "get_verify_level",
     "Writer",
     "to_json",
     "from_json",
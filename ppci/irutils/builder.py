@@ -30,8 +30,6 @@ def split_block(block, pos=None, newname="splitblock"):
     block.function.add_block(block2)
     block.instructions = first
     block2.instructions = rest
-    for instruction in rest:
-        instruction.block = block2
 
     # Update successor phi nodes:
     for phi in downstream_phis:
@@ -45,6 +45,7 @@ def to_json(module):
 
 
 def to_dict(module):
+    """ Convert an IR-module to a dict of plain python values. """
     w = DictWriter()
     d = w.write_module(module)
     return d
@@ -59,10 +60,11 @@ def from_json(json_txt):
     Returns:
         The IR-module as represented by JSON.
     """
-    return from_dict(json_txt)
+    return from_dict(json.loads(json_txt))
 
 
 def from_dict(d):
+    """ Construct a module from a dict, as created by :func:`to_dict`. """
     r = DictReader()
     return r.construct(d)
 
@@ -336,6 +338,9 @@ class DictWriter:
         return block.name
 
 
+TYPE_MAP = {ty.name: ty for ty in ir.all_types}
+
+
 class Scope:
     def __init__(self):
         self.value_map = {}
@@ -343,7 +348,7 @@ class Scope:
 
 
 class DictReader:
-    """ Construct IR-module from given json.
+    """ Construct IR-module from a dict as created by the DictWriter.
     """
 
     def __init__(self):
@@ -351,8 +356,7 @@ class DictReader:
         self.scopes = []
         self.undefined_values = {}
 
-    def construct(self, json_txt):
-        d = json.loads(json_txt)
+    def construct(self, d):
         name = d["name"]
         json_externals = d["externals"]
         json_variables = d["variables"]
@@ -420,8 +424,6 @@ class DictReader:
 
     def construct_subroutine(self, json_subroutine):
         name = json_subroutine["name"]
-        json_blocks = json_subroutine["blocks"]
-        json_parameters = json_subroutine["parameters"]
         binding = self.construct_binding(json_subroutine["binding"])
         stype = json_subroutine["kind"]
 
@@ -433,6 +435,17 @@ class DictReader:
         else:  # pragma: no cover
             raise NotImplementedError(stype)
         self.register_value(subroutine)
+        self.construct_subroutine_body(json_subroutine, subroutine)
+        return subroutine
+
+    def construct_subroutine_body(self, json_subroutine, subroutine):
+        """ Fill the parameters and blocks of the given subroutine.
+
+        The subroutine itself must be registered before, such that
+        other code can refer to existing subroutines.
+        """
+        json_blocks = json_subroutine["blocks"]
+        json_parameters = json_subroutine["parameters"]
 
         # self.subroutines.append(subroutine)
         self.enter_scope()
@@ -450,7 +463,6 @@ class DictReader:
             subroutine.add_block(block)
         self.leave_scope()
         # self.subroutines.pop()
-        return subroutine
 
     def construct_block(self, json_block, subroutine):
         name = json_block["name"]
@@ -564,8 +576,7 @@ class DictReader:
     def get_type(self, json_type):
         tkind = json_type["kind"]
         if tkind == "basic":
-            typ_map = {ty.name: ty for ty in ir.all_types}
-            typ = typ_map[json_type["name"]]
+            typ = TYPE_MAP[json_type["name"]]
         elif tkind == "blob":
             size = json_type["size"]
             alignment = json_type["alignment"]
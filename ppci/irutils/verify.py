@@ -2,6 +2,10 @@
 
 This is a very useful module since it allows to isolate
 bugs in the compiler itself.
+
+The verifier can check on several levels, see :class:`VerifyLevel`.
+The level can be given per call, or set for all calls with
+:func:`set_verify_level`.
 """
 
 import logging
@@ -11,13 +15,57 @@ from ..common import IrFormError
 from .. import ir
 
 
-def verify_module(module: ir.Module):
+class VerifyLevel:
+    """ Enum for the amount of checking done by the verifier.
+
+    - OFF: do not verify at all.
+    - STRUCTURAL: check blocks, control flow edges, phi inputs, names
+      and types.
+    - FULL: additionally check that each value dominates its uses.
+    """
+
+    OFF = "off"
+    STRUCTURAL = "structural"
+    FULL = "full"
+    ALL = (OFF, STRUCTURAL, FULL)
+
+
+_verify_level = VerifyLevel.FULL
+
+
+def set_verify_level(level):
+    """ Set the verification level used when no level is given """
+    global _verify_level
+    _verify_level = check_verify_level(level)
+
+
+def get_verify_level():
+    """ Get the verification level used when no level is given """
+    return _verify_level
+
+
+def check_verify_level(level):
+    """ Check a verification level, None means the default level """
+    if level is None:
+        return _verify_level
+    if level not in VerifyLevel.ALL:
+        raise ValueError(
+            "Invalid verify level {}, use one of {}".format(
+                level, ", ".join(VerifyLevel.ALL)
+            )
+        )
+    return level
+
+
+def verify_module(module: ir.Module, level=None):
     """ Check if the module is properly constructed
 
     Args:
         module: The module to verify.
+        level: The :class:`VerifyLevel`, None selects the level set
+            with :func:`set_verify_level`.
     """
-    Verifier().verify(module)
+    Verifier(level=level).verify(module)
 
 
 class Verifier:
@@ -25,18 +73,23 @@ class Verifier:
 
     logger = logging.getLogger("verifier")
 
-    def __init__(self):
+    def __init__(self, level=None):
+        self.level = check_verify_level(level)
         self.name_map = {}
 
     def verify(self, module):
         """ Verifies a module for some sanity """
-        self.logger.debug("Verifying %s", module)
+        if self.level == VerifyLevel.OFF:
+            return
+        self.logger.debug("Verifying %s at level %s", module, self.level)
         assert isinstance(module, ir.Module)
         for function in module.functions:
             self.verify_function(function)
 
     def verify_function(self, function):
         """ Verify all blocks in the function """
+        if self.level == VerifyLevel.OFF:
+            return
         self.name_map = {}
         for block in function:
             assert block.name not in self.name_map
@@ -84,15 +137,11 @@ class Verifier:
                     # Check that phi 'use' info is good:
                     assert used_value in phi.uses
 
-        # Determine rank of instructions within blocks:
-        ranks = {}
-        for block in function:
-            for rank, instruction in enumerate(block):
-                ranks[instruction] = rank
-        self._ranks = ranks
-
-        # Now we can build a dominator tree
-        self.cfg_info = CfgInfo(function)
+        # Dominance checks require a dominator tree:
+        if self.level == VerifyLevel.FULL:
+            self.cfg_info = CfgInfo(function)
+        else:
+            self.cfg_info = None
 
         for block in function:
             assert block.function is function
@@ -108,7 +157,11 @@ class Verifier:
                     block
                 )
             )
-        assert all(not i.is_terminator for i in block.instructions[:-1])
+        assert all(
+            not i.is_terminator
+            for i in block
+            if i is not block.last_instruction
+        )
         assert all(isinstance(p, ir.Block) for p in block.predecessors)
 
     def verify_block(self, block):
@@ -122,7 +175,7 @@ class Verifier:
 
         # Check that instruction is contained in block:
         assert instruction.block == block
-        assert instruction in block.instructions
+        assert instruction in block
 
         # Check if value has unique name string:
         if isinstance(instruction, ir.Value):
@@ -175,9 +228,10 @@ class Verifier:
 
         # Verify that all uses are defined before this instruction.
         for value in instruction.uses:
-            assert self.instruction_dominates(
-                value, instruction
-            ), "{} does not dominate {}".format(value, instruction)
+            if self.cfg_info is not None:
+                assert self.instruction_dominates(
+                    value, instruction
+                ), "{} does not dominate {}".format(value, instruction)
 
             # Check that a value is not undefined:
             if isinstance(value, ir.Undefined):
@@ -251,7 +305,7 @@ class Verifier:
         # All other instructions must have a containing block:
         if one.block is None:
             raise ValueError("{} has no block".format(one))
-        assert one in one.block.instructions
+        assert one in one.block
 
         # Phis are special case:
         if isinstance(another, ir.Phi):
@@ -269,13 +323,13 @@ class Verifier:
         else:
             # For all other instructions follow these rules:
             if one.block is another.block:
-                return self._ranks[one] < self._ranks[another]
+                # Positions are cached by the block:
+                return one.position < another.position
             else:
                 return self.block_dominates(one.block, another.block)
 
     def block_dominates(self, one: ir.Block, another: ir.Block):
         """ Check if this block dominates other block """
-        assert one in one.function
         one_node = self.cfg_info.get_node(one)
         another_node = self.cfg_info.get_node(another)
         return self.cfg_info.cfg.strictly_dominates(one_node, another_node)
@@ -11,12 +11,13 @@ from .utils import CAstPrinter, print_ast
 from .printer import CPrinter, render_ast
 from .options import COptions
 from .token import CTokenPrinter
-from .api import preprocess, c_to_ir
+from .api import preprocess, get_dependencies, c_to_ir
 
 
 __all__ = [
     "create_ast",
     "preprocess",
+    "get_dependencies",
     "c_to_ir",
     "print_ast",
     "parse_text",
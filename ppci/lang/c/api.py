@@ -16,6 +16,20 @@ def preprocess(f, output_file, coptions=None):
     CTokenPrinter().dump(tokens, file=output_file)
 
 
+def get_dependencies(f, coptions=None):
+    """ Pre-process a file and return the filenames of included files.
+
+    Files included by included files are listed as well.
+    """
+    if coptions is None:
+        coptions = COptions()
+    preprocessor = CPreProcessor(coptions)
+    filename = f.name if hasattr(f, "name") else None
+    for _ in preprocessor.process_file(f, filename=filename):
+        pass
+    return preprocessor.dependencies
+
+
 def c_to_ir(source: io.TextIOBase, march, coptions=None, reporter=None):
     """ C to ir translation.
 
@@ -18,6 +18,7 @@ class CBuilder:
         self.arch_info = arch_info
         self.coptions = coptions
         self.cgen = None
+        self.dependencies = []  # Files included by the last build
 
     def build(self, src: io.TextIOBase, filename: str, reporter=None):
         if reporter:
@@ -29,7 +30,9 @@ class CBuilder:
         self.logger.info("Starting C compilation (%s)", cdialect)
 
         context = CContext(self.coptions, self.arch_info)
-        compile_unit = _parse(src, filename, context)
+        preprocessor = CPreProcessor(self.coptions)
+        compile_unit = _parse(src, filename, context, preprocessor)
+        self.dependencies = preprocessor.dependencies
 
         if reporter:
             f = io.StringIO()
@@ -63,8 +66,9 @@ def create_ast(src, arch_info, filename="<snippet>", coptions=None):
     return _parse(src, filename, context)
 
 
-def _parse(src, filename, context):
-    preprocessor = CPreProcessor(context.coptions)
+def _parse(src, filename, context, preprocessor=None):
+    if preprocessor is None:
+        preprocessor = CPreProcessor(context.coptions)
     tokens = preprocessor.process_file(src, filename)
     semantics = CSemantics(context)
     parser = CParser(context.coptions, semantics)
@@ -14,9 +14,11 @@ Sourcecode of inspiration:
 - https://github.com/rui314/8cc/blob/master/cpp.c
 """
 
+import io
 import os
 import logging
 import operator
+import re
 import time
 
 from ...common import CompilerError
@@ -30,12 +32,15 @@ class CPreProcessor:
     """ A pre-processor for C source code """
 
     logger = logging.getLogger("preprocessor")
+    # Set to a HeaderCache to share lexed headers between preprocessors:
+    header_cache = None
 
     def __init__(self, coptions):
         self.coptions = coptions
         self.verbose = coptions["verbose"]
         self.macros = {}  # A mapping of macros
         self.files = []  # Stack of included files.
+        self.dependencies = []  # All included files, in order of inclusion.
         self.counter = 0  # For the __COUNTER__ macro
         self._int_type = types.BasicType(types.BasicType.INT)
 
@@ -172,7 +177,11 @@ class CPreProcessor:
         source_file = SourceFile(filename)
         clexer = CLexer(self.coptions)
         tokens = clexer.lex(f, source_file)
-        ex = FileExpander(source_file, tokens)
+        yield from self.process_lexed_file(tokens, source_file)
+
+    def process_lexed_file(self, tokens, source_file):
+        """ Process the tokens of a file. """
+        ex = FileExpander(source_file, iter(tokens))
         self.files.append(ex)
         yield LineInfo(1, source_file.filename)
         for token in self.process_tokens():
@@ -249,9 +258,19 @@ class CPreProcessor:
         self.logger.debug("Including %s", full_path)
         source_file = SourceFile(full_path)
         self.files[-1].dependencies.append(source_file)
-        with open(full_path, "r") as f:
-            for token in self.process_file(f, full_path):
-                yield token
+        if full_path not in self.dependencies:
+            self.dependencies.append(full_path)
+        if self.header_cache is not None:
+            tokens = self.header_cache.get_tokens(full_path, self.coptions)
+        else:
+            tokens = None
+        if tokens is None:
+            with open(full_path, "r") as f:
+                for token in self.process_file(f, full_path):
+                    yield token
+        else:
+            self.logger.debug("Using cached tokens of %s", full_path)
+            yield from self.process_lexed_file(tokens, SourceFile(full_path))
 
     # Token consume / peeking:
     @property
@@ -1133,6 +1152,45 @@ class CPreProcessor:
         return value
 
 
+class HeaderCache:
+    """ Cache of the tokens of included files.
+
+    Long running processes, like the compile server, can set this as the
+    header cache of the preprocessor, such that each header is lexed only
+    once. A header is lexed again when it is modified.
+
+    Files which use #line or __LINE__ are not cached, since these depend
+    on the lexer position while preprocessing.
+    """
+
+    uncachable = re.compile(r"^\s*#\s*line\b|__LINE__", re.MULTILINE)
+
+    def __init__(self):
+        self._entries = {}
+
+    def get_tokens(self, filename, coptions):
+        """ Get a fresh copy of the tokens of a file, or None if the file
+        cannot be cached. """
+        stat = os.stat(filename)
+        key = (filename, coptions["trigraphs"], coptions["std"])
+        version = (stat.st_mtime_ns, stat.st_size)
+        if key in self._entries and self._entries[key][0] == version:
+            tokens = self._entries[key][1]
+        else:
+            with open(filename, "r") as f:
+                text = f.read()
+            if self.uncachable.search(text):
+                tokens = None
+            else:
+                clexer = CLexer(coptions)
+                source_file = SourceFile(filename)
+                tokens = list(clexer.lex(io.StringIO(text), source_file))
+            self._entries[key] = (version, tokens)
+
+        if tokens is not None:
+            return [token.copy() for token in tokens]
+
+
 class FileExpander:
     """ Per source or header file an expander class is created
 
@@ -99,7 +99,7 @@ class Lexer(BaseLexer):
             ("LONGCOMMENTBEGIN", r"\/\*", self.handle_comment_start),
             ("LONGCOMMENTEND", r"\*\/", self.handle_comment_stop),
             ("GLYPH", op_txt, lambda typ, val: (val, val)),
-            ("STRING", r'".*?"', lambda typ, val: (typ, val[1:-1])),
+            ("STRING", r'"[^"\n]*"', lambda typ, val: (typ, val[1:-1])),
         ]
         super().__init__(tok_spec)
 
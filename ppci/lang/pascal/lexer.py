@@ -121,11 +121,11 @@ class Lexer(SimpleLexer):
     def handle_float_number(self, val):
         return "NUMBER", float(val)
 
-    @on(r"\(\*.*?\*\)", flags=re.DOTALL, order=-2)
+    @on(r"\(\*([^*]|\*+[^*)])*\*+\)", order=-2)
     def handle_oldcomment(self, val):
         pass
 
-    @on(r"\{.*?\}", flags=re.DOTALL, order=-1)
+    @on(r"\{[^}]*\}", order=-1)
     def handle_comment(self, val):
         pass
 
@@ -1,6 +1,13 @@
 from .python2wasm import python_to_wasm
 from .python2ir import python_to_ir
-from .loadpy import load_py, jit
+from .loadpy import load_py, jit, JitModule
 from .ir2py import ir_to_python
 
-__all__ = ["python_to_ir", "ir_to_python", "jit", "load_py", "python_to_wasm"]
+__all__ = [
+    "python_to_ir",
+    "ir_to_python",
+    "jit",
+    "JitModule",
+    "load_py",
+    "python_to_wasm",
+]
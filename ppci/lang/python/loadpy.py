@@ -1,8 +1,17 @@
+import ctypes
+import functools
+import hashlib
 import inspect
 import io
+import logging
+import os
+import textwrap
 from ... import ir
 from ...binutils import debuginfo
-from .python2ir import python_to_ir
+from ...utils.cache import read_cache_entry, write_cache_entry
+from .python2ir import python_to_ir, PythonToIrCompiler, INDEX_ERROR
+
+logger = logging.getLogger("jit")
 
 
 def load_py(f, imports=None, reporter=None):
@@ -25,18 +34,159 @@ def load_py(f, imports=None, reporter=None):
 
 
 class JittedFunction:
-    """ This is a wrapper around a compiled function. """
+    """ This is a wrapper around a compiled function.
+
+    The function is compiled by its :class:`JitModule` when it is
+    called for the first time, if it is not compiled yet.
 
-    def __init__(self, original, compiled, mod):
+    Buffer arguments are passed to the compiled function as a pointer to
+    their items, and the amount of items. An index outside a buffer
+    raises an IndexError.
+    """
+
+    def __init__(self, original, jit_module):
         self.original = original
-        self.compiled = compiled
+        self.jit_module = jit_module
+        self.compiled = None
+        self.mod = None
+        self.buffer_parameters = ()
+        self.index_error = None
+        self.__signature__ = inspect.signature(original)
+
+    def __repr__(self):
+        return "JittedFunction({})".format(self.original.__name__)
+
+    def load(self, mod, buffer_parameters):
+        """ Use the compiled function from the given code module """
+        compiled = getattr(mod, self.original.__name__)
+        if buffer_parameters:
+            # Pass plain addresses, instead of ctypes pointers:
+            argtypes = list(compiled.argtypes)
+            for nr, (index, _, _) in enumerate(buffer_parameters):
+                argtypes[index + nr] = ctypes.c_void_p
+            ftype = ctypes.CFUNCTYPE(compiled.restype, *argtypes)
+            compiled = ftype(ctypes.cast(compiled, ctypes.c_void_p).value)
+            self.index_error = ctypes.c_int64.from_address(
+                mod.get_symbol_address(INDEX_ERROR)
+            )
         self.mod = mod
+        self.buffer_parameters = buffer_parameters
+        self.compiled = compiled
 
     def __call__(self, *args):
-        return self.compiled.__call__(*args)
+        if self.compiled is None:
+            self.jit_module.compile()
+
+        if not self.buffer_parameters:
+            return self.compiled.__call__(*args)
+
+        args = list(args)
+        views = []
+        try:
+            for index, element_type, writable in reversed(
+                self.buffer_parameters
+            ):
+                view = BufferView(args[index], writable)
+                views.append(view)
+                view.check_element_type(element_type)
+                args[index : index + 1] = [view.address, view.length]
+            result = self.compiled.__call__(*args)
+            if self.index_error.value:
+                self.index_error.value = 0
+                raise IndexError("buffer index out of range")
+            return result
+        finally:
+            for view in views:
+                view.release()
+
+
+# The JitModule contexts which are entered:
+_active_jit_modules = []
+
+
+class JitModule:
+    """ A group of jitted functions which are compiled together.
+
+    Functions are added with the :meth:`jit` method, or with the
+    :func:`jit` decorator while the jit module is used as a context
+    manager. The functions are compiled into a single code module when
+    one of them is called for the first time. A function can call the
+    functions which were added before it directly in native code.
+
+    .. testcode:: jitmodule
+
+        from ppci.lang.python import jit, JitModule
 
+        with JitModule() as helpers:
+            @jit
+            def square(x: int) -> int:
+                return x * x
 
-def jit(function):
+            @jit
+            def distance2(x: int, y: int) -> int:
+                return square(x) + square(y)
+
+    .. doctest:: jitmodule
+
+        >>> distance2(3, 4)
+        25
+
+    Functions added after the compilation are compiled on their own, the
+    next time one of them is called. They can call the functions which
+    were compiled before, except functions with buffer parameters.
+
+    Args:
+        imports: a dictionary with python functions which can be called
+            by the jitted functions.
+        cache: whether to cache the compiled code on disk.
+    """
+
+    def __init__(self, imports=None, cache=True):
+        self.imports = imports or {}
+        self.cache = cache
+        self.functions = {}
+        self.mods = []
+        self._pending = []
+
+    def __enter__(self):
+        _active_jit_modules.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active_jit_modules.remove(self)
+
+    def jit(self, function):
+        """ Add a function, which is compiled when it is first called """
+        name = function.__name__
+        if name in self.functions:
+            raise ValueError("Function {} was already added".format(name))
+        jitted = JittedFunction(function, self)
+        self.functions[name] = jitted
+        self._pending.append(jitted)
+        return jitted
+
+    def compile(self):
+        """ Compile and load all functions which are not compiled yet """
+        if not self._pending:
+            return
+        functions = self._pending
+        self._pending = []
+
+        # Functions compiled before are called directly in native code:
+        imports = dict(self.imports)
+        for name, function in self.functions.items():
+            if function.compiled and not function.buffer_parameters:
+                imports[name] = function
+
+        mod, buffer_parameters = compile_functions(
+            [f.original for f in functions], imports, self.cache
+        )
+        self.mods.append(mod)
+        for function in functions:
+            function.load(mod, buffer_parameters[function.original.__name__])
+
+
+def jit(function=None, cache=True):
     """ Jitting function decorator.
 
     Can be used to just-in-time (jit) compile and load a function. When
@@ -60,11 +210,186 @@ def jit(function):
         >>> heavymath(2, 7)
         9
 
+    Arguments annotated as bytes, bytearray, List[int] or List[float] are
+    buffers, such as bytes, array.array or numpy arrays. These are passed
+    to the native code without copying them.
+
+    The compiled code is cached on disk, so the function is not compiled
+    again the next time it is loaded. The cache is stored in the
+    directory given by the PPCI_JIT_CACHE environment variable, or else
+    in the ppci/jit folder of the user cache directory. Use
+    ``@jit(cache=False)``, or set PPCI_JIT_CACHE to an empty string, to
+    disable the cache.
+
+    Within a :class:`JitModule` context, the function is added to the
+    jit module instead, and compiled when it is first called.
     """
-    source = inspect.getsource(function)
-    mod = load_py(io.StringIO(source))
-    name = function.__name__
-    return JittedFunction(function, getattr(mod, name), mod)
+    if function is None:
+        return functools.partial(jit, cache=cache)
+
+    if _active_jit_modules:
+        return _active_jit_modules[-1].jit(function)
+
+    jit_module = JitModule(cache=cache)
+    jitted = jit_module.jit(function)
+    jit_module.compile()
+    return jitted
+
+
+def compile_functions(functions, imports, cache):
+    """ Compile python functions into a single code module.
+
+    Returns the loaded code module, and the buffer parameters of each
+    function.
+    """
+    from ... import api, __version__
+    from ...utils.codepage import load_obj
+
+    source = "\n\n".join(
+        textwrap.dedent(inspect.getsource(function)) for function in functions
+    )
+    names = ", ".join(function.__name__ for function in functions)
+    arch = api.get_current_arch()
+    cache_dir = get_cache_dir() if cache else None
+
+    key_parts = [__version__, arch.make_id_str(), source]
+    for name, function in sorted(imports.items()):
+        key_parts.append("{}{}".format(name, inspect.signature(function)))
+    key = hashlib.sha256("\0".join(key_parts).encode("utf8")).hexdigest()
+    entry = load_cache_entry(cache_dir, key) if cache_dir else None
+    if entry is None:
+        logger.debug("Compiling %s", names)
+        compiler = PythonToIrCompiler()
+        ir_module = compiler.compile(io.StringIO(source), imports=imports)
+        obj = api.ir_to_object([ir_module], arch, debug=True)
+        buffer_parameters = {
+            function.__name__: [
+                (index, element_ty.name, writable)
+                for index, element_ty, writable in compiler.buffer_parameters[
+                    function.__name__
+                ]
+            ]
+            for function in functions
+        }
+        if cache_dir:
+            save_cache_entry(cache_dir, key, obj, buffer_parameters)
+    else:
+        logger.debug("Using cached code for %s", names)
+        obj, buffer_parameters = entry
+
+    native_imports = {
+        name: function.compiled
+        if isinstance(function, JittedFunction)
+        else function
+        for name, function in imports.items()
+    }
+    return load_obj(obj, imports=native_imports), buffer_parameters
+
+
+def get_cache_dir():
+    """ Get the directory in which jitted code is cached, or None """
+    if "PPCI_JIT_CACHE" in os.environ:
+        return os.environ["PPCI_JIT_CACHE"] or None
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "ppci", "jit")
+
+
+def load_cache_entry(cache_dir, key):
+    """ Load cached code and its buffer parameters, if present """
+    from ...binutils.objectfile import deserialize
+
+    entry = read_cache_entry(cache_dir, key)
+    if entry is None:
+        return
+    try:
+        obj = deserialize(entry["object"])
+        buffer_parameters = {
+            name: [tuple(p) for p in parameters]
+            for name, parameters in entry["buffers"].items()
+        }
+    except (ValueError, KeyError, AttributeError) as ex:
+        logger.warning("Ignoring broken cache entry %s: %s", key, ex)
+        return
+    return obj, buffer_parameters
+
+
+def save_cache_entry(cache_dir, key, obj, buffer_parameters):
+    """ Store compiled code in the cache """
+    entry = {"object": obj.serialize(), "buffers": buffer_parameters}
+    write_cache_entry(cache_dir, key, entry)
+
+
+class PyBuffer(ctypes.Structure):
+    """ The Py_buffer structure of the Python C-API """
+
+    _fields_ = [
+        ("buf", ctypes.c_void_p),
+        ("obj", ctypes.c_void_p),
+        ("len", ctypes.c_ssize_t),
+        ("itemsize", ctypes.c_ssize_t),
+        ("readonly", ctypes.c_int),
+        ("ndim", ctypes.c_int),
+        ("format", ctypes.c_char_p),
+        ("shape", ctypes.POINTER(ctypes.c_ssize_t)),
+        ("strides", ctypes.POINTER(ctypes.c_ssize_t)),
+        ("suboffsets", ctypes.POINTER(ctypes.c_ssize_t)),
+        ("internal", ctypes.c_void_p),
+    ]
+
+
+PyBUF_WRITABLE = 0x1
+PyBUF_FORMAT = 0x4
+PyBUF_C_CONTIGUOUS = 0x38
+
+# Accepted struct formats per item type:
+BUFFER_FORMATS = {
+    "u8": ("B", "b", "c"),
+    "i64": ("q", "l", "n"),
+    "f64": ("d",),
+}
+
+
+class BufferView:
+    """ Access to the memory of an object with the buffer protocol.
+
+    The memory cannot be moved or released by the object until the
+    view is released.
+    """
+
+    def __init__(self, obj, writable):
+        flags = PyBUF_C_CONTIGUOUS | PyBUF_FORMAT
+        if writable:
+            flags |= PyBUF_WRITABLE
+        self._buffer = PyBuffer()
+        get_buffer = ctypes.pythonapi.PyObject_GetBuffer
+        get_buffer.argtypes = [
+            ctypes.py_object,
+            ctypes.POINTER(PyBuffer),
+            ctypes.c_int,
+        ]
+        get_buffer(obj, ctypes.byref(self._buffer), flags)
+        self.address = self._buffer.buf
+        self.itemsize = self._buffer.itemsize
+        self.length = self._buffer.len // self.itemsize
+        self.format = self._buffer.format.decode("ascii").lstrip("@=<>!")
+
+    def check_element_type(self, element_type):
+        """ Check that the items are of the given ir type """
+        size = {"u8": 1, "i64": 8, "f64": 8}[element_type]
+        if (
+            self.format not in BUFFER_FORMATS[element_type]
+            or self.itemsize != size
+        ):
+            raise TypeError(
+                "Expected a buffer of {}, got items of format {}".format(
+                    element_type, self.format
+                )
+            )
+
+    def release(self):
+        ctypes.pythonapi.PyBuffer_Release(ctypes.byref(self._buffer))
 
 
 def ir_to_dbg(typ):
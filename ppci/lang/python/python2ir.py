@@ -1,5 +1,13 @@
 """ Python to IR compilation.
 
+Functions must be annotated with the types int, float or str. Arguments
+can also be buffers, which are passed as a pointer to their items and
+the amount of items. Buffers are annotated as bytes or bytearray, for
+buffers of bytes, or as List[int] or List[float] for buffers of 64-bit
+integers or doubles. Buffer items can be read and written by indexing,
+and len gives the amount of items. Indices are checked: an index
+outside the buffer, including a negative index, stops the function and
+sets the INDEX_ERROR variable of the module.
 """
 
 import logging
@@ -10,6 +18,9 @@ from ... import ir, irutils
 from ...common import SourceLocation, CompilerError
 from ...binutils import debuginfo
 
+# Name of the module variable which is set on an index out of range:
+INDEX_ERROR = "python_index_error"
+
 
 def python_to_ir(f, imports=None):
     """ Compile a piece of python code to an ir module.
@@ -41,6 +52,16 @@ class Var:
         self.ty = ty
 
 
+class Buffer:
+    """ A buffer argument, passed as a pointer and an amount of items. """
+
+    def __init__(self, address, length, element_ty):
+        self.address = address
+        self.length = length
+        self.element_ty = element_ty
+        self.written = False
+
+
 class PythonToIrCompiler:
     """ Not peer-to-peer but python to ppci :) """
 
@@ -48,6 +69,13 @@ class PythonToIrCompiler:
 
     def __init__(self):
         self.type_mapping = {"int": ir.i64, "float": ir.f64, "str": ir.ptr}
+        self.buffer_mapping = {
+            "bytes": ir.u8,
+            "bytearray": ir.u8,
+            "List[int]": ir.i64,
+            "List[float]": ir.f64,
+        }
+        self.buffer_parameters = {}
 
     def compile(self, f, imports=None):
         """ Convert python into IR-code.
@@ -65,6 +93,7 @@ class PythonToIrCompiler:
         x = ast.parse(src)
 
         self.function_map = {}
+        self.index_error = None
 
         self.builder = irutils.Builder()
         self.builder.prepare()
@@ -101,15 +130,16 @@ class PythonToIrCompiler:
 
         # Create external function:
         ir_arg_types = [self.get_ty(t) for t in arg_types]
-        if return_type:
+        ir_return_type = self.get_ty(return_type)
+        if ir_return_type:
             ir_function = ir.ExternalFunction(
-                name, ir_arg_types, self.get_ty(return_type)
+                name, ir_arg_types, ir_return_type
             )
         else:
             ir_function = ir.ExternalProcedure(name, ir_arg_types)
 
         self.builder.module.add_external(ir_function)
-        self.function_map[name] = ir_function, return_type, arg_types
+        self.function_map[name] = ir_function, ir_return_type, ir_arg_types
 
     def gen_function(self, df):
         """ Transform a python function into an IR-function """
@@ -117,7 +147,6 @@ class PythonToIrCompiler:
 
         function_name = df.name
         binding = ir.Binding.GLOBAL
-        dbg_int = debuginfo.DebugBaseType("int", 8, 1)
         return_type = self.get_ty(df.returns)
         if return_type:
             ir_function = self.builder.new_function(
@@ -127,18 +156,53 @@ class PythonToIrCompiler:
             ir_function = self.builder.new_procedure(function_name, binding)
         dbg_args = []
         arg_types = []
-        for arg in df.args.args:
+        buffers = []
+        scalar_parameters = []
+        for index, arg in enumerate(df.args.args):
             if not arg.annotation:
                 self.error(arg, "Need type annotation for {}".format(arg.arg))
-            aty = self.get_ty(arg.annotation)
-            arg_types.append(aty)
             arg_name = arg.arg
+            element_ty = self.get_buffer_element_ty(arg.annotation)
+            if element_ty:
+                # Pass buffers as a pointer and an amount of items:
+                address = ir.Parameter(arg_name, ir.ptr)
+                length = ir.Parameter("{}_len".format(arg_name), ir.i64)
+                buffer = Buffer(address, length, element_ty)
+                self.local_map[arg_name] = buffer
+                buffers.append((index, buffer))
+                arg_types.extend([ir.ptr, ir.i64])
+                dbg_args.append(
+                    debuginfo.DebugParameter(
+                        arg_name, self.get_debug_pointer_type(element_ty)
+                    )
+                )
+                dbg_args.append(
+                    debuginfo.DebugParameter(
+                        length.name, self.get_debug_type(ir.i64)
+                    )
+                )
+                ir_function.add_parameter(address)
+                ir_function.add_parameter(length)
+            else:
+                aty = self.get_ty(arg.annotation)
+                arg_types.append(aty)
+
+                # Debug info:
+                param = ir.Parameter(arg_name, aty)
+                dbg_args.append(
+                    debuginfo.DebugParameter(
+                        arg_name, self.get_debug_type(aty)
+                    )
+                )
 
-            # Debug info:
-            param = ir.Parameter(arg_name, aty)
-            dbg_args.append(debuginfo.DebugParameter(arg_name, dbg_int))
+                ir_function.add_parameter(param)
+                scalar_parameters.append(param)
 
-            ir_function.add_parameter(param)
+        if buffers and not self.index_error:
+            self.index_error = ir.Variable(
+                INDEX_ERROR, ir.Binding.GLOBAL, 8, 8, value=bytes(8)
+            )
+            self.builder.module.add_variable(self.index_error)
 
         # Register function as known:
         self.function_map[function_name] = ir_function, return_type, arg_types
@@ -150,7 +214,7 @@ class PythonToIrCompiler:
         dfi = debuginfo.DebugFunction(
             ir_function.name,
             SourceLocation("foo.py", 1, 1, 1),
-            dbg_int,
+            self.get_debug_type(return_type),
             dbg_args,
         )
         self.debug_db.enter(ir_function, dfi)
@@ -160,7 +224,7 @@ class PythonToIrCompiler:
         ir_function.entry = first_block
 
         # Copy the parameters to variables (so they can be modified):
-        for parameter in ir_function.arguments:
+        for parameter in scalar_parameters:
             # self.local_map[name] = Var(param, False, aty)
             para_var = self.get_variable(df, parameter.name, ty=parameter.ty)
             self.emit(ir.Store(parameter, para_var.value))
@@ -182,6 +246,12 @@ class PythonToIrCompiler:
         # TODO: ugly:
         ir_function.delete_unreachable()
 
+        # Remember how to pass buffers, and whether they must be writable:
+        self.buffer_parameters[function_name] = [
+            (index, buffer.element_ty, buffer.written)
+            for index, buffer in buffers
+        ]
+
     def gen_statement(self, statement):
         """ Generate code for a statement """
         if isinstance(statement, list):
@@ -337,7 +407,7 @@ class PythonToIrCompiler:
         # Increment loop variable:
         one = self.builder.emit_const(1, ir.i64)
         i_inc = self.builder.emit_add(i_phi, one, ir.i64)
-        i_phi.set_incoming(body_block, i_inc)
+        i_phi.set_incoming(self.builder.block, i_inc)
 
         # Jump to start again:
         self.builder.emit_jump(test_block)
@@ -354,7 +424,7 @@ class PythonToIrCompiler:
                 statement, "Only a single assignment target is supported."
             )
 
-        if isinstance(target, ast.Name):
+        if isinstance(target, (ast.Name, ast.Subscript)):
             value = self.gen_expr(statement.value)
             self.store_value(target, value)
         elif isinstance(target, ast.Tuple):
@@ -385,11 +455,27 @@ class PythonToIrCompiler:
             op = self.binop_map[type(statement.op)]
             value = self.emit(ir.Binop(lhs, op, rhs, "augassign", var.ty))
             self.emit(ir.Store(value, var.value))
+        elif isinstance(target, ast.Subscript):
+            buffer, address = self.gen_item_address(target)
+            lhs = self.load_item(buffer, address)
+            rhs = self.gen_expr(statement.value)
+            if lhs.ty is not rhs.ty:
+                self.error(statement, "Type mismatch, types must be the same.")
+            op = self.binop_map[type(statement.op)]
+            value = self.emit(ir.Binop(lhs, op, rhs, "augassign", lhs.ty))
+            self.store_item(buffer, address, value)
         else:  # pragma: no cover
             self.not_impl(statement)
 
     def store_value(self, target, value):
         """ Store an IR-value into a target node. """
+        if isinstance(target, ast.Subscript):
+            buffer, address = self.gen_item_address(target)
+            if value.ty is not self.item_ty(buffer):
+                self.error(target, "Type mismatch, types must be the same.")
+            self.store_item(buffer, address, value)
+            return
+
         assert isinstance(target, ast.Name)
         name = target.id
         var = self.get_variable(target, name, ty=value.ty)
@@ -465,6 +551,9 @@ class PythonToIrCompiler:
                 value = self.gen_call(expr)
             elif isinstance(expr, ast.Constant):
                 value = self.gen_constant(expr)
+            elif isinstance(expr, ast.Subscript):
+                buffer, address = self.gen_item_address(expr)
+                value = self.load_item(buffer, address)
             else:  # pragma: no cover
                 self.not_impl(expr)
         return value
@@ -472,6 +561,8 @@ class PythonToIrCompiler:
     def gen_name(self, expr):
         """ Compile name node access. """
         var = self.local_map[expr.id]
+        if isinstance(var, Buffer):
+            self.error(expr, "Buffers can only be indexed or passed on")
         if var.lvalue:
             value = self.builder.emit_load(var.value, var.ty)
         else:
@@ -508,12 +599,29 @@ class PythonToIrCompiler:
         assert isinstance(expr.func, ast.Name)
         name = expr.func.id
 
+        if name == "len" and name not in self.function_map:
+            if len(expr.args) != 1:
+                self.error(expr, "len takes a single argument")
+            return self.get_buffer(expr.args[0]).length
+
         # Lookup function and check types:
+        if name not in self.function_map:
+            self.error(expr, "Unknown function {}".format(name))
         ir_function, return_type, arg_types = self.function_map[name]
         self.logger.warning("Function arguments not type checked!")
 
-        # Evaluate arguments:
-        args = [self.gen_expr(a) for a in expr.args]
+        # Evaluate arguments, buffers are passed as pointer and length:
+        args = []
+        passes_buffers = False
+        for arg in expr.args:
+            if isinstance(arg, ast.Name) and isinstance(
+                self.local_map.get(arg.id), Buffer
+            ):
+                buffer = self.local_map[arg.id]
+                args.extend([buffer.address, buffer.length])
+                passes_buffers = True
+            else:
+                args.append(self.gen_expr(arg))
 
         # Emit call:
         if return_type:
@@ -523,6 +631,12 @@ class PythonToIrCompiler:
         else:
             self.emit(ir.ProcedureCall(ir_function, args))
             value = None
+
+        # Stop as well when the called function hit an index error:
+        if passes_buffers:
+            flag = self.builder.emit_load(self.index_error, ir.i64)
+            zero = self.builder.emit_const(0, ir.i64)
+            self.gen_error_check(flag, "==", zero)
         return value
 
     def gen_num(self, expr):
@@ -543,6 +657,71 @@ class PythonToIrCompiler:
         value = self.emit(ir.AddressOf(string_constant, "string_constant_ptr"))
         return value
 
+    def get_buffer(self, expr):
+        """ Get the buffer argument to which the expression refers """
+        if isinstance(expr, ast.Name) and isinstance(
+            self.local_map.get(expr.id), Buffer
+        ):
+            return self.local_map[expr.id]
+        self.error(expr, "Expected a buffer argument")
+
+    def gen_item_address(self, expr):
+        """ Determine the address of a buffer item, as in 'a[i]' """
+        buffer = self.get_buffer(expr.value)
+        index = expr.slice
+        if type(index).__name__ == "Index":  # Python < 3.9
+            index = index.value
+        index = self.gen_expr(index)
+        if index.ty is not ir.i64:
+            self.error(expr, "Index must be an integer")
+
+        # Negative indices become large when compared unsigned:
+        unsigned_index = self.builder.emit_cast(index, ir.u64)
+        length = self.builder.emit_cast(buffer.length, ir.u64)
+        self.gen_error_check(unsigned_index, "<", length)
+
+        offset = self.builder.emit_cast(index, ir.ptr)
+        size = self.builder.emit_const(buffer.element_ty.size, ir.ptr)
+        offset = self.builder.emit_mul(offset, size, ir.ptr)
+        address = self.builder.emit_add(buffer.address, offset, ir.ptr)
+        return buffer, address
+
+    def gen_error_check(self, a, cond, b):
+        """ Stop the function with an index error, unless 'a cond b' """
+        ok_block = self.builder.new_block()
+        error_block = self.builder.new_block()
+        self.emit(ir.CJump(a, cond, b, ok_block, error_block))
+
+        self.builder.set_block(error_block)
+        one = self.builder.emit_const(1, ir.i64)
+        self.emit(ir.Store(one, self.index_error))
+        function = self.builder.function
+        if function.is_procedure:
+            self.builder.emit_exit()
+        else:
+            self.builder.emit_return(
+                self.builder.emit_const(0, function.return_ty)
+            )
+
+        self.builder.set_block(ok_block)
+
+    @staticmethod
+    def item_ty(buffer):
+        """ Get the type of buffer items when used in expressions """
+        return ir.i64 if buffer.element_ty is ir.u8 else buffer.element_ty
+
+    def load_item(self, buffer, address):
+        value = self.builder.emit_load(address, buffer.element_ty)
+        if value.ty is not self.item_ty(buffer):
+            value = self.builder.emit_cast(value, self.item_ty(buffer))
+        return value
+
+    def store_item(self, buffer, address, value):
+        if value.ty is not buffer.element_ty:
+            value = self.builder.emit_cast(value, buffer.element_ty)
+        self.emit(ir.Store(value, address))
+        buffer.written = True
+
     # Helper functions:
     def get_variable(self, node, name, ty=None):
         """ Retrieve a variable, or create it if type is given.
@@ -599,6 +778,52 @@ class PythonToIrCompiler:
         self.builder.emit(instruction)
         return instruction
 
+    def get_buffer_element_ty(self, annotation):
+        """ Get the item type when the annotation is of a buffer """
+        if isinstance(annotation, ast.Name):
+            type_name = annotation.id
+        elif isinstance(annotation, ast.Subscript) and isinstance(
+            annotation.value, ast.Name
+        ):
+            item = annotation.slice
+            if type(item).__name__ == "Index":  # Python < 3.9
+                item = item.value
+            if not isinstance(item, ast.Name):
+                return
+            type_name = "{}[{}]".format(annotation.value.id, item.id)
+        else:
+            return
+        return self.buffer_mapping.get(type_name)
+
+    def get_debug_type(self, ty):
+        """ Get the debug type of an ir type, used to call functions """
+        if self.debug_db.contains(ty):
+            return self.debug_db.get(ty)
+
+        if ty is None:
+            dbg_typ = debuginfo.DebugBaseType("void", 0, 1)
+        elif ty is ir.ptr:
+            dbg_typ = debuginfo.DebugPointerType(self.get_debug_type(ir.u8))
+        else:
+            size, name = {
+                ir.i64: (8, "int64_t"),
+                ir.f64: (8, "double"),
+                ir.u8: (1, "uint8_t"),
+            }[ty]
+            dbg_typ = debuginfo.DebugBaseType(name, size, 1)
+        self.debug_db.enter(ty, dbg_typ)
+        return dbg_typ
+
+    def get_debug_pointer_type(self, element_ty):
+        """ Get the debug type of a pointer to the items of a buffer """
+        key = (ir.ptr, element_ty)
+        if not self.debug_db.contains(key):
+            dbg_typ = debuginfo.DebugPointerType(
+                self.get_debug_type(element_ty)
+            )
+            self.debug_db.enter(key, dbg_typ)
+        return self.debug_db.get(key)
+
     def get_ty(self, annotation) -> ir.Typ:
         """ Get the type based on type annotation """
         if isinstance(annotation, type):
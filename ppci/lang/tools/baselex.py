@@ -1,10 +1,14 @@
 import re
 from ...common import CompilerError
 from ..common import Token, SourceLocation
+from .regex.scanner import get_scanner
 
 EOF = "EOF"
 EPS = "EPS"
 
+# Regular expression flags which are supported by table driven lexers:
+TABLE_FLAGS = re.DOTALL | re.IGNORECASE
+
 
 def on(pattern, flags=0, order=0):
     """ Register method to the given pattern.
@@ -46,12 +50,29 @@ class SimpleLexer(Lexer, metaclass=LexMeta):
 
     Use this class by subclassing it and decorating handler methods
     with the 'on' function.
+
+    When table_driven is set, the patterns are compiled into a single
+    transition table. Then the longest match is taken, and the order is
+    only used when patterns match the same text. Otherwise, the
+    patterns are tried in order, and the first match is taken.
     """
 
+    #: Use a table driven scanner, instead of python regular expressions.
+    table_driven = False
+
+    def _matches(self):
+        """ Get the matches at the current position """
+        if self.table_driven:
+            mo = self._scanner.match(self.txt, self.pos)
+            if mo:
+                yield mo, self.lexmap[int(mo.lastgroup)][2]
+        else:
+            for prog, _, func in self.lexmap:
+                yield prog.match(self.txt, self.pos), func
+
     def gettok(self):
         """ Find a match at the given position """
-        for prog, _, func in self.lexmap:
-            mo = prog.match(self.txt, self.pos)
+        for mo, func in self._matches():
             if mo:
                 column = mo.start() - self.line_start
                 length = mo.end() - mo.start()
@@ -91,6 +112,12 @@ class SimpleLexer(Lexer, metaclass=LexMeta):
         self.line_start = 0
         self.pos = 0
         self.txt = txt
+        if self.table_driven:
+            token_spec = tuple(
+                (str(index), prog.pattern, prog.flags & TABLE_FLAGS)
+                for index, (prog, _, _) in enumerate(self.lexmap)
+            )
+            self._scanner = get_scanner(token_spec)
         while len(txt) != self.pos:
             tok = self.gettok()
             if tok:
@@ -108,13 +135,26 @@ class BaseLexer(Lexer):
     This class can be overridden to create a
     lexer. This class handles the regular expression generation and
     source position accounting.
+
+    When table_driven is set, the token specification is compiled into
+    a single transition table, which scans the text in linear time. Then
+    the longest match is taken, and the order of the specification is
+    only used when tokens match the same text. Otherwise, the first
+    alternative which matches is taken.
     """
 
+    #: Use a table driven scanner, instead of python regular expressions.
+    table_driven = False
+
     def __init__(self, tok_spec):
-        tok_re = "|".join(
-            "(?P<{}>{})".format(pair[0], pair[1]) for pair in tok_spec
-        )
-        self.gettok = re.compile(tok_re).match
+        if self.table_driven:
+            token_spec = tuple((pair[0], pair[1]) for pair in tok_spec)
+            self.gettok = get_scanner(token_spec).match
+        else:
+            tok_re = "|".join(
+                "(?P<{}>{})".format(pair[0], pair[1]) for pair in tok_spec
+            )
+            self.gettok = re.compile(tok_re).match
         self.func_map = {pair[0]: pair[2] for pair in tok_spec}
         self.filename = None
         self.line = 1
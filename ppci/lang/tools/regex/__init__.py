@@ -2,11 +2,27 @@
 
 Implement regular expressions using derivatives.
 
+Regular expressions can be compiled into a DFA, and a list of token
+definitions can be compiled into a table driven scanner.
 """
 
 
-from .regex import Symbol, SymbolSet, Kleene
+from .regex import Symbol, SymbolSet, Kleene, kleene, EPSILON, NULL
 from .parser import parse
+from .compile import compile, compile_vector, DFA
+from .scanner import Scanner
 
 
-__all__ = ("parse", "Symbol", "SymbolSet", "Kleene")
+__all__ = (
+    "parse",
+    "compile",
+    "compile_vector",
+    "DFA",
+    "Scanner",
+    "Symbol",
+    "SymbolSet",
+    "Kleene",
+    "kleene",
+    "EPSILON",
+    "NULL",
+)
@@ -1,4 +1,176 @@
-def compile(r):
+""" Compile regular expressions into deterministic finite automata.
+
+The DFA is constructed using derivatives. Each state of the DFA is a
+regular expression, and the transition on a symbol leads to the derivative
+of that expression with respect to the symbol. Only one derivative is
+taken for each set of symbols with an equal derivative.
+
+Several expressions can be compiled into a single DFA. Then each state
+is a vector of expressions, one for each of the original expressions.
+This is how a lexer is turned into a single transition table.
+"""
+
+import bisect
+from .parser import parse
+from .regex import NULL
+from .symbol_set import SymbolSet
+
+
+def compile(r, flags=0):
     """ Turn regular expression into a DFA """
-    parse(r)
-    raise NotImplementedError()
+    return compile_vector([r], flags=flags)
+
+
+def compile_vector(expressions, flags=0):
+    """ Turn a list of regular expressions into a single DFA.
+
+    The DFA accepts the index of the first expression which matches.
+    Expressions can be given as text or as parsed regular expressions.
+    """
+    start = tuple(
+        parse(e, flags=flags) if isinstance(e, str) else e
+        for e in expressions
+    )
+    states = [start]
+    state_numbers = {start: 0}
+    edges = []
+    for state in states:
+        state_edges = []
+        for symbols in _vector_classes(state):
+            symbol = symbols.first()
+            target = tuple(e.derivative(symbol) for e in state)
+            if all(e == NULL for e in target):
+                continue
+            if target not in state_numbers:
+                state_numbers[target] = len(states)
+                states.append(target)
+            state_edges.append((symbols, state_numbers[target]))
+        edges.append(state_edges)
+
+    accepts = [_accepted(state) for state in states]
+    return DFA(edges, accepts)
+
+
+def _vector_classes(state):
+    """ Partition the symbols such that all derivatives are equal """
+    classes = [SymbolSet.all()]
+    for expression in state:
+        if expression == NULL:
+            continue
+        classes = [
+            c
+            for c in (
+                a & b
+                for a in classes
+                for b in expression.derivative_classes()
+            )
+            if c
+        ]
+    return classes
+
+
+def _accepted(state):
+    for index, expression in enumerate(state):
+        if expression.nullable:
+            return index
+
+
+class DFA:
+    """ A deterministic finite automaton.
+
+    Symbols are grouped into classes of symbols for which all transitions
+    are the same. State 0 is the start state.
+
+    Attributes:
+        transitions: for each state a list with the next state for
+            each symbol class, or -1 when there is no next state.
+        accepts: for each state the index of the matched expression,
+            or None if the state does not accept.
+    """
+
+    def __init__(self, edges, accepts):
+        self.accepts = accepts
+
+        # Split the symbols at all places where some transition differs:
+        boundaries = {0}
+        for state_edges in edges:
+            for symbols, _ in state_edges:
+                for first, last in symbols.ranges:
+                    boundaries.add(first)
+                    boundaries.add(last + 1)
+        self._boundaries = sorted(boundaries)
+
+        columns = []
+        for first in self._boundaries:
+            column = []
+            for state_edges in edges:
+                target = -1
+                for symbols, state in state_edges:
+                    if first in symbols:
+                        target = state
+                        break
+                column.append(target)
+            columns.append(tuple(column))
+
+        # Symbols with the same transitions belong to the same class:
+        class_numbers = {}
+        self._interval_classes = [
+            class_numbers.setdefault(column, len(class_numbers))
+            for column in columns
+        ]
+        self.transitions = [[-1] * len(class_numbers) for _ in edges]
+        for column, number in class_numbers.items():
+            for state, target in enumerate(column):
+                self.transitions[state][number] = target
+        self._ascii_classes = [self._lookup_class(c) for c in range(128)]
+
+    @property
+    def num_states(self):
+        return len(self.transitions)
+
+    @property
+    def num_classes(self):
+        return len(self.transitions[0])
+
+    def _lookup_class(self, code):
+        interval = bisect.bisect_right(self._boundaries, code) - 1
+        return self._interval_classes[interval]
+
+    def symbol_class(self, symbol):
+        """ Get the class number of a symbol """
+        code = ord(symbol)
+        if code < 128:
+            return self._ascii_classes[code]
+        return self._lookup_class(code)
+
+    def match(self, text, pos=0):
+        """ Find the longest match at the given position.
+
+        Returns a tuple with the end of the match and the index of the
+        expression which matched, or None if nothing matched.
+        """
+        transitions = self.transitions
+        accepts = self.accepts
+        ascii_classes = self._ascii_classes
+        lookup_class = self._lookup_class
+
+        state = 0
+        last = None if accepts[0] is None else (pos, accepts[0])
+        end = len(text)
+        while pos < end:
+            code = ord(text[pos])
+            if code < 128:
+                state = transitions[state][ascii_classes[code]]
+            else:
+                state = transitions[state][lookup_class(code)]
+            if state < 0:
+                break
+            pos += 1
+            if accepts[state] is not None:
+                last = (pos, accepts[state])
+        return last
+
+    def __repr__(self):
+        return "DFA with {} states and {} symbol classes".format(
+            self.num_states, self.num_classes
+        )
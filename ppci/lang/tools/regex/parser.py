@@ -2,26 +2,75 @@
 
 This module is able to parse regular expressions.
 
+The supported syntax is a subset of the syntax of the python re module:
+alternation, grouping, character sets, the ``.`` wildcard, the
+``*``, ``+``, ``?`` and ``{m,n}`` modifiers and escapes such as ``\\d``.
+Anchors, back references and lazy modifiers cannot be expressed in a DFA,
+and are not supported.
 """
 
+import re
 from . import regex
+from .symbol_set import SymbolSet
 
+DIGITS = SymbolSet([("0", "9")])
+WORD = SymbolSet([("0", "9"), ("A", "Z"), ("a", "z"), "_"])
+SPACE = SymbolSet(" \t\n\r\f\v")
+NEWLINE = SymbolSet("\n")
+REPETITION = re.compile(r"\{\d+(,\d*)?\}")
 
-def parse(r):
-    """ Parse a regular expression """
-    parser = Parser()
+CLASS_ESCAPES = {
+    "d": DIGITS,
+    "D": DIGITS.complement(),
+    "w": WORD,
+    "W": WORD.complement(),
+    "s": SPACE,
+    "S": SPACE.complement(),
+}
+
+CHAR_ESCAPES = {
+    "n": "\n",
+    "t": "\t",
+    "r": "\r",
+    "f": "\f",
+    "v": "\v",
+    "a": "\a",
+    "0": "\0",
+}
+
+
+def parse(r, flags=0):
+    """ Parse a regular expression.
+
+    Args:
+        r: the regular expression text
+        flags: re.DOTALL and re.IGNORECASE flags of the python re module
+    """
+    parser = Parser(flags=flags)
     return parser.parse(r)
 
 
 class Parser:
     """ Regular expression program parser """
 
+    def __init__(self, flags=0):
+        if flags & ~(re.DOTALL | re.IGNORECASE):
+            raise ValueError("Unsupported flags {}".format(flags))
+        self.flags = flags
+
     def parse(self, txt):
         self.txt = txt
         self.pos = 0
         expr = self._parse_top()
+        if self.current() is not None:
+            self.error("Unexpected {}".format(self.current()))
         return expr
 
+    def error(self, message):
+        raise ValueError(
+            "{} at position {} in {!r}".format(message, self.pos, self.txt)
+        )
+
     def current(self):
         if self.pos < len(self.txt):
             return self.txt[self.pos]
@@ -34,7 +83,7 @@ class Parser:
         """ Consume single character """
         actual = self.current()
         if actual is None:
-            raise ValueError("At end of string!")
+            self.error("At end of string!")
 
         self.pos += 1
         if c is None:
@@ -42,7 +91,7 @@ class Parser:
         elif actual == c:
             return actual
         else:
-            raise ValueError("Expected {} but got {}".format(c, actual))
+            self.error("Expected {} but got {}".format(c, actual))
 
     def did_eat(self, c):
         if self.peek(c):
@@ -58,27 +107,72 @@ class Parser:
         while self.did_eat("|"):
             rhs = self._parse_and()
             expr = expr | rhs
+        return expr
 
     def _parse_and(self):
-        return self._parse_element()
+        """ Parse a sequence of elements """
+        expr = regex.EPSILON
+        while self.current() not in (None, "|", ")"):
+            expr = expr + self._parse_modifier(self._parse_element())
+        return expr
 
     def _parse_element(self):
         """ Parse single element of regex """
         if self.peek("("):
             self.eat("(")
+            if self.did_eat("?"):
+                # Only non-capturing groups are supported:
+                self.eat(":")
             expr = self._parse_top()
             self.eat(")")
         elif self.peek("["):
-            return self._parse_set()
+            expr = self._make_set(self._parse_set())
+        elif self.did_eat("."):
+            if self.flags & re.DOTALL:
+                expr = regex.SymbolSet.from_symbol_set(SymbolSet.all())
+            else:
+                expr = regex.SymbolSet.from_symbol_set(NEWLINE.complement())
+        elif self.current() in ("^", "$"):
+            self.error("Anchors are not supported")
+        elif self.current() in ("*", "+", "?") or self._at_repetition():
+            self.error("Nothing to repeat")
+        elif self.peek("\\"):
+            expr = self._make_set(self._parse_escape())
         else:
-            raise NotImplementedError()
-            expr = self._parse_set()
+            expr = self._make_set(SymbolSet(self.eat()))
         return expr
 
+    def _make_set(self, symbols):
+        if self.flags & re.IGNORECASE:
+            for first, last in symbols.ranges:
+                if last - first < 256:
+                    for code in range(first, last + 1):
+                        char = chr(code)
+                        symbols = symbols | SymbolSet(
+                            char.lower() + char.upper()
+                        )
+        return regex.SymbolSet.from_symbol_set(symbols)
+
+    def _parse_escape(self):
+        """ Parse an escape sequence, like \\d or \\. """
+        self.eat("\\")
+        char = self.eat()
+        if char in CLASS_ESCAPES:
+            return CLASS_ESCAPES[char]
+        elif char in CHAR_ESCAPES:
+            return SymbolSet(CHAR_ESCAPES[char])
+        elif char == "x":
+            code = self.txt[self.pos : self.pos + 2]
+            self.pos += 2
+            return SymbolSet([int(code, 16)])
+        elif char.isalnum():
+            self.error("Unsupported escape \\{}".format(char))
+        else:
+            return SymbolSet(char)
+
     def _parse_set(self):
         """ Parse a set of options '[0-9abc]' """
         self.eat("[")
-        options = []
         # Check inversion:
         if self.peek("^"):
             self.eat("^")
@@ -86,25 +180,80 @@ class Parser:
         else:
             complement = False
 
-        options.append(complement)
-        while not self.peek("]"):
-            start = self.eat()
-            if self.peek("-"):
+        symbols = SymbolSet()
+        first = True
+        while first or not self.peek("]"):
+            first = False
+            start = self._parse_set_item()
+            if self.peek("-") and self.txt[self.pos + 1 : self.pos + 2] != "]":
                 self.eat("-")
-                end = self.eat()
-                options.append((start, end))
+                end = self._parse_set_item()
+                if len(start.ranges) != 1 or len(end.ranges) != 1:
+                    self.error("Invalid range")
+                symbols = symbols | SymbolSet(
+                    [(start.ranges[0][0], end.ranges[-1][1])]
+                )
             else:
-                options.append(start)
+                symbols = symbols | start
         self.eat("]")
+        if complement:
+            symbols = symbols.complement()
+        return symbols
+
+    def _parse_set_item(self):
+        if self.peek("\\"):
+            return self._parse_escape()
+        else:
+            return SymbolSet(self.eat())
 
     def _parse_modifier(self, expr):
         """ Parse any modifiers after an expression """
-        if self.eat("*"):
-            return regex.Kleene(expr)
-        elif self.eat("+"):
-            return expr + regex.Kleene(expr)
-        elif self.eat("?"):
-            raise NotImplementedError()
-            # return expr | eps
+        while True:
+            if self.did_eat("*"):
+                expr = regex.kleene(expr)
+            elif self.did_eat("+"):
+                expr = expr + regex.kleene(expr)
+            elif self.did_eat("?"):
+                expr = expr | regex.EPSILON
+            elif self._at_repetition():
+                expr = self._parse_repetition(expr)
+            else:
+                return expr
+            if self.peek("?"):
+                self.error("Lazy modifiers are not supported")
+
+    def _at_repetition(self):
+        """ Check for a repetition, a { which is not, is a literal """
+        return bool(REPETITION.match(self.txt, self.pos))
+
+    def _parse_repetition(self, expr):
+        """ Parse a modifier like {2}, {2,} or {2,4} """
+        self.eat("{")
+        minimum = self._parse_number()
+        if self.did_eat(","):
+            if self.peek("}"):
+                maximum = None
+            else:
+                maximum = self._parse_number()
         else:
-            return expr
+            maximum = minimum
+        self.eat("}")
+
+        result = regex.EPSILON
+        for _ in range(minimum):
+            result = result + expr
+        if maximum is None:
+            result = result + regex.kleene(expr)
+        else:
+            optional = expr | regex.EPSILON
+            for _ in range(maximum - minimum):
+                result = result + optional
+        return result
+
+    def _parse_number(self):
+        start = self.pos
+        while self.current() is not None and self.current().isdigit():
+            self.eat()
+        if start == self.pos:
+            self.error("Expected a number")
+        return int(self.txt[start : self.pos])
@@ -1,10 +1,22 @@
-""" Regular expression descriptions """
+""" Regular expression descriptions
+
+Regular expressions are compared structurally. The operators ``|``,
+``&`` and ``+`` simplify the expressions they create, such that
+repeatedly taking derivatives results in a finite amount of different
+expressions. This is required to construct a DFA from derivatives.
+"""
 
 import abc
 from . import symbol_set
 
 
 class Regex(metaclass=abc.ABCMeta):
+    __slots__ = ("_key", "_hash")
+
+    def __init__(self, key):
+        self._key = key
+        self._hash = hash(key)
+
     @abc.abstractmethod
     def nu(self):
         """ Determine if this regex is nullable or not """
@@ -14,31 +26,122 @@ class Regex(metaclass=abc.ABCMeta):
     def derivative(self, symbol):
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    def derivative_classes(self):
+        """ Partition the symbols into sets with an equal derivative
+
+        Returns a list of symbol sets. The derivative of this regex
+        is the same for all symbols in one set.
+        """
+        raise NotImplementedError()
+
+    @property
+    def nullable(self):
+        """ Test if this regex matches the empty string """
+        return self.nu() == EPSILON
+
+    def __eq__(self, other):
+        return isinstance(other, Regex) and self._key == other._key
+
+    def __hash__(self):
+        return self._hash
+
     def __or__(self, other):
         if not isinstance(other, Regex):
             raise TypeError("Expected Regex but got {}".format(type(other)))
-        return LogicalOr(self, other)
+        symbols = symbol_set.SymbolSet()
+        terms = set()
+        for term in _flatten(LogicalOr, (self, other)):
+            if isinstance(term, SymbolSet):
+                symbols = symbols | term.symbols
+            else:
+                terms.add(term)
+        if symbols:
+            terms.add(SymbolSet.from_symbol_set(symbols))
+        if not terms:
+            return NULL
+        return _chain(LogicalOr, terms)
 
     def __and__(self, other):
         if not isinstance(other, Regex):
             raise TypeError("Expected Regex but got {}".format(type(other)))
-        return LogicalAnd(self, other)
+        symbols = None
+        terms = set()
+        for term in _flatten(LogicalAnd, (self, other)):
+            if isinstance(term, SymbolSet):
+                if symbols is None:
+                    symbols = term.symbols
+                else:
+                    symbols = symbols & term.symbols
+            else:
+                terms.add(term)
+        if symbols is not None:
+            if not symbols:
+                return NULL
+            terms.add(SymbolSet.from_symbol_set(symbols))
+        return _chain(LogicalAnd, terms)
 
     def __add__(self, other):
         if not isinstance(other, Regex):
             raise TypeError("Expected Regex but got {}".format(type(other)))
-        return Concatenation(self, other)
+        if self == NULL or other == NULL:
+            return NULL
+        elif self == EPSILON:
+            return other
+        elif other == EPSILON:
+            return self
+        elif isinstance(self, Concatenation):
+            return self._lhs + (self._rhs + other)
+        else:
+            return Concatenation(self, other)
+
+
+def _flatten(cls, exprs):
+    """ Get the operands of nested binary operations of the same kind """
+    for expr in exprs:
+        if isinstance(expr, cls):
+            yield from _flatten(cls, (expr._lhs, expr._rhs))
+        else:
+            yield expr
+
+
+def _chain(cls, terms):
+    """ Combine terms with a binary operation, in a fixed order """
+    terms = sorted(terms, key=_sort_key)
+    result = terms.pop()
+    while terms:
+        result = cls(terms.pop(), result)
+    return result
+
+
+def _sort_key(expr):
+    return type(expr).__name__, repr(expr._key)
+
+
+def _combine_classes(classes1, classes2):
+    """ Get all non-empty intersections of two partitions """
+    return [
+        c for c in (a & b for a in classes1 for b in classes2) if c
+    ]
 
 
 class Epsilon(Regex):
     """ The empty string """
 
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(("eps",))
+
     def nu(self):
         return self
 
     def derivative(self, symbol):
         return NULL
 
+    def derivative_classes(self):
+        return [symbol_set.SymbolSet.all()]
+
     def __str__(self):
         return ""
 
@@ -49,8 +152,20 @@ EPSILON = Epsilon()
 class SymbolSet(Regex):
     """ Match a single symbol """
 
+    __slots__ = ("_symbols",)
+
     def __init__(self, symbols):
         self._symbols = symbol_set.SymbolSet(symbols)
+        super().__init__(("set", self._symbols.ranges))
+
+    @classmethod
+    def from_symbol_set(cls, symbols):
+        """ Create a regex from a :class:`symbol_set.SymbolSet` """
+        return cls(symbols.ranges)
+
+    @property
+    def symbols(self):
+        return self._symbols
 
     def nu(self):
         return NULL
@@ -58,6 +173,10 @@ class SymbolSet(Regex):
     def derivative(self, symbol):
         return EPSILON if symbol in self._symbols else NULL
 
+    def derivative_classes(self):
+        complement = self._symbols.complement()
+        return [c for c in (self._symbols, complement) if c]
+
     def __str__(self):
         return str(self._symbols)
 
@@ -70,27 +189,45 @@ def Symbol(symbol):
     return SymbolSet([symbol])
 
 
+def kleene(expr):
+    """ Create the kleene closure of an expression, simplifying it """
+    if isinstance(expr, Kleene):
+        return expr
+    elif expr == EPSILON or expr == NULL:
+        return EPSILON
+    else:
+        return Kleene(expr)
+
+
 class Kleene(Regex):
     """ Kleene closure modifier r* """
 
+    __slots__ = ("_expr",)
+
     def __init__(self, expr):
         if not isinstance(expr, Regex):
             raise TypeError("Expected Regex but got {}".format(type(expr)))
         self._expr = expr
+        super().__init__(("star", expr._key))
 
     def nu(self):
-        return Epsilon()
+        return EPSILON
 
     def derivative(self, symbol):
         return self._expr.derivative(symbol) + self
 
+    def derivative_classes(self):
+        return self._expr.derivative_classes()
+
     def __str__(self):
-        return "{}*".format(self._expr)
+        return "({})*".format(self._expr)
 
 
 class Concatenation(Regex):
     """ Concatenate two regular expressions a . b """
 
+    __slots__ = ("_lhs", "_rhs")
+
     def __init__(self, lhs, rhs):
         if not isinstance(lhs, Regex):
             raise TypeError("Expected Regex but got {}".format(type(lhs)))
@@ -98,17 +235,26 @@ class Concatenation(Regex):
         if not isinstance(rhs, Regex):
             raise TypeError("Expected Regex but got {}".format(type(rhs)))
         self._rhs = rhs
+        super().__init__(("cat", lhs._key, rhs._key))
 
     def nu(self):
         return self._lhs.nu() & self._rhs.nu()
 
     def derivative(self, symbol):
         nu = self._lhs.nu()
-        return LogicalOr(
-            Concatenation(self._lhs.derivative(symbol), self._rhs),
-            Concatenation(nu, self._rhs.derivative(symbol)),
+        return (self._lhs.derivative(symbol) + self._rhs) | (
+            nu + self._rhs.derivative(symbol)
         )
 
+    def derivative_classes(self):
+        if self._lhs.nullable:
+            return _combine_classes(
+                self._lhs.derivative_classes(),
+                self._rhs.derivative_classes(),
+            )
+        else:
+            return self._lhs.derivative_classes()
+
     def __str__(self):
         return "{}{}".format(self._lhs, self._rhs)
 
@@ -116,6 +262,8 @@ class Concatenation(Regex):
 class LogicalOr(Regex):
     """ Alternation operator a | b """
 
+    __slots__ = ("_lhs", "_rhs")
+
     def __init__(self, lhs, rhs):
         if not isinstance(lhs, Regex):
             raise TypeError("Expected Regex but got {}".format(type(lhs)))
@@ -123,6 +271,7 @@ class LogicalOr(Regex):
         if not isinstance(rhs, Regex):
             raise TypeError("Expected Regex but got {}".format(type(rhs)))
         self._rhs = rhs
+        super().__init__(("or", lhs._key, rhs._key))
 
     def nu(self):
         return self._lhs.nu() | self._rhs.nu()
@@ -130,6 +279,11 @@ class LogicalOr(Regex):
     def derivative(self, symbol):
         return self._lhs.derivative(symbol) | self._rhs.derivative(symbol)
 
+    def derivative_classes(self):
+        return _combine_classes(
+            self._lhs.derivative_classes(), self._rhs.derivative_classes()
+        )
+
     def __str__(self):
         return "({})|({})".format(self._lhs, self._rhs)
 
@@ -137,6 +291,8 @@ class LogicalOr(Regex):
 class LogicalAnd(Regex):
     """ operator a & b """
 
+    __slots__ = ("_lhs", "_rhs")
+
     def __init__(self, lhs, rhs):
         if not isinstance(lhs, Regex):
             raise TypeError("Expected Regex but got {}".format(type(rhs)))
@@ -144,6 +300,7 @@ class LogicalAnd(Regex):
         if not isinstance(rhs, Regex):
             raise TypeError("Expected Regex but got {}".format(type(rhs)))
         self._rhs = rhs
+        super().__init__(("and", lhs._key, rhs._key))
 
     def nu(self):
         return self._lhs.nu() & self._rhs.nu()
@@ -151,5 +308,10 @@ class LogicalAnd(Regex):
     def derivative(self, symbol):
         return self._lhs.derivative(symbol) & self._rhs.derivative(symbol)
 
+    def derivative_classes(self):
+        return _combine_classes(
+            self._lhs.derivative_classes(), self._rhs.derivative_classes()
+        )
+
     def __str__(self):
         return "({})&({})".format(self._lhs, self._rhs)
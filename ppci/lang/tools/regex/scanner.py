@@ -0,0 +1,74 @@
+""" Table driven scanning of tokens.
+
+A list of token definitions is compiled into a single DFA. At each
+position, the longest possible token is matched. When several tokens
+match the same text, the first definition wins.
+"""
+
+import functools
+from .compile import compile_vector
+from .parser import parse
+
+
+class Scanner:
+    """ Scanner for a list of token definitions.
+
+    The token definitions are tuples with a name and a regular expression,
+    and optionally flags for the regular expression.
+
+    The scanner can be used instead of a compiled python regular
+    expression with a named group for each token.
+    """
+
+    def __init__(self, token_spec):
+        self.names = []
+        expressions = []
+        for definition in token_spec:
+            name, pattern = definition[:2]
+            flags = definition[2] if len(definition) > 2 else 0
+            self.names.append(name)
+            expressions.append(parse(pattern, flags=flags))
+        self.dfa = compile_vector(expressions)
+        if self.dfa.accepts[0] is not None:
+            raise ValueError(
+                "Token {} matches the empty string".format(
+                    self.names[self.dfa.accepts[0]]
+                )
+            )
+
+    def match(self, text, pos=0):
+        """ Match the longest token at the given position """
+        result = self.dfa.match(text, pos)
+        if result:
+            end, index = result
+            return ScanMatch(text, pos, end, self.names[index])
+
+
+@functools.lru_cache(maxsize=None)
+def get_scanner(token_spec):
+    """ Get a scanner for a tuple of token definitions.
+
+    Scanners are created only once for the same definitions.
+    """
+    return Scanner(token_spec)
+
+
+class ScanMatch:
+    """ A matched token, which behaves like a python regex match """
+
+    __slots__ = ("string", "_start", "_end", "lastgroup")
+
+    def __init__(self, string, start, end, name):
+        self.string = string
+        self._start = start
+        self._end = end
+        self.lastgroup = name
+
+    def start(self):
+        return self._start
+
+    def end(self):
+        return self._end
+
+    def group(self, name=0):
+        return self.string[self._start : self._end]
@@ -1,8 +1,130 @@
+""" Sets of symbols, stored as sorted ranges of code points. """
+
+import bisect
+
+MAX_SYMBOL = 0x10FFFF
+
+
 class SymbolSet:
-    """ Ordered series of ranges """
+    """ Ordered series of ranges
+
+    Symbols are characters, which are stored as ranges of code points.
+    Each range is a tuple with the first and the last code point in it.
+    """
+
+    __slots__ = ("_ranges", "_starts")
+
+    def __init__(self, symbols=()):
+        ranges = []
+        for symbol in symbols:
+            if isinstance(symbol, tuple):
+                first, last = symbol
+                ranges.append((_ord(first), _ord(last)))
+            else:
+                ranges.append((_ord(symbol), _ord(symbol)))
+        self._ranges = tuple(_merge(ranges))
+        self._starts = [r[0] for r in self._ranges]
 
-    def __init__(self, symbols):
-        self._symbols = symbols
+    @classmethod
+    def from_ranges(cls, ranges):
+        """ Create a symbol set from code point ranges """
+        return cls(tuple(r) for r in ranges)
+
+    @classmethod
+    def all(cls):
+        """ Create the set with all symbols """
+        return cls([(0, MAX_SYMBOL)])
+
+    @property
+    def ranges(self):
+        return self._ranges
 
     def __contains__(self, item):
-        return item in self._symbols
+        code = _ord(item)
+        index = bisect.bisect_right(self._starts, code) - 1
+        return index >= 0 and code <= self._ranges[index][1]
+
+    def __bool__(self):
+        return bool(self._ranges)
+
+    def __eq__(self, other):
+        return isinstance(other, SymbolSet) and self._ranges == other._ranges
+
+    def __hash__(self):
+        return hash(self._ranges)
+
+    def __lt__(self, other):
+        return self._ranges < other._ranges
+
+    def __or__(self, other):
+        return SymbolSet.from_ranges(self._ranges + other._ranges)
+
+    def __and__(self, other):
+        ranges = []
+        i = j = 0
+        while i < len(self._ranges) and j < len(other._ranges):
+            first = max(self._ranges[i][0], other._ranges[j][0])
+            last = min(self._ranges[i][1], other._ranges[j][1])
+            if first <= last:
+                ranges.append((first, last))
+            if self._ranges[i][1] < other._ranges[j][1]:
+                i += 1
+            else:
+                j += 1
+        return SymbolSet.from_ranges(ranges)
+
+    def __sub__(self, other):
+        return self & other.complement()
+
+    def complement(self):
+        """ Get all symbols which are not in this set """
+        ranges = []
+        start = 0
+        for first, last in self._ranges:
+            if first > start:
+                ranges.append((start, first - 1))
+            start = last + 1
+        if start <= MAX_SYMBOL:
+            ranges.append((start, MAX_SYMBOL))
+        return SymbolSet.from_ranges(ranges)
+
+    def first(self):
+        """ Get a symbol from this set """
+        return chr(self._ranges[0][0])
+
+    def __repr__(self):
+        return "SymbolSet({})".format(self)
+
+    def __str__(self):
+        parts = []
+        for first, last in self._ranges:
+            if first == last:
+                parts.append(_show(first))
+            else:
+                parts.append("{}-{}".format(_show(first), _show(last)))
+        return "[{}]".format("".join(parts))
+
+
+def _ord(symbol):
+    return symbol if isinstance(symbol, int) else ord(symbol)
+
+
+def _show(code):
+    char = chr(code)
+    if char.isprintable() and char not in "[]-\\^":
+        return char
+    return "\\x{:02x}".format(code) if code < 256 else "\\u{:04x}".format(code)
+
+
+def _merge(ranges):
+    """ Sort ranges and join overlapping and adjacent ranges """
+    merged = []
+    for first, last in sorted(ranges):
+        if first > last:
+            continue
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
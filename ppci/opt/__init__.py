@@ -1,11 +1,16 @@
 from .clean import CleanPass
 from .mem2reg import Mem2RegPromotor
 from .cse import CommonSubexpressionEliminationPass
+from .gvn import GlobalValueNumberingPass
 from .constantfolding import ConstantFolder
 from .load_after_store import LoadAfterStorePass
+from .inline import InlinePass
+from .licm import LoopInvariantCodeMotionPass
+from .sccp import SparseConditionalConstantPropagationPass
 from .transform import RemoveAddZeroPass
 from .transform import DeleteUnusedInstructionsPass
 from .transform import ModulePass, FunctionPass, BlockPass, InstructionPass
+from .pass_manager import PassManager
 
 
 __all__ = [
@@ -13,11 +18,16 @@ __all__ = [
     "FunctionPass",
     "BlockPass",
     "InstructionPass",
+    "PassManager",
     "CleanPass",
     "CommonSubexpressionEliminationPass",
     "ConstantFolder",
     "DeleteUnusedInstructionsPass",
+    "GlobalValueNumberingPass",
+    "InlinePass",
     "LoadAfterStorePass",
+    "LoopInvariantCodeMotionPass",
     "Mem2RegPromotor",
     "RemoveAddZeroPass",
+    "SparseConditionalConstantPropagationPass",
 ]
@@ -5,6 +5,7 @@ from .. import ir
 class CleanPass(FunctionPass):
     """ Glue blocks together if a block has only one predecessor.
 
+        Remove blocks which cannot be reached.
 
         Remove blocks with a single jump in it.
 
@@ -25,8 +26,21 @@ class CleanPass(FunctionPass):
     """
 
     def on_function(self, function):
-        self.remove_empty_blocks(function)
-        self.remove_one_preds(function)
+        modified = self.remove_unreachable_blocks(function)
+        if self.remove_empty_blocks(function):
+            modified = True
+        if self.remove_one_preds(function):
+            modified = True
+        return modified
+
+    def remove_unreachable_blocks(self, function):
+        """ Remove blocks which cannot be reached from the entry """
+        num_blocks = len(function.blocks)
+        function.delete_unreachable()
+        stat = num_blocks - len(function.blocks)
+        if stat > 0:
+            self.logger.debug("Removed %s unreachable blocks", stat)
+        return stat > 0
 
     def find_empty_blocks(self, function):
         """ Look for all blocks containing only a jump in it """
@@ -49,6 +63,15 @@ class CleanPass(FunctionPass):
             if block in predecessors:
                 continue
 
+            # Do not remove if a predecessor also jumps directly to the
+            # successor, since phi nodes cannot tell those edges apart:
+            if any(
+                successor.phis and pred in successor.predecessors
+                for pred in predecessors
+                for successor in successors
+            ):
+                continue
+
             # Update successor incoming blocks:
             for successor in successors:
                 successor.replace_incoming(block, predecessors)
@@ -64,6 +87,7 @@ class CleanPass(FunctionPass):
             stat += 1
         if stat > 0:
             self.logger.debug("Removed %s empty blocks", stat)
+        return stat > 0
 
     def find_single_predecessor_block(self, function):
         """ Find a block with a single predecessor """
@@ -86,6 +110,7 @@ class CleanPass(FunctionPass):
 
     def remove_one_preds(self, function):
         """ Remove basic blocks with only one predecessor """
+        modified = False
         change = True
         while change:
             change = False
@@ -94,6 +119,8 @@ class CleanPass(FunctionPass):
                 (pred,) = block.predecessors  # Unpack 1 block
                 self.glue_blocks(pred, block)
                 change = True
+                modified = True
+        return modified
 
     def glue_blocks(self, block1, block2):
         """ Glue two blocks together into the first block """
@@ -106,13 +133,18 @@ class CleanPass(FunctionPass):
         block1.remove_instruction(last_jump)
         last_jump.delete()
 
-        # Copy all instructions to block1:
-        for instruction in block2:
-            block1.add_instruction(instruction)
+        # Phi nodes with a single input are replaced by that input:
+        for phi in block2.phis:
+            phi.replace_by(phi.get_value(block1))
+            phi.remove_from_block()
 
         # Replace incoming info:
         for successor in block2.successors:
             successor.replace_incoming(block2, [block1])
 
+        # Move all instructions to block1:
+        for instruction in list(block2):
+            block1.move_instruction(instruction)
+
         # Remove block from function:
         block1.function.remove_block(block2)
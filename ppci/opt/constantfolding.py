@@ -31,6 +31,8 @@ def enhance(f):
 class ConstantFolder(BlockPass):
     """ Try to fold common constant expressions """
 
+    preserves_cfg = True
+
     def __init__(self):
         super().__init__()
         self.ops = {
@@ -85,6 +87,10 @@ class ConstantFolder(BlockPass):
                 continue
 
             if self.is_const(instruction):
+                if not instruction.is_used:
+                    # No use in folding, it will be deleted.
+                    continue
+
                 # Now we can replace x = (4+5) with x = 9
                 cnst = self.eval_const(instruction)
                 block.insert_instruction(cnst, before_instruction=instruction)
@@ -135,3 +141,4 @@ class ConstantFolder(BlockPass):
                     count += 1
         if count > 0:
             self.logger.debug("Folded %i expressions", count)
+        return count > 0
@@ -7,6 +7,8 @@ class CommonSubexpressionEliminationPass(BlockPass):
         Replace common sub expressions (cse) with the previously defined one.
     """
 
+    preserves_cfg = True
+
     def on_block(self, block):
         ins_map = {}
         stats = 0
@@ -20,10 +22,12 @@ class CommonSubexpressionEliminationPass(BlockPass):
                 # the python peep-hole optimizer!
                 continue
             if k in ins_map:
-                ins_new = ins_map[k]
-                i.replace_by(ins_new)
-                stats += 1
+                if i.is_used:
+                    ins_new = ins_map[k]
+                    i.replace_by(ins_new)
+                    stats += 1
             else:
                 ins_map[k] = i
         if stats > 0:
             self.logger.debug("Replaced %i instructions", stats)
+        return stats > 0
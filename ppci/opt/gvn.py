@@ -0,0 +1,131 @@
+""" Global value numbering.
+
+Replace expressions by an equivalent expression computed earlier in
+a dominating block.
+
+The dominator tree is walked from the entry, with a scoped table of
+available expressions. Values defined in a block are available in all
+blocks dominated by it.
+"""
+
+from .transform import FunctionPass
+from .. import ir
+
+
+class GlobalValueNumberingPass(FunctionPass):
+    """ Replace redundant computations by earlier computed values.
+
+    This is common subexpression elimination across basic blocks.
+    Operands of commutative operations are put in a canonical order, so
+    that `a + b` and `b + a` are recognized as the same value.
+
+    Loads are only replaced by an earlier load of the same address when
+    no instruction in between can change memory.
+    """
+
+    preserves_cfg = True
+    commutative_ops = ("+", "*", "&", "|", "^")
+    memory_clobbers = (
+        ir.Store,
+        ir.FunctionCall,
+        ir.ProcedureCall,
+        ir.CopyBlob,
+        ir.InlineAsm,
+    )
+
+    def on_function(self, function):
+        cfg_info = self.get_cfg_info(function)
+        self._numbers = {}
+
+        # Without any memory modification, all loads read the same memory:
+        self._pure_memory = not any(
+            isinstance(i, self.memory_clobbers)
+            for i in function.get_instructions()
+        )
+
+        table = {}
+        count = 0
+        worklist = [(cfg_info.cfg.root_tree, None)]
+        while worklist:
+            tree_node, added_keys = worklist.pop()
+            if added_keys is not None:
+                # Leaving the scope of this tree node:
+                for key in added_keys:
+                    del table[key]
+                continue
+
+            if not cfg_info.has_block(tree_node.node):
+                continue
+
+            block = cfg_info.get_block(tree_node.node)
+            added_keys = []
+            count += self.number_block(block, table, added_keys)
+
+            worklist.append((tree_node, added_keys))
+            for child in reversed(tree_node.children):
+                worklist.append((child, None))
+
+        self._numbers = None
+        if count > 0:
+            self.logger.debug("Replaced %i redundant values", count)
+        return count > 0
+
+    def number_block(self, block, table, added_keys):
+        """ Number all instructions of a block and remove redundant ones """
+        count = 0
+        memory_state = 0 if self._pure_memory else object()
+        for instruction in list(block):
+            if isinstance(instruction, self.memory_clobbers):
+                memory_state = object()
+                continue
+
+            key = self.make_key(instruction, memory_state)
+            if key is None:
+                continue
+
+            if key in table:
+                instruction.replace_by(table[key])
+                instruction.remove_from_block()
+                count += 1
+            else:
+                table[key] = instruction
+                added_keys.append(key)
+        return count
+
+    def value_number(self, value):
+        """ Get a number for a value, in order of first encounter """
+        if value not in self._numbers:
+            self._numbers[value] = len(self._numbers)
+        return self._numbers[value]
+
+    def make_key(self, instruction, memory_state):
+        """ Create a hashable key describing the computed value.
+
+        Returns None when the instruction cannot be numbered.
+        """
+        if isinstance(instruction, ir.Binop):
+            a, b = instruction.a, instruction.b
+            if instruction.operation in self.commutative_ops:
+                if self.value_number(a) > self.value_number(b):
+                    a, b = b, a
+            return ("binop", instruction.operation, a, b, instruction.ty)
+        elif isinstance(instruction, ir.Unop):
+            return (
+                "unop",
+                instruction.operation,
+                instruction.a,
+                instruction.ty,
+            )
+        elif isinstance(instruction, ir.Const):
+            # Use repr, since 0.0 == -0.0 but they are different values:
+            return ("const", repr(instruction.value), instruction.ty)
+        elif isinstance(instruction, ir.Cast):
+            return ("cast", instruction.src, instruction.ty)
+        elif isinstance(instruction, ir.AddressOf):
+            return ("addressof", instruction.src)
+        elif isinstance(instruction, ir.Load):
+            if instruction.volatile:
+                return None
+            return ("load", instruction.address, instruction.ty, memory_state)
+        else:
+            return None
@@ -1,12 +1,361 @@
+""" Function inlining.
+
+Calls to small functions are replaced by a copy of the called function.
+This removes call overhead, and allows other optimizations to work
+on the combined code.
+"""
+
 from .. import ir
+from ..irutils import split_block
+from ..graph.callgraph import mod_to_call_graph
+from ..graph.digraph import strongly_connected_components
+from .transform import ModulePass
 
 
-def inline_function(call: ir.ProcedureCall, function: ir.SubRoutine):
-    """ Replace the call instruction with the function implementation """
+def inline_function(call, function: ir.SubRoutine):
+    """ Replace the call instruction with the function implementation
+
+    Args:
+        call: the :class:`ppci.ir.FunctionCall` or
+            :class:`ppci.ir.ProcedureCall` to replace.
+        function: the subroutine which is called.
+    """
+    assert isinstance(call, (ir.FunctionCall, ir.ProcedureCall))
+    assert call.callee is function
     dst_function = call.function
-    for block in function:
-        block_copy = block.copy
+    assert dst_function is not function
+
+    # Split the block at the call, the call starts the second block:
+    # Block names are used as labels, so prefix them with the function:
+    rest_name = "{}_after_{}".format(dst_function.name, function.name)
+    block, rest = split_block(call.block, pos=call.position, newname=rest_name)
+
+    # Parameters are replaced by the argument values:
+    value_map = dict(zip(function.arguments, call.arguments))
+
+    # Only reachable blocks are copied, in an order where definitions
+    # precede their uses:
+    src_blocks = _dominator_order(function)
+    block_map = {}
+    for src_block in src_blocks:
+        block_copy = ir.Block(
+            "{}_{}".format(dst_function.name, src_block.name)
+        )
         dst_function.add_block(block_copy)
+        block_map[src_block] = block_copy
+
+    return_values = []
+    phis = []
+    for src_block in src_blocks:
+        block_copy = block_map[src_block]
+        for instruction in src_block:
+            if isinstance(instruction, (ir.Return, ir.Exit)):
+                if isinstance(instruction, ir.Return):
+                    result = instruction.result
+                    return_values.append(
+                        (block_copy, value_map.get(result, result))
+                    )
+                block_copy.add_instruction(ir.Jump(rest))
+            else:
+                new_instruction = _copy_instruction(
+                    instruction, value_map, block_map
+                )
+                block_copy.add_instruction(new_instruction)
+                if isinstance(instruction, ir.Value):
+                    value_map[instruction] = new_instruction
+                if isinstance(instruction, ir.Phi):
+                    phis.append((instruction, new_instruction))
+
+    # Fill phi inputs, now all values are known:
+    for phi, new_phi in phis:
+        for src_block, value in phi.inputs.items():
+            if src_block in block_map:
+                new_phi.set_incoming(
+                    block_map[src_block], value_map.get(value, value)
+                )
+
+    # Enter the inlined code instead of the rest of the block:
+    block.change_target(rest, block_map[function.entry])
+
+    # Replace the result of the call:
+    if isinstance(call, ir.FunctionCall):
+        if len(return_values) == 1:
+            result = return_values[0][1]
+        else:
+            result = ir.Phi("{}_result".format(function.name), call.ty)
+            rest.insert_instruction(result)
+            for return_block, value in return_values:
+                result.set_incoming(return_block, value)
+        call.replace_by(result)
+
+    call.remove_from_block()
+    call.delete()
+
+
+def _dominator_order(function):
+    """ Get the blocks of a function in depth first order from the entry.
+
+    Each block is preceded by all blocks which dominate it.
+    """
+    visited = set()
+    order = []
+    worklist = [function.entry]
+    while worklist:
+        block = worklist.pop()
+        if block in visited:
+            continue
+        visited.add(block)
+        order.append(block)
+        worklist.extend(reversed(block.successors))
+    return order
+
+
+def _copy_instruction(instruction, value_map, block_map):
+    """ Create a copy of an instruction using the mapped values """
+
+    def val(value):
+        return value_map.get(value, value)
+
+    if isinstance(instruction, ir.Const):
+        return ir.Const(instruction.value, instruction.name, instruction.ty)
+    elif isinstance(instruction, ir.LiteralData):
+        return ir.LiteralData(instruction.data, instruction.name)
+    elif isinstance(instruction, ir.Undefined):
+        return ir.Undefined(instruction.name, instruction.ty)
+    elif isinstance(instruction, ir.Alloc):
+        return ir.Alloc(
+            instruction.name, instruction.amount, instruction.alignment
+        )
+    elif isinstance(instruction, ir.AddressOf):
+        return ir.AddressOf(val(instruction.src), instruction.name)
+    elif isinstance(instruction, ir.Cast):
+        return ir.Cast(val(instruction.src), instruction.name, instruction.ty)
+    elif isinstance(instruction, ir.Binop):
+        return ir.Binop(
+            val(instruction.a),
+            instruction.operation,
+            val(instruction.b),
+            instruction.name,
+            instruction.ty,
+        )
+    elif isinstance(instruction, ir.Unop):
+        return ir.Unop(
+            instruction.operation,
+            val(instruction.a),
+            instruction.name,
+            instruction.ty,
+        )
+    elif isinstance(instruction, ir.Load):
+        return ir.Load(
+            val(instruction.address),
+            instruction.name,
+            instruction.ty,
+            volatile=instruction.volatile,
+        )
+    elif isinstance(instruction, ir.Store):
+        return ir.Store(
+            val(instruction.value),
+            val(instruction.address),
+            volatile=instruction.volatile,
+        )
+    elif isinstance(instruction, ir.FunctionCall):
+        return ir.FunctionCall(
+            val(instruction.callee),
+            [val(a) for a in instruction.arguments],
+            instruction.name,
+            instruction.ty,
+        )
+    elif isinstance(instruction, ir.ProcedureCall):
+        return ir.ProcedureCall(
+            val(instruction.callee), [val(a) for a in instruction.arguments]
+        )
+    elif isinstance(instruction, ir.CopyBlob):
+        return ir.CopyBlob(
+            val(instruction.dst), val(instruction.src), instruction.amount
+        )
+    elif isinstance(instruction, ir.Phi):
+        # Inputs are filled in later:
+        return ir.Phi(instruction.name, instruction.ty)
+    elif isinstance(instruction, ir.Jump):
+        return ir.Jump(block_map[instruction.target])
+    elif isinstance(instruction, ir.CJump):
+        return ir.CJump(
+            val(instruction.a),
+            instruction.cond,
+            val(instruction.b),
+            block_map[instruction.lab_yes],
+            block_map[instruction.lab_no],
+        )
+    else:  # pragma: no cover
+        raise NotImplementedError(str(instruction))
+
+
+# Instructions which can be copied by _copy_instruction:
+_COPYABLE = (
+    ir.Const,
+    ir.LiteralData,
+    ir.Undefined,
+    ir.Alloc,
+    ir.AddressOf,
+    ir.Cast,
+    ir.Binop,
+    ir.Unop,
+    ir.Load,
+    ir.Store,
+    ir.FunctionCall,
+    ir.ProcedureCall,
+    ir.CopyBlob,
+    ir.Phi,
+    ir.Jump,
+    ir.CJump,
+    ir.Return,
+    ir.Exit,
+)
+
+
+def can_inline(function):
+    """ Test if a function can be inlined at all. """
+    if not isinstance(function, ir.SubRoutine) or function.entry is None:
+        return False
+
+    # An entry with predecessors would require phi inputs from the caller:
+    if function.entry.predecessors:
+        return False
+
+    has_return = False
+    for instruction in function.get_instructions():
+        if not isinstance(instruction, _COPYABLE):
+            return False
+        if isinstance(instruction, (ir.Return, ir.Exit)):
+            has_return = True
+    return has_return
+
+
+class InlinePass(ModulePass):
+    """ Replace calls to small functions by the function body.
+
+    The call graph is processed bottom-up, so that callees are inlined
+    into their callers before those are considered for inlining.
+    Recursive functions are never inlined. Local functions which are
+    no longer referenced after inlining are removed from the module.
+
+    Args:
+        max_size: the maximum amount of instructions of a leaf function
+            to be inlined. Local functions which are removed after
+            inlining get twice this budget, and may call other functions.
+        max_caller_size: stop inlining into a function once it
+            has this amount of instructions.
+        optimize_size: only inline when the code does not grow. That
+            is when the call sequence is larger than the function
+            body, or when the function is removed after inlining.
+    """
+
+    def __init__(
+        self, max_size=30, max_caller_size=1000, optimize_size=False
+    ):
+        super().__init__()
+        self.max_size = max_size
+        self.max_caller_size = max_caller_size
+        self.optimize_size = optimize_size
+
+    def run(self, ir_module):
+        """ Inline calls in the module, return the modified functions """
+        call_graph = mod_to_call_graph(ir_module)
+        referenced = _referenced_names(ir_module)
+
+        modified = set()
+        inlined = []
+        for component in strongly_connected_components(call_graph):
+            routines = {node.routine for node in component}
+            for node in component:
+                function = node.routine
+                if not isinstance(function, ir.SubRoutine):
+                    continue
+
+                for call in function.get_out_calls():
+                    callee = call.callee
+                    if callee in routines:
+                        # Recursive call
+                        continue
+
+                    if self.should_inline(function, callee, call, referenced):
+                        self.logger.debug(
+                            "Inlining %s into %s", callee.name, function.name
+                        )
+                        inline_function(call, callee)
+                        modified.add(function)
+                        inlined.append(callee)
+
+        if inlined:
+            self.logger.debug("Inlined %s calls", len(inlined))
+
+        # Remove local functions which are no longer called:
+        for callee in inlined:
+            if callee.module is ir_module and _is_removable(
+                callee, referenced, 0
+            ):
+                self.logger.debug("Removing inlined %s", callee.name)
+                _remove_function(callee)
+        return [f for f in ir_module.functions if f in modified]
+
+    def should_inline(self, caller, callee, call, referenced):
+        """ Cost model to decide on inlining a call """
+        if not isinstance(callee, ir.SubRoutine):
+            return False
+
+        if callee.module is not caller.module:
+            return False
+
+        if caller.num_instructions() >= self.max_caller_size:
+            return False
+
+        if not can_inline(callee):
+            return False
+
+        # The callee is removed when this call is its only reference:
+        removable = _is_removable(callee, referenced, 1)
+        size = callee.num_instructions()
+
+        # Arguments are moved into place, and the result is moved out:
+        call_size = 1 + len(call.arguments)
+        if isinstance(call, ir.FunctionCall):
+            call_size += 1
+
+        if self.optimize_size:
+            return removable or size <= call_size
+
+        if removable:
+            return size <= 2 * self.max_size
+
+        # A copy of the callee remains, so only inline when this saves
+        # a call which is a large part of the work done:
+        return size <= call_size or (
+            callee.is_leaf() and size <= self.max_size
+        )
+
+
+def _referenced_names(ir_module):
+    """ Get the names referenced by variable initializers """
+    names = set()
+    for variable in ir_module.variables:
+        if variable.value:
+            for part in variable.value:
+                if isinstance(part, tuple):
+                    names.add(part[1])
+    return names
+
+
+def _is_removable(function, referenced, uses):
+    """ Test if a function can be removed once its uses are inlined """
+    return (
+        function.binding == ir.Binding.LOCAL
+        and len(function.used_by) == uses
+        and function.name not in referenced
+    )
+
 
-    for value, parameter in zip(call.arguments, function.arguments):
-        block
+def _remove_function(function):
+    """ Remove a function and the uses of its instructions """
+    for instruction in function.get_instructions():
+        instruction.delete()
+    function.module.remove_function(function)
@@ -0,0 +1,370 @@
+""" Loop optimizations.
+
+Loop invariant code motion moves computations which give the same
+result in every iteration of a loop into the preheader of the loop.
+
+Strength reduction replaces multiplications of an induction variable
+by additions. For example:
+
+.. code::
+
+    i = phi(0, i2)
+    offset = i * 4
+    address = base + offset
+    x = load address
+    i2 = i + 1
+
+Is transformed into:
+
+.. code::
+
+    i = phi(0, i2)
+    address = phi(base, address2)
+    x = load address
+    i2 = i + 1
+    address2 = address + 4
+
+"""
+
+from .transform import FunctionPass
+from .constantfolding import correct
+from .. import ir
+
+
+class NaturalLoop:
+    """ A loop with a single header, which dominates all loop blocks """
+
+    def __init__(self, header):
+        self.header = header
+        self.blocks = {header}
+        self.latches = []
+
+    def __repr__(self):
+        return "Loop(header={}, blocks={})".format(
+            self.header.name, len(self.blocks)
+        )
+
+    def add_latch(self, latch):
+        """ Add the source of a back edge, and all blocks leading to it """
+        self.latches.append(latch)
+        worklist = [latch]
+        while worklist:
+            block = worklist.pop()
+            if block not in self.blocks:
+                self.blocks.add(block)
+                worklist.extend(block.predecessors)
+
+    def blocks_in_order(self):
+        """ Get the blocks of the loop, in the order of the function """
+        function = self.header.function
+        return [block for block in function.blocks if block in self.blocks]
+
+    def is_invariant(self, value):
+        """ Test if a value is computed outside the loop """
+        if isinstance(value, ir.Instruction) and value.block is not None:
+            return value.block not in self.blocks
+        else:
+            # Parameters and global values:
+            return True
+
+
+def find_loops(function, cfg_info):
+    """ Find the natural loops in a function, innermost loops first """
+    loops = {}
+    for block in function:
+        node = cfg_info.get_node(block)
+        for successor in block.successors:
+            if cfg_info.cfg.dominates(cfg_info.get_node(successor), node):
+                # Back edge!
+                if successor not in loops:
+                    loops[successor] = NaturalLoop(successor)
+                loops[successor].add_latch(block)
+
+    # Sort on size, and on function order to be deterministic:
+    order = {block: index for index, block in enumerate(function.blocks)}
+    return sorted(
+        loops.values(), key=lambda l: (len(l.blocks), order[l.header])
+    )
+
+
+class LoopInvariantCodeMotionPass(FunctionPass):
+    """ Hoist loop invariant computations and reduce induction variables.
+
+    Pure computations whose operands are defined outside the loop are
+    moved into the loop preheader. A preheader is created when the loop
+    header has no single predecessor outside the loop.
+
+    Multiplications of an induction variable by a constant, and
+    addresses formed by adding such a product to an invariant base are
+    replaced by new induction variables which are incremented by
+    a constant amount each iteration.
+    """
+
+    hoistable_ops = (
+        "+", "-", "*", "&", "|", "^", "<<", ">>", "rol", "ror"
+    )
+
+    def on_function(self, function):
+        cfg_info = self.get_cfg_info(function)
+        loops = find_loops(function, cfg_info)
+        modified = False
+        for loop in loops:
+            # A loop at the entry has no place for a preheader:
+            if loop.header is function.entry:
+                continue
+
+            invariants = self.find_invariants(loop)
+            ivs = self.find_induction_variables(loop)
+            if not (invariants or self.has_reductions(loop, ivs)):
+                continue
+
+            preheader = self.get_preheader(function, loop)
+            for other in loops:
+                if other is not loop and loop.header in other.blocks:
+                    other.blocks.add(preheader)
+
+            for instruction in invariants:
+                preheader.move_instruction(
+                    instruction, preheader.last_instruction
+                )
+            if invariants:
+                self.logger.debug(
+                    "Hoisted %s instructions out of %s",
+                    len(invariants),
+                    loop,
+                )
+
+            self.reduce_strength(loop, preheader, ivs)
+            modified = True
+        return modified
+
+    def is_hoistable(self, instruction):
+        """ Test if an instruction may be executed speculatively """
+        if isinstance(instruction, ir.Binop):
+            # Division can trap, so it must stay behind its condition:
+            return instruction.operation in self.hoistable_ops
+        else:
+            return isinstance(
+                instruction, (ir.Const, ir.AddressOf, ir.Cast, ir.Unop)
+            )
+
+    def find_invariants(self, loop):
+        """ Find the instructions to hoist, in a valid order """
+        invariants = []
+        hoisted = set()
+
+        def is_invariant(value):
+            return value in hoisted or loop.is_invariant(value)
+
+        change = True
+        while change:
+            change = False
+            for block in loop.blocks_in_order():
+                for instruction in block:
+                    if instruction in hoisted:
+                        continue
+                    if self.is_hoistable(instruction) and all(
+                        is_invariant(v) for v in instruction.uses
+                    ):
+                        hoisted.add(instruction)
+                        invariants.append(instruction)
+                        change = True
+        return invariants
+
+    def get_preheader(self, function, loop):
+        """ Get or create the single block entering the loop header """
+        header = loop.header
+        outside = [p for p in header.predecessors if p not in loop.blocks]
+        if len(outside) == 1 and isinstance(
+            outside[0].last_instruction, ir.Jump
+        ):
+            return outside[0]
+
+        preheader = ir.Block("{}_preheader".format(header.name))
+        function.add_block(preheader)
+
+        # Merge the incoming values from outside the loop:
+        for phi in header.phis:
+            if len(outside) == 1:
+                value = phi.get_value(outside[0])
+            else:
+                value = ir.Phi("{}_pre".format(phi.name), phi.ty)
+                preheader.add_instruction(value)
+                for pred in outside:
+                    value.set_incoming(pred, phi.get_value(pred))
+            for pred in outside:
+                phi.del_incoming(pred)
+            phi.set_incoming(preheader, value)
+
+        preheader.add_instruction(ir.Jump(header))
+        for pred in outside:
+            pred.change_target(header, preheader)
+        self.logger.debug("Created %s", preheader)
+        return preheader
+
+    def find_induction_variables(self, loop):
+        """ Find phis in the header which are incremented by a constant.
+
+        Returns a map from phi to the step size.
+        """
+        ivs = {}
+        if len(loop.latches) != 1:
+            return ivs
+        latch = loop.latches[0]
+        for phi in loop.header.phis:
+            if not (phi.ty.is_integer or isinstance(phi.ty, ir.PointerTyp)):
+                continue
+            increment = phi.get_value(latch)
+            step = self.get_step(phi, increment)
+            if step is not None:
+                ivs[phi] = step
+        return ivs
+
+    @staticmethod
+    def get_step(phi, increment):
+        """ Get the constant step if increment is phi + constant """
+        if isinstance(increment, ir.Binop) and increment.operation == "+":
+            if increment.a is phi and isinstance(increment.b, ir.Const):
+                return increment.b.value
+            elif increment.b is phi and isinstance(increment.a, ir.Const):
+                return increment.a.value
+
+    def get_scaled_iv(self, value, ivs):
+        """ Check if value is an induction variable multiplied by a const.
+
+        Returns the induction variable, the optional cast and the factor.
+        """
+        if not (isinstance(value, ir.Binop) and value.operation == "*"):
+            return None
+        for x, k in ((value.a, value.b), (value.b, value.a)):
+            if not isinstance(k, ir.Const) or not isinstance(k.value, int):
+                continue
+            if x in ivs:
+                return x, None, k.value
+            elif (
+                isinstance(x, ir.Cast)
+                and x.src in ivs
+                and self.is_linear_cast(x)
+            ):
+                return x.src, x, k.value
+
+    @staticmethod
+    def is_linear_cast(cast):
+        """ Test if cast(a + b) == cast(a) + cast(b) for the cast.
+
+        Signed overflow is undefined, so signed values can be extended.
+        """
+        src_ty, ty = cast.src.ty, cast.ty
+        if not src_ty.is_integer:
+            return False
+        elif src_ty.is_signed:
+            return ty.is_integer or isinstance(ty, ir.PointerTyp)
+        else:
+            return ty.is_integer and ty.bits == src_ty.bits
+
+    def has_reductions(self, loop, ivs):
+        return any(
+            self.get_scaled_iv(instruction, ivs)
+            for block in loop.blocks
+            for instruction in block
+        )
+
+    def reduce_strength(self, loop, preheader, ivs):
+        """ Replace scaled induction variables by new induction variables
+        """
+        if not ivs:
+            return
+        latch = loop.latches[0]
+
+        # Replace iv * k by new induction variables:
+        derived = {}
+        for block in loop.blocks_in_order():
+            for instruction in list(block):
+                scaled = self.get_scaled_iv(instruction, ivs)
+                if scaled is None:
+                    continue
+                phi, cast, factor = scaled
+                init = phi.get_value(preheader)
+                if cast is not None:
+                    init = self.emit(
+                        preheader, ir.Cast(init, "sr_cast", cast.ty)
+                    )
+                ty = instruction.ty
+                step = ivs[phi]
+                k = self.emit(preheader, ir.Const(factor, "sr_factor", ty))
+                init = self.emit(
+                    preheader, ir.Binop(init, "*", k, "sr_init", ty)
+                )
+                step = step * factor
+                if ty.is_integer:
+                    step = correct(step, ty)
+                new_phi = self.add_iv(loop, preheader, latch, init, step, ty)
+                derived[new_phi] = step
+                instruction.replace_by(new_phi)
+                instruction.remove_from_block()
+
+        # Replace addresses base + iv by induction variables:
+        for new_phi, step in derived.items():
+            for user in list(new_phi.used_by):
+                if not (
+                    isinstance(user, ir.Binop)
+                    and user.operation == "+"
+                    and isinstance(user.ty, ir.PointerTyp)
+                    and user.block in loop.blocks
+                ):
+                    continue
+                base = user.b if user.a is new_phi else user.a
+                if base is new_phi or not loop.is_invariant(base):
+                    continue
+                if not any(
+                    isinstance(u, (ir.Load, ir.Store)) and u.address is user
+                    for u in user.used_by
+                ):
+                    continue
+                init = self.emit(
+                    preheader,
+                    ir.Binop(
+                        base,
+                        "+",
+                        new_phi.get_value(preheader),
+                        "sr_base",
+                        user.ty,
+                    ),
+                )
+                address_phi = self.add_iv(
+                    loop, preheader, latch, init, step, user.ty
+                )
+                user.replace_by(address_phi)
+                user.remove_from_block()
+
+            # The offset is dead when only used by its own increment:
+            increment = new_phi.get_value(latch)
+            if list(new_phi.used_by) == [increment] and list(
+                increment.used_by
+            ) == [new_phi]:
+                new_phi.remove_from_block()
+                increment.remove_from_block()
+
+        if derived:
+            self.logger.debug("Reduced %s induction variables", len(derived))
+
+    def add_iv(self, loop, preheader, latch, init, step, ty):
+        """ Create an induction variable starting at init """
+        phi = ir.Phi("sr_iv", ty)
+        loop.header.insert_instruction(phi)
+        step = self.emit(preheader, ir.Const(step, "sr_step", ty))
+        increment = ir.Binop(phi, "+", step, "sr_next", ty)
+        latch.insert_instruction(
+            increment, before_instruction=latch.last_instruction
+        )
+        phi.set_incoming(preheader, init)
+        phi.set_incoming(latch, increment)
+        return phi
+
+    @staticmethod
+    def emit(block, instruction):
+        """ Add an instruction before the terminator of block """
+        block.insert_instruction(
+            instruction, before_instruction=block.last_instruction
+        )
+        return instruction
@@ -19,15 +19,14 @@ class LoadAfterStorePass(BlockPass):
             c = a + 2
     """
 
+    preserves_cfg = True
+
     def find_store_backwards(
         self, i, ty, stop_on=(ir.FunctionCall, ir.ProcedureCall, ir.Store)
     ):
         """ Go back from this instruction to beginning """
-        block = i.block
-        instructions = block.instructions
-        pos = instructions.index(i)
-        for x in range(pos - 1, 0, -1):
-            i2 = instructions[x]
+        i2 = i.previous_instruction
+        while i2 is not None:
             if isinstance(i2, ir.Store) and ty is i2.value.ty:
                 # Got first store!
                 if i2.address is i.address:
@@ -37,11 +36,14 @@ class LoadAfterStorePass(BlockPass):
             elif isinstance(i2, stop_on):
                 # A call can change memory, store not found..
                 return None
+            i2 = i2.previous_instruction
         return None
 
     def on_block(self, block):
-        self.replace_load_after_store(block)
-        self.remove_redundant_stores(block)
+        modified = self.replace_load_after_store(block)
+        if self.remove_redundant_stores(block):
+            modified = True
+        return modified
 
     def replace_load_after_store(self, block):
         """ Replace load after store with the value of the store """
@@ -54,6 +56,9 @@ class LoadAfterStorePass(BlockPass):
         # Replace loads after store of same address by the stored value:
         count = 0
         for load in load_instructions:
+            if not load.is_used:
+                continue
+
             # Find store instruction preceeding this load:
             store = self.find_store_backwards(load, load.ty)
             if store is not None:
@@ -65,6 +70,7 @@ class LoadAfterStorePass(BlockPass):
                 # reload of instructions required?
         if count > 0:
             self.logger.debug("Replaced %s loads after store", count)
+        return count > 0
 
     def remove_redundant_stores(self, block):
         """ From two stores to the same address remove the previous one """
@@ -83,6 +89,8 @@ class LoadAfterStorePass(BlockPass):
             )
             if store_prev is not None and not store_prev.volatile:
                 store_prev.remove_from_block()
+                count += 1
 
         if count > 0:
             self.logger.debug("Replaced %s redundant stores", count)
+        return count > 0
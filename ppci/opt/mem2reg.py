@@ -6,7 +6,6 @@ also be stored into a register, to improve performance.
 
 from .transform import FunctionPass
 from .. import ir
-from ..graph.domtree import CfgInfo
 
 
 def is_alloc_promotable(alloc_inst: ir.Alloc):
@@ -61,6 +60,8 @@ class Mem2RegPromotor(FunctionPass):
     """ Tries to find alloc instructions only used by load and store
     instructions and replace them with values and phi nodes """
 
+    preserves_cfg = True
+
     def place_phi_nodes(self, stores, phi_ty, name, cfg_info):
         """
          Step 1: place phi-functions where required:
@@ -219,9 +220,14 @@ class Mem2RegPromotor(FunctionPass):
         alloc.remove_from_block()
 
     def on_function(self, function):
-        cfg_info = CfgInfo(function)
+        cfg_info = None
+        count = 0
         for block in function.blocks:
             allocs = [i for i in block if isinstance(i, ir.Alloc)]
             for alloc in allocs:
                 if is_alloc_promotable(alloc):
+                    if cfg_info is None:
+                        cfg_info = self.get_cfg_info(function)
                     self.promote(alloc, cfg_info)
+                    count += 1
+        return count > 0
@@ -0,0 +1,160 @@
+""" Run a sequence of optimization passes until nothing changes anymore.
+
+The pass manager keeps track of which functions were modified by
+a pass. Only those functions are optimized again in a next round.
+This continues until a fixed point is reached, or until the maximum
+amount of rounds is reached.
+
+Analysis results, such as the control flow graph and dominator info,
+are cached per function, and invalidated when a pass changes the
+control flow of a function. The results remain valid after running,
+until the module is modified by something else.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from .. import ir
+from ..graph.domtree import CfgInfo
+from ..utils.collections import OrderedSet
+from .transform import FunctionPass, is_modified
+
+
+class AnalysisCache:
+    """ Cache of analysis results per function. """
+
+    def __init__(self):
+        self._cfg_infos = {}
+
+    def get_cfg_info(self, function):
+        """ Get (possibly cached) control flow info of a function """
+        if function not in self._cfg_infos:
+            self._cfg_infos[function] = CfgInfo(function)
+        return self._cfg_infos[function]
+
+    def invalidate(self, function):
+        """ Forget all analysis results of the given function """
+        self._cfg_infos.pop(function, None)
+
+    def clear(self):
+        """ Forget all analysis results """
+        self._cfg_infos.clear()
+
+
+class PassManager:
+    """ Run optimization passes until a fixed point is reached.
+
+    Args:
+        passes: a list of :class:`ppci.opt.transform.ModulePass` instances.
+        max_iterations: the maximum amount of rounds to run the passes.
+
+    After running, the `timings` attribute contains the total time in
+    seconds spent in each pass, and `run_counts` the amount of functions
+    each pass was run on.
+    """
+
+    logger = logging.getLogger("passmanager")
+
+    def __init__(self, passes, max_iterations=10):
+        self.passes = list(passes)
+        self.max_iterations = max_iterations
+        self.analyses = AnalysisCache()
+        self.timings = defaultdict(float)
+        self.run_counts = defaultdict(int)
+
+    def add_pass(self, opt_pass):
+        """ Append a pass to the sequence of passes """
+        self.passes.append(opt_pass)
+
+    def run(self, ir_module: ir.Module):
+        """ Run all passes over the module until nothing changes. """
+        assert isinstance(ir_module, ir.Module)
+        worklist = OrderedSet(ir_module.functions)
+        rounds = 0
+        while worklist and rounds < self.max_iterations:
+            rounds += 1
+            self.logger.debug(
+                "Round %s with %s functions", rounds, len(worklist)
+            )
+            dirty = OrderedSet()
+            for opt_pass in self.passes:
+                # Module passes may remove functions:
+                functions = [f for f in worklist if f.module is ir_module]
+                if isinstance(opt_pass, FunctionPass):
+                    modified = self._run_function_pass(
+                        opt_pass, ir_module, functions
+                    )
+                else:
+                    modified = self._run_module_pass(opt_pass, ir_module)
+                    worklist |= modified
+                dirty |= modified
+            worklist = dirty
+
+        if worklist:
+            self.logger.debug(
+                "Stopped after %s rounds, %s functions still modified",
+                rounds,
+                len(worklist),
+            )
+        else:
+            self.logger.debug("Fixed point reached after %s rounds", rounds)
+
+    def _run_function_pass(self, opt_pass, ir_module, functions):
+        """ Run a function pass over the given functions.
+
+        Returns the functions which were modified.
+        """
+        modified = OrderedSet()
+        name = repr(opt_pass)
+        opt_pass.prepare()
+        opt_pass.debug_db = ir_module.debug_db
+        opt_pass.analyses = self.analyses
+        for function in functions:
+            start = time.perf_counter()
+            result = opt_pass.on_function(function)
+            self.timings[name] += time.perf_counter() - start
+            self.run_counts[name] += 1
+            if is_modified(result):
+                modified.add(function)
+                if not opt_pass.preserves_cfg:
+                    self.analyses.invalidate(function)
+        opt_pass.analyses = None
+        opt_pass.debug_db = None
+        return modified
+
+    def _run_module_pass(self, opt_pass, ir_module):
+        """ Run a pass over the whole module.
+
+        The pass may return the functions it modified. Any other
+        modification result marks all functions as modified.
+        """
+        name = repr(opt_pass)
+        start = time.perf_counter()
+        result = opt_pass.run(ir_module)
+        self.timings[name] += time.perf_counter() - start
+        self.run_counts[name] += 1
+
+        if isinstance(result, (set, list, tuple, OrderedSet)):
+            modified = OrderedSet(
+                f for f in result if f.module is ir_module
+            )
+        elif is_modified(result):
+            modified = OrderedSet(ir_module.functions)
+        else:
+            modified = OrderedSet()
+
+        for function in modified:
+            self.analyses.invalidate(function)
+        return modified
+
+    def report(self, reporter):
+        """ Write pass timings to the given reporter """
+        reporter.message("Optimization pass timings:")
+        for name, seconds in sorted(
+            self.timings.items(), key=lambda item: -item[1]
+        ):
+            reporter.message(
+                "{}: {:.3f} ms over {} runs".format(
+                    name, seconds * 1000, self.run_counts[name]
+                )
+            )
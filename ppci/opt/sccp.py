@@ -0,0 +1,291 @@
+""" Sparse conditional constant propagation.
+
+Propagate constants through the SSA graph of a function, while only
+taking into account the control flow edges which can be executed.
+
+Algorithm from Wegman and Zadeck, "Constant propagation with
+conditional branches".
+
+Each value has a lattice value, which is one of:
+
+- top: not yet known, possibly constant.
+- a constant value.
+- bottom: not a constant.
+"""
+
+import operator
+from .transform import FunctionPass
+from .constantfolding import cast, correct
+from .. import ir
+
+# Lattice values other than constants:
+TOP = None
+BOTTOM = object()
+
+
+def _div(a, b):
+    """ Division rounding towards zero """
+    quotient = abs(a) // abs(b)
+    return -quotient if (a < 0) != (b < 0) else quotient
+
+
+def _mod(a, b):
+    """ Remainder with the sign of the dividend """
+    return a - b * _div(a, b)
+
+
+class SparseConditionalConstantPropagationPass(FunctionPass):
+    """ Propagate constants through phi nodes across the whole function.
+
+    Conditional jumps with a known outcome are replaced by jumps, and
+    the blocks which are no longer reachable are deleted. Merging the
+    remaining blocks is left to the :class:`ppci.opt.CleanPass`.
+    """
+
+    binops = {
+        "+": operator.add,
+        "-": operator.sub,
+        "*": operator.mul,
+        "&": operator.and_,
+        "|": operator.or_,
+        "^": operator.xor,
+    }
+
+    comparisons = {
+        "==": operator.eq,
+        "!=": operator.ne,
+        "<": operator.lt,
+        ">": operator.gt,
+        "<=": operator.le,
+        ">=": operator.ge,
+    }
+
+    def on_function(self, function):
+        self.values = {}
+        self.executable_edges = set()
+        self.executable_blocks = set()
+        self.flow_worklist = [(None, function.entry)]
+        self.ssa_worklist = []
+
+        while self.flow_worklist or self.ssa_worklist:
+            while self.flow_worklist:
+                edge = self.flow_worklist.pop()
+                if edge in self.executable_edges:
+                    continue
+                self.executable_edges.add(edge)
+                block = edge[1]
+                if block in self.executable_blocks:
+                    # Only phi nodes can change by a new incoming edge:
+                    for phi in block.phis:
+                        self.visit(phi)
+                else:
+                    self.executable_blocks.add(block)
+                    for instruction in block:
+                        self.visit(instruction)
+
+            while self.ssa_worklist:
+                instruction = self.ssa_worklist.pop()
+                if instruction.block in self.executable_blocks:
+                    self.visit(instruction)
+
+        modified = self.rewrite(function)
+        self.values = None
+        self.executable_edges = None
+        self.executable_blocks = None
+        return modified
+
+    def get_lattice(self, value):
+        """ Get the current lattice value of a value """
+        if isinstance(value, ir.Const):
+            return self.const_value(value)
+        elif isinstance(value, (ir.Parameter, ir.GlobalValue)):
+            return BOTTOM
+        else:
+            return self.values.get(value, TOP)
+
+    @staticmethod
+    def const_value(const):
+        """ Lattice value of a constant, only integers are propagated """
+        if (
+            (const.ty.is_integer or isinstance(const.ty, ir.PointerTyp))
+            and isinstance(const.value, int)
+        ):
+            return const.value
+        else:
+            return BOTTOM
+
+    def set_lattice(self, value, lattice):
+        """ Lower the lattice value of value, and revisit its users """
+        old = self.values.get(value, TOP)
+        if lattice is old or (isinstance(old, int) and old == lattice):
+            return
+        self.values[value] = lattice
+        self.ssa_worklist.extend(value.used_by)
+
+    def visit(self, instruction):
+        """ Evaluate a single instruction """
+        if isinstance(instruction, ir.Jump):
+            self.add_edge(instruction.block, instruction.target)
+        elif isinstance(instruction, ir.CJump):
+            self.visit_cjump(instruction)
+        elif isinstance(instruction, ir.Value):
+            if self.get_lattice(instruction) is BOTTOM:
+                return
+            self.set_lattice(instruction, self.evaluate(instruction))
+
+    def add_edge(self, block, target):
+        if (block, target) not in self.executable_edges:
+            self.flow_worklist.append((block, target))
+
+    def visit_cjump(self, instruction):
+        a = self.get_lattice(instruction.a)
+        b = self.get_lattice(instruction.b)
+        block = instruction.block
+        if a is TOP or b is TOP:
+            return
+        elif a is BOTTOM or b is BOTTOM:
+            self.add_edge(block, instruction.lab_yes)
+            self.add_edge(block, instruction.lab_no)
+        elif self.comparisons[instruction.cond](a, b):
+            self.add_edge(block, instruction.lab_yes)
+        else:
+            self.add_edge(block, instruction.lab_no)
+
+    def evaluate(self, instruction):
+        """ Determine the lattice value of an instruction """
+        if isinstance(instruction, ir.Const):
+            return self.const_value(instruction)
+        elif isinstance(instruction, ir.Phi):
+            return self.evaluate_phi(instruction)
+        elif isinstance(instruction, ir.Binop):
+            if not instruction.ty.is_integer:
+                return BOTTOM
+            a = self.get_lattice(instruction.a)
+            b = self.get_lattice(instruction.b)
+            if a is BOTTOM or b is BOTTOM:
+                return BOTTOM
+            elif a is TOP or b is TOP:
+                return TOP
+            else:
+                return self.fold_binop(
+                    instruction.operation, a, b, instruction.ty
+                )
+        elif isinstance(instruction, ir.Unop):
+            if not instruction.ty.is_integer:
+                return BOTTOM
+            a = self.get_lattice(instruction.a)
+            if a is BOTTOM or a is TOP:
+                return a
+            elif instruction.operation == "-":
+                return correct(-a, instruction.ty)
+            else:
+                assert instruction.operation == "~"
+                return correct(~a, instruction.ty)
+        elif isinstance(instruction, ir.Cast):
+            if not (
+                instruction.ty.is_integer
+                or isinstance(instruction.ty, ir.PointerTyp)
+            ):
+                return BOTTOM
+            src = self.get_lattice(instruction.src)
+            if src is BOTTOM or src is TOP:
+                return src
+            else:
+                return cast(src, instruction.ty)
+        else:
+            return BOTTOM
+
+    def evaluate_phi(self, phi):
+        """ Meet the values of all executable incoming edges """
+        result = TOP
+        for block, value in phi.inputs.items():
+            if (block, phi.block) not in self.executable_edges:
+                continue
+            lattice = self.get_lattice(value)
+            if lattice is TOP:
+                continue
+            elif lattice is BOTTOM:
+                return BOTTOM
+            elif result is TOP:
+                result = lattice
+            elif result != lattice:
+                return BOTTOM
+        return result
+
+    def fold_binop(self, operation, a, b, ty):
+        """ Calculate a binary operation on constants """
+        if operation in self.binops:
+            value = self.binops[operation](a, b)
+        elif operation in ("<<", ">>"):
+            if not 0 <= b < ty.bits:
+                return BOTTOM
+            value = a << b if operation == "<<" else a >> b
+        elif operation in ("/", "%"):
+            if b == 0:
+                return BOTTOM
+            value = _div(a, b) if operation == "/" else _mod(a, b)
+        else:
+            return BOTTOM
+        return correct(value, ty)
+
+    def rewrite(self, function):
+        """ Replace constant values and decided jumps """
+        count = 0
+        pruned = False
+        for block in function:
+            if block not in self.executable_blocks:
+                continue
+
+            for instruction in list(block):
+                if isinstance(instruction, ir.Const):
+                    continue
+                if not (
+                    isinstance(instruction, ir.Value) and instruction.is_used
+                ):
+                    continue
+                lattice = self.values.get(instruction, TOP)
+                if lattice is TOP or lattice is BOTTOM:
+                    continue
+
+                cnst = ir.Const(lattice, "sccp_cnst", instruction.ty)
+                if isinstance(instruction, ir.Phi):
+                    position = block[len(block.phis)]
+                else:
+                    position = instruction
+                block.insert_instruction(cnst, before_instruction=position)
+                instruction.replace_by(cnst)
+                count += 1
+
+            if isinstance(block.last_instruction, ir.CJump):
+                if self.rewrite_cjump(block.last_instruction):
+                    count += 1
+                    pruned = True
+
+        if pruned:
+            function.delete_unreachable()
+
+        if count > 0:
+            self.logger.debug("Propagated %i constants", count)
+        return count > 0
+
+    def rewrite_cjump(self, instruction):
+        """ Replace a conditional jump by a jump if only one edge is taken """
+        block = instruction.block
+        yes_taken = (block, instruction.lab_yes) in self.executable_edges
+        no_taken = (block, instruction.lab_no) in self.executable_edges
+        if yes_taken == no_taken:
+            return False
+
+        if yes_taken:
+            target, other = instruction.lab_yes, instruction.lab_no
+        else:
+            target, other = instruction.lab_no, instruction.lab_yes
+
+        if other is not target:
+            for phi in other.phis:
+                phi.del_incoming(block)
+
+        instruction.remove_from_block()
+        instruction.delete()
+        block.add_instruction(ir.Jump(target))
+        return True
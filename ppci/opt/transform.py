@@ -3,12 +3,26 @@
 import logging
 import abc
 from .. import ir
+from ..graph.domtree import CfgInfo
+
+
+def is_modified(result):
+    """ Interpret the value returned by a pass as a modification flag.
+
+    Passes which do not report anything (they return None) are assumed
+    to have modified the code.
+    """
+    return result is None or bool(result)
 
 
 class ModulePass(metaclass=abc.ABCMeta):
     """ Base class of all optimizing passes.
 
     Subclass this class to implement your own optimization pass.
+
+    The run method may return a boolean indicating whether the module
+    was modified. When nothing is returned, the module is assumed to
+    be modified.
     """
 
     def __init__(self):
@@ -27,16 +41,44 @@ class ModulePass(metaclass=abc.ABCMeta):
 
 
 class FunctionPass(ModulePass):
-    """ Base pass that loops over all functions in a module """
+    """ Base pass that loops over all functions in a module
+
+    The on_function method may return a boolean indicating whether the
+    function was modified. This allows the
+    :class:`ppci.opt.pass_manager.PassManager` to skip functions which
+    did not change.
+    """
+
+    #: Set to True if this pass never changes the control flow graph.
+    #: Cached control flow analysis is kept valid in that case.
+    preserves_cfg = False
+
+    def __init__(self):
+        super().__init__()
+        self.debug_db = None
+        self.analyses = None
 
     def run(self, ir_module: ir.Module):
         """ Main entry point for the pass """
         self.prepare()
         self.debug_db = ir_module.debug_db
         assert isinstance(ir_module, ir.Module)
+        modified = False
         for function in ir_module.functions:
-            self.on_function(function)
+            if is_modified(self.on_function(function)):
+                modified = True
         self.debug_db = None
+        return modified
+
+    def get_cfg_info(self, function):
+        """ Get control flow info for the function.
+
+        When running under a pass manager, the cached info is used.
+        """
+        if self.analyses is None:
+            return CfgInfo(function)
+        else:
+            return self.analyses.get_cfg_info(function)
 
     @abc.abstractmethod
     def on_function(self, function: ir.SubRoutine):  # pragma: no cover
@@ -49,8 +91,11 @@ class BlockPass(FunctionPass):
 
     def on_function(self, function):
         """ Loops over each block in the function """
+        modified = False
         for block in function.blocks:
-            self.on_block(block)
+            if is_modified(self.on_block(block)):
+                modified = True
+        return modified
 
     @abc.abstractmethod
     def on_block(self, block: ir.Block):  # pragma: no cover
@@ -63,8 +108,11 @@ class InstructionPass(BlockPass):
 
     def on_block(self, block):
         """ Loops over each instruction in the block """
+        modified = False
         for instruction in block:
-            self.on_instruction(instruction)
+            if is_modified(self.on_instruction(instruction)):
+                modified = True
+        return modified
 
     @abc.abstractmethod
     def on_instruction(self, instruction):  # pragma: no cover
@@ -77,30 +125,38 @@ class RemoveAddZeroPass(InstructionPass):
         Replace multiplication by 1 with value itself.
     """
 
+    preserves_cfg = True
+
     def on_instruction(self, instruction):
-        if type(instruction) is ir.Binop:
+        if type(instruction) is ir.Binop and instruction.is_used:
             if instruction.operation == "+":
                 if (
                     type(instruction.b) is ir.Const
                     and instruction.b.value == 0
                 ):
                     instruction.replace_by(instruction.a)
+                    return True
                 elif (
                     type(instruction.a) is ir.Const
                     and instruction.a.value == 0
                 ):
                     instruction.replace_by(instruction.b)
+                    return True
             elif instruction.operation == "*":
                 if (
                     type(instruction.b) is ir.Const
                     and instruction.b.value == 1
                 ):
                     instruction.replace_by(instruction.a)
+                    return True
+        return False
 
 
 class DeleteUnusedInstructionsPass(BlockPass):
     """ Remove unused variables from a block """
 
+    preserves_cfg = True
+
     def on_block(self, block):
         unused_instructions = [
             i
@@ -116,3 +172,4 @@ class DeleteUnusedInstructionsPass(BlockPass):
             instruction.remove_from_block()
         if count > 0:
             self.logger.debug("Deleted %i unused instructions", count)
+        return count > 0
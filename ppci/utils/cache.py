@@ -0,0 +1,39 @@
+""" Storage of compiled code in a cache directory.
+
+Each entry is a json file named after its key. Entries are written to a
+temporary file first, so other processes never see a partial entry.
+"""
+
+import contextlib
+import json
+import logging
+import os
+
+logger = logging.getLogger("cache")
+
+
+def read_cache_entry(cache_dir, key):
+    """ Read the entry with the given key, or None if there is none """
+    filename = os.path.join(cache_dir, key + ".json")
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as ex:
+        logger.warning("Ignoring broken cache entry %s: %s", filename, ex)
+
+
+def write_cache_entry(cache_dir, key, entry):
+    """ Store an entry under the given key """
+    filename = os.path.join(cache_dir, key + ".json")
+    temp_filename = "{}.{}.tmp".format(filename, os.getpid())
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(temp_filename, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_filename, filename)
+    except OSError as ex:
+        logger.warning("Cannot write cache entry %s: %s", filename, ex)
+        with contextlib.suppress(OSError):
+            os.remove(temp_filename)
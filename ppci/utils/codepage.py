@@ -76,12 +76,6 @@ class Mod:
         code_size = obj.get_section("code").size
         data_size = obj.get_section("data").size
 
-        if not obj.debug_info:
-            raise ValueError(
-                'Unable to load "{}"'
-                " because it does not contain debug info.".format(obj)
-            )
-
         # Create a code page into memory:
         self._code_page = MemoryPage(code_size)
         self._data_page = MemoryPage(data_size)
@@ -94,7 +88,13 @@ class Mod:
 
         extra_symbols = {}
         for name, imp_obj in imports.items():
-            if callable(imp_obj):
+            if isinstance(imp_obj, ctypes._CFuncPtr):
+                # Native code, which is called directly:
+                self._import_symbols.append((name, imp_obj))
+                extra_symbols[name] = ctypes.cast(
+                    imp_obj, ctypes.c_void_p
+                ).value
+            elif callable(imp_obj):
                 signature = inspect.signature(imp_obj)
                 if signature.return_annotation is inspect._empty:
                     raise ValueError(
@@ -138,7 +138,7 @@ class Mod:
         obj = link(
             [obj],
             layout=memory_layout,
-            debug=True,
+            debug=bool(obj.debug_info),
             extra_symbols=extra_symbols,
         )
 
@@ -153,8 +153,12 @@ class Mod:
 
         # TODO: we might have more sections!
 
+        # Without debug info, the types of functions and variables are
+        # unknown, so they can only be looked up by address:
+        debug_info = obj.debug_info or debuginfo.DebugInfo()
+
         # Get a function pointer
-        for function in obj.debug_info.functions:
+        for function in debug_info.functions:
             function_name = function.name
 
             # Determine the function type:
@@ -171,7 +175,7 @@ class Mod:
             setattr(self, function_name, fpointer)
 
         # Get a variable pointers
-        for variable in obj.debug_info.variables:
+        for variable in debug_info.variables:
             variable_name = variable.name
             assert isinstance(variable, debuginfo.DebugVariable)
             assert isinstance(variable.address, debuginfo.DebugAddress)
@@ -186,9 +190,14 @@ class Mod:
         self._obj = obj
 
     def get_symbol_offset(self, name):
-        """ Get the memory address of a symbol """
+        """ Get the offset of a symbol in its section """
         return self._obj.get_symbol(name).value
 
+    def get_symbol_address(self, name):
+        """ Get the memory address of a symbol """
+        symbol = self._obj.get_symbol(name)
+        return self._obj.get_symbol_id_value(symbol.id)
+
 
 def load_code_as_module(source_file, reporter=None):
     """ Load c3 code as a module """
@@ -218,5 +227,8 @@ def load_obj(obj, imports=None):
 
     Optionally a dictionary of functions that must be imported can
     be provided.
+
+    When the object contains debug info, its functions and variables
+    are available as attributes of the loaded module.
     """
     return Mod(obj, imports=imports)
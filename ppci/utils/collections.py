@@ -9,18 +9,22 @@ Inspiration:
 http://code.activestate.com/recipes/576694/
 """
 
+import sys
 from collections.abc import MutableSet
 from collections import OrderedDict
 
+# Dictionaries retain their insertion order since python 3.6, and are
+# more compact than an OrderedDict:
+_ordered_dict = dict if sys.version_info >= (3, 6) else OrderedDict
+
 
 class OrderedSet(MutableSet):
     """ Set which retains order of elements """
 
+    __slots__ = ("_map",)
+
     def __init__(self, iterable=None):
-        end = []
-        end += [None, end, end]
-        self._end = end
-        self._map = {}  # key -> [key, prev, next]
+        self._map = _ordered_dict()  # key -> None
         if iterable is not None:
             self |= iterable
 
@@ -31,17 +35,11 @@ class OrderedSet(MutableSet):
         return key in self._map
 
     def add(self, value):
-        if value not in self._map:
-            end = self._end
-            curr = end[1]
-            curr[2] = end[1] = self._map[value] = [value, curr, end]
+        self._map[value] = None
 
     def discard(self, value):
         """ Remove element from set """
-        if value in self._map:
-            value, prev_item, next_item = self._map.pop(value)
-            prev_item[2] = next_item
-            next_item[1] = prev_item
+        self._map.pop(value, None)
 
     def __getitem__(self, index):
         """ O(n) implementation for lookups """
@@ -50,18 +48,10 @@ class OrderedSet(MutableSet):
                 return key
 
     def __iter__(self):
-        end = self._end
-        curr = end[2]
-        while curr is not end:
-            yield curr[0]
-            curr = curr[2]
+        return iter(self._map)
 
     def __reversed__(self):
-        end = self._end
-        curr = end[2]
-        while curr is not end:
-            yield curr[0]
-            curr = curr[1]
+        return reversed(list(self._map))
 
     def __repr__(self):
         return "%s(%r)" % (self.__class__.__name__, list(self))
@@ -24,6 +24,10 @@ from ..binutils.debuginfo import DebugLocation
 class ReportGenerator(metaclass=abc.ABCMeta):
     """ Implement all these function to create a custom reporting generator """
 
+    # Whether dump_instructions does something. When not, the code generator
+    # does not keep a list of generated instructions for the report.
+    dumps_instructions = True
+
     def header(self):
         pass
 
@@ -107,6 +111,8 @@ class ReportGenerator(metaclass=abc.ABCMeta):
 class DummyReportGenerator(ReportGenerator):
     """ Report generator which reports into the void """
 
+    dumps_instructions = False
+
     def heading(self, level, title):
         pass
 
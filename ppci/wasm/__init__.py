@@ -14,11 +14,25 @@ from .util import run_wasm_in_notebook, has_node
 from .execution import instantiate, execute_wasm
 
 
-def read_wasm(input) -> Module:
+def read_wasm(input, lazy_functions=False) -> Module:
     """ Read wasm in the form of a string, tuple, bytes or file object.
     Returns a wasm Module object.
+
+    When lazy_functions is True, the instructions of functions in binary
+    wasm are decoded when they are used for the first time.
     """
-    return Module(input)
+    if lazy_functions and (
+        isinstance(input, (bytes, bytearray, memoryview))
+        or hasattr(input, "read")
+    ):
+        from .binary.reader import BinaryFileReader
+
+        module = Module()
+        reader = BinaryFileReader(input, lazy_functions=True)
+        reader.read_module(module)
+        return module
+    else:
+        return Module(input)
 
 
 def read_wat(f) -> Module:
@@ -1,35 +1,84 @@
 """ Functionality to read a wasm module from it's binary format.
 
+The reader works on a single buffer, which is either the given bytes or a
+memory mapping of the given file, and keeps track of an offset into it.
+Sections and function bodies are regions of this buffer, so no data is
+copied while reading. Function bodies are read into compact instruction
+lists, instead of an object per instruction.
+
+Optionally, the bodies of functions are kept as undecoded regions of the
+buffer, which are decoded when the instructions are used for the first
+time. This saves time when only a few functions of a big module are used.
 """
 
 
 import logging
+import mmap
 import struct
+from array import array
 from contextlib import contextmanager
-from io import BytesIO
-from ...utils.leb128 import unsigned_leb128_decode, signed_leb128_decode
-from ..opcodes import ArgType, OPERANDS, REVERZ
-from ..components import Ref, Instruction, SECTION_IDS, DEFINITION_CLASSES
+from ..opcodes import ArgType, OPERANDS, OPCODE_NUMBERS, REVERZ
+from ..components import Ref, SECTION_IDS, DEFINITION_CLASSES
 from .. import components
 from .io import LANG_TYPES_REVERSE
 
 
 logger = logging.getLogger("wasm")
 
+F32 = struct.Struct("<f")
+F64 = struct.Struct("<d")
+U32 = struct.Struct("<I")
 
-class BinaryFileReader:
-    """ Reader which can read binary wasm. """
 
-    def __init__(self, f):
-        self._f = [f]
-        self._buffer = bytes()
+class BinaryFileReader:
+    """ Reader which can read binary wasm.
+
+    Args:
+        f: a file object, or a bytes-like object with the binary wasm.
+        lazy_functions: when True, function bodies are decoded when
+            their instructions are first used.
+    """
+
+    def __init__(self, f, lazy_functions=False):
+        self.lazy_functions = lazy_functions
+        self._file = None
+        self._mmap = None
+        if isinstance(f, (bytes, bytearray, memoryview)):
+            self._data = memoryview(f)
+        else:
+            self._data = self._open(f)
         self._pos = 0
+        self._end = len(self._data)
 
         self._section_id_to_name = {}
         for name, id in SECTION_IDS.items():
             if name != "code":  # use "func" instead
                 self._section_id_to_name[id] = name
 
+    def _open(self, f):
+        """ Map the file in memory, or read it when that is impossible """
+        try:
+            offset = f.tell()
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            # Not a regular file, or an empty one:
+            return memoryview(f.read())
+        self._file = f, offset
+        return memoryview(self._mmap)[offset:]
+
+    def _close(self):
+        """ Release the buffer, unless functions still refer to it """
+        if self._file:
+            f, offset = self._file
+            f.seek(offset + self._pos)
+            self._file = None
+
+        if not self.lazy_functions:
+            self._data.release()
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
     def read_module(self, module):
         """ Load a module from wasm binary format. """
         self.read_header()
@@ -49,14 +98,10 @@ class BinaryFileReader:
 
         # Read sections that contain definitions
         self._definitions = []
-        while True:
-            try:
-                section_id = self.read_byte()
-            except EOFError:
-                break
-
-            section_data = self.read_length_prefixed_bytes()
-            with self.push_data(section_data):
+        while self._pos < self._end:
+            section_id = self.read_byte()
+            section_size = self.read_uint()
+            with self.region(section_size):
                 self.read_section(section_id)
 
         logger.info(
@@ -65,6 +110,7 @@ class BinaryFileReader:
         )
         module.definitions = self._definitions
         module.id = None
+        self._close()
 
     def read_section(self, section_id):
         """ Process a single section. """
@@ -123,63 +169,105 @@ class BinaryFileReader:
         return mp[cls]()
 
     def read_exactly(self, amount=None):
-        if amount is not None and amount < 0:
+        """ Read the given amount of bytes, or all remaining bytes """
+        return bytes(self.read_view(amount))
+
+    def read_view(self, amount=None):
+        """ Get a view on the next bytes, without copying them """
+        pos = self._pos
+        if amount is None:
+            amount = self._end - pos
+        elif amount < 0:
             raise ValueError("Cannot read {} bytes".format(amount))
-        data = self._f[-1].read(amount)
-        if amount is not None and len(data) != amount:
+        end = pos + amount
+        if end > self._end:
             raise EOFError("Reading beyond end of file")
-        return data
+        self._pos = end
+        return self._data[pos:end]
 
     @contextmanager
-    def push_data(self, data):
-        """ Process the given data first.
+    def region(self, size):
+        """ Read a region of the given size, which must be read entirely.
         """
-        self._f.append(BytesIO(data))
+        end = self._pos + size
+        if end > self._end:
+            raise EOFError("Reading beyond end of file")
+        outer_end = self._end
+        self._end = end
         yield
-        f = self._f.pop()
-        remaining = f.read()
-        assert remaining == bytes(), str(remaining)
-
-    def read_fmt(self, fmt):
-        """ Read data according to the given format. """
-        size = struct.calcsize(fmt)
-        data = self.read_exactly(size)
-        return struct.unpack(fmt, data)[0]
-
-    def bytefile(self, f):
-        b = f.read(1)
-        while b:
-            yield b[0]
-            b = f.read(1)
-
-    def __next__(self):
-        b = self.read_exactly(1)
-        return b[0]
+        assert self._pos == end, "{} bytes remaining".format(end - self._pos)
+        self._end = outer_end
+
+    def read_struct(self, fmt):
+        """ Read a value with the given precompiled struct format """
+        pos = self._pos
+        end = pos + fmt.size
+        if end > self._end:
+            raise EOFError("Reading beyond end of file")
+        self._pos = end
+        return fmt.unpack_from(self._data, pos)[0]
 
     def read_byte(self):
         """ Read the value of a single byte """
-        data = self.read_exactly(1)
-        return data[0]
+        pos = self._pos
+        if pos >= self._end:
+            raise EOFError("Reading beyond end of file")
+        self._pos = pos + 1
+        return self._data[pos]
 
     def read_int(self):
         """ Read variable size signed int """
-        return signed_leb128_decode(self)
+        data = self._data
+        pos = self._pos
+        end = self._end
+        result = 0
+        shift = 0
+        while True:
+            if pos >= end:
+                raise EOFError("Reading beyond end of file")
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        self._pos = pos
+
+        if byte & 0x40:
+            # We have sign bit set!
+            result -= 1 << shift
+        return result
 
     def read_uint(self):
         """ Read variable size unsigned integer """
-        return unsigned_leb128_decode(self)
+        data = self._data
+        pos = self._pos
+        end = self._end
+        result = 0
+        shift = 0
+        while True:
+            if pos >= end:
+                raise EOFError("Reading beyond end of file")
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        self._pos = pos
+        return result
 
     def read_f32(self) -> float:
         """ Read a single f32 value """
-        return self.read_fmt("f")
+        return self.read_struct(F32)
 
     def read_f64(self) -> float:
         """ Read a single f64 value """
-        return self.read_fmt("d")
+        return self.read_struct(F64)
 
     def read_u32(self) -> int:
         """ Read a single u32 value """
-        return self.read_fmt("<I")
+        return self.read_struct(U32)
 
     def read_length_prefixed_bytes(self) -> bytes:
         """ Read length prefixed raw bytes data """
@@ -188,8 +276,8 @@ class BinaryFileReader:
 
     def read_str(self):
         """ Read a string """
-        data = self.read_length_prefixed_bytes()
-        return data.decode("utf-8")
+        amount = self.read_uint()
+        return str(self.read_view(amount), "utf-8")
 
     def read_type(self):
         """ Read a wasm type """
@@ -209,7 +297,11 @@ class BinaryFileReader:
 
     def read_space_ref(self, space):
         """ Read a reference into a certain space. """
-        return Ref(space, index=self.read_uint())
+        ref = Ref.__new__(Ref)
+        ref.space = space
+        ref.index = self.read_uint()
+        ref.name = None
+        return ref
 
     def gen_id(self, space):
         return len(self._id_maps[space])
@@ -222,58 +314,44 @@ class BinaryFileReader:
 
     def read_expression(self):
         """ Read instructions until an end marker is found """
-        expr = []
+        return list(self.read_instruction_list())
+
+    def read_instruction_list(self):
+        """ Read instructions until an end marker is found.
+
+        The instructions are stored in a compact instruction list,
+        without creating an object per instruction.
+        """
+        opcodes = array("H")
+        operands = []
+        append_opcode = opcodes.append
+        append_operand = operands.append
+        read_byte = self.read_byte
+        formats = INSTRUCTION_FORMATS
         blocks = 1
-        i = self.read_instruction()
-        # keep track of if/block/loop etc:
-        if i.opcode == "end":
-            blocks -= 1
-        elif i.opcode in ("if", "block", "loop"):
-            blocks += 1
-        expr.append(i)
-        while blocks:
-            i = self.read_instruction()
-            # print(i)
-            if i.opcode == "end":
-                blocks -= 1
-            elif i.opcode in ("if", "block", "loop"):
-                blocks += 1
-            expr.append(i)
-
-        # Strip of last end opcode:
-        assert expr[-1].opcode == "end"
-        return expr[:-1]
-
-    def read_instruction(self):
-        """ Read a single instruction """
-        binopcode = self.read_byte()
-        opcode = REVERZ[binopcode]
-        operands = OPERANDS[opcode]
-        # print(opcode, type, operands)
-        args = []
-        for operand in operands:
-            if operand in rfm:
-                arg = rfm[operand](self)
-            elif operand == "byte":
-                arg = self.read_byte()
-            elif operand == "br_table":
-                count = self.read_uint()
-                vec = []
-                for _ in range(count + 1):
-                    idx = self.read_space_ref("label")
-                    vec.append(idx)
-                arg = vec
-            else:  # pragma: no cover
-                raise NotImplementedError(operand)
-            args.append(arg)
-        args = tuple(args)
-
-        block_types = ("block", "loop", "if")
-        if opcode in block_types:
-            instruction = components.BlockInstruction(opcode, *args)
-        else:
-            instruction = Instruction(opcode, *args)
-        return instruction
+        while True:
+            binopcode = read_byte()
+            if binopcode == 0xFC:
+                binopcode = (binopcode, self.read_uint())
+            nr, operand_readers, nesting = formats[binopcode]
+
+            # keep track of if/block/loop etc:
+            if nesting:
+                blocks += nesting
+                if not blocks:
+                    # Strip of last end opcode:
+                    break
+
+            append_opcode(nr)
+            if binopcode == 0x0E:
+                # br_table, store the amount of labels first:
+                count = self.read_uint() + 1
+                append_operand(count)
+                operands.extend([self.read_uint() for _ in range(count)])
+            else:
+                for read_operand in operand_readers:
+                    append_operand(read_operand(self))
+        return components.InstructionList(opcodes, operands)
 
     def read_type_definition(self):
         """ Read a type definition. """
@@ -364,22 +442,30 @@ class BinaryFileReader:
     def read_func_definition(self, index):
         """ Read a function with locals and instructions. """
         # First read on the function body block:
-        body_data = self.read_length_prefixed_bytes()
-
-        with self.push_data(body_data):
+        body_size = self.read_uint()
+        body_end = self._pos + body_size
+        with self.region(body_size):
             num_local_pairs = self.read_uint()
             localz = []
             for _ in range(num_local_pairs):
                 c = self.read_uint()
                 t = self.read_type()
                 localz.extend([(None, t)] * c)
-            instructions = self.read_expression()
+            if self.lazy_functions:
+                body = self.read_view(body_end - self._pos)
+                instructions = []
+            else:
+                instructions = self.read_instruction_list()
 
         # Function type ref:
         ref = Ref("type", index=self._type4func[index])
 
         id = self.gen_id("func")
-        func = components.Func(id, ref, localz, instructions)
+        if self.lazy_functions:
+            func = LazyFunc(id, ref, localz, instructions)
+            func.body = body
+        else:
+            func = components.Func(id, ref, localz, instructions)
         self.add_definition("func", func)
         return func
 
@@ -397,18 +483,71 @@ class BinaryFileReader:
         return components.Custom(name, data)
 
 
-# This is a list of functions to read specific argument types:
+# This is a list of functions to read specific argument types. References
+# are stored as plain indices in instruction lists:
 rfm = {
     ArgType.TYPE: lambda reader: reader.read_type(),
     ArgType.U32: lambda reader: reader.read_uint(),
-    ArgType.LABELIDX: lambda reader: reader.read_space_ref("label"),
-    ArgType.LOCALIDX: lambda reader: reader.read_space_ref("local"),
-    ArgType.GLOBALIDX: lambda reader: reader.read_space_ref("global"),
-    ArgType.FUNCIDX: lambda reader: reader.read_space_ref("func"),
-    ArgType.TYPEIDX: lambda reader: reader.read_space_ref("type"),
-    ArgType.TABLEIDX: lambda reader: reader.read_space_ref("table"),
+    ArgType.LABELIDX: lambda reader: reader.read_uint(),
+    ArgType.LOCALIDX: lambda reader: reader.read_uint(),
+    ArgType.GLOBALIDX: lambda reader: reader.read_uint(),
+    ArgType.FUNCIDX: lambda reader: reader.read_uint(),
+    ArgType.TYPEIDX: lambda reader: reader.read_uint(),
+    ArgType.TABLEIDX: lambda reader: reader.read_uint(),
     ArgType.I32: lambda reader: reader.read_int(),
     ArgType.I64: lambda reader: reader.read_int(),
     ArgType.F32: lambda reader: reader.read_f32(),
     ArgType.F64: lambda reader: reader.read_f64(),
+    "byte": lambda reader: reader.read_byte(),
 }
+
+
+def _instruction_formats():
+    """ Determine for each binary opcode its number, what to read and
+    how it changes the nesting of blocks.
+    """
+    formats = {}
+    for binopcode, opcode in REVERZ.items():
+        if opcode == "br_table":
+            readers = ()
+        else:
+            readers = tuple(rfm[o] for o in OPERANDS[opcode])
+        if opcode in ("block", "loop", "if"):
+            nesting = 1
+        elif opcode == "end":
+            nesting = -1
+        else:
+            nesting = 0
+        formats[binopcode] = (OPCODE_NUMBERS[opcode], readers, nesting)
+    return formats
+
+
+INSTRUCTION_FORMATS = _instruction_formats()
+
+
+class LazyFunc(components.Func):
+    """ A function definition of which the instructions are decoded from
+    the binary body when they are used for the first time.
+    """
+
+    __slots__ = ("body",)
+
+    @property
+    def __name__(self):
+        return "func"
+
+    @property
+    def instructions(self):
+        if self.body is not None:
+            reader = BinaryFileReader(self.body)
+            components.Func.instructions.__set__(
+                self, reader.read_instruction_list()
+            )
+            assert reader._pos == reader._end
+            self.body = None
+        return components.Func.instructions.__get__(self)
+
+    @instructions.setter
+    def instructions(self, instructions):
+        components.Func.instructions.__set__(self, instructions)
+        self.body = None
@@ -107,7 +107,9 @@ class BinaryFileWriter(BaseIoWriter):
             components.Data: self.write_data_definition,
             components.Custom: self.write_custom_definition,
         }
-        mp[type(definition)](definition)
+        # Look in the base classes as well, for lazily read functions:
+        cls = next(c for c in type(definition).__mro__ if c in mp)
+        mp[cls](definition)
 
     def write(self, bb):
         return self.f.write(bb)
@@ -179,10 +181,34 @@ class BinaryFileWriter(BaseIoWriter):
         # Encode explicit end:
         self.write_instruction(Instruction("end"))
 
+    def write_opcode(self, opcode):
+        """ Write the binary opcode of the given instruction. """
+        binopcode = OPCODES[opcode]
+        if isinstance(binopcode, tuple):
+            prefix, binopcode = binopcode
+            self.write(bytes([prefix]))
+            self.write_vu32(binopcode)
+        else:
+            self.write(bytes([binopcode]))
+
+    def write_instruction_list(self, instructions):
+        """ Write a compact instruction list, without creating an
+        instruction object per instruction.
+        """
+        for opcode, args in instructions.raw():
+            self.write_opcode(opcode)
+            if opcode == "br_table":
+                self.write_vu32(args[0] - 1)
+                for index in args[1:]:
+                    self.write_vu32(index)
+            else:
+                for o, arg in zip(OPERANDS[opcode], args):
+                    raw_wfm[o](self, arg)
+
     def write_instruction(self, instruction):
         """ Write a single instruction as binary. """
         # Our instruction
-        self.write(bytes([OPCODES[instruction.opcode]]))
+        self.write_opcode(instruction.opcode)
 
         # Prep args for accessing named identifiers
         args = list(instruction.args)
@@ -303,8 +329,11 @@ class BinaryFileWriter(BaseIoWriter):
             f3.write_type(loc_type)
 
         # Instructions:
-        for instruction in func.instructions:
-            f3.write_instruction(instruction)
+        if isinstance(func.instructions, components.InstructionList):
+            f3.write_instruction_list(func.instructions)
+        else:
+            for instruction in func.instructions:
+                f3.write_instruction(instruction)
         f3.write(b"\x0b")  # end
         body = f3.f.getvalue()
         self.write_vu32(len(body))  # number of bytes in body
@@ -342,3 +371,17 @@ wfm = {
     ArgType.F32: lambda writer, arg: writer.write_f32(arg),
     ArgType.F64: lambda writer, arg: writer.write_f64(arg),
 }
+
+# Functions to write raw operands, in which references are indices:
+raw_wfm = dict(wfm)
+raw_wfm.update(
+    {
+        ArgType.LABELIDX: lambda writer, arg: writer.write_vu32(arg),
+        ArgType.LOCALIDX: lambda writer, arg: writer.write_vu32(arg),
+        ArgType.GLOBALIDX: lambda writer, arg: writer.write_vu32(arg),
+        ArgType.FUNCIDX: lambda writer, arg: writer.write_vu32(arg),
+        ArgType.TYPEIDX: lambda writer, arg: writer.write_vu32(arg),
+        ArgType.TABLEIDX: lambda writer, arg: writer.write_vu32(arg),
+        "byte": lambda writer, arg: writer.write(bytes([arg])),
+    }
+)
@@ -3,6 +3,7 @@
 * Module: the toplevel unit of deployment, loading, and compilation.
 * Definition: child field of a module, there are several subclasses.
 * Instruction: representation of a WASM instruction.
+* InstructionList: compact representation of many instructions.
 
 Every component (in particular the definitions) has an internal
 representation, a text representation (WAT), a tuple representation and
@@ -29,12 +30,15 @@ Common attribute names:
 # Validate WAT:
 # https://cdn.rawgit.com/WebAssembly/wabt/aae5a4b7/demo/wat2wasm/
 
+from array import array
 from io import BytesIO
 import logging
 import sys
 from collections import OrderedDict
+from collections.abc import MutableSequence
 
 from ..lang.sexpr import parse_sexpr
+from .opcodes import ArgType, OPCODE_NAMES, OPERANDS
 
 
 def this_is_js():
@@ -243,6 +247,12 @@ class Module(WASMComponent):
 
         load_tuple(self, t)
 
+    def _from_bytes(self, b):
+        from .binary.reader import BinaryFileReader
+
+        reader = BinaryFileReader(b)
+        reader.read_module(self)
+
     def _from_file(self, f):
         from .binary.reader import BinaryFileReader
 
@@ -395,6 +405,194 @@ class BlockInstruction(Instruction):
         return writer.write_block_instruction(self)
 
 
+class InstructionList(MutableSequence):
+    """ A compact list of instructions.
+
+    Instead of an object per instruction, the opcodes are stored as an
+    array of opcode numbers (see ``opcodes.OPCODE_NAMES``), and the
+    operands of all instructions are stored in a single flat list. In
+    this list, references are plain indices, and the labels of a
+    br_table are preceded by their amount.
+
+    The binary reader creates these lists for the function bodies, since
+    memory for big modules would otherwise be dominated by the
+    instruction objects. Use :meth:`raw` to process the instructions
+    without creating objects.
+
+    This list can be used instead of a list of instructions. When it is
+    iterated, indexed or modified, the instruction objects are created
+    once, and from then on the list holds these objects.
+    """
+
+    __slots__ = ("opcodes", "operands", "_instructions")
+
+    def __init__(self, opcodes=None, operands=None):
+        self.opcodes = array("H") if opcodes is None else opcodes
+        self.operands = [] if operands is None else operands
+        self._instructions = None
+
+    def __repr__(self):
+        return "<InstructionList of %s instructions>" % len(self)
+
+    def __len__(self):
+        if self._instructions is None:
+            return len(self.opcodes)
+        return len(self._instructions)
+
+    def __iter__(self):
+        return iter(self.instructions)
+
+    def __getitem__(self, i):
+        return self.instructions[i]
+
+    def __setitem__(self, i, instruction):
+        self.instructions[i] = instruction
+
+    def __delitem__(self, i):
+        del self.instructions[i]
+
+    def insert(self, i, instruction):
+        self.instructions.insert(i, instruction)
+
+    @property
+    def instructions(self):
+        """ The list of instruction objects, created on first use """
+        if self._instructions is None:
+            instructions = []
+            pos = 0
+            for nr in self.opcodes:
+                instruction, pos = self._materialize(nr, pos)
+                instructions.append(instruction)
+            self._instructions = instructions
+            # The objects are the instructions from now on:
+            self.opcodes = array("H")
+            self.operands = []
+        return self._instructions
+
+    def raw(self):
+        """ Iterate over the instructions without creating objects.
+
+        Yields (opcode, operands) tuples, in which operands is the
+        list of the raw operands of the instruction.
+        """
+        if self._instructions is not None:
+            for instruction in self._instructions:
+                yield instruction.opcode, raw_operands(instruction)
+            return
+
+        pos = 0
+        operands = self.operands
+        for nr in self.opcodes:
+            kinds = _OPERAND_KINDS[nr]
+            if kinds == _BR_TABLE:
+                end = pos + operands[pos] + 1
+            else:
+                end = pos + len(kinds)
+            yield OPCODE_NAMES[nr], operands[pos:end]
+            pos = end
+
+    def _materialize(self, nr, pos):
+        """ Create the instruction object of which the operands start at
+        the given position. Returns the instruction and the position of
+        the next operands.
+        """
+        operands = self.operands
+        args = []
+        for kind in _OPERAND_KINDS[nr]:
+            if kind is None:
+                args.append(operands[pos])
+                pos += 1
+            elif kind == "br_table":
+                count = operands[pos]
+                args.append(
+                    [
+                        _make_ref("label", index)
+                        for index in operands[pos + 1 : pos + 1 + count]
+                    ]
+                )
+                pos += count + 1
+            else:
+                args.append(_make_ref(kind, operands[pos]))
+                pos += 1
+
+        opcode = OPCODE_NAMES[nr]
+        if opcode in ("block", "loop", "if"):
+            instruction = BlockInstruction.__new__(BlockInstruction)
+            instruction.id = None
+        else:
+            instruction = Instruction.__new__(Instruction)
+        instruction.opcode = opcode
+        instruction.args = tuple(args)
+        return instruction, pos
+
+
+def raw_instructions(instructions):
+    """ Iterate over instructions as (opcode, operands) tuples.
+
+    This works for lists of instruction objects and for instruction
+    lists. See :meth:`InstructionList.raw` for the format.
+    """
+    if isinstance(instructions, InstructionList):
+        return instructions.raw()
+    return (
+        (instruction.opcode, raw_operands(instruction))
+        for instruction in instructions
+    )
+
+
+def raw_operands(instruction):
+    """ Get the operands of an instruction object in the raw format """
+    operands = []
+    for arg in instruction.args:
+        if isinstance(arg, Ref):
+            operands.append(arg.index)
+        elif isinstance(arg, (list, tuple)):
+            # Labels of a br_table:
+            operands.append(len(arg))
+            operands.extend(
+                label.index if isinstance(label, Ref) else label
+                for label in arg
+            )
+        else:
+            operands.append(arg)
+    return operands
+
+
+def _make_ref(space, index):
+    # Skip the checks of the constructor, the index is valid:
+    ref = Ref.__new__(Ref)
+    ref.space = space
+    ref.index = index
+    ref.name = None
+    return ref
+
+
+def _operand_kinds():
+    """ Determine per opcode number how its operands are stored.
+
+    None is a plain value, a space name is a reference into that space.
+    """
+    spaces = {
+        ArgType.LABELIDX: "label",
+        ArgType.LOCALIDX: "local",
+        ArgType.GLOBALIDX: "global",
+        ArgType.FUNCIDX: "func",
+        ArgType.TYPEIDX: "type",
+        ArgType.TABLEIDX: "table",
+    }
+    return tuple(
+        tuple(
+            o if o == "br_table" else spaces.get(o)
+            for o in OPERANDS[opcode]
+        )
+        for opcode in OPCODE_NAMES
+    )
+
+
+_OPERAND_KINDS = _operand_kinds()
+_BR_TABLE = ("br_table",)
+
+
 # Definition classes
 
 
@@ -673,7 +871,8 @@ class Func(Definition):
     * ref: the reference to the type (i.e. signature).
     * locals: a list of ($id, typ) tuples. The id can be None to indicate
       implicit id's (note that the id is offset by the parameters).
-    * instructions: a list of instructions (may be given as tuples).
+    * instructions: a list of instructions (may be given as tuples), or
+      an InstructionList.
 
     """
 
@@ -685,13 +884,15 @@ class Func(Definition):
         if not isinstance(ref, Ref):
             raise TypeError("ref must be of type Ref")
         assert isinstance(locals, (tuple, list))
-        assert isinstance(instructions, (tuple, list))
+        assert isinstance(instructions, (tuple, list, InstructionList))
         assert all(isinstance(el, tuple) and len(el) == 2 for el in locals)
         self.id = check_id(id)
         self.ref = ref
         self.locals = tuple(locals)
         # Parse instructions
-        if instructions and isinstance(instructions[0], Instruction):
+        if isinstance(instructions, InstructionList):
+            self.instructions = instructions
+        elif instructions and isinstance(instructions[0], Instruction):
             self.instructions = instructions  # assume all are instructions
         else:
             blocktypes = ("block", "loop", "if")
@@ -827,6 +1028,7 @@ __all__ = [
     "WASMComponent",
     "Instruction",
     "BlockInstruction",
+    "InstructionList",
     "Module",
     "Definition",
 ]
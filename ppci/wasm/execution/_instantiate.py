@@ -13,6 +13,8 @@ from .runtime import create_runtime
 from ..components import Import
 from ._native_instance import native_instantiate
 from ._python_instance import python_instantiate
+from ._interp_instance import interp_instantiate
+from ._tiered_instance import tiered_instantiate
 
 
 __all__ = ("instantiate",)
@@ -29,6 +31,12 @@ def instantiate(
         target: Use 'native' to compile wasm to machine code.
                 Use 'python' to generate python code. This option is slower
                 but more reliable.
+                Use 'interp' to interpret the wasm code directly. This
+                option is the slowest, but instantiates without
+                compilation.
+                Use 'tiered' to start interpreting, and compile functions
+                to machine code in the background once they are called
+                often.
         reporter: A reporter which can record detailed compilation information.
         cache_file: a file to use as cache
 
@@ -66,6 +74,10 @@ def instantiate(
         instance = native_instantiate(module, symbols, reporter, cache_file)
     elif target == "python":
         instance = python_instantiate(module, symbols, reporter, cache_file)
+    elif target == "interp":
+        instance = interp_instantiate(module, symbols, reporter, cache_file)
+    elif target == "tiered":
+        instance = tiered_instantiate(module, symbols, reporter, cache_file)
     else:
         raise ValueError("Unknown instantiation target {}".format(target))
 
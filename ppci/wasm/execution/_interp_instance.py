@@ -0,0 +1,1152 @@
+""" Instantiate a wasm module as an interpreter.
+
+No code is generated for the wasm functions. Instead, the body of a
+function is decoded on its first call into a list of python closures, one
+per instruction. All immediates are resolved during decoding: local,
+global and function indices, memory offsets, branch targets and the
+amount of values to remove from the value stack when taking a branch.
+Each closure executes its instruction and returns the index of the next
+one, so running a function is a tight dispatch loop:
+
+.. code::
+
+    while pc >= 0:
+        pc = code[pc](stack, local_vars)
+
+This gives the lowest instantiation latency of all targets, at the cost
+of execution speed.
+"""
+
+import logging
+import math
+import struct
+from functools import partial
+from .. import components
+from ..opcodes import STACK_IO
+from ..util import PAGE_SIZE
+from ._base_instance import ModuleInstance, WasmMemory, WasmGlobal
+from .runtime import Unreachable
+
+logger = logging.getLogger("instantiate")
+
+MASK32 = 0xFFFFFFFF
+MASK64 = 0xFFFFFFFFFFFFFFFF
+_F32 = struct.Struct("<f")
+
+
+def interp_instantiate(module, imports, reporter, cache_file):
+    """ Load wasm module as an InterpModuleInstance """
+    logger.info("Instantiating wasm module as interpreter")
+    reporter.message("Interpreting wasm module, nothing is compiled")
+    return InterpModuleInstance(module, imports)
+
+
+class InterpModuleInstance(ModuleInstance):
+    """ Wasm module executed by an interpreter """
+
+    def __init__(self, module, imports):
+        super().__init__()
+        self._imports = imports
+        self._types = []
+        self._functions = []
+        self._signatures = []
+        self._globals = []
+        self._global_inits = []
+        self._imported_globals = {}
+        self._tables = []
+        self._elems = []
+        self._start = None
+        self._compiler = FunctionCompiler(self)
+
+        for definition in module:
+            if isinstance(definition, components.Type):
+                self._types.append(definition)
+            elif isinstance(definition, components.Import):
+                self._add_import(definition)
+            elif isinstance(definition, components.Func):
+                signature = self._types[definition.ref.index]
+                function = self.create_function(definition, signature)
+                self._functions.append(function)
+                self._signatures.append(signature)
+            elif isinstance(definition, components.Table):
+                self._add_table(definition.min, definition.max)
+            elif isinstance(definition, components.Elem):
+                self._elems.append(definition)
+            elif isinstance(definition, components.Global):
+                self._globals.append(None)
+                self._global_inits.append(definition.init)
+            elif isinstance(definition, components.Start):
+                self._start = definition.ref.index
+
+    def _add_import(self, definition):
+        name = "{}_{}".format(definition.modname, definition.name)
+        obj = self._imports[name]
+        if definition.kind == "func":
+            self._functions.append(obj)
+            self._signatures.append(self._types[definition.info[0].index])
+        elif definition.kind == "table":
+            assert isinstance(obj, components.Table)
+            self._add_table(obj.min, obj.max)
+        elif definition.kind == "global":
+            if isinstance(obj, WasmGlobal):
+                # Share the global with the module it comes from:
+                self._imported_globals[len(self._globals)] = obj
+                obj = None
+            self._globals.append(obj)
+            self._global_inits.append(None)
+        else:
+            raise NotImplementedError(
+                "Importing {} into the interpreter".format(definition.kind)
+            )
+
+    def create_function(self, definition, signature):
+        """ Create the callable for a function defined in the module """
+        return InterpFunction(self, definition, signature)
+
+    def _add_table(self, min_size, max_size):
+        size = min_size if max_size is None else max(min_size, max_size)
+        self._tables.append([None] * size)
+
+    def _run_init(self):
+        for index, init in enumerate(self._global_inits):
+            if init is not None:
+                self._globals[index] = self.eval_expression(init)
+
+        for elem in self._elems:
+            table = self._tables[elem.ref.index]
+            offset = self.eval_expression(elem.offset)
+            for nr, ref in enumerate(elem.refs, offset):
+                table[nr] = self._functions[ref.index]
+
+        if self._start is not None:
+            self._functions[self._start]()
+
+    def eval_expression(self, expression):
+        """ Evaluate a constant expression """
+        assert len(expression) == 1
+        instruction = expression[0]
+        if instruction.opcode == "global.get":
+            return self.get_global_by_index(instruction.args[0].index).read()
+        else:
+            return const_value(instruction)
+
+    def memory_create(self, min_size, max_size):
+        """ Create memory. """
+        assert max_size is not None
+
+        # Allow only a single memory:
+        assert len(self._memories) == 0
+        self._memories.append(InterpWasmMemory(min_size, max_size))
+
+    def memory_grow(self, amount):
+        """ Grow memory and return the old size """
+        memory = self._memories[0]
+        old_size = memory.memory_size()
+        new_size = old_size + (amount & MASK32)
+        if new_size > memory.max_size:
+            return -1
+        else:
+            # Extend in place, since the decoded functions refer to it:
+            memory.data.extend(bytes(amount * PAGE_SIZE))
+            return old_size
+
+    def get_func_by_index(self, index: int):
+        return self._functions[index]
+
+    def get_global_by_index(self, index: int):
+        if index in self._imported_globals:
+            return self._imported_globals[index]
+        return InterpWasmGlobal("global{}".format(index), self, index)
+
+
+class InterpWasmMemory(WasmMemory):
+    """ Wasm memory stored in a bytearray """
+
+    def __init__(self, min_size, max_size):
+        super().__init__(min_size, max_size)
+        self.data = bytearray(min_size * PAGE_SIZE)
+
+    def memory_size(self) -> int:
+        """ return memory size in pages """
+        return len(self.data) // PAGE_SIZE
+
+    def write(self, address: int, data: bytes):
+        assert address + len(data) <= len(self.data)
+        self.data[address : address + len(data)] = data
+
+    def read(self, address: int, size: int) -> bytes:
+        data = bytes(self.data[address : address + size])
+        assert len(data) == size
+        return data
+
+
+class InterpWasmGlobal(WasmGlobal):
+    def __init__(self, name, instance, index):
+        super().__init__(name)
+        self.instance = instance
+        self.index = index
+
+    def read(self):
+        return self.instance._globals[self.index]
+
+    def write(self, value):
+        self.instance._globals[self.index] = value
+
+
+class InterpFunction:
+    """ A wasm function, which is decoded when called for the first time.
+    """
+
+    def __init__(self, instance, definition, signature):
+        self._instance = instance
+        self.definition = definition
+        self.signature = signature
+        self.param_types = tuple(p[1] for p in signature.params)
+        self.result_types = tuple(signature.results)
+        self._code = None
+        self._param_wrappers = tuple(
+            VALUE_WRAPPERS[typ] for typ in self.param_types
+        )
+        self._local_inits = [
+            0.0 if typ[0] == "f" else 0 for _, typ in definition.locals
+        ]
+
+    def __repr__(self):
+        return "InterpFunction({})".format(self.definition.id)
+
+    def __call__(self, *args):
+        # Arguments from the host may be out of range:
+        return self._invoke(
+            [wrap(arg) for wrap, arg in zip(self._param_wrappers, args)]
+        )
+
+    def _invoke(self, local_vars):
+        """ Run the function, the list of arguments is used for the locals.
+        """
+        if self._code is None:
+            self._code = self._instance._compiler.compile(self)
+        code = self._code
+
+        local_vars.extend(self._local_inits)
+        stack = []
+        pc = 0
+        try:
+            while pc >= 0:
+                pc = code[pc](stack, local_vars)
+        except RecursionError:
+            raise Unreachable("Call stack exhausted") from None
+
+        num_results = len(self.result_types)
+        if num_results == 0:
+            return None
+        elif num_results == 1:
+            return stack[-1]
+        else:
+            return tuple(stack[-num_results:])
+
+
+class Label:
+    """ The target of a branch """
+
+    __slots__ = ("pc", "height", "arity")
+
+    def __init__(self, height, arity, pc=None):
+        self.pc = pc
+        self.height = height
+        self.arity = arity
+
+
+class BlockLevel:
+    """ A block, loop or if which is being decoded """
+
+    __slots__ = (
+        "typ",
+        "label",
+        "else_label",
+        "height",
+        "params",
+        "results",
+        "reachable",
+    )
+
+    def __init__(self, typ, label, height, params, results, reachable):
+        self.typ = typ
+        self.label = label
+        self.else_label = None
+        self.height = height
+        self.params = params
+        self.results = results
+        self.reachable = reachable
+
+
+class FunctionCompiler:
+    """ Decode wasm instructions into a list of closures.
+
+    The value stack height is tracked during decoding, so that branches
+    know which values to remove from the stack.
+    """
+
+    logger = logging.getLogger("wasm-interp")
+
+    def __init__(self, instance):
+        self.instance = instance
+        self._opcode_dispatch = {}
+        self._fill_dispatch_table()
+
+    def _fill_dispatch_table(self):
+        """ Fill the table of what to do with each instruction. """
+        dispatch = self._opcode_dispatch
+        for opcode, load_fmt in LOAD_FORMATS.items():
+            dispatch[opcode] = partial(self.gen_load, load_fmt)
+
+        for opcode, store_fmt in STORE_FORMATS.items():
+            dispatch[opcode] = partial(self.gen_store, *store_fmt)
+
+        for opcode, function in UNARY_OPS.items():
+            dispatch[opcode] = partial(self.gen_op, _unary, function, 0)
+
+        for opcode, function in BINARY_OPS.items():
+            dispatch[opcode] = partial(self.gen_op, _binary, function, -1)
+
+        runtime_ops = [
+            opcode
+            for opcode in STACK_IO
+            if opcode.replace(".", "_") in RUNTIME_OPS
+        ]
+        for opcode in runtime_ops:
+            function = self.instance._imports[
+                "wasm_rt_{}".format(opcode.replace(".", "_"))
+            ]
+            function = RUNTIME_OPS[opcode.replace(".", "_")](function)
+            inputs, outputs = STACK_IO[opcode]
+            assert len(outputs) == 1
+            if len(inputs) == 1:
+                dispatch[opcode] = partial(self.gen_op, _unary, function, 0)
+            else:
+                assert len(inputs) == 2
+                dispatch[opcode] = partial(
+                    self.gen_op, _binary, function, -1
+                )
+
+        for opcode in ["f64.const", "f32.const", "i64.const", "i32.const"]:
+            dispatch[opcode] = self.gen_const
+
+        dispatch["local.get"] = self.gen_local_get
+        dispatch["local.set"] = self.gen_local_set
+        dispatch["local.tee"] = self.gen_local_tee
+        dispatch["global.get"] = self.gen_global_get
+        dispatch["global.set"] = self.gen_global_set
+        dispatch["memory.size"] = self.gen_memory_size
+        dispatch["memory.grow"] = self.gen_memory_grow
+        dispatch["drop"] = self.gen_drop
+        dispatch["select"] = self.gen_select
+        dispatch["nop"] = self.gen_nop
+        dispatch["unreachable"] = self.gen_unreachable
+        dispatch["br"] = self.gen_br
+        dispatch["br_if"] = self.gen_br_if
+        dispatch["br_table"] = self.gen_br_table
+        dispatch["return"] = self.gen_return
+        dispatch["call"] = self.gen_call
+        dispatch["call_indirect"] = self.gen_call_indirect
+
+    def compile(self, function):
+        """ Decode the body of the given function """
+        self.logger.debug("Decoding %s", function)
+        self.factories = []
+        self.height = 0
+        self.reachable = True
+        end_label = Label(0, len(function.result_types))
+        self.block_stack = [
+            BlockLevel(
+                "block", end_label, 0, (), function.result_types, True
+            )
+        ]
+
+        for instruction in function.definition.instructions:
+            self.generate_instruction(instruction)
+
+        # The end of the function returns:
+        end_label.pc = len(self.factories)
+        self.factories.append(_return)
+
+        code = [
+            factory(pc + 1) for pc, factory in enumerate(self.factories)
+        ]
+        self.factories = None
+        return code
+
+    def emit(self, factory, effect=0):
+        """ Add an instruction.
+
+        The factory is called with the index of the next instruction
+        when all branch targets are known, and returns the closure.
+        """
+        self.factories.append(factory)
+        self.height += effect
+
+    def generate_instruction(self, instruction):
+        """ Decode a single wasm instruction """
+        opcode = instruction.opcode
+
+        # Handle block instructions first, also in unreachable code,
+        # to keep track of the nesting:
+        if opcode == "block":
+            self.gen_block(instruction)
+        elif opcode == "loop":
+            self.gen_loop(instruction)
+        elif opcode == "if":
+            self.gen_if(instruction)
+        elif opcode == "else":
+            self.gen_else()
+        elif opcode == "end":
+            self.gen_end()
+        elif not self.reachable:
+            pass
+        elif opcode in self._opcode_dispatch:
+            self._opcode_dispatch[opcode](instruction)
+        else:  # pragma: no cover
+            raise NotImplementedError(opcode)
+
+    def get_block_signature(self, instruction):
+        block_type = instruction.args[0]
+        if block_type == "emptyblock":
+            return (), ()
+        elif isinstance(block_type, str):
+            return (), (block_type,)
+        else:
+            signature = self.instance._types[block_type.index]
+            return (
+                tuple(p[1] for p in signature.params),
+                tuple(signature.results),
+            )
+
+    def push_block(self, typ, instruction):
+        params, results = self.get_block_signature(instruction)
+        height = self.height - len(params)
+        arity = len(params) if typ == "loop" else len(results)
+        label = Label(height, arity)
+        block = BlockLevel(typ, label, height, params, results, self.reachable)
+        self.block_stack.append(block)
+        return block
+
+    def gen_block(self, instruction):
+        self.push_block("block", instruction)
+
+    def gen_loop(self, instruction):
+        block = self.push_block("loop", instruction)
+        block.label.pc = len(self.factories)
+
+    def gen_if(self, instruction):
+        if self.reachable:
+            self.height -= 1
+        block = self.push_block("if", instruction)
+        block.else_label = Label(block.height, 0)
+        if self.reachable:
+            self.emit(partial(_jump_if_zero, block.else_label))
+
+    def gen_else(self):
+        block = self.block_stack[-1]
+        assert block.typ == "if"
+        if self.reachable:
+            self.emit(partial(_jump, block.label))
+        block.typ = "else"
+        block.else_label.pc = len(self.factories)
+        self.height = block.height + len(block.params)
+        self.reachable = block.reachable
+
+    def gen_end(self):
+        block = self.block_stack.pop()
+        if block.typ == "if":
+            # No else part:
+            block.else_label.pc = len(self.factories)
+        if block.typ != "loop":
+            block.label.pc = len(self.factories)
+        self.height = block.height + len(block.results)
+        self.reachable = block.reachable
+
+    def get_branch_target(self, depth):
+        """ Get the label and the stack values to drop for a branch """
+        assert isinstance(depth, components.Ref)
+        label = self.block_stack[-depth.index - 1].label
+        drop_end = self.height - label.arity
+        assert drop_end >= label.height
+        return label, label.height, drop_end
+
+    def gen_br(self, instruction):
+        label, start, end = self.get_branch_target(instruction.args[0])
+        if start == end:
+            self.emit(partial(_jump, label))
+        else:
+            self.emit(partial(_unwind_jump, label, start, end))
+        self.reachable = False
+
+    def gen_br_if(self, instruction):
+        self.height -= 1
+        label, start, end = self.get_branch_target(instruction.args[0])
+        if start == end:
+            self.emit(partial(_jump_if, label))
+        else:
+            self.emit(partial(_unwind_jump_if, label, start, end))
+
+    def gen_br_table(self, instruction):
+        self.height -= 1
+        targets = [
+            self.get_branch_target(depth) for depth in instruction.args[0]
+        ]
+        self.emit(partial(_branch_table, targets))
+        self.reachable = False
+
+    def gen_return(self, instruction):
+        self.emit(_return)
+        self.reachable = False
+
+    def gen_unreachable(self, instruction):
+        self.emit(_unreachable)
+        self.reachable = False
+
+    def gen_nop(self, instruction):
+        pass
+
+    def gen_const(self, instruction):
+        value = const_value(instruction)
+        self.emit(partial(_const, value), 1)
+
+    def gen_local_get(self, instruction):
+        self.emit(partial(_local_get, instruction.args[0].index), 1)
+
+    def gen_local_set(self, instruction):
+        self.emit(partial(_local_set, instruction.args[0].index), -1)
+
+    def gen_local_tee(self, instruction):
+        self.emit(partial(_local_tee, instruction.args[0].index))
+
+    def gen_global_get(self, instruction):
+        index = instruction.args[0].index
+        if index in self.instance._imported_globals:
+            wasm_global = self.instance._imported_globals[index]
+            self.emit(partial(_imported_global_get, wasm_global), 1)
+        else:
+            self.emit(partial(_global_get, self.instance._globals, index), 1)
+
+    def gen_global_set(self, instruction):
+        index = instruction.args[0].index
+        if index in self.instance._imported_globals:
+            wasm_global = self.instance._imported_globals[index]
+            self.emit(partial(_imported_global_set, wasm_global), -1)
+        else:
+            self.emit(
+                partial(_global_set, self.instance._globals, index), -1
+            )
+
+    def gen_drop(self, instruction):
+        self.emit(_drop, -1)
+
+    def gen_select(self, instruction):
+        self.emit(_select, -2)
+
+    def gen_op(self, make, function, effect, instruction):
+        self.emit(partial(make, function), effect)
+
+    def gen_load(self, fmt, instruction):
+        _, offset = instruction.args
+        memory = self.instance._memories[0].data
+        self.emit(partial(_load, fmt.unpack_from, memory, offset))
+
+    def gen_store(self, fmt, mask, instruction):
+        _, offset = instruction.args
+        memory = self.instance._memories[0].data
+        self.emit(partial(_store, fmt.pack_into, mask, memory, offset), -2)
+
+    def gen_memory_size(self, instruction):
+        memory = self.instance._memories[0].data
+        self.emit(partial(_memory_size, memory), 1)
+
+    def gen_memory_grow(self, instruction):
+        self.emit(partial(_memory_grow, self.instance.memory_grow))
+
+    def gen_call(self, instruction):
+        index = instruction.args[0].index
+        function = self.instance._functions[index]
+        signature = self.instance._signatures[index]
+        num_params = len(signature.params)
+        num_results = len(signature.results)
+        if isinstance(function, InterpFunction):
+            # Values on the stack are in range already:
+            function = function._invoke
+        else:
+            function = _unpacked(function)
+        self.emit(
+            partial(_call, function, num_params, num_results),
+            num_results - num_params,
+        )
+
+    def gen_call_indirect(self, instruction):
+        signature = self.instance._types[instruction.args[0].index]
+        param_types = tuple(p[1] for p in signature.params)
+        result_types = tuple(signature.results)
+        table = self.instance._tables[0]
+        self.emit(
+            partial(_call_indirect, table, param_types, result_types),
+            len(result_types) - len(param_types) - 1,
+        )
+
+
+def const_value(instruction):
+    """ Get the value of a const instruction as the interpreter uses it """
+    value = instruction.args[0]
+    opcode = instruction.opcode
+    if opcode == "i32.const":
+        return _wrap32(value)
+    elif opcode == "i64.const":
+        return _wrap64(value)
+    elif opcode == "f32.const":
+        return _f32(float(value))
+    else:
+        assert opcode == "f64.const"
+        return float(value)
+
+
+# Closure factories. Each factory takes the index of the next instruction
+# and returns a function which takes the value stack and the local
+# variables and returns the index of the instruction to execute next.
+
+
+def _return(nxt):
+    def op(stack, local_vars):
+        return -1
+
+    return op
+
+
+def _unreachable(nxt):
+    def op(stack, local_vars):
+        raise Unreachable("WASM KERNEL panic!")
+
+    return op
+
+
+def _jump(label, nxt):
+    target = label.pc
+
+    def op(stack, local_vars):
+        return target
+
+    return op
+
+
+def _jump_if(label, nxt):
+    target = label.pc
+
+    def op(stack, local_vars):
+        if stack.pop():
+            return target
+        return nxt
+
+    return op
+
+
+def _jump_if_zero(label, nxt):
+    target = label.pc
+
+    def op(stack, local_vars):
+        if stack.pop():
+            return nxt
+        return target
+
+    return op
+
+
+def _unwind_jump(label, start, end, nxt):
+    target = label.pc
+
+    def op(stack, local_vars):
+        del stack[start:end]
+        return target
+
+    return op
+
+
+def _unwind_jump_if(label, start, end, nxt):
+    target = label.pc
+
+    def op(stack, local_vars):
+        if stack.pop():
+            del stack[start:end]
+            return target
+        return nxt
+
+    return op
+
+
+def _branch_table(targets, nxt):
+    targets = [(label.pc, start, end) for label, start, end in targets]
+    default = targets.pop(-1)
+    num_targets = len(targets)
+
+    def op(stack, local_vars):
+        index = stack.pop() & MASK32
+        if index < num_targets:
+            target, start, end = targets[index]
+        else:
+            target, start, end = default
+        del stack[start:end]
+        return target
+
+    return op
+
+
+def _const(value, nxt):
+    def op(stack, local_vars):
+        stack.append(value)
+        return nxt
+
+    return op
+
+
+def _local_get(index, nxt):
+    def op(stack, local_vars):
+        stack.append(local_vars[index])
+        return nxt
+
+    return op
+
+
+def _local_set(index, nxt):
+    def op(stack, local_vars):
+        local_vars[index] = stack.pop()
+        return nxt
+
+    return op
+
+
+def _local_tee(index, nxt):
+    def op(stack, local_vars):
+        local_vars[index] = stack[-1]
+        return nxt
+
+    return op
+
+
+def _global_get(global_values, index, nxt):
+    def op(stack, local_vars):
+        stack.append(global_values[index])
+        return nxt
+
+    return op
+
+
+def _global_set(global_values, index, nxt):
+    def op(stack, local_vars):
+        global_values[index] = stack.pop()
+        return nxt
+
+    return op
+
+
+def _imported_global_get(wasm_global, nxt):
+    def op(stack, local_vars):
+        stack.append(wasm_global.read())
+        return nxt
+
+    return op
+
+
+def _imported_global_set(wasm_global, nxt):
+    def op(stack, local_vars):
+        wasm_global.write(stack.pop())
+        return nxt
+
+    return op
+
+
+def _drop(nxt):
+    def op(stack, local_vars):
+        stack.pop()
+        return nxt
+
+    return op
+
+
+def _select(nxt):
+    def op(stack, local_vars):
+        condition = stack.pop()
+        b = stack.pop()
+        if not condition:
+            stack[-1] = b
+        return nxt
+
+    return op
+
+
+def _unary(function, nxt):
+    def op(stack, local_vars):
+        stack[-1] = function(stack[-1])
+        return nxt
+
+    return op
+
+
+def _binary(function, nxt):
+    def op(stack, local_vars):
+        b = stack.pop()
+        stack[-1] = function(stack[-1], b)
+        return nxt
+
+    return op
+
+
+def _load(unpack_from, memory, offset, nxt):
+    def op(stack, local_vars):
+        try:
+            stack[-1] = unpack_from(memory, (stack[-1] & MASK32) + offset)[0]
+        except struct.error:
+            raise Unreachable("Out of bounds memory access") from None
+        return nxt
+
+    return op
+
+
+def _store(pack_into, mask, memory, offset, nxt):
+    if mask is None:
+
+        def op(stack, local_vars):
+            value = stack.pop()
+            address = (stack.pop() & MASK32) + offset
+            try:
+                pack_into(memory, address, value)
+            except struct.error:
+                raise Unreachable("Out of bounds memory access") from None
+            return nxt
+
+    else:
+
+        def op(stack, local_vars):
+            value = stack.pop() & mask
+            address = (stack.pop() & MASK32) + offset
+            try:
+                pack_into(memory, address, value)
+            except struct.error:
+                raise Unreachable("Out of bounds memory access") from None
+            return nxt
+
+    return op
+
+
+def _memory_size(memory, nxt):
+    def op(stack, local_vars):
+        stack.append(len(memory) // PAGE_SIZE)
+        return nxt
+
+    return op
+
+
+def _memory_grow(memory_grow, nxt):
+    def op(stack, local_vars):
+        stack[-1] = memory_grow(stack[-1])
+        return nxt
+
+    return op
+
+
+def _call(function, num_params, num_results, nxt):
+    def op(stack, local_vars):
+        split = len(stack) - num_params
+        args = stack[split:]
+        del stack[split:]
+        result = function(args)
+        if num_results == 1:
+            stack.append(result)
+        elif num_results > 1:
+            stack.extend(result)
+        return nxt
+
+    return op
+
+
+def _unpacked(function):
+    """ Call a function with a list of arguments """
+    return lambda args: function(*args)
+
+
+def lookup_indirect(table, index, param_types, result_types):
+    """ Get the function for call_indirect, and check its signature """
+    index &= MASK32
+    function = table[index] if index < len(table) else None
+    if function is None:
+        raise Unreachable("Undefined table element {}".format(index))
+    if isinstance(function, InterpFunction) and (
+        function.param_types != param_types
+        or function.result_types != result_types
+    ):
+        raise Unreachable("Indirect call signature mismatch")
+    return function
+
+
+def _call_indirect(table, param_types, result_types, nxt):
+    num_params = len(param_types)
+    num_results = len(result_types)
+
+    def op(stack, local_vars):
+        function = lookup_indirect(
+            table, stack.pop(), param_types, result_types
+        )
+        split = len(stack) - num_params
+        args = stack[split:]
+        del stack[split:]
+        if isinstance(function, InterpFunction):
+            result = function._invoke(args)
+        else:
+            result = function(*args)
+        if num_results == 1:
+            stack.append(result)
+        elif num_results > 1:
+            stack.extend(result)
+        return nxt
+
+    return op
+
+
+# Value semantics. Integers are stored as signed python integers, and
+# floats as python floats, where f32 values are rounded to single
+# precision.
+
+
+def _wrap32(value):
+    return ((value + 0x80000000) & MASK32) - 0x80000000
+
+
+def _wrap64(value):
+    return ((value + 0x8000000000000000) & MASK64) - 0x8000000000000000
+
+
+def _f32(value):
+    """ Round a float to single precision """
+    try:
+        return _F32.unpack(_F32.pack(value))[0]
+    except OverflowError:
+        return math.copysign(math.inf, value)
+
+
+# Conversion of values into the representation of the interpreter:
+VALUE_WRAPPERS = {
+    "i32": _wrap32,
+    "i64": _wrap64,
+    "f32": lambda value: _f32(float(value)),
+    "f64": float,
+}
+
+
+def _div(a, b):
+    """ Division rounding towards zero """
+    if b == 0:
+        raise Unreachable("Integer divide by zero")
+    quotient = abs(a) // abs(b)
+    return -quotient if (a < 0) != (b < 0) else quotient
+
+
+def _div_u(a, b):
+    if b == 0:
+        raise Unreachable("Integer divide by zero")
+    return a // b
+
+
+def _rem_u(a, b):
+    if b == 0:
+        raise Unreachable("Integer divide by zero")
+    return a % b
+
+
+def _fdiv(a, b):
+    """ IEEE float division """
+    try:
+        return a / b
+    except ZeroDivisionError:
+        if a == 0 or math.isnan(a):
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+def _make_int_ops(bits, wrap):
+    mask = (1 << bits) - 1
+    shift_mask = bits - 1
+
+    def div_s(a, b):
+        quotient = _div(a, b)
+        if quotient != wrap(quotient):
+            raise Unreachable("Integer overflow")
+        return quotient
+
+    return {
+        "add": lambda a, b: wrap(a + b),
+        "sub": lambda a, b: wrap(a - b),
+        "mul": lambda a, b: wrap(a * b),
+        "div_s": div_s,
+        "div_u": lambda a, b: wrap(_div_u(a & mask, b & mask)),
+        "rem_s": lambda a, b: a - b * _div(a, b),
+        "rem_u": lambda a, b: wrap(_rem_u(a & mask, b & mask)),
+        "and": lambda a, b: a & b,
+        "or": lambda a, b: a | b,
+        "xor": lambda a, b: a ^ b,
+        "shl": lambda a, b: wrap(a << (b & shift_mask)),
+        "shr_s": lambda a, b: a >> (b & shift_mask),
+        "shr_u": lambda a, b: wrap((a & mask) >> (b & shift_mask)),
+        "eq": lambda a, b: int(a == b),
+        "ne": lambda a, b: int(a != b),
+        "lt_s": lambda a, b: int(a < b),
+        "lt_u": lambda a, b: int((a & mask) < (b & mask)),
+        "gt_s": lambda a, b: int(a > b),
+        "gt_u": lambda a, b: int((a & mask) > (b & mask)),
+        "le_s": lambda a, b: int(a <= b),
+        "le_u": lambda a, b: int((a & mask) <= (b & mask)),
+        "ge_s": lambda a, b: int(a >= b),
+        "ge_u": lambda a, b: int((a & mask) >= (b & mask)),
+    }
+
+
+def _make_float_ops(rounding):
+    return {
+        "add": lambda a, b: rounding(a + b),
+        "sub": lambda a, b: rounding(a - b),
+        "mul": lambda a, b: rounding(a * b),
+        "div": lambda a, b: rounding(_fdiv(a, b)),
+        "eq": lambda a, b: int(a == b),
+        "ne": lambda a, b: int(a != b),
+        "lt": lambda a, b: int(a < b),
+        "gt": lambda a, b: int(a > b),
+        "le": lambda a, b: int(a <= b),
+        "ge": lambda a, b: int(a >= b),
+    }
+
+
+def _make_binary_ops():
+    ops = {}
+    for prefix, table in [
+        ("i32", _make_int_ops(32, _wrap32)),
+        ("i64", _make_int_ops(64, _wrap64)),
+        ("f32", _make_float_ops(_f32)),
+        ("f64", _make_float_ops(float)),
+    ]:
+        for name, function in table.items():
+            ops["{}.{}".format(prefix, name)] = function
+    return ops
+
+
+BINARY_OPS = _make_binary_ops()
+
+UNARY_OPS = {
+    "i32.eqz": lambda a: int(a == 0),
+    "i64.eqz": lambda a: int(a == 0),
+    "f32.neg": lambda a: -a,
+    "f64.neg": lambda a: -a,
+    "i32.wrap_i64": _wrap32,
+    "i64.extend_i32_s": lambda a: a,
+    "i64.extend_i32_u": lambda a: a & MASK32,
+    "f32.convert_i32_s": lambda a: _f32(float(a)),
+    "f32.convert_i32_u": lambda a: _f32(float(a & MASK32)),
+    "f32.convert_i64_s": lambda a: _f32(float(a)),
+    "f32.convert_i64_u": lambda a: _f32(float(a & MASK64)),
+    "f64.convert_i32_s": float,
+    "f64.convert_i32_u": lambda a: float(a & MASK32),
+    "f64.convert_i64_s": float,
+    "f64.convert_i64_u": lambda a: float(a & MASK64),
+    "f32.demote_f64": _f32,
+    "f64.promote_f32": lambda a: a,
+}
+
+
+def _rounded_f32(function):
+    return lambda *args: _f32(function(*args))
+
+
+def _as_is(function):
+    return function
+
+
+# Instructions implemented by the wasm runtime functions, with a
+# wrapper for the result:
+RUNTIME_OPS = {
+    "f32_sqrt": _rounded_f32,
+    "f64_sqrt": _as_is,
+    "i32_rotl": _as_is,
+    "i64_rotl": _as_is,
+    "i32_rotr": _as_is,
+    "i64_rotr": _as_is,
+    "i32_clz": _as_is,
+    "i64_clz": _as_is,
+    "i32_ctz": _as_is,
+    "i64_ctz": _as_is,
+    "i32_popcnt": _as_is,
+    "i64_popcnt": _as_is,
+    "i32_trunc_f32_s": _as_is,
+    "i32_trunc_f32_u": _as_is,
+    "i32_trunc_f64_s": _as_is,
+    "i32_trunc_f64_u": _as_is,
+    "i64_trunc_f32_s": _as_is,
+    "i64_trunc_f32_u": _as_is,
+    "i64_trunc_f64_s": _as_is,
+    "i64_trunc_f64_u": _as_is,
+    "i32_trunc_sat_f32_s": _as_is,
+    "i32_trunc_sat_f32_u": _as_is,
+    "i32_trunc_sat_f64_s": _as_is,
+    "i32_trunc_sat_f64_u": _as_is,
+    "i64_trunc_sat_f32_s": _as_is,
+    "i64_trunc_sat_f32_u": _as_is,
+    "i64_trunc_sat_f64_s": _as_is,
+    "i64_trunc_sat_f64_u": _as_is,
+    "f64_reinterpret_i64": _as_is,
+    "i64_reinterpret_f64": _as_is,
+    "f32_reinterpret_i32": _as_is,
+    "i32_reinterpret_f32": _as_is,
+    "f32_copysign": _as_is,
+    "f64_copysign": _as_is,
+    "f32_min": _as_is,
+    "f32_max": _as_is,
+    "f64_min": _as_is,
+    "f64_max": _as_is,
+    "f32_abs": _as_is,
+    "f64_abs": _as_is,
+    "f32_floor": _as_is,
+    "f64_floor": _as_is,
+    "f32_nearest": _as_is,
+    "f64_nearest": _as_is,
+    "f32_ceil": _as_is,
+    "f64_ceil": _as_is,
+    "f32_trunc": _as_is,
+    "f64_trunc": _as_is,
+    "i32_extend8_s": _as_is,
+    "i32_extend16_s": _as_is,
+    "i64_extend8_s": _as_is,
+    "i64_extend16_s": _as_is,
+    "i64_extend32_s": _as_is,
+}
+
+# Struct formats for loads:
+LOAD_FORMATS = {
+    "i32.load": struct.Struct("<i"),
+    "i64.load": struct.Struct("<q"),
+    "f32.load": struct.Struct("<f"),
+    "f64.load": struct.Struct("<d"),
+    "i32.load8_s": struct.Struct("<b"),
+    "i32.load8_u": struct.Struct("<B"),
+    "i32.load16_s": struct.Struct("<h"),
+    "i32.load16_u": struct.Struct("<H"),
+    "i64.load8_s": struct.Struct("<b"),
+    "i64.load8_u": struct.Struct("<B"),
+    "i64.load16_s": struct.Struct("<h"),
+    "i64.load16_u": struct.Struct("<H"),
+    "i64.load32_s": struct.Struct("<i"),
+    "i64.load32_u": struct.Struct("<I"),
+}
+
+# Struct formats and value masks for stores:
+STORE_FORMATS = {
+    "i32.store": (struct.Struct("<i"), None),
+    "i64.store": (struct.Struct("<q"), None),
+    "f32.store": (struct.Struct("<f"), None),
+    "f64.store": (struct.Struct("<d"), None),
+    "i32.store8": (struct.Struct("<B"), 0xFF),
+    "i32.store16": (struct.Struct("<H"), 0xFFFF),
+    "i64.store8": (struct.Struct("<B"), 0xFF),
+    "i64.store16": (struct.Struct("<H"), 0xFFFF),
+    "i64.store32": (struct.Struct("<I"), MASK32),
+}
@@ -0,0 +1,594 @@
+""" Instantiate a wasm module in tiers.
+
+All functions start in the interpreter. Each function counts its calls,
+and when a function has been called often enough, it is compiled to
+native code in a background thread. Once compiled, calls to the function
+are redirected to the native code. Cold functions are never compiled,
+so instantiation is as fast as with the interpreter.
+
+A hot function is compiled on its own. To do this, it is placed in a
+wasm module of its own, in which everything it refers to is imported
+from the interpreter:
+
+- Calls to other functions become calls to imported functions, which
+  call the callee in its current tier. Recursive calls stay native.
+- global.get and global.set become calls to imported getters and setters.
+- call_indirect becomes a call to an imported function, which looks up
+  the function in the table of the interpreter.
+- The native code accesses the linear memory of the interpreter directly.
+  Each access is checked against the memory size, which is kept in a
+  global of the native code.
+- Divisions are checked for a zero divisor and for overflow, since these
+  do not trap in the same way on each platform.
+
+Exceptions raised by python code called from native code cannot pass
+through the native code. They are stored, and the native code checks
+for a stored exception after each call which can raise one. When there
+is one, the native code returns at once, and the exception is raised
+again when the native code returns to python.
+"""
+
+import ctypes
+import inspect
+import logging
+import queue
+import struct
+import threading
+from ... import ir
+from ...irutils import verify_module
+from ...utils.codepage import get_ctypes_type, load_obj
+from .. import components
+from .. import wasm_to_ir
+from ._interp_instance import InterpModuleInstance, InterpFunction
+from ._interp_instance import lookup_indirect, LOAD_FORMATS, STORE_FORMATS
+from .runtime import Unreachable
+
+logger = logging.getLogger("instantiate")
+
+IR_TYPES = {"i32": ir.i32, "i64": ir.i64, "f32": ir.f32, "f64": ir.f64}
+
+# Instructions which are compiled into runtime calls which can raise:
+TRAPPING_OPCODES = {
+    "i32.trunc_f32_s",
+    "i32.trunc_f32_u",
+    "i32.trunc_f64_s",
+    "i32.trunc_f64_u",
+    "i64.trunc_f32_s",
+    "i64.trunc_f32_u",
+    "i64.trunc_f64_s",
+    "i64.trunc_f64_u",
+}
+
+
+# Instructions which are checked before they are executed natively:
+DIVISION_OPCODES = {
+    "{}.{}".format(typ, operation)
+    for typ in ("i32", "i64")
+    for operation in ("div_s", "div_u", "rem_s", "rem_u")
+}
+
+MEMORY_OPCODES = set(LOAD_FORMATS) | set(STORE_FORMATS)
+
+
+def tiered_instantiate(module, imports, reporter, cache_file):
+    """ Load wasm module as a TieredModuleInstance """
+    logger.info("Instantiating wasm module in tiers")
+    reporter.message(
+        "Interpreting wasm module, hot functions are compiled later"
+    )
+    return TieredModuleInstance(module, imports)
+
+
+class TieredModuleInstance(InterpModuleInstance):
+    """ Wasm module which is interpreted, and compiled where it is hot """
+
+    #: The amount of calls after which a function is compiled.
+    hot_threshold = 1000
+
+    def __init__(self, module, imports):
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._code_modules = []
+        self._errors = []
+        self._global_types = []
+        for definition in module:
+            if isinstance(definition, components.Import):
+                if definition.kind == "global":
+                    self._global_types.append(definition.info[0])
+            elif isinstance(definition, components.Global):
+                self._global_types.append(definition.typ)
+        super().__init__(module, imports)
+
+    def create_function(self, definition, signature):
+        index = len(self._functions)
+        return TieredFunction(self, definition, signature, index)
+
+    def promote(self, function):
+        """ Schedule compilation of the given function to native code """
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._compile_worker,
+                    name="wasm-tier-up",
+                    daemon=True,
+                )
+                self._worker.start()
+        self._queue.put(function)
+
+    def wait_for_promotions(self):
+        """ Block until all scheduled compilations are done """
+        self._queue.join()
+
+    def _compile_worker(self):
+        from ...api import get_current_arch
+
+        # Determine the architecture here, since that takes a while:
+        arch = get_current_arch()
+        while True:
+            function = self._queue.get()
+            try:
+                if arch is None:
+                    logger.debug("No native target, interpreting %s", function)
+                else:
+                    self._compile(arch, function)
+            except Exception as ex:  # pylint: disable=broad-except
+                logger.warning(
+                    "Cannot compile %s, keep interpreting it: %s",
+                    function,
+                    ex,
+                )
+            finally:
+                self._queue.task_done()
+
+    def _compile(self, arch, function):
+        """ Compile a single function and redirect calls to it """
+        from ...api import ir_to_object
+
+        logger.debug("Compiling hot function %s", function)
+        wasm_module, callbacks = self.extract_function(function)
+        ppci_module = wasm_to_ir(
+            wasm_module, arch.info.get_type_info("ptr")
+        )
+        verify_module(ppci_module)
+        obj = ir_to_object([ppci_module], arch)
+
+        imports = {}
+        for external in ppci_module.externals:
+            name = external.name
+            if name in callbacks:
+                imports[name] = callbacks[name]
+            elif name.startswith("wasm_rt_"):
+                runtime_function = self._imports[name]
+                imports[name] = self._callback(
+                    runtime_function, inspect.signature(runtime_function)
+                )
+        code_module = load_obj(obj, imports=imports)
+        native = NativeFunction(
+            self, code_module, function.param_types, function.result_types
+        )
+
+        # Swap in the native code:
+        with self._lock:
+            if self._memories:
+                self._set_memory_address(code_module)
+            self._code_modules.append(code_module)
+            function.native = native
+            self._functions[function.index] = native
+        logger.debug("Promoted %s to native code", function)
+
+    def extract_function(self, function):
+        """ Create a wasm module which contains only the given function.
+
+        Returns the module and the python functions it imports.
+        """
+        definitions = list(self._types)
+        extra_types = {}
+        imports = []
+        import_indices = {}
+        callbacks = {}
+
+        def import_function(name, params, results, callback):
+            if name not in import_indices:
+                key = (params, results)
+                if key not in extra_types:
+                    extra_types[key] = len(definitions)
+                    definitions.append(
+                        components.Type(
+                            len(definitions),
+                            list(enumerate(params)),
+                            list(results),
+                        )
+                    )
+                import_indices[name] = len(imports)
+                imports.append(
+                    components.Import(
+                        "tiered",
+                        name,
+                        "func",
+                        len(imports),
+                        (components.Ref("type", index=extra_types[key]),),
+                    )
+                )
+                callbacks["tiered_{}".format(name)] = self._callback(
+                    callback, make_signature(params, results)
+                )
+            return import_indices[name]
+
+        def emit(opcode, *args):
+            body.append(components.Instruction(opcode, *args))
+
+        def temp_local(role, typ):
+            # Scratch locals are added after the locals of the function:
+            key = (role, typ)
+            if key not in temp_locals:
+                temp_locals[key] = first_temp + len(temp_locals)
+            return components.Ref("local", index=temp_locals[key])
+
+        def trap_if(message):
+            # Trap when the value on the stack is not zero:
+            ref = import_function(
+                "trap_{}".format(message.replace(" ", "_")),
+                (),
+                (),
+                _raise_unreachable(message),
+            )
+            body.append(components.BlockInstruction("if", "emptyblock"))
+            emit("call", components.Ref("func", index=ref))
+            for result_type in function.result_types:
+                emit("{}.const".format(result_type), 0)
+            emit("return")
+            emit("end")
+
+        def check_address(opcode, offset):
+            # Check the address on the stack, and leave it there:
+            address = temp_local("address", "i32")
+            emit("local.tee", address)
+            emit("i64.extend_i32_u")
+            emit("i64.const", offset + access_size(opcode))
+            emit("i64.add")
+            emit("global.get", components.Ref("global", index=0))
+            emit("i64.gt_u")
+            trap_if("out of bounds memory access")
+            emit("local.get", address)
+
+        def check_division(opcode):
+            # Check the operands on the stack, and leave them there:
+            typ, operation = opcode.split(".")
+            divisor = temp_local("divisor", typ)
+            dividend = temp_local("dividend", typ)
+            emit("local.set", divisor)
+            emit("local.get", divisor)
+            emit("{}.eqz".format(typ))
+            trap_if("integer divide by zero")
+            emit("local.set", dividend)
+            if operation == "div_s":
+                emit("local.get", dividend)
+                emit("{}.const".format(typ), -(1 << (int(typ[1:]) - 1)))
+                emit("{}.eq".format(typ))
+                emit("local.get", divisor)
+                emit("{}.const".format(typ), -1)
+                emit("{}.eq".format(typ))
+                emit("i32.and")
+                trap_if("integer overflow")
+            elif operation == "rem_s":
+                # The remainder of a division by -1 is zero, divide by 1
+                # instead to prevent an overflow:
+                emit("local.get", divisor)
+                emit("{}.const".format(typ), -1)
+                emit("{}.eq".format(typ))
+                body.append(components.BlockInstruction("if", "emptyblock"))
+                emit("{}.const".format(typ), 1)
+                emit("local.set", divisor)
+                emit("end")
+            emit("local.get", dividend)
+            emit("local.get", divisor)
+
+        def check_trap():
+            # Return from the function when python code raised an error.
+            # The value returned does not matter, since the error is
+            # raised when the native code returns to python:
+            ref = import_function("trapped", (), ("i32",), self._trapped)
+            body.append(
+                components.Instruction(
+                    "call", components.Ref("func", index=ref)
+                )
+            )
+            body.append(components.BlockInstruction("if", "emptyblock"))
+            for result_type in function.result_types:
+                body.append(
+                    components.Instruction("{}.const".format(result_type), 0)
+                )
+            body.append(components.Instruction("return"))
+            body.append(components.Instruction("end"))
+
+        callbacks["wasm_rt_memory_grow"] = self._callback(
+            self.memory_grow, make_signature(("i32",), ("i32",))
+        )
+        callbacks["wasm_rt_memory_size"] = self._callback(
+            self.memory_size, make_signature((), ("i32",))
+        )
+
+        # Replace everything outside the function by imports:
+        body = []
+        temp_locals = {}
+        first_temp = len(function.param_types) + len(
+            function.definition.locals
+        )
+        for instruction in function.definition.instructions:
+            opcode = instruction.opcode
+            if opcode in DIVISION_OPCODES:
+                check_division(opcode)
+            elif opcode in MEMORY_OPCODES:
+                if opcode.split(".")[1].startswith("store"):
+                    # Check the address below the value to store:
+                    value = temp_local("value", opcode.split(".")[0])
+                    emit("local.set", value)
+                    check_address(opcode, instruction.args[1])
+                    emit("local.get", value)
+                else:
+                    check_address(opcode, instruction.args[1])
+
+            if opcode == "call":
+                index = instruction.args[0].index
+                if index == function.index:
+                    # Recursion, refer to the function itself later on:
+                    body.append(None)
+                    check_trap()
+                    continue
+                signature = self._signatures[index]
+                ref = import_function(
+                    "func{}".format(index),
+                    tuple(p[1] for p in signature.params),
+                    tuple(signature.results),
+                    self._call_function(index),
+                )
+            elif opcode == "global.get":
+                index = instruction.args[0].index
+                ref = import_function(
+                    "global{}_get".format(index),
+                    (),
+                    (self._global_types[index],),
+                    self._global_getter(index),
+                )
+            elif opcode == "global.set":
+                index = instruction.args[0].index
+                ref = import_function(
+                    "global{}_set".format(index),
+                    (self._global_types[index],),
+                    (),
+                    self._global_setter(index),
+                )
+            elif opcode == "call_indirect":
+                index = instruction.args[0].index
+                signature = self._types[index]
+                ref = import_function(
+                    "call_indirect{}".format(index),
+                    tuple(p[1] for p in signature.params) + ("i32",),
+                    tuple(signature.results),
+                    self._call_indirect(index),
+                )
+            else:
+                body.append(instruction)
+                if opcode in TRAPPING_OPCODES:
+                    check_trap()
+                continue
+            body.append(
+                components.Instruction(
+                    "call", components.Ref("func", index=ref)
+                )
+            )
+            if opcode in ("call", "call_indirect"):
+                check_trap()
+
+        func_index = len(imports)
+        func_ref = components.Ref("func", index=func_index)
+        body = [
+            components.Instruction("call", func_ref) if i is None else i
+            for i in body
+        ]
+        definitions.extend(imports)
+        if self._memories:
+            definitions.append(components.Memory(0, 0))
+            definitions.append(
+                components.Global(
+                    "$mem_size",
+                    "i64",
+                    True,
+                    [components.Instruction("i64.const", 0)],
+                )
+            )
+        local_types = sorted(temp_locals, key=temp_locals.get)
+        definitions.append(
+            components.Func(
+                func_index,
+                function.definition.ref,
+                list(function.definition.locals)
+                + [(None, typ) for _, typ in local_types],
+                body,
+            )
+        )
+        definitions.append(components.Export("hot", "func", func_ref))
+        return components.Module(*definitions), callbacks
+
+    def _callback(self, function, signature):
+        """ Wrap a python function, such that native code can call it """
+        errors = self._errors
+        if signature.return_annotation in (ir.f32, ir.f64):
+            default = 0.0
+        elif signature.return_annotation is None:
+            default = None
+        else:
+            default = 0
+
+        def callback(*args):
+            try:
+                return function(*args)
+            except Exception as ex:  # pylint: disable=broad-except
+                errors.append(ex)
+                return default
+
+        callback.__signature__ = signature
+        return callback
+
+    def _trapped(self):
+        return 1 if self._errors else 0
+
+    def _call_function(self, index):
+        functions = self._functions
+
+        def call(*args):
+            return functions[index](*args)
+
+        return call
+
+    def _global_getter(self, index):
+        if index in self._imported_globals:
+            return self._imported_globals[index].read
+        global_values = self._globals
+
+        def get_global():
+            return global_values[index]
+
+        return get_global
+
+    def _global_setter(self, index):
+        if index in self._imported_globals:
+            return self._imported_globals[index].write
+        global_values = self._globals
+
+        def set_global(value):
+            global_values[index] = value
+
+        return set_global
+
+    def _call_indirect(self, type_index):
+        signature = self._types[type_index]
+        param_types = tuple(p[1] for p in signature.params)
+        result_types = tuple(signature.results)
+        table = self._tables[0]
+
+        def call_indirect(*args):
+            function = lookup_indirect(
+                table, args[-1], param_types, result_types
+            )
+            return function(*args[:-1])
+
+        return call_indirect
+
+    def memory_size(self):
+        """ return memory size in pages """
+        return self._memories[0].memory_size()
+
+    def memory_grow(self, amount):
+        # Growing may move the memory, so update the native code:
+        with self._lock:
+            old_size = super().memory_grow(amount)
+            for code_module in self._code_modules:
+                self._set_memory_address(code_module)
+        return old_size
+
+    def _set_memory_address(self, code_module):
+        """ Let native code refer to the memory of the interpreter, and
+        tell it the size of the memory. """
+        data = self._memories[0].data
+        if data:
+            # Only keep the buffer export for a moment, or else the
+            # memory cannot grow anymore:
+            buffer = (ctypes.c_char * len(data)).from_buffer(data)
+            address = ctypes.addressof(buffer)
+            del buffer
+        else:
+            address = 0
+        offset = code_module.get_symbol_offset("wasm_mem0_address")
+        code_module._data_page.seek(offset)
+        code_module._data_page.write(struct.pack("P", address))
+        offset = code_module.get_symbol_offset("global__mem_size")
+        code_module._data_page.seek(offset)
+        code_module._data_page.write(struct.pack("<q", len(data)))
+
+
+def access_size(opcode):
+    """ Get the amount of bytes accessed by a load or store """
+    typ, operation = opcode.split(".")
+    bits = operation.replace("load", "").replace("store", "").split("_")[0]
+    return int(bits or typ[1:]) // 8
+
+
+def _raise_unreachable(message):
+    def trap():
+        raise Unreachable(message)
+
+    return trap
+
+
+def make_signature(params, results):
+    """ Create a signature with ir types, as used to load native code """
+    parameters = [
+        inspect.Parameter(
+            "arg{}".format(nr),
+            inspect.Parameter.POSITIONAL_ONLY,
+            annotation=IR_TYPES[typ],
+        )
+        for nr, typ in enumerate(params)
+    ]
+    return_type = IR_TYPES[results[0]] if results else None
+    return inspect.Signature(parameters, return_annotation=return_type)
+
+
+class TieredFunction(InterpFunction):
+    """ An interpreted function which counts how often it is called. """
+
+    def __init__(self, instance, definition, signature, index):
+        super().__init__(instance, definition, signature)
+        self.index = index
+        self.calls = 0
+        self.native = None
+
+    def __repr__(self):
+        return "TieredFunction({})".format(self.definition.id)
+
+    def _invoke(self, local_vars):
+        native = self.native
+        if native is not None:
+            return native(*local_vars)
+
+        self.calls += 1
+        if self.calls == self._instance.hot_threshold:
+            self._instance.promote(self)
+        return super()._invoke(local_vars)
+
+
+class NativeFunction:
+    """ A wasm function which is compiled to native code. """
+
+    def __init__(self, instance, code_module, param_types, result_types):
+        self._instance = instance
+        self._code_module = code_module
+        self.param_types = param_types
+        self.result_types = result_types
+
+        # The code has no debug info, so determine its type from wasm:
+        signature = make_signature(param_types, result_types)
+        restype = get_ctypes_type(signature.return_annotation)
+        argtypes = [
+            get_ctypes_type(p.annotation)
+            for p in signature.parameters.values()
+        ]
+        function_type = ctypes.CFUNCTYPE(restype, *argtypes)
+        self._function = function_type(
+            code_module.get_symbol_address("hot")
+        )
+
+    def __call__(self, *args):
+        result = self._function(*args)
+
+        # Raise errors which occurred in python code called by native code:
+        errors = self._instance._errors
+        if errors:
+            error = errors[0]
+            errors.clear()
+            raise error
+
+        if self.result_types:
+            return result
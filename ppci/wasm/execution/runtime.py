@@ -73,60 +73,46 @@ def i64_popcnt(v: ir.i64) -> ir.i64:
 
 
 # Conversions:
+def truncate(value: float, lower_limit, upper_limit) -> int:
+    """ Truncate a float, trap when the result is not representable """
+    if math.isnan(value) or math.isinf(value):
+        raise Unreachable("invalid conversion to integer")
+    result = int(value)
+    if result > upper_limit or result < lower_limit:
+        raise Unreachable("integer overflow")
+    return result
+
+
 def i32_trunc_f32_s(value: ir.f32) -> ir.i32:
-    if math.isinf(value):
-        return 0  # undefined
-    else:
-        return int(value)
+    return truncate(value, MIN_I32, MAX_I32)
 
 
 def i32_trunc_f32_u(value: ir.f32) -> ir.i32:
-    if math.isinf(value):
-        return 0  # undefined
-    else:
-        return make_int(value, 32)
+    return make_int(truncate(value, MIN_U32, MAX_U32), 32)
 
 
 def i32_trunc_f64_s(value: ir.f64) -> ir.i32:
-    if math.isinf(value):
-        return 0  # undefined
-    else:
-        return int(value)
+    return truncate(value, MIN_I32, MAX_I32)
 
 
 def i32_trunc_f64_u(value: ir.f64) -> ir.i32:
-    if math.isinf(value):
-        return 0  # undefined
-    else:
-        return make_int(value, 32)
+    return make_int(truncate(value, MIN_U32, MAX_U32), 32)
 
 
 def i64_trunc_f32_s(value: ir.f32) -> ir.i64:
-    if math.isinf(value):
-        return 0  # undefined
-    else:
-        return int(value)
+    return truncate(value, MIN_I64, MAX_I64)
 
 
 def i64_trunc_f32_u(value: ir.f32) -> ir.i64:
-    if math.isinf(value):
-        return 0  # undefined
-    else:
-        return make_int(value, 64)
+    return make_int(truncate(value, MIN_U64, MAX_U64), 64)
 
 
 def i64_trunc_f64_s(value: ir.f64) -> ir.i64:
-    if math.isinf(value):
-        return 0  # undefined
-    else:
-        return int(value)
+    return truncate(value, MIN_I64, MAX_I64)
 
 
 def i64_trunc_f64_u(value: ir.f64) -> ir.i64:
-    if math.isinf(value):
-        return 0  # undefined
-    else:
-        return make_int(value, 64)
+    return make_int(truncate(value, MIN_U64, MAX_U64), 64)
 
 
 # saturated trunc
@@ -260,6 +260,10 @@ instruction_table = [
 OPCODES = {r[0]: r[1] for r in instruction_table}
 REVERZ = {r[1]: r[0] for r in instruction_table}
 
+# Dense numbering of the opcodes, used to store instructions compactly:
+OPCODE_NAMES = tuple(r[0] for r in instruction_table)
+OPCODE_NUMBERS = {name: nr for nr, name in enumerate(OPCODE_NAMES)}
+
 OPERANDS = {r[0]: r[2] if len(r) > 2 else () for r in instruction_table}
 EVAL = {
     r[0]: (r[3], r[4], r[5]) if len(r) >= 6 else ((), (), None)
@@ -1,9 +1,14 @@
 """ Convert Web Assembly (WASM) into PPCI IR. """
 
 import logging
+import multiprocessing
+import os
 import struct
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from .. import ir
 from .. import irutils
+from ..irutils.io import DictReader, DictWriter
 from .. import common
 from ..binutils import debuginfo
 from ..arch.arch_info import TypeInfo
@@ -13,7 +18,7 @@ from .util import sanitize_name
 
 
 def wasm_to_ir(
-    wasm_module: components.Module, ptr_info, reporter=None
+    wasm_module: components.Module, ptr_info, reporter=None, workers=1
 ) -> ir.Module:
     """ Convert a WASM module into a PPCI native module.
 
@@ -21,11 +26,16 @@ def wasm_to_ir(
         wasm_module (ppci.wasm.Module): The wasm-module to compile
         ptr_info: :class:`ppci.arch.arch_info.TypeInfo` size and
                   alignment information for pointers.
+        workers: the amount of processes in which function bodies are
+                 translated. The result is the same as with a single
+                 worker. Small modules are always translated in this
+                 process, since starting the workers and reading back
+                 their results takes longer than translating them.
 
     Returns:
         An IR-module.
     """
-    compiler = WasmToIrCompiler(ptr_info)
+    compiler = WasmToIrCompiler(ptr_info, workers=workers)
     ppci_module = compiler.generate(wasm_module)
     if reporter:
         reporter.dump_ir(ppci_module)
@@ -39,12 +49,19 @@ class WasmToIrCompiler:
     logger = logging.getLogger("wasm2ir")
     verbose = False
 
-    def __init__(self, ptr_info):
+    #: The amount of instructions in the function bodies from which
+    #: they are translated in worker processes. Reading back the
+    #: results of the workers costs nearly as much as translating the
+    #: functions, so the workers only pay off for big modules.
+    parallel_threshold = 100000
+
+    def __init__(self, ptr_info, workers=1):
         self.builder = irutils.Builder()
         self.blocknr = 0
         if not isinstance(ptr_info, TypeInfo):
             raise TypeError("Expected ptr_info to be TypeInfo")
         self.ptr_info = ptr_info
+        self.workers = workers
         self._opcode_dispatch = {}
         self._fill_dispatch_table()
 
@@ -199,8 +216,13 @@ class WasmToIrCompiler:
             self.gen_definition(definition)
 
         # Generate functions:
-        for ppci_function, signature, wasm_function in self.gen_functions:
-            self.generate_function(ppci_function, signature, wasm_function)
+        if self.use_workers():
+            self.generate_functions_in_parallel()
+        else:
+            for ppci_function, signature, wasm_function in self.gen_functions:
+                self.generate_function(
+                    ppci_function, signature, wasm_function
+                )
 
         # Generate run_init function:
         self.gen_init_procedure()
@@ -214,6 +236,75 @@ class WasmToIrCompiler:
 
         return self.builder.module
 
+    def use_workers(self):
+        """ Check whether functions are generated in worker processes """
+        workers = min(self.workers, os.cpu_count() or 1)
+        if workers < 2 or len(self.gen_functions) < 2:
+            return False
+        size = sum(len(f[2].instructions) for f in self.gen_functions)
+        return size >= self.parallel_threshold
+
+    def generate_functions_in_parallel(self):
+        """ Generate the function bodies in a pool of processes.
+
+        The worker processes are forked from this process, and are
+        initialized with this compiler, which knows all definitions of
+        the module. Each worker translates a range of functions, and
+        returns them serialized. The bodies are then read into the
+        functions of this module.
+        """
+        if "fork" not in multiprocessing.get_all_start_methods():
+            self.logger.warning("Cannot fork, generating functions serially")
+            for ppci_function, signature, wasm_function in self.gen_functions:
+                self.generate_function(
+                    ppci_function, signature, wasm_function
+                )
+            return
+
+        # Split the functions into contiguous ranges:
+        workers = min(self.workers, os.cpu_count() or 1)
+        amount = len(self.gen_functions)
+        chunk_count = min(amount, workers * 4)
+        bounds = [amount * i // chunk_count for i in range(chunk_count + 1)]
+        chunks = [range(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+        self.logger.info(
+            "Generating %s functions in %s processes", amount, workers
+        )
+
+        # The compiler is passed to the forked workers without pickling:
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(self,),
+        ) as executor:
+            results = list(executor.map(_generate_functions, chunks))
+
+        # Read the function bodies, referring to the values of this module:
+        reader = DictReader()
+        reader.enter_scope()
+        module = self.builder.module
+        for value in module.externals + module.variables + module.functions:
+            reader.register_value(value)
+
+        for chunk, (json_externals, json_subroutines) in zip(chunks, results):
+            for json_external in json_externals:
+                # Runtime functions are created on first use:
+                name = json_external["name"]
+                if name not in self._runtime_functions:
+                    rt_func = reader.construct_external(json_external)
+                    self._runtime_functions[name] = rt_func
+                    module.add_external(rt_func)
+
+            for index, json_subroutine in zip(chunk, json_subroutines):
+                ppci_function, signature, _ = self.gen_functions[index]
+                self.gen_function_debug_info(ppci_function, signature)
+                reader.construct_subroutine_body(
+                    json_subroutine, ppci_function
+                )
+        reader.leave_scope()
+        assert not reader.undefined_values
+
     def gen_definition(self, definition):
         """ Generate code for a single wasm definition. """
         if isinstance(definition, components.Type):
@@ -442,6 +533,7 @@ class WasmToIrCompiler:
             "_run_init", ir.Binding.GLOBAL
         )
         self.builder.set_function(ppci_function)
+        self.blocknr = 0
         entryblock = self.new_block()
         self.builder.set_block(entryblock)
         ppci_function.entry = entryblock
@@ -553,6 +645,37 @@ class WasmToIrCompiler:
         assert len(self.stack) == 1
         return self.stack[-1]
 
+    def gen_function_debug_info(self, ppci_function, signature):
+        """ Enter the debug signature of a function """
+        if signature.results and len(signature.results) == 1:
+            dbg_return_type = self.get_debug_type(signature.results[0])
+        else:
+            dbg_return_type = self.get_debug_type("void")
+
+        dbg_arg_types = []
+        for i, a_typ in enumerate(signature.params):
+            dbg_arg_types.append(
+                debuginfo.DebugParameter(
+                    "arg{}".format(i), self.get_debug_type(a_typ[1])
+                )
+            )
+
+        if signature.results and len(signature.results) > 1:
+            dbg_void_ptr = debuginfo.DebugPointerType(
+                self.get_debug_type("void")
+            )
+            dbg_arg_types.append(
+                debuginfo.DebugParameter("multi_return_ptr", dbg_void_ptr)
+            )
+
+        db_function_info = debuginfo.DebugFunction(
+            ppci_function.name,
+            common.SourceLocation("main.wasm", 1, 1, 1),
+            dbg_return_type,
+            dbg_arg_types,
+        )
+        self.debug_db.enter(ppci_function, db_function_info)
+
     def generate_function(self, ppci_function, signature, wasm_function):
         """ Generate code for a single function """
         self.logger.info(
@@ -562,31 +685,23 @@ class WasmToIrCompiler:
         )
         self.stack = []
         self.block_stack = []
+        self.gen_function_debug_info(ppci_function, signature)
 
-        # Create correct debug signature for function:
-
-        if signature.results and len(signature.results) == 1:
-            dbg_return_type = self.get_debug_type(signature.results[0])
-        else:
-            dbg_return_type = self.get_debug_type("void")
+        # Block numbers start anew, so each function is named the same,
+        # whether it is generated on its own or not:
+        self.blocknr = 0
         self.builder.set_function(ppci_function)
 
         entryblock = self.new_block()
         self.builder.set_block(entryblock)
         ppci_function.entry = entryblock
 
-        dbg_arg_types = []
         self.locals = []  # todo: ak: why store on self?
 
         # First locals are the function arguments:
         for i, a_typ in enumerate(signature.params):
             ir_typ = self.get_ir_type(a_typ[1])
             ir_arg = ir.Parameter("param{}".format(i), ir_typ)
-            dbg_arg_types.append(
-                debuginfo.DebugParameter(
-                    "arg{}".format(i), self.get_debug_type(a_typ[1])
-                )
-            )
             ppci_function.add_parameter(ir_arg)
             size = ir_typ.size
             alignment = size
@@ -602,21 +717,6 @@ class WasmToIrCompiler:
                 "multiple_return_ptr", ir.ptr
             )
             ppci_function.add_parameter(multiple_return_data_ptr)
-            dbg_void_ptr = debuginfo.DebugPointerType(
-                self.get_debug_type("void")
-            )
-            dbg_arg_types.append(
-                debuginfo.DebugParameter("multi_return_ptr", dbg_void_ptr)
-            )
-
-        # Enter correct debug info:
-        db_function_info = debuginfo.DebugFunction(
-            ppci_function.name,
-            common.SourceLocation("main.wasm", 1, 1, 1),
-            dbg_return_type,
-            dbg_arg_types,
-        )
-        self.debug_db.enter(ppci_function, db_function_info)
 
         # Next are the rest of the locals:
         for i, local in enumerate(wasm_function.locals, len(self.locals)):
@@ -648,15 +748,17 @@ class WasmToIrCompiler:
             BlockLevel("block", final_block, body_block, [], final_phis, 0)
         )
 
-        # Generate code for each instruction:
+        # Generate code for each instruction, from the raw operands:
         num = len(wasm_function.instructions)
-        for nr, instruction in enumerate(wasm_function.instructions, start=1):
+        raw = components.raw_instructions(wasm_function.instructions)
+        for nr, instruction in enumerate(map(RawInstruction._make, raw), 1):
             if self.verbose:
                 self.logger.debug(
-                    "%s/%s %s [stack=%s]",
+                    "%s/%s %s %s [stack=%s]",
                     nr,
                     num,
-                    instruction.to_string(),
+                    instruction.opcode,
+                    instruction.args,
                     len(self.stack),
                 )
             self.generate_instruction(instruction)
@@ -731,8 +833,7 @@ class WasmToIrCompiler:
             param_types = []
             result_types = [block_type]
         else:
-            type_id = block_type.index
-            signature = self.wasm_types[type_id]
+            signature = self.wasm_types[block_type]
             param_types = [p[1] for p in signature.params]
             result_types = signature.results
         return param_types, result_types
@@ -956,24 +1057,24 @@ class WasmToIrCompiler:
 
     def gen_local_set(self, instruction):
         opcode = instruction.opcode
-        ty, local_var = self.locals[instruction.args[0].index]
+        ty, local_var = self.locals[instruction.args[0]]
         value = self.pop_value(ir_typ=ty)
         self.emit(ir.Store(value, local_var))
         if opcode == "local.tee":
             self.push_value(value)
 
     def gen_local_get(self, instruction):
-        ty, local_var = self.locals[instruction.args[0].index]
+        ty, local_var = self.locals[instruction.args[0]]
         value = self.emit(ir.Load(local_var, "local_get", ty))
         self.push_value(value)
 
     def gen_global_get(self, instruction):
-        ty, addr = self.globalz[instruction.args[0].index]
+        ty, addr = self.globalz[instruction.args[0]]
         value = self.emit(ir.Load(addr, "global_get", ty))
         self.push_value(value)
 
     def gen_global_set(self, instruction):
-        ty, addr = self.globalz[instruction.args[0].index]
+        ty, addr = self.globalz[instruction.args[0]]
         value = self.pop_value(ir_typ=ty)
         self.emit(ir.Store(value, addr))
 
@@ -1287,13 +1388,13 @@ class WasmToIrCompiler:
     def gen_call_instruction(self, instruction):
         """ Generate a function call """
         # Call another function!
-        idx = instruction.args[0].index
+        idx = instruction.args[0]
         ir_function, signature = self.functions[idx]
         self._gen_call_helper(ir_function, signature)
 
     def gen_call_indirect_instruction(self, instruction):
         """ Call another function by pointer! """
-        type_id = instruction.args[0].index
+        type_id = instruction.args[0]
         signature = self.wasm_types[type_id]
         func_index = self.pop_value()
         ptr_size = self.emit(ir.Const(self.ptr_info.size, "ptr_size", ir.i32))
@@ -1459,8 +1560,8 @@ class WasmToIrCompiler:
         test_value = self.pop_value()
         assert test_value.ty in [ir.i32, ir.i64]
         ir_typ = test_value.ty
-        option_labels = instruction.args[0]
-        default_label = option_labels.pop(-1)
+        # The labels are preceded by their amount:
+        *option_labels, default_label = instruction.args[1:]
         for i, option_label in enumerate(option_labels):
             # Figure which block we must jump to:
             depth = option_label
@@ -1481,8 +1582,6 @@ class WasmToIrCompiler:
     def get_jump_target_block(self, depth):
         """ Lookup the branch target and fill its optional value.
         """
-        assert isinstance(depth, components.Ref)
-        depth = depth.index
         block = self.block_stack[-depth - 1]
         if block.typ == "loop":
             self.fill_phis(block.param_phis)
@@ -1537,6 +1636,42 @@ class WasmToIrCompiler:
             self.push_value(value)
 
 
+# The compiler of a worker process, set when the worker starts:
+_worker_compiler = None
+
+
+def _init_worker(compiler):
+    """ Initialize a worker process with the compiler to use """
+    global _worker_compiler
+    _worker_compiler = compiler
+
+
+def _generate_functions(indices):
+    """ Generate some functions in a worker process, and serialize them """
+    compiler = _worker_compiler
+    known_runtime_functions = set(compiler._runtime_functions)
+    writer = DictWriter()
+    json_subroutines = []
+    for index in indices:
+        ppci_function, signature, wasm_function = compiler.gen_functions[
+            index
+        ]
+        compiler.generate_function(ppci_function, signature, wasm_function)
+        json_subroutines.append(writer.write_subroutine(ppci_function))
+
+    json_externals = [
+        writer.write_external(rt_func)
+        for name, rt_func in compiler._runtime_functions.items()
+        if name not in known_runtime_functions
+    ]
+    return json_externals, json_subroutines
+
+
+# A wasm instruction with its operands in the raw format, as produced by
+# components.raw_instructions:
+RawInstruction = namedtuple("RawInstruction", ["opcode", "args"])
+
+
 class BlockLevel:
     """ Store some info about blocks.
 
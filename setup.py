@@ -38,6 +38,8 @@ setup(
             'ppci-pedump = ppci.cli.pedump:pedump',
             'ppci-pycompile = ppci.cli.pycompile:pycompile',
             'ppci-readelf = ppci.cli.readelf:readelf',
+            'ppci-remote = ppci.cli.remote:remote',
+            'ppci-server = ppci.cli.server:server',
             'ppci-wasm2wat = ppci.cli.wasm2wat:wasm2wat',
             'ppci-wasmcompile = ppci.cli.wasmcompile:wasmcompile',
             'ppci-wat2wasm = ppci.cli.wat2wasm:wat2wasm',
@@ -79,6 +79,37 @@ class DebuggerTestCase(unittest.TestCase):
         addr = self.debugger.find_address('', 7)
         self.assertTrue(addr is not None)
 
+    def test_indexed_lookups(self):
+        """ Check the lookup tables against a search of all debug info """
+        self.debugger.load_symbols(self.obj)
+        debug_info = self.obj.debug_info
+        addresses = {
+            self.debugger.calc_address(l.address): l.loc
+            for l in debug_info.locations}
+        function = debug_info.functions[0]
+        begin = self.debugger.calc_address(function.begin)
+        end = self.debugger.calc_address(function.end)
+        for pc in range(max(begin - 8, 0), end + 8):
+            with patch.object(self.debugger, 'get_pc', return_value=pc):
+                nearest = min(addresses, key=lambda a: (abs(a - pc), a))
+                loc = addresses[nearest]
+                self.assertEqual(
+                    (loc.filename, loc.row), self.debugger.find_pc())
+                if begin <= pc < end:
+                    self.assertIs(
+                        function, self.debugger.current_function())
+                else:
+                    self.assertIsNone(self.debugger.current_function())
+
+        rows = {l.loc.row for l in debug_info.locations}
+        self.assertEqual(rows, self.debugger.get_possible_breakpoints(''))
+        self.assertEqual(set(), self.debugger.get_possible_breakpoints('x'))
+        for row in rows:
+            address = next(
+                self.debugger.calc_address(l.address)
+                for l in debug_info.locations if l.loc.row == row)
+            self.assertEqual(address, self.debugger.find_address('', row))
+
     def test_expressions_with_globals(self):
         """ See if expressions involving global variables can be evaluated """
         src = """
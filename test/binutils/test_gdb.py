@@ -62,13 +62,13 @@ class TransportMock:
     """ Test dummy to test the GDB protocol """
     def __init__(self):
         self.send_data = bytearray()
-        self.response = None
+        self.responses = []
 
     def send(self, dt):
         self.send_data.extend(dt)
-        if self.response:
-            data = self.response
-            self.response = None
+        # Acknowledgements get no response:
+        if self.responses and dt != b'+':
+            data = self.responses.pop(0)
             for byte in data:
                 self.on_byte(bytes([byte]))
 
@@ -132,8 +132,57 @@ class GdbClientTestCase(unittest.TestCase):
         self.gdbc.clear_breakpoint(98)
         self.check_send(b'$z0,62,4#9E+')
 
+    def test_get_pc(self):
+        """ Registers are read at once, and cached """
+        self.prepare_packet('2a0000000000000000000000')
+        self.assertEqual(42, self.gdbc.get_pc())
+        self.assertEqual(42, self.gdbc.get_pc())
+        self.check_send(b'$g#67+')
+
+    def test_stop_packet_registers(self):
+        """ Register values in a stop packet are cached """
+        self.gdbc._process_stop_status('T0500:10000000;')
+        self.assertEqual(16, self.gdbc.get_pc())
+        self.check_send(b'')
+
+    def test_set_registers(self):
+        """ Registers are written at once """
+        regs = self.arch.gdb_registers
+        self.prepare_response(b'+$OK#9a')
+        self.gdbc.set_registers({reg: nr for nr, reg in enumerate(regs)})
+        self.check_send(b'$G000000000100000002000000#CA+')
+        self.assertEqual(0, self.gdbc.get_pc())
+
     def test_read_mem(self):
         """ Test reading of memory """
+        page = bytes(37) + bytes([1, 2, 0x73, 9]) + bytes(23)
+        self.prepare_packet(page.hex())
+        contents = self.gdbc.read_mem(101, 4)
+        self.assertEqual(bytes([1, 2, 0x73, 9]), contents)
+        self.check_send(b'$m 40,40#81+')
+
+        # The second time, the memory is cached:
+        self.assertEqual(bytes([2, 0x73]), self.gdbc.read_mem(102, 2))
+        self.check_send(b'$m 40,40#81+')
+
+    def test_read_mem_coalesced(self):
+        """ Adjacent pages are read at once """
+        data = bytes(range(192))
+        self.prepare_packet(data.hex())
+        contents = self.gdbc.read_mem(60, 70)
+        self.assertEqual(data[60:130], contents)
+        self.check_send(b'$m 0,c0#7C+')
+
+    def test_read_mem_error(self):
+        """ When a page cannot be read, read only what is asked """
+        self.prepare_packet('E01')
+        self.prepare_packet('0102')
+        self.assertEqual(bytes([1, 2]), self.gdbc.read_mem(101, 2))
+        self.check_send(b'$m 40,40#81+$m 65,2#56+')
+
+    def test_read_mem_uncached(self):
+        """ Test reading of memory without the cache """
+        self.gdbc.cache_memory = False
         self.prepare_response(b'+$01027309#96')
         contents = self.gdbc.read_mem(101, 4)
         self.assertEqual(bytes([1, 2, 0x73, 9]), contents)
@@ -141,13 +190,60 @@ class GdbClientTestCase(unittest.TestCase):
 
     def test_write_mem(self):
         """ Test write to memory """
-        self.prepare_response(b'+$01027309#96')
+        self.prepare_response(b'+$OK#9a')
+        self.gdbc.write_mem(100, bytes([1, 2, 0x7d, 9]))
+        self.check_send(b'$X64,4:\x01\x02}]\x09#42+')
+
+    def test_write_mem_hex(self):
+        """ When binary writes are not supported, hex is used """
+        self.prepare_response(b'+$#00')
+        self.prepare_response(b'+$OK#9a')
         self.gdbc.write_mem(100, bytes([1, 2, 0x73, 9]))
-        self.check_send(b'$M 64,4:01027309#07+')
+        self.check_send(b'$X64,4:\x01\x02s\x09#DB+$M 64,4:01027309#07+')
+
+    def test_write_mem_cached(self):
+        """ Writes go into the cached memory, which is cleared on a step """
+        self.prepare_packet(bytes(64).hex())
+        self.prepare_response(b'+$OK#9a')
+        self.gdbc.read_mem(0, 4)
+        self.gdbc.write_mem(62, bytes([1, 2, 3]))
+        self.assertEqual(bytes([0, 0, 1, 2]), self.gdbc.read_mem(60, 4))
+        self.assertNotIn(1, self.gdbc._memory_cache)
+
+        self.prepare_response(b'+$S05#b8')
+        self.gdbc.step()
+        self.assertEqual({}, self.gdbc._memory_cache)
+
+    def test_write_mem_failed(self):
+        """ A failed write removes the written pages from the cache """
+        self.prepare_packet(bytes(128).hex())
+        self.prepare_packet('E01')
+        self.gdbc.read_mem(0, 128)
+        self.gdbc.write_mem(62, bytes([1, 2, 3]))
+        self.assertEqual({}, self.gdbc._memory_cache)
+
+    def test_no_ack_mode(self):
+        """ Test the negotiation of features and the no-ack mode """
+        self.prepare_packet('PacketSize=100;QStartNoAckMode+')
+        self.prepare_packet('OK')
+        self.gdbc._negotiate_features()
+        self.assertEqual(0x100, self.gdbc.max_packet_size)
+        self.assertFalse(self.gdbc._rsp.ack_mode)
+        self.check_send(b'$qSupported#37+$QStartNoAckMode#B0+')
+
+        self.transport_mock.send_data.clear()
+        self.transport_mock.responses.append(b'$OK#9a')
+        self.gdbc.set_breakpoint(98)
+        self.check_send(b'$Z0,62,4#7E')
+
+    def prepare_packet(self, message):
+        """ Prepare an acknowledged response with the given message """
+        packet = RspHandler.rsp_pack(message).encode('latin-1')
+        self.prepare_response(b'+' + packet)
 
     def prepare_response(self, data):
         """ Prepare mock that we expect this data to be received """
-        self.transport_mock.response = data
+        self.transport_mock.responses.append(data)
 
     def expect_recv(self, data):
         """ Prepare mock that we expect this data to be received """
@@ -1,10 +1,21 @@
 import unittest
 import io
+import os
+import tempfile
 
 from ppci.binutils.objectfile import ObjectFile
-from ppci.format.elf import ElfFile, write_elf
+from ppci.format.elf import ElfFile, read_elf, write_elf
 from ppci.format.elf.writer import elf_hash
-from ppci.api import get_arch
+from ppci.api import asm, get_arch
+
+
+def make_elf():
+    """ Create an x86_64 elf file with some code and a symbol """
+    src = "section code\nglobal main\nmain:\nmov rax, 60\nsyscall\n"
+    obj = asm(io.StringIO(src), "x86_64")
+    f = io.BytesIO()
+    write_elf(obj, f, type="relocatable")
+    return f.getvalue()
 
 
 class ElfFileTestCase(unittest.TestCase):
@@ -15,6 +26,58 @@ class ElfFileTestCase(unittest.TestCase):
         f2 = io.BytesIO(f.getvalue())
         ElfFile.load(f2)
 
+    def test_mmap_load(self):
+        """ Check that a mapped elf file has the same contents """
+        data = make_elf()
+        handle, filename = tempfile.mkstemp(suffix=".elf")
+        os.close(handle)
+        self.addCleanup(os.remove, filename)
+        with open(filename, "wb") as f:
+            f.write(data)
+
+        elf = read_elf(io.BytesIO(data))
+        with open(filename, "rb") as f:
+            mapped_elf = read_elf(f, use_mmap=True)
+        with mapped_elf:
+            self.assertEqual(
+                [s.name for s in elf.sections],
+                [s.name for s in mapped_elf.sections],
+            )
+            for section, mapped_section in zip(
+                elf.sections, mapped_elf.sections
+            ):
+                self.assertIsInstance(mapped_section.data, memoryview)
+                self.assertEqual(section.data, bytes(mapped_section.data))
+            code = mapped_elf.get_section("code")
+            self.assertEqual(bytes([0x0F, 0x05]), bytes(code.data[-2:]))
+
+            # The file stays mapped while a slice of it is used:
+            tail = code.data[-2:]
+            with self.assertRaises(BufferError):
+                mapped_elf.close()
+            self.assertEqual(bytes([0x0F, 0x05]), bytes(code.data[-2:]))
+            self.assertEqual(bytes([0x0F, 0x05]), bytes(tail))
+            tail.release()
+        self.assertIsNone(mapped_elf._mapped_file)
+        with self.assertRaises(ValueError):
+            bytes(code.data)
+
+    def test_symbol_table_view(self):
+        """ Check the lazily decoded symbol table """
+        elf = read_elf(io.BytesIO(make_elf()), use_mmap=True)
+        symtab = elf.get_section(".symtab")
+        table = elf.read_symbol_table(symtab)
+        names = elf.sections[symtab.header.sh_link]
+        self.assertEqual(2, len(table))
+        self.assertEqual(
+            ["", "main"], [names.get_str(e.st_name) for e in table]
+        )
+        self.assertEqual("main", names.get_str(table[-1].st_name))
+        self.assertEqual(1, len(table[1:]))
+        with self.assertRaises(IndexError):
+            table[2]
+        elf.close()
+
     def test_hash_function(self):
         examples = [
             ("jdfgsdhfsdfsd 6445dsfsd7fg/*/+bfjsdgf%$^",  248446350),
@@ -2,6 +2,8 @@
 
 import unittest
 from ppci.graph import Graph, Node, DiGraph, DiNode, MaskableGraph
+from ppci.graph.digraph import strongly_connected_components
+from ppci.graph.cfg import ControlFlowGraph, ControlFlowNode
 from ppci.codegen.interferencegraph import InterferenceGraph
 from ppci.codegen.flowgraph import FlowGraph
 from ppci.arch.generic_instructions import Nop
@@ -116,6 +118,78 @@ class DigraphTestCase(unittest.TestCase):
         g.del_node(c)
         self.assertEqual(set(), b.successors)
 
+    def test_strongly_connected_components(self):
+        g = DiGraph()
+        a = DiNode(g)
+        b = DiNode(g)
+        c = DiNode(g)
+        d = DiNode(g)
+        g.add_edge(a, b)
+        g.add_edge(b, c)
+        g.add_edge(c, b)
+        g.add_edge(c, d)
+        components = strongly_connected_components(g)
+        self.assertEqual([{d}, {b, c}, {a}], components)
+
+
+class ControlFlowGraphTestCase(unittest.TestCase):
+    def setUp(self):
+        """ Create a loop with an if statement inside:
+
+        entry -> header -> body -> then -> latch -> header
+                                -> latch
+                        -> exit
+        """
+        self.cfg = ControlFlowGraph()
+        nodes = [
+            ControlFlowNode(self.cfg, name=name)
+            for name in ("entry", "header", "body", "then", "latch", "exit")
+        ]
+        entry, header, body, then, latch, exit = nodes
+        self.cfg.entry_node = entry
+        self.cfg.exit_node = exit
+        entry.add_edge(header)
+        header.add_edge(body)
+        header.add_edge(exit)
+        body.add_edge(then)
+        body.add_edge(latch)
+        then.add_edge(latch)
+        latch.add_edge(header)
+        self.nodes = nodes
+
+    def test_post_dominators(self):
+        entry, header, body, then, latch, exit = self.nodes
+        self.assertIs(latch, self.cfg.get_immediate_post_dominator(body))
+        self.assertIs(exit, self.cfg.get_immediate_post_dominator(header))
+        self.assertIsNone(self.cfg.get_immediate_post_dominator(exit))
+        self.assertTrue(latch.post_dominates(then))
+        self.assertTrue(header.post_dominates(entry))
+        self.assertFalse(then.post_dominates(body))
+
+    def test_endless_loop(self):
+        """ Nodes in an endless loop have no post dominator """
+        entry, header, body, then, latch, exit = self.nodes
+        forever = ControlFlowNode(self.cfg, name="forever")
+        then.add_edge(forever)
+        forever.add_edge(forever)
+        self.assertIsNone(self.cfg.get_immediate_post_dominator(forever))
+        self.assertIs(header, self.cfg.get_immediate_post_dominator(latch))
+
+    def test_reach(self):
+        entry, header, body, then, latch, exit = self.nodes
+        self.assertTrue(entry.can_reach(exit))
+        self.assertTrue(header.can_reach(header))
+        self.assertFalse(entry.can_reach(entry))
+        self.assertFalse(exit.can_reach(header))
+        self.assertEqual({header, body, then, latch, exit}, entry.reached())
+
+    def test_loops(self):
+        entry, header, body, then, latch, exit = self.nodes
+        loops = self.cfg.calculate_loops()
+        self.assertEqual(1, len(loops))
+        self.assertIs(header, loops[0].header)
+        self.assertEqual({body, then, latch}, set(loops[0].rest))
+
 
 class InterferenceGraphTestCase(unittest.TestCase):
     def test_normal_use(self):
@@ -91,6 +91,25 @@ class LengauerTarjanTestCase(unittest.TestCase):
         }
         self.assertEqual(correct_idom, idom)
 
+    def test_reverse(self):
+        """ Post dominators are dominators of the reversed graph """
+        graph = DiGraph()
+        node_1 = DiNode(graph)
+        node_2 = DiNode(graph)
+        node_3 = DiNode(graph)
+        node_4 = DiNode(graph)
+        node_1.add_edge(node_2)
+        node_1.add_edge(node_3)
+        node_2.add_edge(node_4)
+        node_3.add_edge(node_4)
+        ipdom = calculate_idom(graph, node_4, reverse=True)
+        correct_ipdom = {
+            node_1: node_4,
+            node_2: node_4,
+            node_3: node_4,
+        }
+        self.assertEqual(correct_ipdom, ipdom)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,8 +1,11 @@
 import unittest
 import io
+import os
+import tempfile
 from unittest import mock
 from ppci.common import CompilerError
 from ppci.lang.c import CPreProcessor
+from ppci.lang.c.preprocessor import HeaderCache
 from ppci.lang.c import COptions
 from ppci.lang.c import CTokenPrinter
 
@@ -631,5 +634,42 @@ class CPreProcessorTestCase(unittest.TestCase):
         self.preprocess(src, expected)
 
 
+class HeaderCacheTestCase(unittest.TestCase):
+    """ Test the reuse of lexed headers """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.coptions = COptions()
+        self.coptions.add_include_path(self.directory)
+        self.write_header("a.h", "#define A 1\nint a = A;\n")
+        self.write_header("line.h", "int line = __LINE__;\n")
+
+    def write_header(self, name, text):
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(text)
+
+    def preprocess(self, header_cache):
+        preprocessor = CPreProcessor(self.coptions)
+        preprocessor.header_cache = header_cache
+        src = io.StringIO('#include "a.h"\n#include "line.h"\nA a;\n')
+        f = io.StringIO()
+        CTokenPrinter().dump(preprocessor.process_file(src, "main.c"), f)
+        return f.getvalue()
+
+    def test_cached_headers(self):
+        header_cache = HeaderCache()
+        expected = self.preprocess(None)
+        self.assertEqual(expected, self.preprocess(header_cache))
+        self.assertEqual(expected, self.preprocess(header_cache))
+        a_h = os.path.join(self.directory, "a.h")
+        line_h = os.path.join(self.directory, "line.h")
+        self.assertIsNotNone(header_cache.get_tokens(a_h, self.coptions))
+        self.assertIsNone(header_cache.get_tokens(line_h, self.coptions))
+
+        # Modified headers are lexed again:
+        self.write_header("a.h", "#define A 22\nint a = A;\n")
+        self.assertIn("22 a;", self.preprocess(header_cache))
+
+
 if __name__ == "__main__":
     unittest.main()
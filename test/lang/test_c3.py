@@ -45,6 +45,24 @@ class LexerTestCase(unittest.TestCase):
         toks = ['var', 'ID', 'ID', '=', 'NUMBER', ';', 'EOF']
         self.check(snippet, toks)
 
+    def test_table_driven(self):
+        """ The table driven scanner gives the same tokens """
+        class TableDrivenLexer(Lexer):
+            table_driven = True
+
+        snippet = """
+          module x; // Comment
+          /* Demo * / */
+          var int x = 0x1F + 2 >= 3;
+          const string s = "hi\\n";
+        """
+        toks = [
+            (tok.typ, tok.val) for tok in self.l.lex(io.StringIO(snippet))]
+        lexer = TableDrivenLexer(DiagnosticsManager())
+        toks2 = [
+            (tok.typ, tok.val) for tok in lexer.lex(io.StringIO(snippet))]
+        self.assertEqual(toks, toks2)
+
 
 class TypesTestCase(unittest.TestCase):
     def setUp(self):
@@ -1,8 +1,13 @@
+import array
+import os
+import tempfile
 import unittest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 import io
+from typing import List
 from ppci import api, irutils
-from ppci.lang.python import load_py, python_to_ir
+from ppci.common import CompilerError
+from ppci.lang.python import load_py, python_to_ir, jit, JitModule
 from ppci.utils.reporting import HtmlReportGenerator
 
 
@@ -96,6 +101,166 @@ class PythonJitLoadingTestCase(unittest.TestCase):
         self.assertEqual(15, v2)
 
 
+@unittest.skipUnless(api.is_platform_supported(), 'skipping codepage tests')
+class PythonJitDecoratorTestCase(unittest.TestCase):
+    """ Check the jit decorator """
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        patcher = patch.dict(os.environ, {'PPCI_JIT_CACHE': self.cache_dir})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_float(self):
+        @jit
+        def mix(a: float, b: float) -> float:
+            return a * b + 0.5
+
+        self.assertEqual(5.5, mix(2.5, 2.0))
+
+    def test_buffers(self):
+        @jit
+        def total(xs: List[float]) -> float:
+            s = 0.0
+            for i in range(len(xs)):
+                s = s + xs[i]
+            return s
+
+        @jit
+        def scale(xs: List[float], f: float) -> None:
+            for i in range(len(xs)):
+                xs[i] *= f
+
+        @jit
+        def checksum(data: bytes, start: int) -> int:
+            s = start
+            for i in range(len(data)):
+                s += data[i]
+            return s
+
+        values = array.array('d', [1.0, 2.5, 3.0])
+        self.assertEqual(6.5, total(values))
+        scale(values, 2.0)
+        self.assertEqual(array.array('d', [2.0, 5.0, 6.0]), values)
+        self.assertEqual(262, checksum(b'\x01\x02\xff', 4))
+        self.assertEqual(5, checksum(bytearray(b'\x05'), 0))
+        self.assertEqual(0, checksum(b'', 0))
+
+        with self.assertRaises(TypeError):
+            total(b'12345678')
+        with self.assertRaises(BufferError):
+            scale(b'12345678', 1.0)
+
+    def test_buffer_index_checked(self):
+        with JitModule():
+            @jit
+            def get(xs: List[int], i: int) -> int:
+                return xs[i]
+
+            @jit
+            def put(xs: List[int], i: int, value: int) -> None:
+                xs[i] = value
+
+            @jit
+            def get_twice(xs: List[int], i: int) -> int:
+                return get(xs, i) + get(xs, i)
+
+        values = array.array('q', [7, 8])
+        self.assertEqual(8, get(values, 1))
+        for index in [2, -1, 1 << 62]:
+            with self.assertRaises(IndexError):
+                get(values, index)
+            with self.assertRaises(IndexError):
+                put(values, index, 3)
+        self.assertEqual(array.array('q', [7, 8]), values)
+
+        # An index error in a called function stops the caller as well:
+        self.assertEqual(14, get_twice(values, 0))
+        with self.assertRaises(IndexError):
+            get_twice(values, 2)
+        self.assertEqual(16, get_twice(values, 1))
+
+    def test_cache(self):
+        def inc(x: int) -> int:
+            return x + 1
+
+        with patch('ppci.api.ir_to_object', wraps=api.ir_to_object) as m:
+            self.assertEqual(3, jit(inc)(2))
+            self.assertEqual(3, jit(inc)(2))
+            self.assertEqual(1, m.call_count)
+            self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+            self.assertEqual(3, jit(inc, cache=False)(2))
+            self.assertEqual(2, m.call_count)
+
+        # Buffer parameters must survive the cache as well:
+        def total(xs: List[float]) -> float:
+            s = 0.0
+            for i in range(len(xs)):
+                s = s + xs[i]
+            return s
+
+        xs = array.array('d', [1.5, 2.5])
+        with patch('ppci.api.ir_to_object', wraps=api.ir_to_object) as m:
+            self.assertEqual(4.0, jit(total)(xs))
+            self.assertEqual(4.0, jit(total)(xs))
+            self.assertEqual(1, m.call_count)
+
+    def test_jit_module(self):
+        mock = Mock()
+
+        def report(x: int) -> None:
+            mock(x)
+
+        with JitModule(imports={'report': report}) as jit_module:
+            @jit
+            def square(x: int) -> int:
+                return x * x
+
+            @jit
+            def sum_squares(xs: List[int]) -> int:
+                s = 0
+                for i in range(len(xs)):
+                    s += square(xs[i])
+                report(s)
+                return s
+
+        with patch('ppci.api.ir_to_object', wraps=api.ir_to_object) as m:
+            self.assertEqual(
+                14, sum_squares(array.array('q', [1, 2, 3])))
+            self.assertEqual(9, square(3))
+            mock.assert_called_once_with(14)
+            self.assertEqual(1, m.call_count)
+        self.assertEqual(1, len(jit_module.mods))
+
+        # Functions added later are compiled separately:
+        def negate(x: int) -> int:
+            return 0 - x
+
+        negate = jit_module.jit(negate)
+        self.assertIsNone(negate.compiled)
+        self.assertEqual(-2, negate(2))
+        self.assertEqual(2, len(jit_module.mods))
+        with self.assertRaises(ValueError):
+            jit_module.jit(negate.original)
+
+        # Functions added later can call the functions compiled before:
+        def quad(x: int) -> int:
+            return square(square(x))
+
+        quad = jit_module.jit(quad)
+        self.assertEqual(81, quad(3))
+
+        # Except the functions with buffer parameters:
+        def total(xs: List[int]) -> int:
+            return sum_squares(xs)
+
+        total = jit_module.jit(total)
+        with self.assertRaises(CompilerError):
+            total(array.array('q', [1, 2, 3]))
+
+
 class PythonToIrCompilerTestCase(unittest.TestCase):
     """ Check the compilation of python code to ir """
     def do(self, src, imports=None):
@@ -1,24 +1,109 @@
+import itertools
+import re
 import unittest
 from ppci.lang.tools import regex
+from ppci.lang.tools.regex.symbol_set import SymbolSet
 
 
 class RegexTestCase(unittest.TestCase):
     def test_derivatives(self):
         ab = regex.Symbol('a') + regex.Symbol('b')
+        self.assertFalse(ab.nullable)
+        self.assertEqual(regex.Symbol('b'), ab.derivative('a'))
+        self.assertEqual(regex.NULL, ab.derivative('b'))
+        self.assertTrue(ab.derivative('a').derivative('b').nullable)
 
-        # TODO: work in progress
-        print(ab)
-        print(ab.derivative('a'))
-        print(ab.derivative('b'))
-        print(ab.derivative('a').derivative('b'))
+    def test_simplification(self):
+        """ Derivatives of a kleene closure are simplified """
+        a = regex.Symbol('a')
+        b = regex.Symbol('b')
+        self.assertEqual(a | b, b | a | a)
+        self.assertEqual(regex.SymbolSet('ab'), a | b)
+        self.assertEqual(a, a + regex.EPSILON)
+        r = regex.kleene(a + b)
+        self.assertEqual(r, r.derivative('a').derivative('b'))
 
     def test_parse(self):
         re_txt = '[0-9]+'
-        regex.parse(re_txt)
+        expr = regex.parse(re_txt)
+        self.assertFalse(expr.nullable)
+        self.assertTrue(expr.derivative('7').nullable)
+        self.assertEqual(regex.NULL, expr.derivative('a'))
+
+    def test_parse_errors(self):
+        for re_txt in ['a*?', '^a', '(ab', '*', 'a)', '[a']:
+            with self.assertRaises(ValueError):
+                regex.parse(re_txt)
+
+    def test_compile(self):
+        dfa = regex.compile('0x[0-9a-f]+|[0-9]+')
+        self.assertEqual((4, 0), dfa.match('0x1fz'))
+        self.assertEqual((1, 0), dfa.match('0xz'))
+        self.assertEqual((5, 0), dfa.match('ab123', 2))
+        self.assertIsNone(dfa.match('z'))
+
+    def test_compare_with_re(self):
+        """ Compare the longest match with the python re module """
+        patterns = [
+            r'a*b', r'(ab|a)*', r'[^ab]+c?', r'a{2,3}b{1,}', r'(a|b)*abb',
+            r'[a-c]+\.\d', r'.*c', r'a?b?c?', r'(?:a|bc){2}', r'x{|}',
+        ]
+        texts = [
+            ''.join(t) for n in range(6)
+            for t in itertools.product('abc.1\nx{|}', repeat=n)
+            if n < 4 or t[0] in 'ab'
+        ]
+        for pattern in patterns:
+            dfa = regex.compile(pattern)
+            prog = re.compile(r'(?:{})\Z'.format(pattern))
+            for text in texts[:3000]:
+                expected = max(
+                    (end for end in range(len(text) + 1)
+                     if prog.match(text[:end])),
+                    default=None)
+                result = dfa.match(text)
+                self.assertEqual(
+                    expected, result and result[0], (pattern, text))
+
+    def test_scanner(self):
+        """ The longest token is matched, the first one on ties """
+        scanner = regex.Scanner([
+            ('NUMBER', r'\d+'),
+            ('REAL', r'\d+\.\d+'),
+            ('KW', 'if'),
+            ('ID', r'[a-z]+'),
+            ('GLYPH', r'\.\.|\.'),
+        ])
+        text = '12..13.5ifx if'
+        tokens = []
+        pos = 0
+        mo = scanner.match(text)
+        while mo:
+            tokens.append((mo.lastgroup, mo.group(0)))
+            pos = mo.end()
+            mo = scanner.match(text, pos)
+        self.assertEqual(
+            [('NUMBER', '12'), ('GLYPH', '..'), ('REAL', '13.5'),
+             ('ID', 'ifx')], tokens)
+        mo = scanner.match(text, 12)
+        self.assertEqual(('KW', 'if'), (mo.lastgroup, mo.group(0)))
+
+    def test_scanner_empty_token(self):
+        with self.assertRaises(ValueError):
+            regex.Scanner([('A', 'a*')])
 
 
 class SymbolSetTestCase(unittest.TestCase):
-    pass
+    def test_ranges(self):
+        symbols = SymbolSet([('a', 'f'), 'x', ('c', 'h'), 'i'])
+        self.assertEqual(((97, 105), (120, 120)), symbols.ranges)
+        self.assertIn('g', symbols)
+        self.assertNotIn('j', symbols)
+        self.assertNotIn('g', symbols.complement())
+        self.assertEqual(SymbolSet('x'), symbols & SymbolSet('xyz'))
+        self.assertEqual(
+            SymbolSet([('a', 'i')]), symbols - SymbolSet('x'))
+        self.assertEqual(SymbolSet.all(), symbols | symbols.complement())
 
 
 if __name__ == '__main__':
@@ -6,7 +6,8 @@ from ppci.common import CompilerError, DiagnosticsManager
 from ppci.binutils.assembler import AsmLexer, BaseAssembler
 from ppci.binutils.objectfile import ObjectFile
 from ppci.binutils.outstream import BinaryOutputStream
-from ppci.arch.generic_instructions import Label
+from ppci.arch.generic_instructions import Alignment, Global, Label
+from ppci.arch.data_instructions import DByte, Dcd2
 from ppci.api import link, get_arch
 from ppci.binutils.layout import Layout
 from helper_util import gnu_assemble
@@ -65,6 +66,30 @@ class OustreamTestCase(unittest.TestCase):
         o.emit(Label('a'))
         self.assertSequenceEqual(bytes(), obj.get_section('.text').data)
 
+    def test_symbols_and_relocations(self):
+        """ Check symbol addresses and relocation offsets """
+        arch = get_arch('example')
+        obj = ObjectFile(arch)
+        o = BinaryOutputStream(obj)
+        o.select_section('data')
+        o.emit(DByte(1))
+        o.emit(Alignment(4))
+        o.emit(Global('b'))
+        o.emit(Label('b'))
+        o.emit(Dcd2('a'))
+        o.emit(Label('a'))
+        section = obj.get_section('data')
+        symbols = {symbol.name: symbol for symbol in obj.symbols}
+        self.assertEqual(bytes([1, 0, 0, 0]), section.data[:4])
+        self.assertEqual(8, section.size)
+        self.assertEqual(4, section.alignment)
+        self.assertEqual(4, symbols['b'].value)
+        self.assertTrue(symbols['b'].is_global)
+        self.assertEqual(8, symbols['a'].value)
+        self.assertEqual(1, len(obj.relocations))
+        self.assertEqual(4, obj.relocations[0].offset)
+        self.assertEqual(symbols['a'].id, obj.relocations[0].symbol_id)
+
 
 class AssemblerTestCase(unittest.TestCase):
     def test_parse_failure(self):
@@ -4,12 +4,14 @@ import unittest
 import tempfile
 import io
 import os
+import socket
+import threading
 from unittest.mock import patch
 
 from ppci.cli.asm import asm
 from ppci.cli.build import build
 from ppci.cli.c3c import c3c
-from ppci.cli.cc import cc
+from ppci.cli.cc import cc, compile_in_parallel
 from ppci.cli.hexdump import hexdump
 from ppci.cli.java import java
 from ppci.cli.link import link
@@ -18,6 +20,8 @@ from ppci.cli.objcopy import objcopy
 from ppci.cli.ocaml import ocaml
 from ppci.cli.opt import opt
 from ppci.cli.pascal import pascal
+from ppci.cli.remote import remote
+from ppci.cli.server import CompileServer
 from ppci.cli.yacc import yacc
 from ppci import api
 from ppci.common import DiagnosticsManager, SourceLocation
@@ -114,6 +118,44 @@ class CcTestCase(unittest.TestCase):
         oj_file = new_temp_file('.oj')
         cc(['-m', 'arm', '-E', self.c_file, '-o', oj_file])
 
+    @patch('sys.stdout', new_callable=io.StringIO)
+    def test_cc_command_m(self, mock_stdout):
+        """ Emit a makefile rule with the included headers """
+        cc(['-m', 'arm', '-M', '-MT', 'std.oj', self.c_file])
+        rule = mock_stdout.getvalue()
+        self.assertTrue(rule.startswith('std.oj: '))
+        self.assertIn(self.c_file, rule)
+        self.assertIn('std.h', rule)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_cc_command_md(self, mock_stdout, mock_stderr):
+        """ Compile and write the dependencies next to the output """
+        oj_file = new_temp_file('.oj')
+        cc(['-m', 'arm', '-MD', self.c_file, '-o', oj_file])
+        with open(oj_file[:-3] + '.d') as f:
+            rule = f.read()
+        self.assertTrue(rule.startswith(oj_file + ': '))
+        self.assertIn('std.h', rule)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_cc_command_jobs(self, mock_stdout, mock_stderr):
+        """ Compile sources in parallel, into the same object """
+        main_file = relpath('..', 'examples', 'c', 'hello', 'main.c')
+        contents = []
+        for jobs in ['1', '2']:
+            oj_file = new_temp_file('.oj')
+            with patch('os.cpu_count', return_value=2), patch(
+                    'ppci.cli.cc.compile_in_parallel',
+                    wraps=compile_in_parallel) as parallel:
+                cc(['-m', 'arm', '-c', '-j', jobs, self.c_file, main_file,
+                    '-o', oj_file])
+            self.assertEqual(jobs == '2', parallel.called)
+            with open(oj_file, 'r') as f:
+                contents.append(f.read())
+        self.assertEqual(contents[0], contents[1])
+
     @patch('sys.stdout', new_callable=io.StringIO)
     @patch('sys.stderr', new_callable=io.StringIO)
     def test_cc_command_ir(self, mock_stdout, mock_stderr):
@@ -308,6 +350,45 @@ class HexDumpTestCase(unittest.TestCase):
         hexdump([bin_file])
 
 
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), 'requires unix sockets')
+class ServerTestCase(unittest.TestCase):
+    """ Test the compile server with the remote utility """
+    def setUp(self):
+        self.socket_path = os.path.join(tempfile.mkdtemp(), 'ppci.sock')
+        self.server = CompileServer(self.socket_path, jobs=1)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_remote_cc(self, mock_stderr, mock_stdout):
+        c_file = relpath('..', 'examples', 'c', 'hello', 'std.c')
+        oj_file = new_temp_file('.oj')
+        for _ in range(2):
+            remote([
+                '--socket', self.socket_path, 'cc', '-m', 'arm', '-c',
+                c_file, '-o', oj_file])
+            with open(oj_file, 'r') as f:
+                obj = ObjectFile.load(f)
+            self.assertEqual('arm', obj.arch.name)
+
+    @patch('sys.stdout', new_callable=io.StringIO)
+    @patch('sys.stderr', new_callable=io.StringIO)
+    def test_remote_error(self, mock_stderr, mock_stdout):
+        with self.assertRaises(SystemExit) as cm:
+            remote(['--socket', self.socket_path, 'cc', 'missing.c'])
+        self.assertEqual(2, cm.exception.code)
+        self.assertIn('missing.c', mock_stderr.getvalue())
+        with self.assertRaises(SystemExit) as cm:
+            remote(['--socket', self.socket_path, 'rm', '-rf'])
+        self.assertIn('Unknown command', mock_stderr.getvalue())
+
+
 class DiagnosticsTestCase(unittest.TestCase):
     @patch('sys.stdout', new_callable=io.StringIO)
     def test_error_reporting(self, mock_stdout):
@@ -1,6 +1,7 @@
 import unittest
-from ppci.arch.encoding import Syntax
-from ppci.arch.token import bit_range, Token
+from ppci.arch.arch_info import Endianness
+from ppci.arch.encoding import Instruction, Operand, Syntax
+from ppci.arch.token import bit, bit_concat, bit_range, Token
 from ppci.arch.avr import instructions as avr_instructions
 from ppci.arch.avr import registers as avr_registers
 from ppci.arch.arm import arm_instructions
@@ -33,6 +34,86 @@ class TokenTestCase(unittest.TestCase):
         self.assertEqual(0x0d10, my_token.bit_value)
 
 
+class BigToken(Token):
+    class Info:
+        size = 16
+        endianness = Endianness.BIG
+
+    opcode = bit_range(12, 16)
+    flag = bit(11)
+    imm = bit_range(0, 8)
+    split = bit_concat(bit_range(8, 11), bit_range(0, 4))
+
+
+class Imm(Instruction):
+    imm = Operand("imm", int)
+    tokens = [BigToken]
+    syntax = Syntax(["imm", " ", imm])
+    patterns = {"opcode": 0xA, "flag": 1, "imm": imm}
+
+
+class Split(Instruction):
+    imm = Operand("imm", int)
+    tokens = [BigToken]
+    syntax = Syntax(["split", " ", imm])
+    # The imm field is partly overwritten by the split field:
+    patterns = {"imm": 0xFF, "split": imm}
+
+
+class UserPatterns(Imm):
+    def set_user_patterns(self, tokens):
+        tokens.set_field("flag", 0)
+
+
+def generic_encode(instruction):
+    """ Encode an instruction without the compiled encoder """
+    tokens = instruction.get_tokens()
+    instruction.set_all_patterns(tokens)
+    return tokens.encode()
+
+
+class EncodeTestCase(unittest.TestCase):
+    def test_compiled_encoder(self):
+        """ Check fixed and variable fields of a compiled encoder """
+        instruction = Imm(0x12)
+        self.assertIsNotNone(instruction.get_layout()[1].encoder)
+        self.assertEqual(bytes([0xA8, 0x12]), instruction.encode())
+        self.assertEqual(generic_encode(instruction), instruction.encode())
+
+    def test_negative_value(self):
+        """ Negative values wrap around, like when setting a token field """
+        self.assertEqual(bytes([0xA8, 0xFE]), Imm(-2).encode())
+        self.assertEqual(generic_encode(Imm(-2)), Imm(-2).encode())
+
+    def test_value_too_large(self):
+        """ Check that a value which does not fit is an error """
+        with self.assertRaisesRegex(ValueError, "cannot be fit into 8 bits"):
+            Imm(0x100).encode()
+
+    def test_overlapping_fields(self):
+        """ Later patterns overwrite the bits of earlier patterns """
+        for value in (0, 0x5A, 0x7F, -1):
+            instruction = Split(value)
+            self.assertEqual(generic_encode(instruction), instruction.encode())
+        self.assertEqual(bytes([0x02, 0xF3]), Split(0x23).encode())
+
+    def test_user_patterns(self):
+        """ Instructions with custom patterns use the generic encoding """
+        instruction = UserPatterns(0x12)
+        self.assertIsNone(instruction.get_layout()[1].encoder)
+        self.assertEqual(bytes([0xA0, 0x12]), instruction.encode())
+
+    def test_constructor_operand(self):
+        """ Check an instruction with a sub constructor """
+        instruction = arm_instructions.Cmp2(
+            arm_registers.R4,
+            arm_registers.R11,
+            arm_instructions.ShiftLsr(4),
+        )
+        self.assertIsNotNone(instruction.get_layout()[1].encoder)
+        self.assertEqual(bytes([0x2b, 0x02, 0x54, 0xe1]), instruction.encode())
+
+
 class SyntaxTestCase(unittest.TestCase):
     def test_lower_case(self):
         """ A TypeError is raised when syntax contains mixed casing """
@@ -32,6 +32,150 @@ class IrCodeTestCase(unittest.TestCase):
         self.assertEqual({c3, c4}, add.uses)
         self.assertEqual(c4, add.b)
 
+    def test_block_instructions(self):
+        """ Check insertion, removal and positions of instructions """
+        function = ir.Procedure("f", ir.Binding.GLOBAL)
+        block = function.add_block(ir.Block("block"))
+        c1 = ir.Const(1, "one", ir.i32)
+        c2 = ir.Const(2, "two", ir.i32)
+        c3 = ir.Const(3, "three", ir.i32)
+        exit = ir.Exit()
+        block.add_instruction(c2)
+        block.add_instruction(exit)
+        block.insert_instruction(c1)
+        block.insert_instruction(c3, before_instruction=exit)
+        self.assertEqual([c1, c2, c3, exit], block.instructions)
+        self.assertEqual(4, len(block))
+        self.assertEqual(2, c3.position)
+        self.assertIs(c2, block[1])
+        self.assertIs(c3, block[-2])
+        self.assertIs(c2, c3.previous_instruction)
+        self.assertIs(exit, c3.next_instruction)
+
+        block.remove_instruction(c2)
+        self.assertEqual([c1, c3, exit], block.instructions)
+        self.assertEqual(1, c3.position)
+        self.assertNotIn(c2, block)
+        self.assertIsNone(c2.block)
+
+        # Moving an instruction keeps its name:
+        block2 = function.add_block(ir.Block("block2"))
+        block2.move_instruction(c1)
+        self.assertEqual([c3, exit], block.instructions)
+        self.assertEqual([c1], block2.instructions)
+        self.assertEqual("one", c1.name)
+
+    def test_block_instructions_view(self):
+        """ Check that modifying the instructions modifies the block """
+        function = ir.Procedure("f", ir.Binding.GLOBAL)
+        block = function.add_block(ir.Block("block"))
+        c1 = ir.Const(1, "one", ir.i32)
+        c2 = ir.Const(2, "two", ir.i32)
+        c3 = ir.Const(3, "three", ir.i32)
+        exit = ir.Exit()
+        block.instructions.append(exit)
+        block.instructions.insert(0, c1)
+        block.instructions.insert(-1, c3)
+        self.assertEqual([c1, c3, exit], list(block))
+        self.assertIs(c3, block[1])
+
+        block.instructions[1] = c2
+        self.assertEqual([c1, c2, exit], list(block))
+        self.assertIsNone(c3.block)
+
+        del block.instructions[:2]
+        self.assertEqual([exit], list(block))
+        self.assertIs(exit, block.first_instruction)
+
+    def test_block_index_after_splice(self):
+        """ Indexing stays correct while the block is modified """
+        function = ir.Procedure("f", ir.Binding.GLOBAL)
+        block = function.add_block(ir.Block("block"))
+        consts = [ir.Const(i, "c", ir.i32) for i in range(4)]
+        for const in consts:
+            block.add_instruction(const)
+        self.assertIs(consts[2], block[2])
+        extra = ir.Const(9, "extra", ir.i32)
+        block.insert_instruction(extra, before_instruction=consts[1])
+        self.assertIs(extra, block[1])
+        self.assertIs(consts[3], block[-1])
+        block.remove_instruction(consts[0])
+        self.assertEqual([extra] + consts[1:], block[:])
+        block.add_instruction(consts[0])
+        self.assertIs(consts[0], block[4])
+
+    def test_assign_instructions_from_other_block(self):
+        function = ir.Procedure("f", ir.Binding.GLOBAL)
+        block1 = function.add_block(ir.Block("block1"))
+        block2 = function.add_block(ir.Block("block2"))
+        c1 = ir.Const(1, "one", ir.i32)
+        c2 = ir.Const(2, "two", ir.i32)
+        block1.add_instruction(c1)
+        block1.add_instruction(c2)
+        block2.instructions = [c2]
+        self.assertEqual([c1], list(block1))
+        self.assertEqual(1, len(block1))
+        self.assertIs(c1, block1.last_instruction)
+        self.assertEqual([c2], list(block2))
+
+        # Instructions left out are detached:
+        block2.instructions = []
+        self.assertIsNone(c2.block)
+        block1.instructions = [c2]
+        self.assertIsNone(c1.block)
+        self.assertEqual([c2], list(block1))
+
+
+class VerifierTestCase(unittest.TestCase):
+    def setUp(self):
+        self.module = ir.Module("test")
+        self.function = ir.Procedure("f", ir.Binding.GLOBAL)
+        self.module.add_function(self.function)
+        self.block = self.function.add_block(ir.Block("entry"))
+        self.function.entry = self.block
+
+    def test_use_before_definition(self):
+        """ Only the full level checks dominance of uses """
+        c1 = ir.Const(1, "one", ir.i32)
+        add = ir.add(c1, c1, "add", ir.i32)
+        alloc = ir.Alloc("alloc", 4, 4)
+        address = ir.AddressOf(alloc, "address")
+        self.block.add_instruction(alloc)
+        self.block.add_instruction(address)
+        self.block.add_instruction(ir.Store(add, address))
+        self.block.add_instruction(add)
+        self.block.add_instruction(c1)
+        self.block.add_instruction(ir.Exit())
+        with self.assertRaises(AssertionError):
+            irutils.verify_module(self.module)
+        with self.assertRaises(AssertionError):
+            irutils.verify_module(
+                self.module, level=irutils.VerifyLevel.FULL
+            )
+        irutils.verify_module(
+            self.module, level=irutils.VerifyLevel.STRUCTURAL
+        )
+
+    def test_off(self):
+        """ An unterminated block is only accepted without verification """
+        with self.assertRaises(ValueError):
+            irutils.verify_module(
+                self.module, level=irutils.VerifyLevel.STRUCTURAL
+            )
+        irutils.verify_module(self.module, level=irutils.VerifyLevel.OFF)
+
+    def test_default_level(self):
+        old_level = irutils.get_verify_level()
+        irutils.set_verify_level(irutils.VerifyLevel.OFF)
+        try:
+            irutils.verify_module(self.module)
+        finally:
+            irutils.set_verify_level(old_level)
+
+    def test_invalid_level(self):
+        with self.assertRaises(ValueError):
+            irutils.verify_module(self.module, level="paranoid")
+
 
 class IrBuilderTestCase(unittest.TestCase):
     def setUp(self):
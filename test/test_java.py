@@ -1,7 +1,15 @@
 import io
+import os
+import struct
+import tempfile
 import unittest
+import zipfile
+from unittest import mock
 
+from ppci import api
 from ppci.arch.jvm import read_class_file, class_to_ir
+from ppci.arch.jvm import ClassLoader, JarFile
+from ppci.utils.codepage import load_obj
 
 
 class JavaTestCase(unittest.TestCase):
@@ -11,6 +19,137 @@ class JavaTestCase(unittest.TestCase):
         class_to_ir(class_file)
 
 
+def make_class_file(name, methods):
+    """ Create a class file with static methods.
+
+    Each method is a tuple with the name, descriptor, bytecode and a
+    list with the (class, name, descriptor) of methods it calls. The
+    invokestatic instructions refer to these with a 0xffff placeholder.
+    """
+    constants = []
+
+    def constant(tag, data):
+        if (tag, data) not in constants:
+            constants.append((tag, data))
+        return constants.index((tag, data)) + 1
+
+    def utf8(text):
+        data = text.encode('utf8')
+        return constant(1, struct.pack('>H', len(data)) + data)
+
+    def class_ref(class_name):
+        return constant(7, struct.pack('>H', utf8(class_name)))
+
+    def method_ref(class_name, method_name, descriptor):
+        name_and_type = constant(12, struct.pack(
+            '>HH', utf8(method_name), utf8(descriptor)))
+        return constant(10, struct.pack(
+            '>HH', class_ref(class_name), name_and_type))
+
+    this_class = class_ref(name)
+    super_class = class_ref('java/lang/Object')
+    method_data = b''
+    for method_name, descriptor, code, calls in methods:
+        for call in calls:
+            code = code.replace(
+                b'\xff\xff', struct.pack('>H', method_ref(*call)), 1)
+        code_attribute = struct.pack('>HHI', 4, 4, len(code)) + code + \
+            struct.pack('>HH', 0, 0)
+        method_data += struct.pack(
+            '>HHHHHI', 0x9, utf8(method_name), utf8(descriptor), 1,
+            utf8('Code'), len(code_attribute)) + code_attribute
+
+    pool = b''.join(struct.pack('>B', tag) + data for tag, data in constants)
+    return struct.pack('>IHHH', 0xcafebabe, 0, 52, len(constants) + 1) + \
+        pool + struct.pack('>HHHHHH', 0x21, this_class, super_class, 0, 0,
+                           len(methods)) + method_data + struct.pack('>H', 0)
+
+
+class ClassLoaderTestCase(unittest.TestCase):
+    """ Load and compile classes from a jar file on demand """
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.jar_filename = os.path.join(directory, 'test.jar')
+        classes = {
+            # static int add(int a, int b) { return a + b; }
+            'util/Adder': [('add', '(II)I', b'\x1a\x1b\x60\xac', [])],
+            # static int twice(int a) { return Adder.add(a, a); }
+            'Caller': [('twice', '(I)I', b'\x1a\x1a\xb8\xff\xff\xac', [
+                ('util/Adder', 'add', '(II)I')])],
+            # Translating this class fails, since athrow is not supported:
+            'Unused': [('fail', '()V', b'\xbf', [])],
+        }
+        with zipfile.ZipFile(self.jar_filename, 'w') as f:
+            f.writestr('META-INF/MANIFEST.MF', 'Manifest-Version: 1.0\n')
+            for name, methods in classes.items():
+                f.writestr(name + '.class', make_class_file(name, methods))
+        self.cache_dir = os.path.join(directory, 'cache')
+
+    def test_jar_file(self):
+        with JarFile(self.jar_filename) as jar_file:
+            self.assertEqual(
+                ['Caller', 'Unused', 'util/Adder'], jar_file.class_names)
+            self.assertIn('util/Adder', jar_file)
+            self.assertNotIn('Adder', jar_file)
+            self.assertEqual(
+                '1.0', jar_file.read_manifest()['Manifest-Version'])
+            class_file = jar_file.read_class('util/Adder')
+            self.assertEqual(['add'], [m.name for m in class_file.methods])
+
+    def test_compile_on_demand(self):
+        class_loader = ClassLoader(cache_dir=self.cache_dir)
+        class_loader.add_class_path(self.jar_filename)
+        obj = class_loader.compile('Caller', 'arm')
+        names = {s.name for s in obj.symbols}
+        self.assertIn('Caller_twice', names)
+        self.assertIn('util_Adder_add', names)
+        self.assertNotIn('Unused_fail', names)
+        with self.assertRaises(ValueError):
+            class_loader.compile('Missing', 'arm')
+
+        # A new loader uses the cached code, and translates nothing:
+        class_loader = ClassLoader(cache_dir=self.cache_dir)
+        class_loader.add_class_path(self.jar_filename)
+        with mock.patch('ppci.arch.jvm.class_loader.Generator') as generator:
+            obj2 = class_loader.compile('Caller', 'arm')
+        self.assertFalse(generator.called)
+        self.assertEqual(obj.serialize(), obj2.serialize())
+
+    def test_overloaded_methods(self):
+        classes = {
+            # static int inc(int a) { return a + 1; }
+            # static int inc(int a, int b) { return a + b; }
+            'util/Math': [
+                ('inc', '(I)I', b'\x1a\x04\x60\xac', []),
+                ('inc', '(II)I', b'\x1a\x1b\x60\xac', [])],
+            # static int both(int a) { return inc(a) + inc(a, a); }
+            'Mixed': [('both', '(I)I',
+                       b'\x1a\xb8\xff\xff\x1a\x1a\xb8\xff\xff\x60\xac',
+                       [('util/Math', 'inc', '(I)I'),
+                        ('util/Math', 'inc', '(II)I')])],
+        }
+        with zipfile.ZipFile(self.jar_filename, 'w') as f:
+            for name, methods in classes.items():
+                f.writestr(name + '.class', make_class_file(name, methods))
+        class_loader = ClassLoader()
+        class_loader.add_class_path(self.jar_filename)
+        obj = class_loader.compile('Mixed', 'arm')
+        names = {s.name for s in obj.symbols}
+        self.assertIn('Mixed_both', names)
+        self.assertIn('util_Math_inc__I', names)
+        self.assertIn('util_Math_inc__II', names)
+
+    @unittest.skipUnless(
+        api.is_platform_supported(), 'skipping codepage tests')
+    def test_run_compiled_classes(self):
+        class_loader = ClassLoader()
+        class_loader.add_class_path(self.jar_filename)
+        arch = api.get_current_arch()
+        obj = class_loader.compile('Caller', arch, debug=True)
+        code = load_obj(obj)
+        self.assertEqual(42, code.Caller_twice(21))
+
+
 simple_class_file = b'\xca\xfe\xba\xbe\x00\x00\x004\x00\x0f\n\x00' + \
     b'\x03\x00\x0c\x07\x00\r\x07\x00\x0e\x01\x00\x06<init>\x01\x00' + \
     b'\x03()V\x01\x00\x04Code\x01\x00\x0fLineNumberTable\x01\x00\x06' + \
@@ -10,6 +10,12 @@ from ppci.binutils.debuginfo import DebugDb
 from ppci.irutils import verify_module
 from ppci.opt import Mem2RegPromotor
 from ppci.opt import CleanPass
+from ppci.opt import ConstantFolder, DeleteUnusedInstructionsPass
+from ppci.opt import PassManager
+from ppci.opt import InlinePass
+from ppci.opt import GlobalValueNumberingPass
+from ppci.opt import SparseConditionalConstantPropagationPass
+from ppci.opt import LoopInvariantCodeMotionPass
 from ppci.opt.constantfolding import correct
 from ppci.opt.tailcall import TailCallOptimization
 
@@ -137,6 +143,317 @@ class Mem2RegTestCase(OptTestCase):
         self.assertIn(alloc, self.function.entry.instructions)
 
 
+class PassManagerTestCase(OptTestCase):
+    """ Test the fixed point iteration of the pass manager """
+    def test_fixed_point(self):
+        cnst1 = self.builder.emit(ir.Const(2, 'cnst1', ir.i32))
+        cnst2 = self.builder.emit(ir.Const(3, 'cnst2', ir.i32))
+        binop = self.builder.emit(ir.add(cnst1, cnst2, 'binop', ir.i32))
+        alloc = self.builder.emit(ir.Alloc('alloc', 4, 4))
+        addr = self.builder.emit(ir.AddressOf(alloc, 'addr'))
+        self.builder.emit(ir.Store(binop, addr, volatile=True))
+        self.builder.emit(ir.Exit())
+
+        pass_manager = PassManager(
+            [ConstantFolder(), DeleteUnusedInstructionsPass()])
+        pass_manager.run(self.module)
+
+        # The first round folds the addition and deletes it. This leaves
+        # the constants unused, which the second round deletes. The third
+        # round changes nothing, so the fixed point is reached:
+        self.assertEqual(3, pass_manager.run_counts['ConstantFolder'])
+        self.assertIn('DeleteUnusedInstructionsPass', pass_manager.timings)
+        self.assertNotIn(binop, self.function.entry)
+
+    def test_unmodified_function_not_revisited(self):
+        self.builder.emit(ir.Exit())
+        pass_manager = PassManager([ConstantFolder(), CleanPass()])
+        pass_manager.run(self.module)
+        self.assertEqual(1, pass_manager.run_counts['ConstantFolder'])
+        self.assertEqual(1, pass_manager.run_counts['CleanPass'])
+
+
+class InlineTestCase(OptTestCase):
+    """ Test the inlining of functions """
+    def make_callee(self):
+        """ Create a function with two returns: max(a, 0) """
+        callee = self.builder.new_function(
+            'callee', ir.Binding.LOCAL, ir.i32)
+        a = ir.Parameter('a', ir.i32)
+        callee.add_parameter(a)
+        self.builder.set_function(callee)
+        entry = self.builder.new_block()
+        callee.entry = entry
+        positive = self.builder.new_block()
+        negative = self.builder.new_block()
+        self.builder.set_block(entry)
+        zero = self.builder.emit(ir.Const(0, 'zero', ir.i32))
+        self.builder.emit(ir.CJump(a, '>', zero, positive, negative))
+        self.builder.set_block(positive)
+        self.builder.emit(ir.Return(a))
+        self.builder.set_block(negative)
+        self.builder.emit(ir.Return(zero))
+        self.builder.set_function(self.function)
+        self.builder.set_block(self.function.entry)
+        return callee
+
+    def test_inline_function(self):
+        callee = self.make_callee()
+        cnst = self.builder.emit(ir.Const(5, 'cnst', ir.i32))
+        result = self.builder.emit(
+            ir.FunctionCall(callee, [cnst], 'result', ir.i32))
+        alloc = self.builder.emit(ir.Alloc('alloc', 4, 4))
+        addr = self.builder.emit(ir.AddressOf(alloc, 'addr'))
+        store = self.builder.emit(ir.Store(result, addr))
+        self.builder.emit(ir.Exit())
+        verify_module(self.module)
+
+        modified = InlinePass().run(self.module)
+
+        self.assertEqual([self.function], modified)
+        self.assertTrue(self.function.is_leaf())
+        self.assertIsInstance(store.value, ir.Phi)
+        # The local callee is no longer referenced:
+        self.assertNotIn(callee, self.module.functions)
+
+    def test_global_function_kept(self):
+        callee = self.make_callee()
+        callee.binding = ir.Binding.GLOBAL
+        cnst = self.builder.emit(ir.Const(5, 'cnst', ir.i32))
+        self.builder.emit(ir.FunctionCall(callee, [cnst], 'result', ir.i32))
+        self.builder.emit(ir.Exit())
+
+        modified = InlinePass().run(self.module)
+
+        self.assertEqual([self.function], modified)
+        self.assertIn(callee, self.module.functions)
+
+    def test_optimize_size(self):
+        """ Only inline when the callee is removed afterwards """
+        callee = self.make_callee()
+        cnst = self.builder.emit(ir.Const(5, 'cnst', ir.i32))
+        self.builder.emit(ir.FunctionCall(callee, [cnst], 'result', ir.i32))
+        self.builder.emit(ir.FunctionCall(callee, [cnst], 'result', ir.i32))
+        self.builder.emit(ir.Exit())
+
+        modified = InlinePass(optimize_size=True).run(self.module)
+
+        self.assertEqual([], modified)
+        self.assertIn(callee, self.module.functions)
+
+    def test_recursive_function_not_inlined(self):
+        self.builder.emit(
+            ir.ProcedureCall(self.function, []))
+        self.builder.emit(ir.Exit())
+
+        modified = InlinePass().run(self.module)
+
+        self.assertEqual([], modified)
+        self.assertFalse(self.function.is_leaf())
+
+
+class GlobalValueNumberingTestCase(OptTestCase):
+    """ Test the removal of redundant values across blocks """
+    def setUp(self):
+        super().setUp()
+        self.gvn = GlobalValueNumberingPass()
+        self.a = ir.Parameter('a', ir.i32)
+        self.function.add_parameter(self.a)
+        self.b = ir.Parameter('b', ir.i32)
+        self.function.add_parameter(self.b)
+
+    def test_dominated_block(self):
+        """ A value of a dominating block is reused, commuted or not """
+        alloc = self.builder.emit(ir.Alloc('alloc', 4, 4))
+        addr = self.builder.emit(ir.AddressOf(alloc, 'addr'))
+        add1 = self.builder.emit(ir.add(self.a, self.b, 'add1', ir.i32))
+        block1 = self.builder.new_block()
+        self.builder.emit(ir.Jump(block1))
+        self.builder.set_block(block1)
+        add2 = self.builder.emit(ir.add(self.b, self.a, 'add2', ir.i32))
+        store = self.builder.emit(ir.Store(add2, addr))
+        self.builder.emit(ir.Exit())
+
+        self.assertTrue(self.gvn.on_function(self.function))
+        self.assertIs(add1, store.value)
+        self.assertNotIn(add2, block1)
+
+    def test_sibling_blocks(self):
+        """ Values of a non dominating block must not be used """
+        alloc = self.builder.emit(ir.Alloc('alloc', 4, 4))
+        addr = self.builder.emit(ir.AddressOf(alloc, 'addr'))
+        block1 = self.builder.new_block()
+        block2 = self.builder.new_block()
+        block3 = self.builder.new_block()
+        self.builder.emit(ir.CJump(self.a, '<', self.b, block1, block2))
+        self.builder.set_block(block1)
+        sub1 = self.builder.emit(ir.sub(self.a, self.b, 'sub1', ir.i32))
+        self.builder.emit(ir.Store(sub1, addr))
+        self.builder.emit(ir.Jump(block3))
+        self.builder.set_block(block2)
+        sub2 = self.builder.emit(ir.sub(self.a, self.b, 'sub2', ir.i32))
+        self.builder.emit(ir.Store(sub2, addr))
+        self.builder.emit(ir.Jump(block3))
+        self.builder.set_block(block3)
+        self.builder.emit(ir.Exit())
+
+        self.assertFalse(self.gvn.on_function(self.function))
+
+    def test_load_after_store_not_reused(self):
+        alloc = self.builder.emit(ir.Alloc('alloc', 4, 4))
+        addr = self.builder.emit(ir.AddressOf(alloc, 'addr'))
+        load1 = self.builder.emit(ir.Load(addr, 'load1', ir.i32))
+        self.builder.emit(ir.Store(self.a, addr))
+        load2 = self.builder.emit(ir.Load(addr, 'load2', ir.i32))
+        self.builder.emit(ir.Store(load1, addr))
+        self.builder.emit(ir.Store(load2, addr))
+        self.builder.emit(ir.Exit())
+
+        self.assertFalse(self.gvn.on_function(self.function))
+
+
+class SccpTestCase(OptTestCase):
+    """ Test sparse conditional constant propagation """
+    def test_constant_through_loop(self):
+        """ A phi with the same constant on all executable edges is constant,
+        and the branch depending on it is decided. """
+        alloc = self.builder.emit(ir.Alloc('alloc', 4, 4))
+        addr = self.builder.emit(ir.AddressOf(alloc, 'addr'))
+        one = self.builder.emit(ir.Const(1, 'one', ir.i32))
+        loop = self.builder.new_block()
+        body = self.builder.new_block()
+        dead = self.builder.new_block()
+        done = self.builder.new_block()
+        entry = self.builder.block
+        self.builder.emit(ir.Jump(loop))
+
+        self.builder.set_block(loop)
+        phi = self.builder.emit(ir.Phi('phi', ir.i32))
+        self.builder.emit(ir.CJump(phi, '==', one, body, dead))
+
+        self.builder.set_block(body)
+        two = self.builder.emit(ir.Const(2, 'two', ir.i32))
+        product = self.builder.emit(ir.mul(one, two, 'product', ir.i32))
+        half = self.builder.emit(
+            ir.Binop(product, '/', two, 'half', ir.i32))
+        self.builder.emit(ir.Store(half, addr, volatile=True))
+        self.builder.emit(ir.CJump(half, '<', two, loop, done))
+
+        self.builder.set_block(dead)
+        self.builder.emit(ir.Jump(done))
+
+        self.builder.set_block(done)
+        self.builder.emit(ir.Exit())
+        phi.set_incoming(entry, one)
+        phi.set_incoming(body, half)
+        verify_module(self.module)
+
+        sccp = SparseConditionalConstantPropagationPass()
+        self.assertTrue(sccp.on_function(self.function))
+        self.assertIsInstance(loop.last_instruction, ir.Jump)
+        self.assertIs(body, loop.last_instruction.target)
+        self.assertFalse(phi.is_used)
+        self.assertNotIn(dead, self.function.blocks)
+
+    def test_parameter_not_constant(self):
+        a = ir.Parameter('a', ir.i32)
+        self.function.add_parameter(a)
+        block1 = self.builder.new_block()
+        block2 = self.builder.new_block()
+        one = self.builder.emit(ir.Const(1, 'one', ir.i32))
+        self.builder.emit(ir.CJump(a, '==', one, block1, block2))
+        self.builder.set_block(block1)
+        self.builder.emit(ir.Jump(block2))
+        self.builder.set_block(block2)
+        self.builder.emit(ir.Exit())
+
+        sccp = SparseConditionalConstantPropagationPass()
+        self.assertFalse(sccp.on_function(self.function))
+
+
+class LoopInvariantCodeMotionTestCase(OptTestCase):
+    """ Test hoisting of loop invariants and strength reduction """
+    def test_array_loop(self):
+        """ Store i into a[i] for i in 0..n """
+        a = ir.Parameter('a', ir.ptr)
+        self.function.add_parameter(a)
+        n = ir.Parameter('n', ir.i32)
+        self.function.add_parameter(n)
+        zero = self.builder.emit(ir.Const(0, 'zero', ir.i32))
+        loop = self.builder.new_block()
+        done = self.builder.new_block()
+        entry = self.builder.block
+        self.builder.emit(ir.CJump(n, '>', zero, loop, done))
+
+        self.builder.set_block(loop)
+        i = self.builder.emit(ir.Phi('i', ir.i32))
+        four = self.builder.emit(ir.Const(4, 'four', ir.ptr))
+        index = self.builder.emit(ir.Cast(i, 'index', ir.ptr))
+        offset = self.builder.emit(ir.mul(index, four, 'offset', ir.ptr))
+        address = self.builder.emit(ir.add(a, offset, 'address', ir.ptr))
+        store = self.builder.emit(ir.Store(i, address))
+        one = self.builder.emit(ir.Const(1, 'one', ir.i32))
+        i2 = self.builder.emit(ir.add(i, one, 'i2', ir.i32))
+        self.builder.emit(ir.CJump(i2, '<', n, loop, done))
+
+        self.builder.set_block(done)
+        self.builder.emit(ir.Exit())
+        i.set_incoming(entry, zero)
+        i.set_incoming(loop, i2)
+        verify_module(self.module)
+
+        licm = LoopInvariantCodeMotionPass()
+        self.assertTrue(licm.on_function(self.function))
+        verify_module(self.module)
+
+        # A preheader is inserted, and constants are hoisted into it:
+        preheader = entry.last_instruction.lab_yes
+        self.assertIsNot(loop, preheader)
+        self.assertIs(preheader, four.block)
+        self.assertIs(preheader, one.block)
+
+        # The address is now an induction variable:
+        self.assertIsNot(address, store.address)
+        self.assertIsInstance(store.address, ir.Phi)
+        self.assertIs(loop, store.address.block)
+        self.assertFalse(offset.is_used)
+        self.assertFalse(licm.on_function(self.function))
+
+    def test_hoist_order(self):
+        """ Invariants are hoisted in the order of the function blocks """
+        n = ir.Parameter('n', ir.i32)
+        self.function.add_parameter(n)
+        zero = self.builder.emit(ir.Const(0, 'zero', ir.i32))
+        header = self.builder.new_block()
+        body = self.builder.new_block()
+        done = self.builder.new_block()
+        entry = self.builder.block
+        self.builder.emit(ir.Jump(header))
+
+        self.builder.set_block(header)
+        i = self.builder.emit(ir.Phi('i', ir.i32))
+        one = self.builder.emit(ir.Const(1, 'one', ir.i32))
+        self.builder.emit(ir.CJump(i, '<', n, body, done))
+
+        self.builder.set_block(body)
+        two = self.builder.emit(ir.Const(2, 'two', ir.i32))
+        step = self.builder.emit(ir.add(one, two, 'step', ir.i32))
+        i2 = self.builder.emit(ir.add(i, step, 'i2', ir.i32))
+        self.builder.emit(ir.Jump(header))
+
+        self.builder.set_block(done)
+        self.builder.emit(ir.Exit())
+        i.set_incoming(entry, zero)
+        i.set_incoming(body, i2)
+        verify_module(self.module)
+
+        licm = LoopInvariantCodeMotionPass()
+        self.assertTrue(licm.on_function(self.function))
+        verify_module(self.module)
+        self.assertEqual(
+            [zero, one, two, step], list(entry)[:-1])
+
+
 class TypedEvalTestCase(unittest.TestCase):
     """ Test various integer values wrapped at bitsizes and signedness """
     def test_char_overflow(self):
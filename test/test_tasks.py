@@ -1,8 +1,12 @@
 import os
 import unittest
 import tempfile
+from unittest.mock import patch
 
 from ppci.build.tasks import TaskRunner, TaskError, Project, Target, Task
+from ppci.build.buildtasks import CCompileTask
+from ppci.build.depfile import format_rule, parse_rules
+from ppci.lang.c import CBuilder
 
 
 class TaskTestCase(unittest.TestCase):
@@ -68,5 +72,56 @@ class TaskTestCase(unittest.TestCase):
             task.open_file_set('*.asm')
 
 
+class CCompileTaskTestCase(unittest.TestCase):
+    def setUp(self):
+        self.basedir = tempfile.mkdtemp()
+        for filename, text in [
+                ('main.c', '#include "a.h"\nint main() { return A; }\n'),
+                ('a.h', '#include "b.h"\n#define A B\n'),
+                ('b.h', '#define B 2\n')]:
+            with open(os.path.join(self.basedir, filename), 'w') as f:
+                f.write(text)
+        project = Project('a')
+        project.set_property('basedir', self.basedir)
+        self.target = Target('t1', project)
+
+    def run_task(self, **arguments):
+        arguments.update(sources='main.c', output='main.oj')
+        task = CCompileTask(self.target, arguments)
+        with patch('ppci.build.buildtasks.CBuilder') as builder:
+            builder.side_effect = CBuilder
+            task.run()
+        return builder.call_count
+
+    def test_incremental(self):
+        """ Sources are only compiled when they or their headers change """
+        self.assertEqual(1, self.run_task(arch='arm'))
+        with open(os.path.join(self.basedir, 'main.d')) as f:
+            rules = parse_rules(f.read())
+        output = os.path.join(self.basedir, 'main.oj')
+        prerequisites = [
+            os.path.join(self.basedir, f) for f in ('main.c', 'a.h', 'b.h')]
+        self.assertEqual([([output], prerequisites)], rules)
+        self.assertEqual(0, self.run_task(arch='arm'))
+
+        # Make an indirectly included header newer than the output:
+        earlier = os.path.getmtime(prerequisites[2]) - 10
+        os.utime(output, (earlier, earlier))
+        self.assertEqual(1, self.run_task(arch='arm'))
+        self.assertEqual(0, self.run_task(arch='arm'))
+
+        # Other options require compilation:
+        self.assertEqual(1, self.run_task(arch='arm', optimize='1'))
+
+
+class DepfileTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        rule = format_rule('a b.o', ['a b.c', 'C:/x.h', 'y$.h'])
+        self.assertEqual(
+            'a\\ b.o: \\\n  a\\ b.c \\\n  C:/x.h \\\n  y$$.h\n', rule)
+        self.assertEqual(
+            [(['a b.o'], ['a b.c', 'C:/x.h', 'y$.h'])], parse_rules(rule))
+
+
 if __name__ == '__main__':
     unittest.main()
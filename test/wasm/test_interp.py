@@ -0,0 +1,188 @@
+""" Test the wasm interpreter, which runs wasm without compilation. """
+
+import unittest
+
+from ppci.wasm import Module, instantiate
+from ppci.wasm.execution.runtime import Unreachable
+
+
+SOURCE = r"""
+(module
+  (type $t (func (param i32) (result i32)))
+  (import "env" "log" (func $log (param i32)))
+  (memory 1 3)
+  (table 2 funcref)
+  (elem (i32.const 0) $fac $double)
+  (global $counter (mut i32) (i32.const 5))
+  (func $fac (type $t)
+    (if (result i32) (i32.le_s (local.get 0) (i32.const 1))
+      (then (i32.const 1))
+      (else
+        (i32.mul
+          (local.get 0)
+          (call $fac (i32.sub (local.get 0) (i32.const 1)))))))
+  (func $double (type $t) (i32.add (local.get 0) (local.get 0)))
+  (func (export "indirect") (param i32 i32) (result i32)
+    (call_indirect (type $t) (local.get 1) (local.get 0)))
+  (func (export "memory_test") (param i32) (result i64)
+    (i32.store8 offset=3 (i32.const 0) (local.get 0))
+    (i64.load (i32.const 0)))
+  (func (export "switch") (param i32) (result i32)
+    (block
+      (block
+        (block (br_table 0 1 2 (local.get 0)))
+        (return (i32.const 10)))
+      (return (i32.const 20)))
+    (i32.const 30))
+  (func (export "sum") (param i32) (result i32) (local i32)
+    (block
+      (loop
+        (br_if 1 (i32.eqz (local.get 0)))
+        (local.set 1 (i32.add (local.get 1) (local.get 0)))
+        (local.set 0 (i32.sub (local.get 0) (i32.const 1)))
+        (global.set $counter
+          (i32.add (global.get $counter) (i32.const 1)))
+        (br 0)))
+    (call $log (local.get 1))
+    (local.get 1))
+  (func (export "grow") (result i32)
+    (drop (memory.grow (i32.const 2)))
+    (memory.size))
+  (func (export "div_u") (param i32 i32) (result i32)
+    (i32.div_u (local.get 0) (local.get 1)))
+  (func (export "div_s") (param i32 i32) (result i32)
+    (i32.div_s (local.get 0) (local.get 1)))
+  (func (export "rem_s") (param i32 i32) (result i32)
+    (i32.rem_s (local.get 0) (local.get 1)))
+  (func (export "rem_u64") (param i64 i64) (result i64)
+    (i64.rem_u (local.get 0) (local.get 1)))
+  (func (export "grow_by") (param i32) (result i32)
+    (memory.grow (local.get 0)))
+  (func (export "load") (param i32) (result i32)
+    (i32.load (local.get 0)))
+  (func (export "add_f32") (param f32 f32) (result f32)
+    (f32.add (local.get 0) (local.get 1)))
+  (func (export "crash") (unreachable))
+  (func (export "trunc") (param f32) (result i32)
+    (i32.trunc_f32_s (local.get 0)))
+  (func (export "eqm1") (param i32) (result i32)
+    (i32.eq (local.get 0) (i32.const -1)))
+  (func $depth (export "depth") (param i32) (result i32)
+    (if (result i32) (i32.eqz (local.get 0))
+      (then (i32.const 0))
+      (else
+        (i32.add
+          (i32.const 1)
+          (call $depth (i32.sub (local.get 0) (i32.const 1)))))))
+  (export "counter" (global $counter))
+  (export "mem" (memory 0))
+)
+"""
+
+
+class WasmInterpreterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.logged = []
+
+        def log(x: int) -> None:
+            self.logged.append(x)
+
+        module = Module(SOURCE)
+        instance = instantiate(module, {"env": {"log": log}}, target="interp")
+        self.exports = instance.exports
+
+    def test_calls(self):
+        self.assertEqual(720, self.exports.indirect(0, 6))
+        self.assertEqual(12, self.exports.indirect(1, 6))
+
+    def test_control_flow(self):
+        self.assertEqual(
+            [10, 20, 30, 30], [self.exports.switch(i) for i in range(4)]
+        )
+        self.assertEqual(55, self.exports.sum(10))
+        self.assertEqual(15, self.exports.counter.read())
+        self.assertEqual([55], self.logged)
+
+    def test_memory(self):
+        self.assertEqual(0x7F000000, self.exports.memory_test(0x7F))
+        self.assertEqual(bytes([0, 0, 0, 0x7F]), self.exports.mem.read(0, 4))
+        self.assertEqual(3, self.exports.grow())
+        self.assertEqual(3, self.exports.grow())
+
+        # The amount is unsigned:
+        self.assertEqual(-1, self.exports.grow_by(-1))
+        self.assertEqual(3, self.exports.grow_by(0))
+
+    def test_memory_out_of_bounds(self):
+        self.assertEqual(0, self.exports.load(65536 - 4))
+        with self.assertRaises(Unreachable):
+            self.exports.load(65536 - 3)
+        with self.assertRaises(Unreachable):
+            self.exports.load(-1)
+
+    def test_arithmetic(self):
+        self.assertEqual(2147483644, self.exports.div_u(-8, 2))
+        self.assertEqual(-3, self.exports.div_s(-7, 2))
+        self.assertEqual(-1, self.exports.rem_s(-7, 2))
+        self.assertEqual(0, self.exports.rem_s(-2 ** 31, -1))
+
+        # Division traps:
+        for function, args in [
+            (self.exports.div_s, (1, 0)),
+            (self.exports.div_s, (-2 ** 31, -1)),
+            (self.exports.div_u, (1, 0)),
+            (self.exports.rem_s, (1, 0)),
+            (self.exports.rem_u64, (1, 0)),
+        ]:
+            with self.assertRaises(Unreachable):
+                function(*args)
+
+        # Single precision rounding:
+        self.assertEqual(0.30000001192092896, self.exports.add_f32(0.1, 0.2))
+
+    def test_unreachable(self):
+        with self.assertRaises(Unreachable):
+            self.exports.crash()
+
+    def test_trunc_traps(self):
+        self.assertEqual(-2, self.exports.trunc(-2.5))
+        for value in [float("nan"), float("inf"), 3e9, -3e9]:
+            with self.assertRaises(Unreachable):
+                self.exports.trunc(value)
+
+    def test_arguments_wrapped(self):
+        """ Arguments from python are wrapped to the parameter type """
+        self.assertEqual(1, self.exports.eqm1(0xFFFFFFFF))
+        self.assertEqual(1, self.exports.eqm1(-1))
+
+    def test_call_stack_exhausted(self):
+        self.assertEqual(300, self.exports.depth(300))
+        with self.assertRaises(Unreachable):
+            self.exports.depth(100000)
+
+    def test_imported_global(self):
+        """ An imported global is shared with the module exporting it """
+        module = Module(
+            """
+            (module
+              (import "env" "counter" (global $counter (mut i32)))
+              (func (export "bump")
+                (global.set $counter
+                  (i32.add (global.get $counter) (i32.const 1))))
+              (export "counter" (global $counter))
+            )
+            """
+        )
+        counter = self.exports.counter
+        instance = instantiate(
+            module, {"env": {"counter": counter}}, target="interp"
+        )
+        instance.exports.bump()
+        self.assertEqual(6, counter.read())
+        counter.write(10)
+        instance.exports.bump()
+        self.assertEqual(11, instance.exports.counter.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
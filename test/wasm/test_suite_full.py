@@ -399,7 +399,7 @@ def wasm_spec_populate(cls):
     if 'WASM_SPEC_DIR' in os.environ:
         wasm_spec_directory = os.path.normpath(os.environ['WASM_SPEC_DIR'])
 
-        for target in ['python', 'native']:
+        for target in ['python', 'native', 'interp']:
             for filename in get_wast_files(wasm_spec_directory):
                 create_test_function(cls, filename, target)
     else:
@@ -456,7 +456,7 @@ class WasmSpecTestCase(unittest.TestCase):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        '--target', choices=['native', 'python'],
+        '--target', choices=['native', 'python', 'interp', 'tiered'],
         action='append', default=[],
         help='The target for code generation.'
     )
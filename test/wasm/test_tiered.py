@@ -0,0 +1,153 @@
+""" Test tiered execution, which compiles hot wasm functions in the
+background. """
+
+import unittest
+from unittest.mock import patch
+
+from ppci.api import is_platform_supported
+from ppci.wasm import Module, instantiate
+from ppci.wasm.execution._tiered_instance import TieredModuleInstance
+from ppci.wasm.execution._tiered_instance import NativeFunction
+from ppci.wasm.execution.runtime import Unreachable
+
+
+SOURCE = r"""
+(module
+  (type $t (func (param i32) (result i32)))
+  (import "env" "log" (func $log (param i32)))
+  (memory 1 3)
+  (table 1 funcref)
+  (elem (i32.const 0) $double)
+  (global $counter (mut i32) (i32.const 5))
+  (func $fac (export "fac") (type $t)
+    (if (result i32) (i32.le_s (local.get 0) (i32.const 1))
+      (then (i32.const 1))
+      (else
+        (i32.mul
+          (local.get 0)
+          (call $fac (i32.sub (local.get 0) (i32.const 1)))))))
+  (func $double (type $t) (i32.add (local.get 0) (local.get 0)))
+  (func (export "count") (param i32) (result i32)
+    (global.set $counter (i32.add (global.get $counter) (local.get 0)))
+    (call $log (global.get $counter))
+    (call_indirect (type $t) (global.get $counter) (i32.const 0)))
+  (func (export "store") (param i32 i32)
+    (i32.store (local.get 0) (local.get 1)))
+  (func (export "load") (param i32) (result i32)
+    (i32.load offset=4 (local.get 0)))
+  (func (export "div") (param i32 i32) (result i32)
+    (i32.div_s (local.get 0) (local.get 1)))
+  (func (export "rem") (param i64 i64) (result i64)
+    (i64.rem_s (local.get 0) (local.get 1)))
+  (func (export "grow") (result i32)
+    (memory.grow (i32.const 1)))
+  (func $crash (export "crash") (param i32)
+    (if (local.get 0) (then (unreachable))))
+  (func (export "crash_later") (param i32) (result f64)
+    (global.set $counter (i32.const 3))
+    (call $crash (local.get 0))
+    (global.set $counter (i32.const 4))
+    (i32.store (i32.const 0) (i32.const 77))
+    (f64.const 1.5))
+  (export "counter" (global $counter))
+  (export "mem" (memory 0))
+)
+"""
+
+
+@unittest.skipUnless(is_platform_supported(), "Requires native code")
+class TieredTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(TieredModuleInstance, "hot_threshold", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.logged = []
+
+        def log(x: int) -> None:
+            self.logged.append(x)
+
+        module = Module(SOURCE)
+        self.instance = instantiate(
+            module, {"env": {"log": log}}, target="tiered"
+        )
+        self.exports = self.instance.exports
+
+    def warm_up(self, function, *args):
+        """ Call a function until it is compiled """
+        results = [function(*args) for _ in range(2)]
+        self.instance.wait_for_promotions()
+        self.assertIsInstance(function.native, NativeFunction)
+        results.append(function(*args))
+        return results
+
+    def test_cold(self):
+        self.assertEqual(1, self.exports.fac(1))
+        self.instance.wait_for_promotions()
+        self.assertIsNone(self.exports.fac.native)
+
+        # The recursive calls count as well:
+        self.assertEqual(2, self.exports.fac(2))
+        self.instance.wait_for_promotions()
+        self.assertIsInstance(self.exports.fac.native, NativeFunction)
+
+    def test_recursion(self):
+        self.assertEqual([720] * 3, self.warm_up(self.exports.fac, 6))
+
+    def test_globals_and_calls(self):
+        self.assertEqual([12, 14, 16], self.warm_up(self.exports.count, 1))
+        self.assertEqual(8, self.exports.counter.read())
+        self.assertEqual([6, 7, 8], self.logged)
+
+    def test_memory(self):
+        self.warm_up(self.exports.store, 8, 0x12345678)
+        self.assertEqual(
+            bytes([0x78, 0x56, 0x34, 0x12]), self.exports.mem.read(8, 4)
+        )
+
+        # Native code must follow the memory when it grows:
+        self.assertEqual([1, 2, -1], self.warm_up(self.exports.grow))
+        self.exports.store(3 * 65536 - 4, 42)
+        self.assertEqual(
+            bytes([42, 0, 0, 0]), self.exports.mem.read(3 * 65536 - 4, 4)
+        )
+
+    def test_memory_bounds(self):
+        self.warm_up(self.exports.load, 0)
+        self.warm_up(self.exports.store, 0, 0)
+        self.assertEqual(0, self.exports.load(65536 - 8))
+        for address in [65536 - 7, -1]:
+            with self.assertRaises(Unreachable):
+                self.exports.load(address)
+        with self.assertRaises(Unreachable):
+            self.exports.store(65536 - 3, 1)
+
+    def test_division_traps(self):
+        self.assertEqual([-3] * 3, self.warm_up(self.exports.div, -7, 2))
+        for args in [(1, 0), (-2 ** 31, -1)]:
+            with self.assertRaises(Unreachable):
+                self.exports.div(*args)
+
+        self.assertEqual([-1] * 3, self.warm_up(self.exports.rem, -7, 2))
+        self.assertEqual(0, self.exports.rem(-2 ** 63, -1))
+        with self.assertRaises(Unreachable):
+            self.exports.rem(1, 0)
+
+    def test_unreachable(self):
+        self.warm_up(self.exports.crash, 0)
+        with self.assertRaises(Unreachable):
+            self.exports.crash(1)
+
+    def test_trap_unwinds(self):
+        self.assertEqual([1.5] * 3, self.warm_up(self.exports.crash_later, 0))
+        self.exports.mem.write(0, bytes(4))
+
+        # The native code must stop right after the trap:
+        with self.assertRaises(Unreachable):
+            self.exports.crash_later(1)
+        self.assertEqual(3, self.exports.counter.read())
+        self.assertEqual(bytes(4), self.exports.mem.read(0, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
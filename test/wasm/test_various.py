@@ -1,12 +1,16 @@
 import io
 import os
 import unittest
+from unittest.mock import patch
 
 from ppci.arch.arch_info import TypeInfo
 from ppci import api, ir
-from ppci.wasm import wasm_to_ir, ir_to_wasm, read_wasm, read_wat
+from ppci.irutils import print_module, verify_module
+from ppci.wasm import wasm_to_ir, ir_to_wasm, read_wasm, read_wat, Module
+from ppci.wasm import Instruction, InstructionList
 from ppci.lang.python import python_to_wasm
 from ppci.wasm.util import sanitize_name
+from ppci.wasm.wasm2ppci import WasmToIrCompiler
 
 
 THIS_DIR = os.path.abspath(os.path.dirname(__file__))
@@ -32,6 +36,33 @@ class WasmGeneratorTestCase(unittest.TestCase):
         ir_to_wasm(mod2)
         # Idea: maybe convert the wasm back to ir, and run that?
 
+    def test_parallel(self):
+        """ Functions generated in worker processes are the same """
+        program_filename = os.path.join(
+            THIS_DIR, '..', '..', 'examples', 'wasm', 'program.wasm')
+        with open(program_filename, 'rb') as f:
+            wasm_module = read_wasm(f)
+        ptr_info = api.get_arch('x86_64').info.get_type_info('ptr')
+        texts = []
+        for workers in (1, 2):
+            # Use the workers, also for this module on a single cpu:
+            with patch.object(
+                WasmToIrCompiler, 'parallel_threshold', 0
+            ), patch('os.cpu_count', return_value=2):
+                mod = wasm_to_ir(wasm_module, ptr_info, workers=workers)
+            verify_module(mod)
+            f = io.StringIO()
+            print_module(mod, file=f)
+            texts.append(f.getvalue())
+        self.assertEqual(texts[0], texts[1])
+
+        # Small modules are generated without workers:
+        with patch('ppci.wasm.wasm2ppci.ProcessPoolExecutor') as pool, patch(
+            'os.cpu_count', return_value=4
+        ):
+            wasm_to_ir(wasm_module, ptr_info, workers=4)
+        pool.assert_not_called()
+
 
 class WasmLoadAndSaveTestCase(unittest.TestCase):
     def test_load_save(self):
@@ -77,6 +108,72 @@ class WasmLoadAndSaveTestCase(unittest.TestCase):
 
         self.assertEqual(content1, content2)
 
+    def test_load_lazy_functions(self):
+        """ Function bodies are decoded when they are used """
+        program_filename = os.path.join(
+            THIS_DIR, '..', '..', 'examples', 'wasm', 'program.wasm')
+        with open(program_filename, 'rb') as f:
+            content1 = f.read()
+            f.seek(0)
+            wasm_module = read_wasm(f, lazy_functions=True)
+            self.assertEqual(len(content1), f.tell())
+
+        function = wasm_module['func'][0]
+        self.assertIsNotNone(function.body)
+        self.assertEqual(
+            Module(content1)['func'][0].to_string(), function.to_string())
+        self.assertIsNone(function.body)
+
+        self.assertEqual(content1, wasm_module.to_bytes())
+
+    def test_instruction_list(self):
+        """ Function bodies are read into compact instruction lists """
+        program = """
+        (module
+          (func (export "f") (param i32 f32) (result i32)
+            (block
+              (br_table 0 1 0 (local.get 0)))
+            (i32.trunc_sat_f32_s (local.get 1))))
+        """
+        content = Module(program).to_bytes()
+        wasm_module = read_wasm(content)
+        instructions = wasm_module['func'][0].instructions
+        self.assertIsInstance(instructions, InstructionList)
+        self.assertEqual(6, len(instructions))
+        self.assertEqual(
+            ['block', 'local.get', 'br_table', 'end', 'local.get',
+             'i32.trunc_sat_f32_s'],
+            [i.opcode for i in instructions])
+        self.assertEqual(
+            [0, 1, 0], [ref.index for ref in instructions[2].args[0]])
+        self.assertEqual(1, instructions[-2].args[0].index)
+        self.assertEqual(
+            ('br_table', [3, 0, 1, 0]), list(instructions.raw())[2])
+        self.assertEqual(content, wasm_module.to_bytes())
+
+    def test_instruction_list_modify(self):
+        """ Changes to the instructions of a compact list are kept """
+        program = '(module (func (export "f") (result i32) i32.const 7))'
+        wasm_module = read_wasm(Module(program).to_bytes())
+        instructions = wasm_module['func'][0].instructions
+        self.assertEqual([('i32.const', [7])], list(instructions.raw()))
+        self.assertIs(instructions[0], instructions[0])
+        instructions[0].args = (8,)
+        instructions.extend(
+            [Instruction('i32.const', 1), Instruction('i32.add')])
+
+        wasm_module = read_wasm(wasm_module.to_bytes())
+        self.assertEqual(
+            [('i32.const', [8]), ('i32.const', [1]), ('i32.add', [])],
+            list(wasm_module['func'][0].instructions.raw()))
+
+    def test_load_truncated(self):
+        """ Reading beyond the end of a section is an error """
+        program = '(module (func (export "f") (result i32) i32.const 7))'
+        content = Module(program).to_bytes()
+        with self.assertRaises(EOFError):
+            read_wasm(content[:-3])
+
 
 class NameNormalizationTestCase(unittest.TestCase):
     def test_sanitize_name(self):